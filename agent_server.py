@@ -578,24 +578,25 @@ async def startup():
 
     try:
         import httpx
+        from brain.task_executor import fetch_plugin_catalog
+
+        # 上次拿到的插件列表及其 ETag；插件列表未变化时插件服务器只返回 304
+        plugin_catalog = {"plugins": [], "etag": None}
 
         async def _http_plugin_provider(force_refresh: bool = False):
-            url = f"http://localhost:{USER_PLUGIN_SERVER_PORT}/plugins"
-            if force_refresh:
-                url += "?refresh=true"
             try:
-                async with httpx.AsyncClient(timeout=1.0) as client:
-                    r = await client.get(url)
-                    if r.status_code == 200:
-                        try:
-                            data = r.json()
-                        except Exception as parse_err:
-                            logger.debug(f"[Agent] plugin_list_provider parse error: {parse_err}")
-                            data = {}
-                        return data.get("plugins", []) or []
+                plugins, etag = await fetch_plugin_catalog(
+                    None if force_refresh else plugin_catalog["etag"],
+                    timeout=httpx.Timeout(1.0),
+                )
+                if plugins is not None:
+                    plugin_catalog["plugins"] = plugins or []
+                    plugin_catalog["etag"] = etag
+                return plugin_catalog["plugins"]
             except Exception as e:
                 logger.debug(f"[Agent] plugin_list_provider http fetch failed: {e}")
-            return []
+            # 请求失败：有上次的结果就继续用，否则交给 task_executor 自带的获取逻辑
+            return plugin_catalog["plugins"] if plugin_catalog["etag"] else None
 
         # inject http-based provider so DirectTaskExecutor can pick up user_plugin_server plugins
         try:
@@ -18,6 +18,38 @@ from .computer_use import ComputerUseAdapter
 
 logger = logging.getLogger(__name__)
 
+# 插件列表缓存超过该时间（秒）后在后台用 ETag 重新验证，期间继续使用旧列表
+PLUGIN_LIST_REVALIDATE_SECONDS = 10
+
+
+async def fetch_plugin_catalog(
+    etag: Optional[str] = None,
+    timeout: Optional[httpx.Timeout] = None,
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    条件请求插件服务器的插件列表
+    
+    Args:
+        etag: 上次响应的 ETag，插件列表未变化时服务器返回 304
+        timeout: 请求超时
+    
+    Returns:
+        (plugins, etag)；插件列表未变化时 plugins 为 None
+    
+    Raises:
+        httpx.HTTPError: 请求失败
+    """
+    url = f"http://localhost:{USER_PLUGIN_SERVER_PORT}/plugins"
+    headers = {"If-None-Match": etag} if etag else None
+    async with httpx.AsyncClient(timeout=timeout or httpx.Timeout(5.0, connect=2.0)) as client:
+        resp = await client.get(url, headers=headers)
+    if resp.status_code == 304:
+        return None, etag
+    resp.raise_for_status()
+    data = resp.json()
+    plugins = data.get("plugins", []) if isinstance(data, dict) else (data if isinstance(data, list) else [])
+    return plugins, resp.headers.get("ETag")
+
 
 @dataclass
 class TaskResult:
@@ -89,9 +121,11 @@ class DirectTaskExecutor:
         self._llm_client_cache = None
         self._llm_client_cache_time = 0
         self._llm_cache_timeout = 60  # LLM客户端缓存超时时间（秒）
-        # 插件列表缓存
+        # 插件列表缓存（stale-while-revalidate：过期后先返回旧列表，后台用 ETag 刷新）
         self._plugin_list_cache_time = 0
-        self._plugin_cache_timeout = 60  # 插件列表缓存超时时间（秒）
+        self._plugin_cache_timeout = PLUGIN_LIST_REVALIDATE_SECONDS
+        self._plugin_list_etag: Optional[str] = None
+        self._plugin_list_refresh_task: Optional[asyncio.Task] = None
     
     
     def set_plugin_list_provider(self, provider: Callable[[bool], Awaitable[List[Dict[str, Any]]]]):
@@ -99,50 +133,55 @@ class DirectTaskExecutor:
         self._external_plugin_provider = provider
 
     async def plugin_list_provider(self, force_refresh: bool = True) -> List[Dict[str, Any]]:
+        """
+        获取插件列表
+        
+        force_refresh=False 时使用 stale-while-revalidate：已有缓存就立即返回，
+        缓存过期则在后台刷新（未变化时插件服务器只返回 304），不阻塞调用方。
+        """
         import time
         current_time = time.time()
         
-        # Check if cache is valid
-        if self.plugin_list and not force_refresh and current_time - self._plugin_list_cache_time < self._plugin_cache_timeout:
-            logger.info(f"[Agent] Using cached plugin list, found {len(self.plugin_list)} plugins")
-            return self.plugin_list
+        if force_refresh or not self._plugin_list_cache_time:
+            return await self._refresh_plugin_list(force_refresh)
+        
+        if current_time - self._plugin_list_cache_time >= self._plugin_cache_timeout:
+            if self._plugin_list_refresh_task is None or self._plugin_list_refresh_task.done():
+                self._plugin_list_refresh_task = asyncio.create_task(self._refresh_plugin_list(False))
+        logger.debug(f"[Agent] Using cached plugin list, found {len(self.plugin_list)} plugins")
+        return self.plugin_list
+
+    async def _refresh_plugin_list(self, force_refresh: bool) -> List[Dict[str, Any]]:
+        import time
+        current_time = time.time()
 
         # try external provider first (e.g., injected by agent_server)
         if self._external_plugin_provider is not None:
             try:
                 plugins = await self._external_plugin_provider(force_refresh)
                 if isinstance(plugins, list):
-                    self.plugin_list = plugins
+                    if plugins is not self.plugin_list:
+                        self.plugin_list = plugins
+                        logger.info(f"[Agent] Updated plugin list via external provider, found {len(self.plugin_list)} plugins")
                     self._plugin_list_cache_time = current_time
-                    logger.info(f"[Agent] Updated plugin list via external provider, found {len(self.plugin_list)} plugins")
                     return self.plugin_list
             except Exception as e:
                 logger.warning(f"[Agent] external plugin_list_provider failed: {e}")
 
         # fallback to built-in HTTP fetcher
         try:
-            url = f"http://localhost:{USER_PLUGIN_SERVER_PORT}/plugins"
-            # increase timeout and avoid awaiting a non-awaitable .json()
-            timeout = httpx.Timeout(5.0, connect=2.0)
-            async with httpx.AsyncClient(timeout=timeout) as _client:
-                resp = await _client.get(url)
-                try:
-                    data = resp.json()
-                except Exception:
-                    logger.warning("[Agent] Failed to parse plugins response as JSON")
-                    data = {}
-                plugin_list = data.get("plugins", []) if isinstance(data, dict) else (data if isinstance(data, list) else [])
-                # only update cache when we obtained a non-empty list
-                if plugin_list:
-                    self.plugin_list = plugin_list  # 更新实例变量
-                    self._plugin_list_cache_time = current_time
-                    logger.info(f"[Agent] Updated plugin list via HTTP, found {len(self.plugin_list)} plugins")
-                else:
-                    logger.info(f"[Agent] No plugins found, using cached list with {len(self.plugin_list)} plugins")
+            plugin_list, etag = await fetch_plugin_catalog(None if force_refresh else self._plugin_list_etag)
+            self._plugin_list_cache_time = current_time
+            if plugin_list is None:
+                logger.debug("[Agent] Plugin list not modified")
+            else:
+                self.plugin_list = plugin_list  # 更新实例变量
+                self._plugin_list_etag = etag
+                logger.info(f"[Agent] Updated plugin list via HTTP, found {len(self.plugin_list)} plugins")
+                logger.info(f"[Agent] Loaded {len(self.plugin_list)} plugins: {[p.get('id', 'unknown') for p in self.plugin_list if isinstance(p, dict)]}")
         except Exception as e:
-            logger.warning(f"[Agent] plugin_list_provider http fetch failed: {e}")
+            logger.warning(f"[Agent] plugin_list_provider http fetch failed, using cached list with {len(self.plugin_list)} plugins: {e}")
         
-        logger.info(f"[Agent] Loaded {len(self.plugin_list)} plugins: {[p.get('id', 'unknown') for p in self.plugin_list if isinstance(p, dict)]}")
         return self.plugin_list
 
 
@@ -639,9 +678,8 @@ Return only the JSON object, nothing else.
         if mcp_enabled and capabilities:
             assessment_tasks.append(('mcp', self._assess_mcp(conversation, capabilities)))
         
-        # user plugin 支路（由外部 provider 提供插件列表）
-        await self.plugin_list_provider()
-        plugins = self.plugin_list
+        # user plugin 支路（由外部 provider 提供插件列表；有缓存时不等待网络请求）
+        plugins = await self.plugin_list_provider(force_refresh=False)
         
         if user_plugin_enabled and plugins:
             assessment_tasks.append(('up', self._assess_user_plugin(conversation, plugins)))
@@ -42,6 +42,9 @@ DEFAULT_OPENROUTER_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 # 屏幕分享模式的原生图片输入限流配置（秒）
 NATIVE_IMAGE_MIN_INTERVAL = 1.5
 
+# 是否把每次对话写入语义记忆（每条消息都要调用付费的嵌入接口，默认关闭）
+SEMANTIC_MEMORY_STORE_ENABLED = False
+
 # 用户自定义模型配置的默认 Provider/URL/API_KEY（空字符串表示使用全局配置）
 DEFAULT_SUMMARY_MODEL_PROVIDER = ""
 DEFAULT_SUMMARY_MODEL_URL = ""
@@ -346,6 +349,7 @@ __all__ = [
     'EXTRA_BODY_CLAUDE',
     'MAIN_SERVER_PORT',
     'MEMORY_SERVER_PORT',
+    'SEMANTIC_MEMORY_STORE_ENABLED',
     'MONITOR_SERVER_PORT',
     'COMMENTER_SERVER_PORT',
     'TOOL_SERVER_PORT',
@@ -102,6 +102,33 @@ history_review_prompt = """请审阅%s和%s之间的对话历史记录，识别
 - 解决明显的矛盾
 - 保持对话的自然流畅性"""
 
+history_review_incremental_prompt = """请审阅%s和%s之间的对话历史记录中【待审阅】的部分，识别并修正以下问题：
+
+<问题1> 矛盾的部分：前后不一致的信息或观点 </问题1>
+<问题2> 冗余的部分：重复的内容或信息 </问题2>
+<问题3> 复读的部分：重复表达相同意思的内容 </问题3>
+<问题4> 人称错误的部分：对自己或对方的人称错误，或擅自生成了多轮对话 </问题4>
+<问题5> 角色错误的部分：认知失调，认为自己是大语言模型 </问题5>
+
+请注意！
+<要点1> 这是一段情景对话，双方的回答应该是口语化的、自然的、拟人化的。</要点1>
+<要点2> 请以删除为主，除非不得已、不要直接修改内容。</要点2>
+<要点3> 【已审阅】的部分仅作为上下文参考，不要修改或删除。“先前对话的备忘录”可以修改，但不允许删除。</要点3>
+<要点4> 请保留时间戳。 </要点4>
+
+======以下为对话历史======
+%s
+======以上为对话历史======
+
+请以JSON格式只返回需要修改的消息（用消息前的编号指代），没有问题时"修改"为空列表，格式为：
+{
+    "修正说明": "简要说明发现的问题和修正内容",
+    "修改": [
+        {"编号": 3, "操作": "删除"},
+        {"编号": 5, "操作": "修改", "内容": "修正后的消息内容"}
+    ]
+}"""
+
 emotion_analysis_prompt = """你是一个情感分析专家。请分析用户输入的文本情感，并返回以下格式的JSON：{"emotion": "情感类型", "confidence": 置信度(0-1), "reason": "分析原因"}。情感类型包括：happy(开心), sad(悲伤), angry(愤怒), neutral(中性),surprised(惊讶)。"""
 
 proactive_chat_prompt = """你是{lanlan_name}，现在看到了一些B站首页推荐和微博热议话题。请根据与{master_name}的对话历史和{master_name}的兴趣，判断是否要主动和{master_name}聊聊这些内容。
@@ -2,6 +2,8 @@
 本文件是主逻辑文件，负责管理整个对话流程。当选择不使用TTS时，将会通过OpenAI兼容接口使用Omni模型的原生语音输出。
 当选择使用TTS时，将会通过额外的TTS API去合成语音。注意，TTS API的输出是流式输出、且需要与用户输入进行交互，实现打断逻辑。
 TTS部分使用了两个队列，原本只需要一个，但是阿里的TTS API回调函数只支持同步函数，所以增加了一个response queue来异步向前端发送音频数据。
+response queue 是 TTSQueueBridge：worker 线程 put 后直接唤醒事件循环，无需轮询。
+TTS worker 由共享的 TTSWorkerPool 托管，多个会话复用少量事件循环线程。
 """
 import asyncio
 import json
@@ -17,16 +19,17 @@ from utils.frontend_utils import contains_chinese, replace_blank, replace_corner
 from utils.screenshot_utils import process_screen_data
 from main_logic.omni_realtime_client import OmniRealtimeClient
 from main_logic.omni_offline_client import OmniOfflineClient
-from main_logic.tts_client import get_tts_worker
+from main_logic.tts_client import get_tts_worker, get_tts_pool, get_tts_cache_model, TTSQueueBridge, TTS_BATCH_MAX_BYTES
+from main_logic.tts_cache import get_tts_cache, TTSTurnRecorder, TTSLeadingSegments
 from config import MEMORY_SERVER_PORT
 from utils.config_manager import get_config_manager
 from utils.language_utils import normalize_language_code
-from threading import Thread
 from queue import Queue
 from uuid import uuid4
 import numpy as np
 import soxr
 import httpx 
+from urllib.parse import unquote
 
 # Setup logger for this module
 logger = logging.getLogger(__name__)
@@ -41,9 +44,9 @@ class LLMSessionManager:
         self.is_active = False
         self.active_session_is_idle = False
         self.current_expression = None
-        self.tts_request_queue = Queue()  # TTS request (线程队列)
-        self.tts_response_queue = Queue()  # TTS response (线程队列)
-        self.tts_thread = None  # TTS线程
+        self.tts_request_queue = Queue()  # TTS request（由 TTSWorkerPool 在启动时替换）
+        self.tts_response_queue = TTSQueueBridge()  # TTS response (线程 -> 事件循环)
+        self.tts_worker = None  # TTSSessionHandle（共享 TTS worker 池中的会话）
         # 流式音频重采样器（24kHz→48kHz）- 维护内部状态避免 chunk 边界不连续
         self.audio_resampler = soxr.ResampleStream(24000, 48000, 1, dtype='float32')
         self.lock = asyncio.Lock()  # 使用异步锁替代同步锁
@@ -80,6 +83,8 @@ class LLMSessionManager:
         realtime_config = self._config_manager.get_model_api_config('realtime')
         self.core_api_type = realtime_config.get('api_type', '') or self._config_manager.get_core_config().get('CORE_API_TYPE', '')
         self.memory_server_port = MEMORY_SERVER_PORT
+        # 上次获取的记忆上下文 (角色名, ETag, 文本, 文本中的时间)，内容未变化时服务端返回 304
+        self._new_dialog_cache = None
         self.audio_api_key = self._config_manager.get_core_config()['AUDIO_API_KEY']  # 用于CosyVoice自定义音色
         self.voice_id = self.lanlan_basic_config[self.lanlan_name].get('voice_id', '')
         # 注意：use_tts 会在 start_session 中根据 input_mode 重新设置
@@ -130,6 +135,11 @@ class LLMSessionManager:
         self.tts_pending_chunks = []  # 待处理的TTS文本chunk: [(speech_id, text), ...]
         self.tts_cache_lock = asyncio.Lock()  # 保护缓存的锁
         
+        # TTS 语音缓存：记录发往 TTS 的文本与返回的 PCM，轮次完成后按 (音色, 模型, 规范化文本) 写入缓存
+        self.tts_cache_model = None  # 当前 TTS worker 在缓存键中的模型名，None 表示该 worker 不支持缓存
+        self.tts_recorder = TTSTurnRecorder()
+        self.tts_segments = TTSLeadingSegments()  # 轮次开头逐句查询缓存
+        
         # 输入数据缓存机制：确保session初始化期间的输入不丢失
         self.session_ready = False  # Session是否完全就绪
         self.pending_input_data = []  # 待处理的输入数据: [message_dict, ...]
@@ -158,16 +168,14 @@ class LLMSessionManager:
         """处理新模型输出：清空TTS队列并通知前端"""
         # 重置音频重采样器状态（新轮次音频不应与上轮次连续）
         self.audio_resampler.clear()
-        if self.use_tts and self.tts_thread and self.tts_thread.is_alive():
+        if self.use_tts and self.tts_worker and self.tts_worker.is_alive():
             # 清空响应队列中待发送的音频数据
-            while not self.tts_response_queue.empty():
-                try:
-                    self.tts_response_queue.get_nowait()
-                except: # noqa
-                    break
-            # 发送终止信号以清空TTS请求队列并停止当前合成
+            self.tts_response_queue.clear()
+            self.tts_recorder.interrupt()
+            self.tts_segments.reset()
+            # 按 speech_id 打断：丢弃被打断语音尚未合成的文本，并停止当前合成
             try:
-                self.tts_request_queue.put((None, None))
+                self.tts_worker.cancel_speech(self.current_speech_id)
             except Exception as e:
                 logger.warning(f"⚠️ 发送TTS中断信号失败: {e}")
         
@@ -190,13 +198,11 @@ class LLMSessionManager:
             async with self.tts_cache_lock:
                 self.tts_pending_chunks.clear()
             
-            if self.tts_thread and self.tts_thread.is_alive():
+            if self.tts_worker and self.tts_worker.is_alive():
                 # 清空响应队列中待发送的音频数据
-                while not self.tts_response_queue.empty():
-                    try:
-                        self.tts_response_queue.get_nowait()
-                    except: # noqa
-                        break
+                self.tts_response_queue.clear()
+                self.tts_recorder.interrupt()
+                self.tts_segments.reset()
         
         # 文本模式下，无论是否使用TTS，都要发送文本到前端显示
         await self.send_lanlan_response(text, is_first_chunk)
@@ -205,10 +211,10 @@ class LLMSessionManager:
         if self.use_tts:
             async with self.tts_cache_lock:
                 # 检查TTS是否就绪
-                if self.tts_ready and self.tts_thread and self.tts_thread.is_alive():
+                if self.tts_ready and self.tts_worker and self.tts_worker.is_alive():
                     # TTS已就绪，直接发送
                     try:
-                        self.tts_request_queue.put((self.current_speech_id, text))
+                        self.queue_tts_request(self.current_speech_id, text)
                     except Exception as e:
                         logger.warning(f"⚠️ 发送TTS请求失败: {e}")
                 else:
@@ -219,10 +225,10 @@ class LLMSessionManager:
 
     async def handle_response_complete(self):
         """Qwen完成回调：用于处理Core API的响应完成事件，包含TTS和热切换逻辑"""
-        if self.use_tts and self.tts_thread and self.tts_thread.is_alive():
+        if self.use_tts and self.tts_worker and self.tts_worker.is_alive():
             logger.info("📨 Response complete (LLM 回复结束)")
             try:
-                self.tts_request_queue.put((None, None))
+                self.queue_tts_request(None, None)
             except Exception as e:
                 logger.warning(f"⚠️ 发送TTS结束信号失败: {e}")
         self.sync_message_queue.put({'type': 'system', 'data': 'turn end'})
@@ -372,10 +378,10 @@ class LLMSessionManager:
         if self.use_tts:
             async with self.tts_cache_lock:
                 # 检查TTS是否就绪
-                if self.tts_ready and self.tts_thread and self.tts_thread.is_alive():
+                if self.tts_ready and self.tts_worker and self.tts_worker.is_alive():
                     # TTS已就绪，直接发送
                     try:
-                        self.tts_request_queue.put((self.current_speech_id, text))
+                        self.queue_tts_request(self.current_speech_id, text)
                     except Exception as e:
                         logger.warning(f"⚠️ 发送TTS请求失败: {e}")
                 else:
@@ -545,10 +551,10 @@ class LLMSessionManager:
             chunk_count = len(self.tts_pending_chunks)
             logger.info(f"TTS就绪，开始处理缓存的 {chunk_count} 个文本chunk...")
             
-            if self.tts_thread and self.tts_thread.is_alive():
+            if self.tts_worker and self.tts_worker.is_alive():
                 for speech_id, text in self.tts_pending_chunks:
                     try:
-                        self.tts_request_queue.put((speech_id, text))
+                        self.queue_tts_request(speech_id, text)
                     except Exception as e:
                         logger.error(f"💥 发送缓存的TTS请求失败: {e}")
                         break
@@ -627,7 +633,7 @@ class LLMSessionManager:
                     for i in range(0, len(combined_audio), large_chunk_size):
                         chunk = combined_audio[i:i + large_chunk_size]
                         try:
-                            await self.session.stream_audio(chunk)
+                            await self.session.stream_audio(chunk, preprocessed=True)
                             await asyncio.sleep(0.025)
                             total_chunks_sent += 1
                         except Exception as e:
@@ -753,15 +759,15 @@ class LLMSessionManager:
             logger.info("旧session清理完成")
         
         # 如果当前不需要TTS但TTS线程仍在运行，发送停止信号
-        if not self.use_tts and self.tts_thread and self.tts_thread.is_alive():
+        if not self.use_tts and self.tts_worker and self.tts_worker.is_alive():
             logger.info("当前模式不需要TTS，关闭TTS线程")
             try:
-                self.tts_request_queue.put((None, None))  # 通知线程退出
-                self.tts_thread.join(timeout=1.0)  # 等待线程结束
+                self.tts_worker.stop()  # 通知会话退出
+                await asyncio.to_thread(self.tts_worker.join, 1.0)  # 等待会话结束
             except Exception as e:
                 logger.error(f"关闭TTS线程时出错: {e}")
             finally:
-                self.tts_thread = None
+                self.tts_worker = None
 
         # 定义 TTS 启动协程（如果需要）
         async def start_tts_if_needed():
@@ -770,7 +776,7 @@ class LLMSessionManager:
                 return True
             
             # 启动TTS线程
-            if self.tts_thread is None or not self.tts_thread.is_alive():
+            if self.tts_worker is None or not self.tts_worker.is_alive():
                 # 判断是否使用自定义 TTS：有 voice_id 或 配置了自定义 TTS URL
                 core_config = self._config_manager.get_core_config()
                 has_custom_tts = bool(self.voice_id) or (
@@ -784,19 +790,18 @@ class LLMSessionManager:
                     has_custom_voice=has_custom_tts
                 )
                 
-                self.tts_request_queue = Queue()  # TTS request (线程队列)
-                self.tts_response_queue = Queue()  # TTS response (线程队列)
                 # 根据是否有自定义音色/TTS配置选择 TTS API 配置
                 if has_custom_tts:
                     tts_config = self._config_manager.get_model_api_config('tts_custom')
                 else:
                     tts_config = self._config_manager.get_model_api_config('tts_default')
-                self.tts_thread = Thread(
-                    target=tts_worker,
-                    args=(self.tts_request_queue, self.tts_response_queue, tts_config['api_key'], self.voice_id)
-                )
-                self.tts_thread.daemon = True
-                self.tts_thread.start()
+                # 交给共享 worker 池运行（不再为每个会话单独开线程和事件循环）
+                self.tts_worker = get_tts_pool().start(tts_worker, tts_config['api_key'], self.voice_id)
+                self.tts_request_queue = self.tts_worker.request_queue
+                self.tts_response_queue = self.tts_worker.response_queue
+                self.tts_cache_model = get_tts_cache_model(tts_worker)
+                self.tts_recorder = TTSTurnRecorder()
+                self.tts_segments = TTSLeadingSegments()
                 
                 # 等待TTS进程发送就绪信号（最多等待8秒）
                 tts_type = "自定义TTS" if has_custom_tts else f"{self.core_api_type}默认TTS"
@@ -806,28 +811,21 @@ class LLMSessionManager:
                 start_time = time.time()
                 timeout = 8.0  # 最多等待8秒
                 
-                while time.time() - start_time < timeout:
-                    try:
-                        # 非阻塞检查队列
-                        if not self.tts_response_queue.empty():
-                            msg = self.tts_response_queue.get_nowait()
-                            # 检查是否是就绪信号
-                            if isinstance(msg, tuple) and len(msg) == 2 and msg[0] == "__ready__":
-                                tts_ready = msg[1]
-                                if tts_ready:
-                                    logger.info(f"✅ TTS进程已就绪 (用时: {time.time() - start_time:.2f}秒)")
-                                else:
-                                    logger.error("❌ TTS进程初始化失败")
-                                break
-                            else:
-                                # 不是就绪信号，放回队列
-                                self.tts_response_queue.put(msg)
-                                break
-                    except: # noqa
-                        pass
-                    
-                    # 小睡眠避免忙等
-                    await asyncio.sleep(0.05)
+                try:
+                    # 事件驱动等待第一条响应，不再轮询
+                    msg = await asyncio.wait_for(self.tts_response_queue.get(), timeout=timeout)
+                    # 检查是否是就绪信号
+                    if isinstance(msg, tuple) and len(msg) == 2 and msg[0] == "__ready__":
+                        tts_ready = msg[1]
+                        if tts_ready:
+                            logger.info(f"✅ TTS进程已就绪 (用时: {time.time() - start_time:.2f}秒)")
+                        else:
+                            logger.error("❌ TTS进程初始化失败")
+                    else:
+                        # 不是就绪信号，放回队首
+                        self.tts_response_queue.requeue(msg)
+                except asyncio.TimeoutError:
+                    pass
                 
                 if not tts_ready:
                     if time.time() - start_time >= timeout:
@@ -863,8 +861,7 @@ class LLMSessionManager:
             # 连接 Memory Server 获取记忆上下文
             try:
                 async with httpx.AsyncClient(timeout=2.0) as client:
-                    resp = await client.get(f"http://localhost:{self.memory_server_port}/new_dialog/{self.lanlan_name}")
-                    initial_prompt += resp.text + f"========以上为前情概要。现在请{self.lanlan_name}准备，即将开始用语音与{self.master_name}继续对话。========\n"
+                    initial_prompt += await self._fetch_new_dialog(client) + f"========以上为前情概要。现在请{self.lanlan_name}准备，即将开始用语音与{self.master_name}继续对话。========\n"
             except httpx.ConnectError:
                 raise ConnectionError(f"❌ 记忆服务未启动！请先启动记忆服务 (端口 {self.memory_server_port})")
             except httpx.TimeoutException:
@@ -1078,6 +1075,26 @@ class LLMSessionManager:
         except Exception as e:
             logger.error(f"💥 WS Send User Activity Error: {e}")
 
+    async def _fetch_new_dialog(self, client):
+        """获取记忆上下文；设定与近期记录未变化时服务端返回 304，复用上次的文本，只替换其中的当前时间"""
+        headers = {}
+        cached = self._new_dialog_cache
+        if cached is not None and cached[0] == self.lanlan_name:
+            headers["If-None-Match"] = cached[1]
+        else:
+            cached = None
+        resp = await client.get(f"http://localhost:{self.memory_server_port}/new_dialog/{self.lanlan_name}", headers=headers)
+        timestamp = unquote(resp.headers.get("X-Context-Timestamp", ""))
+        if resp.status_code == 304 and cached is not None:
+            _, etag, text, old_timestamp = cached
+            if old_timestamp and timestamp:
+                text = text.replace(f"现在时间是{old_timestamp}", f"现在时间是{timestamp}", 1)
+            self._new_dialog_cache = (self.lanlan_name, etag, text, timestamp or old_timestamp)
+            return text
+        etag = resp.headers.get("ETag")
+        self._new_dialog_cache = (self.lanlan_name, etag, resp.text, timestamp) if resp.status_code == 200 and etag else None
+        return resp.text
+
     def _convert_cache_to_str(self, cache):
         """[热切换相关] 将cache转换为字符串"""
         res = ""
@@ -1156,8 +1173,7 @@ class LLMSessionManager:
             initial_prompt = (f"你是一个角色扮演大师，并且精通电脑操作。请按要求扮演以下角色（{self.lanlan_name}），在对方请求时、回答“我试试”并尝试操纵电脑。" if self._is_agent_enabled() else f"你是一个角色扮演大师。请按要求扮演以下角色（{self.lanlan_name}）。") + self.lanlan_prompt
             self.initial_cache_snapshot_len = len(self.message_cache_for_new_session)
             async with httpx.AsyncClient() as client:
-                resp = await client.get(f"http://localhost:{self.memory_server_port}/new_dialog/{self.lanlan_name}")
-                initial_prompt += resp.text + self._convert_cache_to_str(self.message_cache_for_new_session)
+                initial_prompt += await self._fetch_new_dialog(client) + self._convert_cache_to_str(self.message_cache_for_new_session)
             # print(initial_prompt)
             await self.pending_session.connect(initial_prompt, native_audio = not self.use_tts)
 
@@ -1522,13 +1538,22 @@ class LLMSessionManager:
                     logger.error("💥 Stream: Session websocket not available")
                     return
                 try:
-                    if isinstance(data, list):
-                        audio_bytes = struct.pack(f'<{len(data)}h', *data)
+                    if isinstance(data, (bytes, bytearray, memoryview, list)):
+                        if isinstance(data, list):
+                            # 旧版 JSON 协议：int 列表
+                            audio_bytes = struct.pack(f'<{len(data)}h', *data)
+                        else:
+                            # 二进制帧协议：原始小端 int16，零拷贝传递给 AudioProcessor
+                            audio_bytes = data
                         
                         # 🔧 音频预处理：RNNoise降噪 + 降采样到16kHz（在缓存之前）
-                        # 检查是否为48kHz输入（480 samples = 960 bytes per 10ms chunk）
-                        num_samples = len(audio_bytes) // 2
-                        is_48khz = (num_samples == 480)
+                        # 二进制帧头部带有采样率；旧版 JSON 协议没有，只能按块长猜测
+                        # （480 samples = 960 bytes per 10ms chunk 视为48kHz）
+                        sample_rate = message.get("sample_rate")
+                        if sample_rate is not None:
+                            is_48khz = (sample_rate == 48000)
+                        else:
+                            is_48khz = (len(audio_bytes) // 2 == 480)
                         
                         processed_audio = audio_bytes  # 默认使用原始音频
                         if is_48khz and isinstance(self.session, OmniRealtimeClient):
@@ -1583,8 +1608,8 @@ class LLMSessionManager:
                                 self.last_audio_send_error_time = current_time
                             return
                         
-                        # 发送音频到session（stream_audio会检测是否48kHz，16kHz不会再处理）
-                        await self.session.stream_audio(processed_audio)
+                        # 发送音频到session（已预处理的音频不会被再次按48kHz处理）
+                        await self.session.stream_audio(processed_audio, preprocessed=processed_audio is not audio_bytes)
                     else:
                         logger.error(f"💥 Stream: Invalid audio data type: {type(data)}")
                         return
@@ -1701,14 +1726,14 @@ class LLMSessionManager:
                 pass
             self.tts_handler_task = None
             
-        if self.tts_thread and self.tts_thread.is_alive():
+        if self.tts_worker and self.tts_worker.is_alive():
             try:
-                self.tts_request_queue.put((None, None))  # 通知线程退出
-                self.tts_thread.join(timeout=2.0)  # 等待线程结束
+                self.tts_worker.stop()  # 通知会话退出
+                await asyncio.to_thread(self.tts_worker.join, 2.0)  # 等待会话结束
             except Exception as e:
                 logger.error(f"💥 关闭TTS线程时出错: {e}")
             finally:
-                self.tts_thread = None
+                self.tts_worker = None
                 
         # 清理TTS队列和缓存状态
         try:
@@ -1716,11 +1741,9 @@ class LLMSessionManager:
                 self.tts_request_queue.get_nowait()
         except: # noqa
             pass
-        try:
-            while not self.tts_response_queue.empty():
-                self.tts_response_queue.get_nowait()
-        except: # noqa
-            pass
+        self.tts_response_queue.clear()
+        self.tts_recorder.interrupt()
+        self.tts_segments.reset()
         
         # 重置TTS缓存状态
         async with self.tts_cache_lock:
@@ -1936,12 +1959,125 @@ class LLMSessionManager:
 
     async def tts_response_handler(self):
         while True:
-            while not self.tts_response_queue.empty():
-                data = self.tts_response_queue.get_nowait()
-                # 过滤掉就绪信号（格式为 ("__ready__", True/False)）
-                if isinstance(data, tuple) and len(data) == 2 and data[0] == "__ready__":
-                    # 这是就绪信号，不是音频数据，跳过
-                    continue
-                await self.send_speech(data)
-            await asyncio.sleep(0.01)
+            # 事件驱动：worker put 时唤醒；相邻的 PCM chunk 合并为一个 WebSocket 帧发送
+            data = await self.tts_response_queue.get_batch()
+            # 过滤掉控制信号：就绪信号 ("__ready__", True/False)、轮次合成完成 ("__turn_done__", speech_id)
+            # ("__cached__", pcm) 是命中 TTS 缓存的句子，与合成音频走同一队列以保持顺序，但不记录到缓存
+            if isinstance(data, tuple) and len(data) == 2:
+                if data[0] == "__turn_done__":
+                    self._store_tts_turn(data[1])
+                elif data[0] == "__cached__":
+                    pcm = data[1]
+                    for i in range(0, len(pcm), TTS_BATCH_MAX_BYTES):
+                        await self.send_speech(pcm[i:i + TTS_BATCH_MAX_BYTES])
+                continue
+            if self.tts_cache_model:
+                self.tts_recorder.add_audio(data)
+            await self.send_speech(data)
+
+    def queue_tts_request(self, speech_id, text):
+        """
+        向 TTS worker 发送 (speech_id, text)，(None, None) 为轮次结束信号。
+        worker 支持缓存时，轮次开头的句子逐句查询 TTS 缓存（命中则直接播放），
+        并记录发给 worker 的文本，轮次完成后整轮写入缓存（只缓存短轮次，如问候语、开场白）。
+        """
+        if not self.tts_cache_model:
+            self.tts_request_queue.put((speech_id, text))
+            return
+        segments = self.tts_segments
+        
+        if speech_id is None:
+            sid = segments.speech_id
+            rest = segments.finish()
+            # 整个轮次都还在开头阶段（如没有句末符号的短回复），剩余文本也按句查缓存
+            if rest and not self._play_cached_segment(rest):
+                self._send_tts_text(sid, rest)
+            self.tts_recorder.close_text()
+            self.tts_request_queue.put((None, None))
+            return
+        
+        passthrough = segments.feed(speech_id, text)
+        if passthrough is not None:
+            self._send_tts_text(speech_id, passthrough)
+            return
+        missed = None
+        while missed is None:
+            segment = segments.next_segment()
+            if segment is None:
+                break
+            if not self._play_cached_segment(segment):
+                missed = segment
+        # 第一个未命中的句子，或句子过长/迟迟没有句末符号：开头阶段结束，
+        # 该句连同缓冲的文本照常流式交给 worker（不在回复中途结束 TTS 轮次，避免断句和重新建连）
+        if missed is not None or not segments.leading:
+            rest = (missed or "") + segments.release()
+            if rest:
+                self._send_tts_text(speech_id, rest)
+
+    def _send_tts_text(self, speech_id, text):
+        self.tts_recorder.add_text(speech_id, text)
+        self.tts_request_queue.put((speech_id, text))
+
+    def _play_cached_segment(self, text) -> bool:
+        """
+        按句查询 TTS 缓存（只查内存，不读盘）；命中则把缓存音频排入响应队列。
+        只在磁盘上的条目会在后台提升到内存，下次即可命中。
+        
+        Returns:
+            是否已处理该句（命中缓存，或规范化后没有可朗读的内容）
+        """
+        normalized = self.normalize_text(text)
+        if not normalized:
+            return True
+        cache = get_tts_cache()
+        key = cache.make_key(self.voice_id, self.tts_cache_model, normalized)
+        pcm = cache.peek(key)
+        if pcm is None:
+            if cache.on_disk(key):
+                asyncio.get_running_loop().run_in_executor(None, cache.get, key)
+            return False
+        logger.debug(f"🔁 TTS 缓存命中（句）: {normalized}")
+        self.tts_response_queue.put(("__cached__", pcm))
+        return True
+
+    def _store_tts_turn(self, speech_id):
+        """worker 报告轮次合成完成：完整的短句写入 TTS 缓存（写盘放到线程池，不阻塞音频发送）"""
+        finished = self.tts_recorder.finish(speech_id)
+        if not finished or not self.tts_cache_model:
+            return
+        text, pcm = finished
+        text = self.normalize_text(text)
+        cache = get_tts_cache()
+        if not cache.is_cacheable_text(text):
+            return
+        key = cache.make_key(self.voice_id, self.tts_cache_model, text)
+        asyncio.get_running_loop().run_in_executor(None, cache.put, key, pcm)
+        logger.debug(f"TTS 缓存写入: {text} ({len(pcm)} bytes)")
+
+    async def play_cached_speech(self, text: str) -> bool:
+        """
+        整段文本事先已知时（如主动搭话）先查 TTS 缓存，命中则直接推送缓存的 48kHz PCM
+        
+        Returns:
+            是否命中缓存；未命中时调用方照常把文本交给 TTS
+        """
+        if not (self.use_tts and self.tts_cache_model):
+            return False
+        normalized = self.normalize_text(text)
+        cache = get_tts_cache()
+        if not cache.is_cacheable_text(normalized):
+            return False
+        key = cache.make_key(self.voice_id, self.tts_cache_model, normalized)
+        pcm = await asyncio.to_thread(cache.get, key)
+        if not pcm:
+            return False
+        
+        # 与新消息一致：丢弃尚未播放的旧语音
+        self.tts_response_queue.clear()
+        self.tts_recorder.interrupt()
+        self.tts_segments.reset()
+        logger.info(f"🔁 TTS 缓存命中，直接播放: {normalized}")
+        for i in range(0, len(pcm), TTS_BATCH_MAX_BYTES):
+            await self.send_speech(pcm[i:i + TTS_BATCH_MAX_BYTES])
+        return True
 
@@ -13,6 +13,7 @@ import time
 import pickle
 import aiohttp
 import logging
+from queue import Empty
 from config import MONITOR_SERVER_PORT, MEMORY_SERVER_PORT, COMMENTER_SERVER_PORT, TOOL_SERVER_PORT
 from datetime import datetime
 import json
@@ -30,6 +31,16 @@ emoji_pattern2 = re.compile("["
                            "]+", flags=re.UNICODE)
 emotion_pattern = re.compile('<(.*?)>')
 
+# 同步连接器参数
+SYNC_QUEUE_POLL_TIMEOUT = 0.5  # 阻塞读取线程队列的超时（秒），仅用于及时响应关闭信号
+SYNC_LINK_CHECK_INTERVAL = 1.0  # 检查/重连下游 WebSocket 的间隔（秒）
+SYNC_HEARTBEAT_INTERVAL = 10.0  # 连接空闲超过该时长才发送应用层心跳（秒）
+SYNC_RECONNECT_MIN_DELAY = 0.5  # 重连退避的初始/最大间隔（秒）
+SYNC_RECONNECT_MAX_DELAY = 30.0
+SYNC_MEMORY_POST_TIMEOUT = 10.0  # 提交聊天历史的超时（秒），memory_server 落盘后立即返回，LLM 处理在其后台进行
+SYNC_BINARY_BATCH_BYTES = 48000 * 2 // 5  # 合并转发相邻音频块的上限（48kHz int16 约 200ms）
+_SYNC_STOP = object()  # 读取线程通知事件循环退出的哨兵
+
 
 def normalize_text(text):  # 对文本进行基本预处理
     text = text.strip()
@@ -124,7 +135,7 @@ async def keep_reader(ws: aiohttp.ClientWebSocketResponse):
         while True:
             try:
                 msg = await ws.receive(timeout=30)
-                if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.ERROR):
                     break
             except asyncio.TimeoutError:
                 pass
@@ -134,8 +145,100 @@ async def keep_reader(ws: aiohttp.ClientWebSocketResponse):
         pass
 
 
+class SyncLink:
+    """
+    同步连接器到某个下游服务（monitor 文本/二进制、bullet）的 WebSocket 连接。
+    断线后按指数退避重连；发送失败时标记断开，由维护任务在退避时间到达后重连。
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url: str, **connect_kwargs):
+        self.session = session
+        self.url = url
+        self.connect_kwargs = connect_kwargs
+        self.ws = None
+        self.reader = None
+        self.last_send = 0.0
+        self._delay = SYNC_RECONNECT_MIN_DELAY
+        self._next_attempt = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self.ws is not None and not self.ws.closed
+
+    async def ensure(self) -> bool:
+        """确保连接可用；处于退避期内时直接返回 False"""
+        if self.connected:
+            return True
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+        await self.close()
+        try:
+            self.ws = await self.session.ws_connect(self.url, **self.connect_kwargs)
+        except Exception:
+            # 下游服务可能尚未启动，退避后再试
+            self.ws = None
+            self._next_attempt = now + self._delay
+            self._delay = min(self._delay * 2, SYNC_RECONNECT_MAX_DELAY)
+            return False
+        self._delay = SYNC_RECONNECT_MIN_DELAY
+        self.reader = asyncio.create_task(keep_reader(self.ws))
+        return True
+
+    async def send_json(self, data) -> bool:
+        if not self.connected:
+            return False
+        try:
+            await self.ws.send_json(data)
+            self.last_send = time.monotonic()
+            return True
+        except Exception:
+            await self.close()
+            return False
+
+    async def send_bytes(self, data) -> bool:
+        if not self.connected:
+            return False
+        try:
+            await self.ws.send_bytes(data)
+            self.last_send = time.monotonic()
+            return True
+        except Exception:
+            await self.close()
+            return False
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+            self.reader = None
+        if self.ws:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+
+
+def _pump_message_queue(message_queue, shutdown_event, loop, inbox):
+    """
+    在 executor 线程中阻塞读取线程队列，并把消息转交给事件循环中的 asyncio 队列。
+    超时只用于及时响应关闭信号，空闲时不会占用 CPU。
+    """
+    try:
+        while not shutdown_event.is_set():
+            try:
+                message = message_queue.get(timeout=SYNC_QUEUE_POLL_TIMEOUT)
+            except Empty:
+                continue
+            loop.call_soon_threadsafe(inbox.put_nowait, message)
+        loop.call_soon_threadsafe(inbox.put_nowait, _SYNC_STOP)
+    except RuntimeError:
+        # 事件循环已关闭
+        pass
+
+
 def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_server_url=f"ws://localhost:{MONITOR_SERVER_PORT}", config=None):
-    """独立进程运行的同步连接器"""
+    """独立进程运行的同步连接器（事件驱动：消息到达时才唤醒）"""
 
     # 创建一个新的事件循环
     loop = asyncio.new_event_loop()
@@ -147,339 +250,278 @@ def sync_connector_process(message_queue, shutdown_event, lanlan_name, sync_serv
     config = default_config | config
 
     async def maintain_connection(chat_history, lanlan_name):
-        sync_session = None
-        sync_ws = None
-        sync_reader = None
-        binary_session = None
-        binary_ws = None
-        binary_reader = None
-        bullet_session = None
-        bullet_ws = None
-        bullet_reader = None
+        # 所有 WebSocket 与 HTTP 请求共用一个长连接会话
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=8))
+        sync_link = SyncLink(session, f"{sync_server_url}/sync/{lanlan_name}", heartbeat=10)
+        binary_link = SyncLink(session, f"{sync_server_url}/sync_binary/{lanlan_name}", heartbeat=10)
+        bullet_link = SyncLink(session, f"wss://localhost:{COMMENTER_SERVER_PORT}/sync/{lanlan_name}",
+                               ssl=ssl._create_unverified_context())
+        links = []
+        if config['monitor']:
+            links += [sync_link, binary_link]
+        if config['bullet']:
+            links.append(bullet_link)
+
+        inbox = asyncio.Queue()
+        memory_jobs = asyncio.Queue()  # /renew 与 /process 按顺序提交，不阻塞消息转发
+        background_tasks = set()
 
         user_input_cache = ''
         text_output_cache = '' # lanlan的当前消息
         current_turn = 'user'
         last_screen = None
 
-        while not shutdown_event.is_set():
-            try:
-                # 检查消息队列
-                while not message_queue.empty():
-                    message = message_queue.get()
-
-                    if message["type"] == "json":
-                        # Forward to monitor if enabled
-                        if config['monitor'] and sync_ws:
-                            await sync_ws.send_json(message["data"])
-
-                        # Only treat assistant turn when it's a gemini_response
-                        if message["data"].get("type") == "gemini_response":
-                            if current_turn == 'user':  # assistant new message starts
-                                if user_input_cache:
-                                    chat_history.append({'role': 'user', 'content': [{"type": "text", "text": user_input_cache}]})
-                                    user_input_cache = ''
-                                current_turn = 'assistant'
-                                text_output_cache = datetime.now().strftime('[%Y%m%d %a %H:%M] ')
-
-                                if config['bullet'] and bullet_ws:
-                                    try:
-                                        last_user = last_ai = None
-                                        for i in chat_history[::-1]:
-                                            if i["role"] == "user":
-                                                last_user = i['content'][0]['text']
-                                                break
-                                        for i in chat_history[::-1]:
-                                            if i["role"] == "assistant":
-                                                last_ai = i['content'][0]['text']
-                                                break
-
-                                        message_data = {
-                                            "user": last_user,
-                                            "ai": last_ai,
-                                            "screen": last_screen
-                                        }
-                                        binary_message = pickle.dumps(message_data)
-                                        await bullet_ws.send_bytes(binary_message)
-                                    except Exception as e:
-                                        logger.error(f"[{lanlan_name}] Error when sending to commenter: {e}")
-
-                            # Append assistant streaming text
-                            try:
-                                text_output_cache += message["data"].get("text", "")
-                            except Exception:
-                                pass
-
-                    elif message["type"] == "binary":
-                        if config['monitor'] and binary_ws:
-                            await binary_ws.send_bytes(message["data"])
-
-                    elif message["type"] == "user":  # 准备转录
-                        data = message["data"].get("data")
-                        input_type = message["data"].get("input_type")
-                        if input_type == "transcript": # 暂时只处理语音，后续还需要记录图片
-                            if user_input_cache == '' and config['monitor'] and sync_ws:
-                                await sync_ws.send_json({'type': 'user_activity'}) #用于打断前端声音播放
-                            user_input_cache += data
-                            # 发送用户转录到 monitor 供副终端显示
-                            if config['monitor'] and sync_ws and data:
-                                await sync_ws.send_json({'type': 'user_transcript', 'text': data})
-                        elif input_type == "screen":
-                            last_screen = data
-
-                    elif message["type"] == "system":
-                        try:
-                            if message["data"] == "google disconnected":
-                                if len(text_output_cache) > 0:
-                                    chat_history.append({'role': 'system', 'content': [
-                                        {'type': 'text', 'text': "网络错误，您已断开连接！"}]})
-                                text_output_cache = ''
-
-                            if message["data"] == "renew session":
-                                # 先处理未完成的用户输入缓存（如果有）
-                                if user_input_cache:
-                                    chat_history.append({'role': 'user', 'content': [{"type": "text", "text": user_input_cache}]})
-                                    user_input_cache = ''
-                                
-                                # 再处理未完成的输出缓存（如果有）
-                                current_turn = 'user'
-                                text_output_cache = normalize_text(text_output_cache)
-                                if len(text_output_cache) > 0:
-                                    chat_history.append(
-                                            {'role': 'assistant', 'content': [{'type': 'text', 'text': text_output_cache}]})
-                                text_output_cache = ''
-                                
-                                # 清理连续的assistant消息（主动搭话未被响应时只保留最后一条）
-                                chat_history = cleanup_consecutive_assistant_messages(chat_history)
-                                
-                                logger.info(f"[{lanlan_name}] 热重置：聊天历史长度 {len(chat_history)} 条消息")
-                                try:
-                                    async with aiohttp.ClientSession() as session:
-                                        async with session.post(
-                                            f"http://localhost:{MEMORY_SERVER_PORT}/renew/{lanlan_name}",
-                                            json={'input_history': json.dumps(chat_history, indent=2, ensure_ascii=False)},
-                                            timeout=aiohttp.ClientTimeout(total=30.0)
-                                        ) as response:
-                                            result = await response.json()
-                                            if result.get('status') == 'error':
-                                                logger.error(f"[{lanlan_name}] 热重置记忆处理失败: {result.get('message')}")
-                                            else:
-                                                logger.info(f"[{lanlan_name}] 热重置记忆已成功上传到 memory_server")
-                                except Exception as e:
-                                    logger.exception(f"[{lanlan_name}] 调用 /renew API 失败: {type(e).__name__}: {e}")
-                                chat_history.clear()
-
-                            if message["data"] == 'turn end': # lanlan的消息结束了
-                                current_turn = 'user'
-                                text_output_cache = normalize_text(text_output_cache)
-                                if len(text_output_cache) > 0:
-                                    chat_history.append(
-                                        {'role': 'assistant', 'content': [{'type': 'text', 'text': text_output_cache}]})
-                                text_output_cache = ''
-                                if config['monitor'] and sync_ws:
-                                    await sync_ws.send_json({'type': 'turn end'})
-                                # 非阻塞地向tool_server发送最近对话，供分析器识别潜在任务
-                                try:
-                                    # 构造最近的消息摘要
-                                    recent = []
-                                    for item in chat_history[-6:]:
-                                        if item.get('role') in ['user', 'assistant']:
-                                            try:
-                                                txt = item['content'][0]['text'] if item.get('content') else ''
-                                            except Exception:
-                                                txt = ''
-                                            if txt == '':
-                                                continue
-                                            recent.append({'role': item.get('role'), 'text': txt})
-                                    if recent:
-                                        async with aiohttp.ClientSession() as session:
-                                            async with session.post(
-                                                f"http://localhost:{TOOL_SERVER_PORT}/analyze_and_plan",
-                                                json={'messages': recent, 'lanlan_name': lanlan_name},
-                                                timeout=aiohttp.ClientTimeout(total=5.0)
-                                            ) as resp:
-                                                await resp.read()  # 确保响应被完全读取
-                                        logger.debug(f"[{lanlan_name}] 已发送对话到analyzer进行分析")
-                                except asyncio.TimeoutError:
-                                    logger.warning(f"[{lanlan_name}] 发送到analyzer超时")
-                                except Exception as e:
-                                    logger.warning(f"[{lanlan_name}] 发送到analyzer失败: {e}")
-                                
-                                # Turn end时不保存聊天记录，只在session end或renew session时保存
-
-                            elif message["data"] == 'session end': # 当前session结束了
-                                # 先处理未完成的用户输入缓存（如果有）
-                                if user_input_cache:
-                                    chat_history.append({'role': 'user', 'content': [{"type": "text", "text": user_input_cache}]})
-                                    user_input_cache = ''
-                                
-                                # 再处理未完成的输出缓存（如果有）
-                                current_turn = 'user'
-                                text_output_cache = normalize_text(text_output_cache)
-                                if len(text_output_cache) > 0:
-                                    chat_history.append(
-                                        {'role': 'assistant', 'content': [{'type': 'text', 'text': text_output_cache}]})
-                                text_output_cache = ''
-                                
-                                # 向tool_server发送最近对话，供分析器识别潜在任务（与turn end逻辑相同）
-                                try:
-                                    # 构造最近的消息摘要
-                                    recent = []
-                                    for item in chat_history[-6:]:
-                                        if item.get('role') in ['user', 'assistant']:
-                                            try:
-                                                txt = item['content'][0]['text'] if item.get('content') else ''
-                                            except Exception:
-                                                txt = ''
-                                            if txt == '':
-                                                continue
-                                            recent.append({'role': item.get('role'), 'text': txt})
-                                    if recent:
-                                        async with aiohttp.ClientSession() as session:
-                                            async with session.post(
-                                                f"http://localhost:{TOOL_SERVER_PORT}/analyze_and_plan",
-                                                json={'messages': recent, 'lanlan_name': lanlan_name},
-                                                timeout=aiohttp.ClientTimeout(total=5.0)
-                                            ) as resp:
-                                                await resp.read()  # 确保响应被完全读取
-                                        logger.debug(f"[{lanlan_name}] 已发送对话到analyzer进行分析 (session end)")
-                                except asyncio.TimeoutError:
-                                    logger.warning(f"[{lanlan_name}] 发送到analyzer超时 (session end)")
-                                except Exception as e:
-                                    logger.warning(f"[{lanlan_name}] 发送到analyzer失败: {e} (session end)")
-                                
-                                # 清理连续的assistant消息（主动搭话未被响应时只保留最后一条）
-                                chat_history = cleanup_consecutive_assistant_messages(chat_history)
-                                
-                                # 处理聊天历史
-                                logger.info(f"[{lanlan_name}] 会话结束：开始处理聊天历史，共 {len(chat_history)} 条消息")
-                                try:
-                                    async with aiohttp.ClientSession() as session:
-                                        async with session.post(
-                                            f"http://localhost:{MEMORY_SERVER_PORT}/process/{lanlan_name}",
-                                            json={'input_history': json.dumps(chat_history, indent=2, ensure_ascii=False)},
-                                            timeout=aiohttp.ClientTimeout(total=30.0)
-                                        ) as response:
-                                            result = await response.json()
-                                            if result.get('status') == 'error':
-                                                logger.error(f"[{lanlan_name}] 会话记忆处理失败: {result.get('message')}")
-                                            else:
-                                                logger.info(f"[{lanlan_name}] 会话记忆已成功上传到 memory_server")
-                                except Exception:
-                                    logger.exception(f"[{lanlan_name}] 调用 /process API 失败")
-                                chat_history.clear()
-                        except Exception as e:
-                            logger.error(f"[{lanlan_name}] System message error: {e}", exc_info=True)
-                    await asyncio.sleep(0.02)
-            except Exception as e:
-                logger.error(f"[{lanlan_name}] Message processing error: {e}", exc_info=True)
-                await asyncio.sleep(0.02)
-            
-            # WebSocket 连接管理（独立于消息处理）
-            try:
-                # 如果连接不存在，尝试建立连接
+        async def maintain_links():
+            """WebSocket 连接管理（独立于消息处理）：退避重连，空闲时发送心跳"""
+            while True:
                 try:
-                    if config['monitor']:
-                        if sync_ws is None:
-                            if sync_session:
-                                await sync_session.close()
-                            sync_session = aiohttp.ClientSession()
-                            try:
-                                sync_ws = await sync_session.ws_connect(
-                                    f"{sync_server_url}/sync/{lanlan_name}",
-                                    heartbeat=10,
-                                )
-                                # print(f"[Sync Process] [{lanlan_name}] 文本连接已建立")
-                                sync_reader = asyncio.create_task(keep_reader(sync_ws))
-                            except Exception:
-                                # logger.warning(f"[{lanlan_name}] Monitor文本连接失败: {e}")
-                                sync_ws = None
-
-                        if binary_ws is None:
-                            if binary_session:
-                                await binary_session.close()
-                            binary_session = aiohttp.ClientSession()
-                            try:
-                                binary_ws = await binary_session.ws_connect(
-                                    f"{sync_server_url}/sync_binary/{lanlan_name}",
-                                    heartbeat=10,
-                                )
-                                # print(f"[Sync Process] [{lanlan_name}] 二进制连接已建立")
-                                binary_reader = asyncio.create_task(keep_reader(binary_ws))
-                            except Exception:
-                                # logger.warning(f"[{lanlan_name}] Monitor二进制连接失败: {e}")
-                                binary_ws = None
-
-                        # 发送心跳（捕获异常以检测连接断开）
-                        if config['monitor'] and sync_ws:
-                            try:
-                                await sync_ws.send_json({"type": "heartbeat", "timestamp": time.time()})
-                            except Exception:
-                                sync_ws = None
-                                
-                        if config['monitor'] and binary_ws:
-                            try:
-                                await binary_ws.send_bytes(b'\x00\x01\x02\x03')
-                            except Exception:
-                                binary_ws = None
-
+                    for link in links:
+                        await link.ensure()
+                    now = time.monotonic()
+                    if sync_link.connected and now - sync_link.last_send >= SYNC_HEARTBEAT_INTERVAL:
+                        await sync_link.send_json({"type": "heartbeat", "timestamp": time.time()})
+                    if binary_link.connected and now - binary_link.last_send >= SYNC_HEARTBEAT_INTERVAL:
+                        await binary_link.send_bytes(b'\x00\x01\x02\x03')
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
-                    logger.error(f"[{lanlan_name}] Monitor连接异常: {e}", exc_info=True)
-                    sync_ws = None
-                    binary_ws = None
+                    logger.error(f"[{lanlan_name}] WebSocket连接异常: {e}")
+                await asyncio.sleep(SYNC_LINK_CHECK_INTERVAL)
 
+        async def post_memory(endpoint, history, label):
+            """向 memory_server 提交聊天历史（/renew 或 /process）"""
+            try:
+                async with session.post(
+                    f"http://localhost:{MEMORY_SERVER_PORT}/{endpoint}/{lanlan_name}",
+                    json={'input_history': json.dumps(history, indent=2, ensure_ascii=False)},
+                    timeout=aiohttp.ClientTimeout(total=SYNC_MEMORY_POST_TIMEOUT)
+                ) as response:
+                    result = await response.json()
+                    if result.get('status') == 'error':
+                        logger.error(f"[{lanlan_name}] {label}记忆处理失败: {result.get('message')}")
+                    else:
+                        logger.info(f"[{lanlan_name}] {label}记忆已成功上传到 memory_server")
+            except Exception as e:
+                logger.exception(f"[{lanlan_name}] 调用 /{endpoint} API 失败: {type(e).__name__}: {e}")
+
+        async def memory_worker():
+            while True:
+                endpoint, history, label = await memory_jobs.get()
                 try:
-                    if config['bullet']:
-                        if bullet_ws is None:
-                            if bullet_session:
-                                await bullet_session.close()
-                            bullet_session = aiohttp.ClientSession()
-                            try:
-                                bullet_ws = await bullet_session.ws_connect(
-                                    f"wss://localhost:{COMMENTER_SERVER_PORT}/sync/{lanlan_name}",
-                                    ssl=ssl._create_unverified_context()
-                                )
-                                # print(f"[Sync Process] [{lanlan_name}] Bullet连接已建立")
-                                bullet_reader = asyncio.create_task(keep_reader(bullet_ws))
-                            except Exception:
-                                # Bullet 连接失败是正常的（该服务可能未启动）
-                                bullet_ws = None
-                except Exception as e:
-                    logger.error(f"[{lanlan_name}] Bullet连接异常: {e}", exc_info=True)
-                    bullet_ws = None
-                
-                # 短暂休眠避免CPU占用过高
-                await asyncio.sleep(0.02)
+                    await post_memory(endpoint, history, label)
+                finally:
+                    memory_jobs.task_done()
 
-            except asyncio.CancelledError:
-                break
+        async def post_analyzer(recent, suffix):
+            """向tool_server发送最近对话，供分析器识别潜在任务"""
+            try:
+                async with session.post(
+                    f"http://localhost:{TOOL_SERVER_PORT}/analyze_and_plan",
+                    json={'messages': recent, 'lanlan_name': lanlan_name},
+                    timeout=aiohttp.ClientTimeout(total=5.0)
+                ) as resp:
+                    await resp.read()  # 确保响应被完全读取
+                logger.debug(f"[{lanlan_name}] 已发送对话到analyzer进行分析{suffix}")
+            except asyncio.TimeoutError:
+                logger.warning(f"[{lanlan_name}] 发送到analyzer超时{suffix}")
             except Exception as e:
-                # WebSocket 连接异常，标记连接为失败状态
-                logger.error(f"[{lanlan_name}] WebSocket连接异常: {e}")
-                sync_ws = None
-                binary_ws = None
-                bullet_ws = None
-                await asyncio.sleep(0.03)  # 重连前等待
-
-        # 关闭资源
-        for ws in [sync_ws, binary_ws, bullet_ws]:
-            if ws:
-                try:
-                    await ws.close()
-                except Exception:
-                    pass
-        for sess in [sync_session, binary_session, bullet_session]:
-            if sess:
+                logger.warning(f"[{lanlan_name}] 发送到analyzer失败: {e}{suffix}")
+
+        def send_to_analyzer(suffix=''):
+            """非阻塞地向tool_server发送最近对话"""
+            # 构造最近的消息摘要
+            recent = []
+            for item in chat_history[-6:]:
+                if item.get('role') in ['user', 'assistant']:
+                    try:
+                        txt = item['content'][0]['text'] if item.get('content') else ''
+                    except Exception:
+                        txt = ''
+                    if txt == '':
+                        continue
+                    recent.append({'role': item.get('role'), 'text': txt})
+            if recent:
+                task = asyncio.create_task(post_analyzer(recent, suffix))
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
+
+        async def handle_message(message):
+            nonlocal chat_history, user_input_cache, text_output_cache, current_turn, last_screen
+
+            if message["type"] == "json":
+                # Forward to monitor if enabled
+                if config['monitor']:
+                    await sync_link.send_json(message["data"])
+
+                # Only treat assistant turn when it's a gemini_response
+                if message["data"].get("type") == "gemini_response":
+                    if current_turn == 'user':  # assistant new message starts
+                        if user_input_cache:
+                            chat_history.append({'role': 'user', 'content': [{"type": "text", "text": user_input_cache}]})
+                            user_input_cache = ''
+                        current_turn = 'assistant'
+                        text_output_cache = datetime.now().strftime('[%Y%m%d %a %H:%M] ')
+
+                        if config['bullet'] and bullet_link.connected:
+                            try:
+                                last_user = last_ai = None
+                                for i in chat_history[::-1]:
+                                    if i["role"] == "user":
+                                        last_user = i['content'][0]['text']
+                                        break
+                                for i in chat_history[::-1]:
+                                    if i["role"] == "assistant":
+                                        last_ai = i['content'][0]['text']
+                                        break
+
+                                message_data = {
+                                    "user": last_user,
+                                    "ai": last_ai,
+                                    "screen": last_screen
+                                }
+                                binary_message = pickle.dumps(message_data)
+                                await bullet_link.send_bytes(binary_message)
+                            except Exception as e:
+                                logger.error(f"[{lanlan_name}] Error when sending to commenter: {e}")
+
+                    # Append assistant streaming text
+                    try:
+                        text_output_cache += message["data"].get("text", "")
+                    except Exception:
+                        pass
+
+            elif message["type"] == "user":  # 准备转录
+                data = message["data"].get("data")
+                input_type = message["data"].get("input_type")
+                if input_type == "transcript": # 暂时只处理语音，后续还需要记录图片
+                    if user_input_cache == '' and config['monitor']:
+                        await sync_link.send_json({'type': 'user_activity'}) #用于打断前端声音播放
+                    user_input_cache += data
+                    # 发送用户转录到 monitor 供副终端显示
+                    if config['monitor'] and data:
+                        await sync_link.send_json({'type': 'user_transcript', 'text': data})
+                elif input_type == "screen":
+                    last_screen = data
+
+            elif message["type"] == "system":
                 try:
-                    await sess.close()
-                except Exception:
-                    pass
-        for rdr in [sync_reader, binary_reader, bullet_reader]:
-            if rdr:
+                    if message["data"] == "google disconnected":
+                        if len(text_output_cache) > 0:
+                            chat_history.append({'role': 'system', 'content': [
+                                {'type': 'text', 'text': "网络错误，您已断开连接！"}]})
+                        text_output_cache = ''
+
+                    if message["data"] == "renew session":
+                        # 先处理未完成的用户输入缓存（如果有）
+                        if user_input_cache:
+                            chat_history.append({'role': 'user', 'content': [{"type": "text", "text": user_input_cache}]})
+                            user_input_cache = ''
+                        
+                        # 再处理未完成的输出缓存（如果有）
+                        current_turn = 'user'
+                        text_output_cache = normalize_text(text_output_cache)
+                        if len(text_output_cache) > 0:
+                            chat_history.append(
+                                    {'role': 'assistant', 'content': [{'type': 'text', 'text': text_output_cache}]})
+                        text_output_cache = ''
+                        
+                        # 清理连续的assistant消息（主动搭话未被响应时只保留最后一条）
+                        chat_history = cleanup_consecutive_assistant_messages(chat_history)
+                        
+                        logger.info(f"[{lanlan_name}] 热重置：聊天历史长度 {len(chat_history)} 条消息")
+                        memory_jobs.put_nowait(('renew', list(chat_history), "热重置"))
+                        chat_history.clear()
+
+                    if message["data"] == 'turn end': # lanlan的消息结束了
+                        current_turn = 'user'
+                        text_output_cache = normalize_text(text_output_cache)
+                        if len(text_output_cache) > 0:
+                            chat_history.append(
+                                {'role': 'assistant', 'content': [{'type': 'text', 'text': text_output_cache}]})
+                        text_output_cache = ''
+                        if config['monitor']:
+                            await sync_link.send_json({'type': 'turn end'})
+                        # 非阻塞地向tool_server发送最近对话，供分析器识别潜在任务
+                        send_to_analyzer()
+                        
+                        # Turn end时不保存聊天记录，只在session end或renew session时保存
+
+                    elif message["data"] == 'session end': # 当前session结束了
+                        # 先处理未完成的用户输入缓存（如果有）
+                        if user_input_cache:
+                            chat_history.append({'role': 'user', 'content': [{"type": "text", "text": user_input_cache}]})
+                            user_input_cache = ''
+                        
+                        # 再处理未完成的输出缓存（如果有）
+                        current_turn = 'user'
+                        text_output_cache = normalize_text(text_output_cache)
+                        if len(text_output_cache) > 0:
+                            chat_history.append(
+                                {'role': 'assistant', 'content': [{'type': 'text', 'text': text_output_cache}]})
+                        text_output_cache = ''
+                        
+                        # 向tool_server发送最近对话，供分析器识别潜在任务（与turn end逻辑相同）
+                        send_to_analyzer(' (session end)')
+                        
+                        # 清理连续的assistant消息（主动搭话未被响应时只保留最后一条）
+                        chat_history = cleanup_consecutive_assistant_messages(chat_history)
+                        
+                        # 处理聊天历史
+                        logger.info(f"[{lanlan_name}] 会话结束：开始处理聊天历史，共 {len(chat_history)} 条消息")
+                        memory_jobs.put_nowait(('process', list(chat_history), "会话"))
+                        chat_history.clear()
+                except Exception as e:
+                    logger.error(f"[{lanlan_name}] System message error: {e}", exc_info=True)
+
+        link_task = asyncio.create_task(maintain_links())
+        memory_task = asyncio.create_task(memory_worker())
+        pump = loop.run_in_executor(None, _pump_message_queue, message_queue, shutdown_event, loop, inbox)
+
+        pending = None
+        try:
+            while True:
+                if pending is not None:
+                    message, pending = pending, None
+                else:
+                    message = await inbox.get()
+                if message is _SYNC_STOP:
+                    break
                 try:
-                    rdr.cancel()
-                except Exception:
-                    pass
+                    if message["type"] == "binary":
+                        # 合并队列中已就绪的相邻音频块，一次发送
+                        chunks = [message["data"]]
+                        size = len(message["data"])
+                        while size < SYNC_BINARY_BATCH_BYTES:
+                            try:
+                                nxt = inbox.get_nowait()
+                            except asyncio.QueueEmpty:
+                                break
+                            if nxt is not _SYNC_STOP and nxt["type"] == "binary":
+                                chunks.append(nxt["data"])
+                                size += len(nxt["data"])
+                            else:
+                                pending = nxt
+                                break
+                        if config['monitor']:
+                            await binary_link.send_bytes(chunks[0] if len(chunks) == 1 else b''.join(chunks))
+                    else:
+                        await handle_message(message)
+                except Exception as e:
+                    logger.error(f"[{lanlan_name}] Message processing error: {e}", exc_info=True)
+        finally:
+            # 关闭资源：等待已排队的记忆提交完成，再关闭连接
+            try:
+                await asyncio.wait_for(memory_jobs.join(), timeout=SYNC_MEMORY_POST_TIMEOUT + 5.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            for task in [link_task, memory_task, *background_tasks]:
+                task.cancel()
+            await asyncio.gather(link_task, memory_task, *background_tasks, return_exceptions=True)
+            for link in [sync_link, binary_link, bullet_link]:
+                await link.close()
+            await session.close()
+            if not pump.done():
+                pump.cancel()
 
     try:
         loop.run_until_complete(maintain_connection(chat_history, lanlan_name))
@@ -343,7 +343,7 @@ class OmniOfflineClient:
             if self.on_response_done:
                 await self.on_response_done()
     
-    async def stream_audio(self, audio_chunk: bytes) -> None:
+    async def stream_audio(self, audio_chunk: bytes, preprocessed: bool = False) -> None:
         """Compatibility method - not used in text mode"""
         pass
     
@@ -190,6 +190,28 @@ class OmniRealtimeClient:
                 audio_chunk
             )
 
+    async def flush_audio_processor(self, send_tail: bool = False) -> None:
+        """
+        结束一段麦克风输入：排空流式重采样器并请求重置处理器状态，
+        避免重采样器缓存的尾部样本和 RNNoise/AGC 状态带到下一轮或下一个会话。
+
+        Args:
+            send_tail: 是否把排空得到的尾部音频发送给服务端（会话结束时使用）
+        """
+        if self._audio_processor is None:
+            return
+
+        async with self._audio_processing_lock:
+            loop = asyncio.get_running_loop()
+            tail = await loop.run_in_executor(None, self._audio_processor.flush)
+            self._audio_processor.request_reset()
+
+        if tail and send_tail and self.ws and not self._fatal_error_occurred:
+            await self.send_event({
+                "type": "input_audio_buffer.append",
+                "audio": base64.b64encode(tail).decode()
+            })
+
     async def _check_silence_timeout(self):
         """定期检查是否超过静默超时时间，如果是则触发超时回调"""
         # 如果未启用静默超时（Qwen 或 Step），直接返回
@@ -421,12 +443,15 @@ class OmniRealtimeClient:
         }
         await self.send_event(event)
 
-    async def stream_audio(self, audio_chunk: bytes) -> None:
+    async def stream_audio(self, audio_chunk: bytes, preprocessed: bool = False) -> None:
         """Stream raw audio data to the API.
         
         Supports two input modes:
         - 48kHz from PC: Apply RNNoise then downsample to 16kHz
         - 16kHz from mobile: Pass through directly (no RNNoise)
+        
+        preprocessed=True means the chunk already went through the AudioProcessor
+        (16kHz output); its size says nothing about the sample rate then.
         """
         # 检查是否已发生致命错误，如果是则直接返回
         if self._fatal_error_occurred:
@@ -436,7 +461,7 @@ class OmniRealtimeClient:
         # 48kHz: 480 samples (10ms) = 960 bytes
         # 16kHz: 512 samples (~32ms) = 1024 bytes
         num_samples = len(audio_chunk) // 2  # 16-bit = 2 bytes per sample
-        is_48khz = (num_samples == 480)  # RNNoise frame size
+        is_48khz = (num_samples == 480) and not preprocessed  # RNNoise frame size
         
         
         # Apply RNNoise noise reduction only for 48kHz input (PC)
@@ -766,6 +791,8 @@ class OmniRealtimeClient:
                         await self.handle_interruption()
                 elif event_type == "input_audio_buffer.speech_stopped":
                     logger.info("Speech ended")
+                    # 一轮语音结束：丢弃重采样器中残留的尾部样本，下一轮从干净状态开始
+                    await self.flush_audio_processor()
                     if self.on_new_message:
                         await self.on_new_message()
                     self._audio_in_buffer = False
@@ -844,6 +871,13 @@ class OmniRealtimeClient:
             finally:
                 self._silence_check_task = None
         
+        # 会话结束：把重采样器中残留的尾部音频发出去，并清空处理器状态
+        if self._audio_processor is not None:
+            try:
+                await self.flush_audio_processor(send_tail=True)
+            except Exception as e:
+                logger.error(f"Error flushing audio processor: {e}")
+
         # 保存 debug 音频（RNNoise 处理前后的对比音频）
         if self._audio_processor is not None:
             try:
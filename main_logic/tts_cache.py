@@ -0,0 +1,362 @@
+"""
+TTS 语音缓存模块
+按 (音色, TTS 模型, 规范化文本) 内容寻址缓存合成好的 48kHz PCM：内存 LRU + 磁盘存储。
+角色反复说的问候语、回复开头的固定短句、主动搭话开场白等命中缓存后直接推送音频，不再经过 TTS 服务。
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 内存 LRU 上限（48kHz int16 约 5.8 分钟语音）
+TTS_CACHE_MEMORY_BYTES = 32 * 1024 * 1024
+# 磁盘缓存上限，超出后按最近访问时间淘汰
+TTS_CACHE_DISK_BYTES = 256 * 1024 * 1024
+# 只缓存短句：长回复几乎不会逐字重复，缓存只会白占空间
+TTS_CACHE_MAX_TEXT_CHARS = 120
+# 单条缓存音频上限（48kHz int16 约 30 秒）
+TTS_CACHE_MAX_ENTRY_BYTES = 48000 * 2 * 30
+# 轮次开头逐句查缓存时，单句的长度上限；超过后不再按句处理，文本照常流式交给 TTS
+TTS_CACHE_MAX_SEGMENT_CHARS = 40
+# 句子结束符（轮次开头按句切分用）
+_SEGMENT_END_PATTERN = re.compile(r'[。！？!?；;…~～\n]+')
+
+
+class TTSPhraseCache:
+    """
+    内容寻址的 TTS PCM 缓存（线程安全）
+
+    Args:
+        cache_dir: 磁盘缓存目录，为 None 时只使用内存
+        memory_bytes: 内存 LRU 上限（字节）
+        disk_bytes: 磁盘缓存上限（字节）
+    """
+
+    def __init__(self, cache_dir: Optional[Path], memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = TTS_CACHE_DISK_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> pcm bytes
+        self._memory_size = 0
+        # 磁盘条目索引：key -> 字节数，按最近访问排序；写入/淘汰时增量维护，不再每次扫描目录
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir is not None:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                logger.warning(f"⚠️ TTS 缓存目录不可用，仅使用内存缓存: {e}")
+                self.cache_dir = None
+        if self.cache_dir is not None:
+            # 启动时扫描一次磁盘建立索引（并预热内存），放到后台线程，不阻塞调用方
+            threading.Thread(target=self._load_disk_index, name="tts-cache-index", daemon=True).start()
+
+    def _load_disk_index(self):
+        """扫描磁盘缓存建立索引，并把最近使用的条目预热到内存（最多占内存上限的一半）"""
+        try:
+            entries = []
+            for path in self.cache_dir.glob("*/*.pcm"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+        except Exception as e:
+            logger.debug(f"扫描 TTS 磁盘缓存失败: {e}")
+            return
+        entries.sort()
+        with self._lock:
+            # 从新到旧依次插到队首，最终最旧的条目排在最前面
+            for _, key, size in reversed(entries):
+                # 扫描期间新写入的条目已在索引中（且更新），保留它们的位置
+                if key not in self._disk:
+                    self._disk[key] = size
+                    self._disk.move_to_end(key, last=False)
+                    self._disk_size += size
+        self._prune_disk()
+
+        warm_budget = self.memory_bytes // 2
+        for _, key, size in reversed(entries):
+            if size > warm_budget:
+                continue
+            try:
+                pcm = self._path(key).read_bytes()
+            except Exception:
+                continue
+            with self._lock:
+                if key not in self._memory:
+                    self._memory[key] = pcm
+                    self._memory.move_to_end(key, last=False)
+                    self._memory_size += len(pcm)
+            warm_budget -= size
+        logger.debug(f"TTS 磁盘缓存索引完成: {len(entries)} 条")
+
+    @staticmethod
+    def make_key(voice_id: str, model: str, text: str) -> str:
+        """缓存键：音色 + TTS 模型 + 规范化后的文本"""
+        raw = f"{voice_id or ''}\x1f{model or ''}\x1f{text}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_cacheable_text(text: str) -> bool:
+        return bool(text) and len(text) <= TTS_CACHE_MAX_TEXT_CHARS
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pcm"
+
+    def _remember(self, key: str, pcm: bytes):
+        """写入内存 LRU（调用方持有锁）"""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = pcm
+        self._memory_size += len(pcm)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """只查内存（不读盘，可以在事件循环中直接调用）"""
+        with self._lock:
+            pcm = self._memory.get(key)
+            if pcm is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    # 常用的条目一直在内存中命中，磁盘淘汰顺序也要随之更新
+                    self._disk.move_to_end(key)
+                self.hits += 1
+            return pcm
+
+    def on_disk(self, key: str) -> bool:
+        """磁盘索引中是否有该条目（不读盘）"""
+        with self._lock:
+            return key in self._disk
+
+    def get(self, key: str) -> Optional[bytes]:
+        """查询缓存：先查内存，再查磁盘（命中后提升到内存）。可能读盘，异步代码中请放到线程里调用"""
+        pcm = self.peek(key)
+        if pcm is not None:
+            return pcm
+        pcm = None
+        if self.on_disk(key):
+            path = self._path(key)
+            try:
+                pcm = path.read_bytes()
+                os.utime(path)  # 记录访问时间，重启后重建索引时按它排序
+            except FileNotFoundError:
+                self._forget_disk(key)
+            except Exception as e:
+                logger.debug(f"读取 TTS 缓存失败: {e}")
+        with self._lock:
+            if pcm:
+                self._remember(key, pcm)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.hits += 1
+                return pcm
+            self.misses += 1
+        return None
+
+    def put(self, key: str, pcm: bytes):
+        """写入缓存（内存 + 磁盘）。会写盘，异步代码中请放到线程里调用"""
+        if not pcm or len(pcm) > TTS_CACHE_MAX_ENTRY_BYTES:
+            return
+        pcm = bytes(pcm)
+        with self._lock:
+            self._remember(key, pcm)
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(pcm)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ 写入 TTS 缓存失败: {e}")
+            return
+        with self._lock:
+            self._disk_size += len(pcm) - self._disk.pop(key, 0)
+            self._disk[key] = len(pcm)
+            over_budget = self._disk_size > self.disk_bytes
+        if over_budget:
+            self._prune_disk()
+
+    def _forget_disk(self, key: str):
+        with self._lock:
+            self._disk_size -= self._disk.pop(key, 0)
+
+    def _prune_disk(self):
+        """磁盘缓存超过上限时，按最近访问顺序淘汰最旧的条目（降到上限的 90%）"""
+        victims = []
+        with self._lock:
+            if self._disk_size <= self.disk_bytes:
+                return
+            while self._disk and self._disk_size > self.disk_bytes * 0.9:
+                key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                victims.append(key)
+        for key in victims:
+            try:
+                self._path(key).unlink(missing_ok=True)
+            except Exception as e:
+                logger.debug(f"清理 TTS 磁盘缓存失败: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class TTSTurnRecorder:
+    """
+    记录发往 TTS 的文本与返回的音频，轮次合成完成后写入缓存。
+    worker 按顺序合成各个轮次，因此音频总是属于最早一个尚未完成的轮次，按提交顺序匹配完成信号。
+    打断后旧轮次的残余音频可能还在路上，此时开始的轮次不写缓存，直到 worker 再次报告完成。
+    """
+
+    def __init__(self):
+        self._turns = deque()  # {"speech_id", "text": [...], "audio": [...], "size": int, "closed": bool, "valid": bool}
+        self._tainted = False
+
+    def add_text(self, speech_id, text: str):
+        turn = self._turns[-1] if self._turns else None
+        if turn is None or turn["closed"] or turn["speech_id"] != speech_id:
+            turn = {
+                "speech_id": speech_id, "text": [], "audio": [], "size": 0,
+                "closed": False, "valid": not self._tainted,
+            }
+            self._turns.append(turn)
+        turn["text"].append(text)
+
+    def close_text(self):
+        """文本结束信号 (None, None)：标记最新的轮次文本已完整"""
+        if self._turns:
+            self._turns[-1]["closed"] = True
+
+    def add_audio(self, pcm):
+        for turn in self._turns:
+            if not turn["valid"]:
+                return
+            if turn["size"] + len(pcm) > TTS_CACHE_MAX_ENTRY_BYTES:
+                # 过长，放弃缓存该轮次
+                turn["valid"] = False
+                turn["audio"].clear()
+                return
+            turn["audio"].append(bytes(pcm))
+            turn["size"] += len(pcm)
+            return
+
+    def finish(self, speech_id):
+        """
+        worker 报告 speech_id 的一个轮次合成完成，返回 (完整文本, PCM) 或 None（被打断/不完整/无音频）。
+        早于该轮次的未完成轮次一并丢弃。
+        """
+        self._tainted = False
+        if not any(turn["speech_id"] == speech_id for turn in self._turns):
+            return None
+        while self._turns:
+            turn = self._turns.popleft()
+            if turn["speech_id"] == speech_id:
+                if turn["closed"] and turn["valid"] and turn["audio"]:
+                    return "".join(turn["text"]), b"".join(turn["audio"])
+                return None
+        return None
+
+    def interrupt(self):
+        """响应队列被清空/语音被打断：丢弃所有未完成的轮次"""
+        if self._turns:
+            self._tainted = True
+            self._turns.clear()
+
+
+class TTSLeadingSegments:
+    """
+    轮次开头的逐句切分：开头的句子逐句查询 TTS 缓存（缓存条目来自此前整轮写入的短回复）。
+    命中的句子直接播放缓存音频；从第一个未命中的句子起，文本照常流式交给 worker，
+    之后不再查询 —— 只有这样缓存音频与合成音频的先后顺序才能与文本一致。
+    """
+
+    def __init__(self):
+        self.speech_id = None
+        self.leading = False
+        self._buffer = ""
+
+    def feed(self, speech_id, text: str) -> Optional[str]:
+        """
+        输入一段流式文本。仍处于轮次开头时文本先缓冲（之后用 next_segment 取出完整句子），返回 None；
+        否则返回应直接发送给 worker 的文本。
+        """
+        if speech_id != self.speech_id:
+            # 新轮次
+            self.speech_id = speech_id
+            self.leading = True
+            self._buffer = ""
+        if not self.leading:
+            return text
+        self._buffer += text
+        return None
+
+    def next_segment(self) -> Optional[str]:
+        """取出缓冲区中下一个完整的句子；句子过长或迟迟没有句末符号时结束开头阶段，返回 None"""
+        if not self.leading:
+            return None
+        match = _SEGMENT_END_PATTERN.search(self._buffer)
+        end = match.end() if match else None
+        if end is None or end > TTS_CACHE_MAX_SEGMENT_CHARS:
+            if end is not None or len(self._buffer) > TTS_CACHE_MAX_SEGMENT_CHARS:
+                self.leading = False
+            return None
+        segment, self._buffer = self._buffer[:end], self._buffer[end:]
+        return segment
+
+    def release(self) -> str:
+        """结束开头阶段，返回尚未发送的缓冲文本（之后的文本由 feed 直接返回）"""
+        self.leading = False
+        rest, self._buffer = self._buffer, ""
+        return rest
+
+    def finish(self) -> str:
+        """轮次结束：返回尚未发送的缓冲文本并重置"""
+        rest = self._buffer
+        self.reset()
+        return rest
+
+    def reset(self):
+        """打断或轮次结束时丢弃状态"""
+        self.speech_id = None
+        self.leading = False
+        self._buffer = ""
+
+
+_tts_cache = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSPhraseCache:
+    """获取进程内共享的 TTS 缓存单例（磁盘目录位于用户文档目录下的 tts_cache）"""
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                cache_dir = None
+                try:
+                    from utils.config_manager import get_config_manager
+                    cache_dir = get_config_manager().app_docs_dir / "tts_cache"
+                except Exception as e:
+                    logger.warning(f"⚠️ 无法确定 TTS 缓存目录: {e}")
+                _tts_cache = TTSPhraseCache(cache_dir)
+    return _tts_cache
@@ -1,6 +1,9 @@
 """
 TTS Helper模块
 负责处理TTS语音合成，支持自定义音色（阿里云CosyVoice）和默认音色（各core_api的原生TTS）
+
+异步 worker 既可以独占一个线程运行（asyncio.run），也可以通过 TTSWorkerPool
+托管到少量共享的事件循环线程上，多个会话复用同一组线程与事件循环。
 """
 import numpy as np
 import soxr
@@ -13,10 +16,286 @@ import io
 import wave
 import aiohttp
 import asyncio
+import os
+import threading
+import concurrent.futures
+from collections import deque
+from queue import Empty, Queue
 from functools import partial
 from utils.config_manager import get_config_manager
 logger = logging.getLogger(__name__)
 
+# 合并相邻 PCM chunk 时单帧的最大字节数（48kHz int16 约 200ms）
+TTS_BATCH_MAX_BYTES = 48000 * 2 // 5
+# 共享 TTS 事件循环线程数上限
+TTS_POOL_MAX_LOOPS = min(4, os.cpu_count() or 1)
+
+
+def _wake_waiter(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class TTSQueueBridge:
+    """TTS 跨线程队列桥：任意线程同步 put，消费者所在事件循环异步 get
+    
+    与 queue.Queue 的 put/empty/get_nowait 接口兼容，所有 TTS worker 无需改动即可使用。
+    消费端通过 loop.call_soon_threadsafe 被唤醒，不再需要轮询。
+    既用作响应队列（worker -> 主循环），也用作池化 worker 的请求队列（主循环 -> 池循环）。
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._waiter = None  # 当前等待中的 asyncio.Future（最多一个消费者）
+
+    def put(self, item):
+        """线程安全地放入一条响应（音频 bytes 或就绪信号），并唤醒等待中的消费者"""
+        with self._lock:
+            self._items.append(item)
+            waiter = self._waiter
+            self._waiter = None
+        if waiter is not None:
+            try:
+                waiter.get_loop().call_soon_threadsafe(_wake_waiter, waiter)
+            except RuntimeError:
+                # 事件循环已关闭，数据留在队列中即可
+                pass
+
+    put_nowait = put
+
+    def requeue(self, item):
+        """把取出的条目放回队首（保持顺序）"""
+        with self._lock:
+            self._items.appendleft(item)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._items:
+                raise Empty
+            return self._items.popleft()
+
+    def clear(self):
+        """丢弃所有未消费的响应（用于打断）"""
+        with self._lock:
+            self._items.clear()
+
+    def discard(self, predicate) -> int:
+        """丢弃所有满足 predicate 的条目，返回丢弃数量"""
+        with self._lock:
+            kept = [item for item in self._items if not predicate(item)]
+            dropped = len(self._items) - len(kept)
+            self._items = deque(kept)
+        return dropped
+
+    async def get(self):
+        """等待并取出下一条响应"""
+        while True:
+            with self._lock:
+                if self._items:
+                    return self._items.popleft()
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiter = waiter
+            try:
+                await waiter
+            finally:
+                with self._lock:
+                    if self._waiter is waiter:
+                        self._waiter = None
+
+    async def get_batch(self, max_bytes: int = TTS_BATCH_MAX_BYTES):
+        """等待下一条响应；若为音频，则把队列中紧随其后的音频 chunk 合并成一帧返回"""
+        item = await self.get()
+        if not isinstance(item, (bytes, bytearray)):
+            return item
+        parts = [item]
+        total = len(item)
+        with self._lock:
+            while self._items:
+                nxt = self._items[0]
+                if not isinstance(nxt, (bytes, bytearray)) or total + len(nxt) > max_bytes:
+                    break
+                parts.append(self._items.popleft())
+                total += len(nxt)
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+
+async def _next_request(request_queue):
+    """取下一条 (speech_id, text) 请求：TTSQueueBridge 直接 await，线程 Queue 交给 executor"""
+    if isinstance(request_queue, TTSQueueBridge):
+        return await request_queue.get()
+    return await asyncio.get_running_loop().run_in_executor(None, request_queue.get)
+
+
+async def _discard_requests(request_queue):
+    """持续取出并丢弃请求（无可用 TTS 时使用）"""
+    while True:
+        await _next_request(request_queue)
+
+
+# 备用连接超过该空闲时长后不再换入（服务端可能已按空闲超时断开）
+TTS_STANDBY_MAX_IDLE = 60.0
+
+
+class TTSStandbyConnection:
+    """
+    TTS 备用连接（warm standby）：在后台预先建立并完成握手的 WebSocket 连接，
+    新轮次或打断时直接换入，换入后立即在后台准备下一条，省去建连+握手的往返延迟。
+
+    Args:
+        connect: 无参异步工厂，返回 (ws, info)；ws 已完成握手可直接发送文本，info 为提供商附加信息（如 session_id）
+        name: 提供商名称，用于日志与延迟统计
+    """
+
+    def __init__(self, connect, name: str):
+        self._connect = connect
+        self.name = name
+        self._pending = None  # asyncio.Task -> (ws, info, created_at)
+        self.metrics = get_tts_latency_metrics(name)
+
+    async def _build(self):
+        ws, info = await self._connect()
+        return ws, info, time.monotonic()
+
+    def prewarm(self):
+        """后台准备一条备用连接（已有可用/进行中的备用连接时不重复建立）"""
+        task = self._pending
+        if task is not None and not (task.done() and (task.cancelled() or task.exception() is not None)):
+            return
+        self._pending = asyncio.create_task(self._build())
+
+    @staticmethod
+    def _is_open(ws) -> bool:
+        return getattr(ws, "close_code", None) is None
+
+    async def acquire(self):
+        """
+        取一条可用连接：优先换入备用连接（正在握手中则等待它完成），否则现场建立；
+        随后立即预热下一条。建连失败时抛出异常。
+        """
+        task, self._pending = self._pending, None
+        conn = None
+        if task is not None:
+            try:
+                ws, info, created_at = await task
+                if self._is_open(ws) and time.monotonic() - created_at < TTS_STANDBY_MAX_IDLE:
+                    conn = (ws, info)
+                else:
+                    await _close_quietly(ws)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            except Exception as e:
+                logger.debug(f"{self.name} 备用连接不可用，改为现场建连: {e}")
+        self.metrics.record_standby(conn is not None)
+        if conn is None:
+            conn = await self._connect()
+        self.prewarm()
+        return conn
+
+    async def ready(self):
+        """预热并等待备用连接握手完成（启动时用于确认服务可用），失败时抛出异常"""
+        self.prewarm()
+        await asyncio.shield(self._pending)
+
+    async def close(self):
+        """取消并关闭备用连接"""
+        task, self._pending = self._pending, None
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        try:
+            ws, _, _ = await task
+            await _close_quietly(ws)
+        except BaseException:
+            pass
+
+
+async def _close_quietly(ws):
+    try:
+        await ws.close()
+    except Exception:
+        pass
+
+
+class TTSLatencyMetrics:
+    """
+    TTS 首包延迟统计：从某个 speech_id 的首条文本到达 worker 起，到第一段音频写入响应队列为止。
+    同一提供商的所有会话共享一个实例（会话可能分布在不同事件循环线程上，内部加锁）。
+    """
+
+    def __init__(self, name: str, window: int = 200):
+        self.name = name
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self._turns = {}  # 会话对象 id -> 当前轮次开始时间
+        self.standby_hits = 0
+        self.standby_misses = 0
+
+    def turn_started(self, owner):
+        with self._lock:
+            self._turns[id(owner)] = time.perf_counter()
+
+    def first_audio(self, owner):
+        with self._lock:
+            started = self._turns.pop(id(owner), None)
+            if started is None:
+                return
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._samples.append(elapsed_ms)
+        logger.debug(f"⏱️ {self.name} TTS 首包延迟: {elapsed_ms:.0f}ms")
+
+    def turn_aborted(self, owner):
+        with self._lock:
+            self._turns.pop(id(owner), None)
+
+    def record_standby(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.standby_hits += 1
+            else:
+                self.standby_misses += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            hits, misses = self.standby_hits, self.standby_misses
+        stats = {"count": len(samples), "standby_hits": hits, "standby_misses": misses}
+        if samples:
+            stats.update(
+                avg_ms=round(sum(samples) / len(samples), 1),
+                p50_ms=round(samples[len(samples) // 2], 1),
+                p95_ms=round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+            )
+        return stats
+
+
+_tts_latency_metrics = {}
+_tts_latency_lock = threading.Lock()
+
+
+def get_tts_latency_metrics(name: str) -> TTSLatencyMetrics:
+    """获取（按需创建）某个 TTS 提供商的首包延迟统计"""
+    with _tts_latency_lock:
+        metrics = _tts_latency_metrics.get(name)
+        if metrics is None:
+            metrics = _tts_latency_metrics[name] = TTSLatencyMetrics(name)
+        return metrics
+
+
+def get_tts_latency_stats() -> dict:
+    """所有 TTS 提供商的首包延迟与备用连接命中统计"""
+    with _tts_latency_lock:
+        items = list(_tts_latency_metrics.items())
+    return {name: metrics.snapshot() for name, metrics in items}
+
 
 def _resample_audio(audio_int16: np.ndarray, src_rate: int, dst_rate: int, 
                     resampler: 'soxr.ResampleStream | None' = None) -> bytes:
@@ -49,7 +328,38 @@ def _resample_audio(audio_int16: np.ndarray, src_rate: int, dst_rate: int,
     return resampled_int16.tobytes()
 
 
-def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice_id, free_mode=False):
+def _cogtts_convert_chunk(audio_bytes: bytes, sample_rate: int, trim_head: bool) -> bytes:
+    """CogTTS 音频块转换：24kHz PCM16 -> 48kHz PCM16（同步计算，供线程池调用）
+
+    Args:
+        audio_bytes: CogTTS 返回的 PCM16 数据
+        sample_rate: 源采样率
+        trim_head: 是否为本轮第一个音频块（裁剪开头的初始化噪音并淡入）
+    """
+    # 转换为 float32 进行高质量重采样
+    audio_array = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+
+    # 对第一个音频块，裁剪掉开头的噪音部分（CogTTS有初始化噪音）
+    if trim_head:
+        # 裁剪掉前 1s 的音频（通常包含初始化噪音）
+        trim_samples = int(sample_rate)
+        if len(audio_array) > trim_samples:
+            audio_array = audio_array[trim_samples:]
+            logger.debug(f"裁剪第一个音频块的前 {trim_samples} 个采样点（{trim_samples/sample_rate:.2f}秒）")
+        # 对裁剪后的开头应用短淡入（10ms），平滑过渡
+        fade_samples = min(int(sample_rate * 0.01), len(audio_array))
+        if fade_samples > 0:
+            fade_curve = np.linspace(0.0, 1.0, fade_samples)
+            audio_array[:fade_samples] *= fade_curve
+
+    # 使用 soxr 进行高质量重采样
+    resampled = soxr.resample(audio_array, sample_rate, 48000, quality='HQ')
+    # 转回 int16 格式
+    resampled_int16 = (resampled * 32768.0).clip(-32768, 32767).astype(np.int16)
+    return resampled_int16.tobytes()
+
+
+def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice_id, free_mode=False, runner=None):
     """
     StepFun实时TTS worker（用于默认音色）
     使用阶跃星辰的实时TTS API（step-tts-mini）
@@ -59,6 +369,7 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
         response_queue: 多进程响应队列，发送音频数据（也用于发送就绪信号）
         audio_api_key: API密钥
         voice_id: 音色ID，默认使用"qingchunshaonv"
+        runner: 可选，接收异步主循环协程的回调（TTSWorkerPool 使用）；为 None 时在本线程 asyncio.run
     """
     import asyncio
     
@@ -80,86 +391,84 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
         response_done = asyncio.Event()  # 用于标记当前响应是否完成
         # 流式重采样器（24kHz→48kHz）- 维护 chunk 边界状态
         resampler = soxr.ResampleStream(24000, 48000, 1, dtype='float32')
+        standby = None
         
         try:
-            # 连接WebSocket
             headers = {"Authorization": f"Bearer {audio_api_key}"}
             
-            ws = await websockets.connect(tts_url, additional_headers=headers)
-            
-            # 等待连接成功事件
-            async def wait_for_connection():
-                """等待连接成功"""
-                nonlocal session_id
+            async def connect():
+                """建立连接并完成握手（tts.connection.done → tts.create），返回 (ws, session_id)"""
+                new_ws = await websockets.connect(tts_url, additional_headers=headers)
                 try:
-                    async for message in ws:
-                        event = json.loads(message)
-                        event_type = event.get("type")
-                        
-                        if event_type == "tts.connection.done":
-                            session_id = event.get("data", {}).get("session_id")
-                            session_ready.set()
-                            break
-                        elif event_type == "tts.response.error":
-                            logger.error(f"TTS服务器错误: {event}")
-                            break
-                except Exception as e:
-                    logger.error(f"等待连接时出错: {e}")
+                    new_session_id = None
+                    
+                    # 等待连接成功事件
+                    async def wait_for_connection():
+                        nonlocal new_session_id
+                        async for message in new_ws:
+                            event = json.loads(message)
+                            event_type = event.get("type")
+                            
+                            if event_type == "tts.connection.done":
+                                new_session_id = event.get("data", {}).get("session_id")
+                                break
+                            elif event_type == "tts.response.error":
+                                logger.error(f"TTS服务器错误: {event}")
+                                break
+                    
+                    await asyncio.wait_for(wait_for_connection(), timeout=5.0)
+                    if not new_session_id:
+                        raise RuntimeError("连接未能正确建立")
+                    
+                    # 发送创建会话事件
+                    await new_ws.send(json.dumps({
+                        "type": "tts.create",
+                        "data": {
+                            "session_id": new_session_id,
+                            "voice_id": voice_id,
+                            "response_format": "wav",
+                            "sample_rate": 24000
+                        }
+                    }))
+                    
+                    # 等待会话创建成功
+                    async def wait_for_session_ready():
+                        async for message in new_ws:
+                            event = json.loads(message)
+                            event_type = event.get("type")
+                            
+                            if event_type == "tts.response.created":
+                                break
+                            elif event_type == "tts.response.error":
+                                logger.error(f"创建会话错误: {event}")
+                                break
+                    
+                    try:
+                        await asyncio.wait_for(wait_for_session_ready(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        logger.warning("会话创建超时")
+                    return new_ws, new_session_id
+                except BaseException:
+                    await _close_quietly(new_ws)
+                    raise
             
-            # 等待连接成功
+            standby = TTSStandbyConnection(connect, "StepFun")
+            latency = standby.metrics
             try:
-                await asyncio.wait_for(wait_for_connection(), timeout=5.0)
-            except asyncio.TimeoutError:
-                logger.error("等待连接超时")
-                # 发送失败信号
-                response_queue.put(("__ready__", False))
-                return
-            
-            if not session_ready.is_set() or not session_id:
-                logger.error("连接未能正确建立")
+                # 启动时先把第一条备用连接握手完成，首轮直接换入
+                await standby.ready()
+            except Exception as e:
+                logger.error(f"StepFun TTS 连接失败: {e}")
                 # 发送失败信号
                 response_queue.put(("__ready__", False))
                 return
             
-            # 发送创建会话事件
-            create_event = {
-                "type": "tts.create",
-                "data": {
-                    "session_id": session_id,
-                    "voice_id": voice_id,
-                    "response_format": "wav",
-                    "sample_rate": 24000
-                }
-            }
-            await ws.send(json.dumps(create_event))
-            
-            # 等待会话创建成功
-            async def wait_for_session_ready():
-                try:
-                    async for message in ws:
-                        event = json.loads(message)
-                        event_type = event.get("type")
-                        
-                        if event_type == "tts.response.created":
-                            break
-                        elif event_type == "tts.response.error":
-                            logger.error(f"创建会话错误: {event}")
-                            break
-                except Exception as e:
-                    logger.error(f"等待会话创建时出错: {e}")
-            
-            try:
-                await asyncio.wait_for(wait_for_session_ready(), timeout=1.0)
-            except asyncio.TimeoutError:
-                logger.warning("会话创建超时")
-            
             # 发送就绪信号，通知主进程 TTS 已经可以使用
             logger.info("StepFun TTS 已就绪，发送就绪信号")
             response_queue.put(("__ready__", True))
             
-            # 初始接收任务
-            async def receive_messages_initial():
-                """初始接收任务"""
+            async def receive_messages():
+                """接收当前连接上的事件"""
                 try:
                     async for message in ws:
                         event = json.loads(message)
@@ -183,6 +492,7 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                                     audio_array = np.frombuffer(pcm_data, dtype=np.int16)
                                     # 使用流式重采样器 24000Hz -> 48000Hz
                                     response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
+                                    latency.first_audio(standby)
                             except Exception as e:
                                 logger.error(f"处理音频数据时出错: {e}")
                         elif event_type in ["tts.response.done", "tts.response.audio.done"]:
@@ -194,13 +504,11 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                 except Exception as e:
                     logger.error(f"消息接收出错: {e}")
             
-            receive_task = asyncio.create_task(receive_messages_initial())
-            
             # 主循环：处理请求队列
             loop = asyncio.get_running_loop()
             while True:
                 try:
-                    sid, tts_text = await loop.run_in_executor(None, request_queue.get)
+                    sid, tts_text = await _next_request(request_queue)
                 except Exception:
                     break
                 
@@ -218,6 +526,8 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                             try:
                                 await asyncio.wait_for(response_done.wait(), timeout=20.0)
                                 logger.debug("音频生成完成，主动关闭连接")
+                                # 通知主进程该轮次音频已完整（用于写入 TTS 缓存）
+                                response_queue.put(("__turn_done__", current_speech_id))
                             except asyncio.TimeoutError:
                                 logger.warning("等待响应完成超时（30秒），强制关闭连接")
                             
@@ -259,84 +569,17 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                         except asyncio.CancelledError:
                             pass
                     
-                    # 建立新连接
+                    # 换入已握手的备用连接（没有时现场建立），同时后台预热下一条
+                    latency.turn_started(standby)
                     try:
-                        ws = await websockets.connect(tts_url, additional_headers=headers)
-                        
-                        # 等待连接成功
-                        session_id = None
-                        session_ready.clear()
-                        
-                        async def wait_conn():
-                            nonlocal session_id
-                            try:
-                                async for message in ws:
-                                    event = json.loads(message)
-                                    if event.get("type") == "tts.connection.done":
-                                        session_id = event.get("data", {}).get("session_id")
-                                        session_ready.set()
-                                        break
-                            except Exception:
-                                pass
-                        
-                        try:
-                            await asyncio.wait_for(wait_conn(), timeout=1.0)
-                        except asyncio.TimeoutError:
-                            logger.warning("新连接超时")
-                            continue
-                        
-                        if not session_id:
-                            continue
-                        
-                        # 创建会话
-                        await ws.send(json.dumps({
-                            "type": "tts.create",
-                            "data": {
-                                "session_id": session_id,
-                                "voice_id": voice_id,
-                                "response_format": "wav",
-                                "sample_rate": 24000
-                            }
-                        }))
-                        
-                        # 启动新的接收任务
-                        async def receive_messages():
-                            try:
-                                async for message in ws:
-                                    event = json.loads(message)
-                                    event_type = event.get("type")
-                                    
-                                    if event_type == "tts.response.error":
-                                        logger.error(f"TTS错误: {event}")
-                                    elif event_type == "tts.response.audio.delta":
-                                        try:
-                                            audio_b64 = event.get("data", {}).get("audio", "")
-                                            if audio_b64:
-                                                audio_bytes = base64.b64decode(audio_b64)
-                                                # 使用 wave 模块读取 WAV 数据
-                                                with io.BytesIO(audio_bytes) as wav_io:
-                                                    with wave.open(wav_io, 'rb') as wav_file:
-                                                        # 读取音频数据
-                                                        pcm_data = wav_file.readframes(wav_file.getnframes())
-                                                
-                                                # 转换为 numpy 数组
-                                                audio_array = np.frombuffer(pcm_data, dtype=np.int16)
-                                                # 使用流式重采样器 24000Hz -> 48000Hz
-                                                response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
-                                        except Exception as e:
-                                            logger.error(f"处理音频数据时出错: {e}")
-                                    elif event_type in ["tts.response.done", "tts.response.audio.done"]:
-                                        # 服务器明确表示音频生成完成，设置完成标志
-                                        logger.debug(f"收到响应完成事件: {event_type}")
-                                        response_done.set()
-                            except websockets.exceptions.ConnectionClosed:
-                                pass
-                            except Exception as e:
-                                logger.error(f"消息接收出错: {e}")
-                        
+                        ws, session_id = await standby.acquire()
+                        session_ready.set()
                         receive_task = asyncio.create_task(receive_messages())
-                        
                     except Exception as e:
+                        ws = None
+                        session_id = None
+                        session_ready.clear()
+                        latency.turn_aborted(standby)
                         logger.error(f"重新建立连接失败: {e}")
                         continue
                 
@@ -370,6 +613,8 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
             logger.error(f"StepFun实时TTS Worker错误: {e}")
         finally:
             # 清理资源
+            if standby is not None:
+                await standby.close()
             if receive_task and not receive_task.done():
                 receive_task.cancel()
                 try:
@@ -383,14 +628,16 @@ def step_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                 except Exception:
                     pass
     
-    # 运行异步worker
+    # 运行异步worker（由 TTSWorkerPool 托管时交给共享事件循环）
+    if runner is not None:
+        return runner(async_worker())
     try:
         asyncio.run(async_worker())
     except Exception as e:
         logger.error(f"StepFun实时TTS Worker启动失败: {e}")
 
 
-def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
+def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice_id, runner=None):
     """
     Qwen实时TTS worker（用于默认音色）
     使用阿里云的实时TTS API（qwen3-tts-flash-2025-09-18）
@@ -400,6 +647,7 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
         response_queue: 多进程响应队列，发送音频数据（也用于发送就绪信号）
         audio_api_key: API密钥
         voice_id: 音色ID，默认使用"Cherry"
+        runner: 可选，接收异步主循环协程的回调（TTSWorkerPool 使用）；为 None 时在本线程 asyncio.run
     """
     import asyncio
 
@@ -416,6 +664,7 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
         response_done = asyncio.Event()  # 用于标记当前响应是否完成
         # 流式重采样器（24kHz→48kHz）- 维护 chunk 边界状态
         resampler = soxr.ResampleStream(24000, 48000, 1, dtype='float32')
+        standby = None
         
         try:
             # 连接WebSocket
@@ -437,39 +686,44 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                 }
             }
             
-            ws = await websockets.connect(tts_url, additional_headers=headers)
-            
-            # 等待并处理初始消息
-            async def wait_for_session_ready():
-                """等待会话创建确认"""
+            async def connect():
+                """建立连接并发送会话配置，等待 session.created/updated 后返回 (ws, None)"""
+                new_ws = await websockets.connect(tts_url, additional_headers=headers)
                 try:
-                    async for message in ws:
-                        event = json.loads(message)
-                        event_type = event.get("type")
-                        
-                        # Qwen TTS API 返回 session.updated 而不是 session.created
-                        if event_type in ["session.created", "session.updated"]:
-                            session_ready.set()
-                            break
-                        elif event_type == "error":
-                            logger.error(f"TTS服务器错误: {event}")
-                            break
-                except Exception as e:
-                    logger.error(f"等待会话就绪时出错: {e}")
-            
-            # 发送配置
-            await ws.send(json.dumps(config_message))
+                    ready = False
+                    
+                    async def wait_for_session_ready():
+                        """等待会话创建确认"""
+                        nonlocal ready
+                        async for message in new_ws:
+                            event = json.loads(message)
+                            event_type = event.get("type")
+                            
+                            # Qwen TTS API 返回 session.updated 而不是 session.created
+                            if event_type in ["session.created", "session.updated"]:
+                                ready = True
+                                break
+                            elif event_type == "error":
+                                logger.error(f"TTS服务器错误: {event}")
+                                break
+                    
+                    # 发送配置
+                    await new_ws.send(json.dumps(config_message))
+                    await asyncio.wait_for(wait_for_session_ready(), timeout=5.0)
+                    if not ready:
+                        raise RuntimeError("会话未能正确初始化")
+                    return new_ws, None
+                except BaseException:
+                    await _close_quietly(new_ws)
+                    raise
             
-            # 等待会话就绪（超时5秒）
+            standby = TTSStandbyConnection(connect, "Qwen")
+            latency = standby.metrics
             try:
-                await asyncio.wait_for(wait_for_session_ready(), timeout=5.0)
-            except asyncio.TimeoutError:
-                logger.error("❌ 等待会话就绪超时")
-                response_queue.put(("__ready__", False))
-                return
-            
-            if not session_ready.is_set():
-                logger.error("❌ 会话未能正确初始化")
+                # 启动时先把第一条备用连接握手完成，首轮直接换入
+                await standby.ready()
+            except Exception as e:
+                logger.error(f"❌ Qwen TTS 会话初始化失败: {e}")
                 response_queue.put(("__ready__", False))
                 return
             
@@ -477,9 +731,8 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
             logger.info("Qwen TTS 已就绪，发送就绪信号")
             response_queue.put(("__ready__", True))
             
-            # 初始接收任务（会在每次新 speech_id 时重新创建）
-            async def receive_messages_initial():
-                """初始接收任务"""
+            async def receive_messages():
+                """接收当前连接上的事件（每次换入新连接时重新创建）"""
                 try:
                     async for message in ws:
                         event = json.loads(message)
@@ -493,6 +746,7 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                                 audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
                                 # 使用流式重采样器 24000Hz -> 48000Hz
                                 response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
+                                latency.first_audio(standby)
                             except Exception as e:
                                 logger.error(f"处理音频数据时出错: {e}")
                         elif event_type in ["response.done", "response.audio.done", "output.done"]:
@@ -504,14 +758,12 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                 except Exception as e:
                     logger.error(f"消息接收出错: {e}")
             
-            receive_task = asyncio.create_task(receive_messages_initial())
-            
             # 主循环：处理请求队列
             loop = asyncio.get_running_loop()
             while True:
                 # 非阻塞检查队列
                 try:
-                    sid, tts_text = await loop.run_in_executor(None, request_queue.get)
+                    sid, tts_text = await _next_request(request_queue)
                 except Exception:
                     break
                 
@@ -528,6 +780,8 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                             try:
                                 await asyncio.wait_for(response_done.wait(), timeout=20.0)
                                 logger.debug("音频生成完成，主动关闭连接")
+                                # 通知主进程该轮次音频已完整（用于写入 TTS 缓存）
+                                response_queue.put(("__turn_done__", current_speech_id))
                             except asyncio.TimeoutError:
                                 logger.warning("等待响应完成超时（30秒），强制关闭连接")
                             
@@ -569,63 +823,16 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                         except asyncio.CancelledError:
                             pass
                     
-                    # 建立新连接
+                    # 换入已握手的备用连接（没有时现场建立），同时后台预热下一条
+                    latency.turn_started(standby)
                     try:
-                        ws = await websockets.connect(tts_url, additional_headers=headers)
-                        await ws.send(json.dumps(config_message))
-                        
-                        # 等待 session.created
-                        session_ready.clear()
-                        
-                        async def wait_ready():
-                            try:
-                                async for message in ws:
-                                    event = json.loads(message)
-                                    event_type = event.get("type")
-                                    # Qwen TTS API 返回 session.updated 而不是 session.created
-                                    if event_type in ["session.created", "session.updated"]:
-                                        session_ready.set()
-                                        break
-                                    elif event_type == "error":
-                                        logger.error(f"等待期间收到错误: {event}")
-                                        break
-                            except Exception as e:
-                                logger.error(f"wait_ready 异常: {e}")
-                        
-                        try:
-                            await asyncio.wait_for(wait_ready(), timeout=2.0)
-                        except asyncio.TimeoutError:
-                            logger.warning("新会话创建超时")
-                        
-                        # 启动新的接收任务
-                        async def receive_messages():
-                            try:
-                                async for message in ws:
-                                    event = json.loads(message)
-                                    event_type = event.get("type")
-                                    
-                                    if event_type == "error":
-                                        logger.error(f"TTS错误: {event}")
-                                    elif event_type == "response.audio.delta":
-                                        try:
-                                            audio_bytes = base64.b64decode(event.get("delta", ""))
-                                            audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
-                                            # 使用流式重采样器 24000Hz -> 48000Hz
-                                            response_queue.put(_resample_audio(audio_array, 24000, 48000, resampler))
-                                        except Exception as e:
-                                            logger.error(f"处理音频数据时出错: {e}")
-                                    elif event_type in ["response.done", "response.audio.done", "output.done"]:
-                                        # 服务器明确表示音频生成完成，设置完成标志
-                                        logger.debug(f"收到响应完成事件: {event_type}")
-                                        response_done.set()
-                            except websockets.exceptions.ConnectionClosed:
-                                pass
-                            except Exception as e:
-                                logger.error(f"消息接收出错: {e}")
-                        
+                        ws, _ = await standby.acquire()
+                        session_ready.set()
                         receive_task = asyncio.create_task(receive_messages())
-                        
                     except Exception as e:
+                        ws = None
+                        session_ready.clear()
+                        latency.turn_aborted(standby)
                         logger.error(f"重新建立连接失败: {e}")
                         continue
                 
@@ -656,6 +863,8 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
             logger.error(f"Qwen实时TTS Worker错误: {e}")
         finally:
             # 清理资源
+            if standby is not None:
+                await standby.close()
             if receive_task and not receive_task.done():
                 receive_task.cancel()
                 try:
@@ -669,7 +878,9 @@ def qwen_realtime_tts_worker(request_queue, response_queue, audio_api_key, voice
                 except Exception:
                     pass
     
-    # 运行异步worker
+    # 运行异步worker（由 TTSWorkerPool 托管时交给共享事件循环）
+    if runner is not None:
+        return runner(async_worker())
     try:
         asyncio.run(async_worker())
     except Exception as e:
@@ -814,7 +1025,7 @@ def cosyvoice_vc_tts_worker(request_queue, response_queue, audio_api_key, voice_
                 current_speech_id = None
 
 
-def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
+def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id, runner=None):
     """
     智谱AI CogTTS worker（用于默认音色）
     使用智谱AI的CogTTS API（cogtts）
@@ -826,6 +1037,7 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
         response_queue: 多进程响应队列，发送音频数据（也用于发送就绪信号）
         audio_api_key: API密钥
         voice_id: 音色ID，默认使用"tongtong"（支持：tongtong, chuichui, xiaochen, jam, kazi, douji, luodo）
+        runner: 可选，接收异步主循环协程的回调（TTSWorkerPool 使用）；为 None 时在本线程 asyncio.run
     """
     import asyncio
     
@@ -848,7 +1060,7 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
             
             while True:
                 try:
-                    sid, tts_text = await loop.run_in_executor(None, request_queue.get)
+                    sid, tts_text = await _next_request(request_queue)
                 except Exception:
                     break
                 
@@ -927,32 +1139,20 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
                                                                     # 从返回的 return_sample_rate 获取采样率
                                                                     sample_rate = delta.get('return_sample_rate', 24000)
                                                                     
-                                                                    # 转换为 float32 进行高质量重采样
-                                                                    audio_array = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-                                                                    
-                                                                    # 对第一个音频块，裁剪掉开头的噪音部分（CogTTS有初始化噪音）
-                                                                    if not first_audio_received:
-                                                                        first_audio_received = True
-                                                                        # 裁剪掉前 1s 的音频（通常包含初始化噪音）
-                                                                        trim_samples = int(sample_rate)
-                                                                        if len(audio_array) > trim_samples:
-                                                                            audio_array = audio_array[trim_samples:]
-                                                                            logger.debug(f"裁剪第一个音频块的前 {trim_samples} 个采样点（{trim_samples/sample_rate:.2f}秒）")
-                                                                        # 对裁剪后的开头应用短淡入（10ms），平滑过渡
-                                                                        fade_samples = min(int(sample_rate * 0.01), len(audio_array))
-                                                                        if fade_samples > 0:
-                                                                            fade_curve = np.linspace(0.0, 1.0, fade_samples)
-                                                                            audio_array[:fade_samples] *= fade_curve
-                                                                    
-                                                                    # 使用 soxr 进行高质量重采样
-                                                                    resampled = soxr.resample(audio_array, sample_rate, 48000, quality='HQ')
-                                                                    # 转回 int16 格式
-                                                                    resampled_int16 = (resampled * 32768.0).clip(-32768, 32767).astype(np.int16)
-                                                                    response_queue.put(resampled_int16.tobytes())
+                                                                    # 裁剪/淡入/整段重采样是 CPU 密集的同步计算，放到线程池执行，
+                                                                    # 避免阻塞 TTSWorkerPool 共享事件循环上的其他会话
+                                                                    trim_head = not first_audio_received
+                                                                    first_audio_received = True
+                                                                    pcm = await loop.run_in_executor(
+                                                                        None, _cogtts_convert_chunk, audio_bytes, sample_rate, trim_head
+                                                                    )
+                                                                    response_queue.put(pcm)
                                                         except json.JSONDecodeError as e:
                                                             logger.warning(f"解析SSE JSON失败: {e}")
                                                         except Exception as e:
                                                             logger.error(f"处理音频数据时出错: {e}")
+                                            # 通知主进程该轮次音频已完整（用于写入 TTS 缓存）
+                                            response_queue.put(("__turn_done__", current_speech_id))
                                         else:
                                             error_text = await resp.text()
                                             logger.error(f"CogTTS API错误 ({resp.status}): {error_text}")
@@ -970,7 +1170,9 @@ def cogtts_tts_worker(request_queue, response_queue, audio_api_key, voice_id):
         except Exception as e:
             logger.error(f"CogTTS Worker错误: {e}")
     
-    # 运行异步worker
+    # 运行异步worker（由 TTSWorkerPool 托管时交给共享事件循环）
+    if runner is not None:
+        return runner(async_worker())
     try:
         asyncio.run(async_worker())
     except Exception as e:
@@ -1044,7 +1246,7 @@ def get_tts_worker(core_api_type='qwen', has_custom_voice=False):
         return dummy_tts_worker
 
 
-def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_id):
+def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_id, runner=None):
     """
     本地 CosyVoice WebSocket Worker（OpenAI 兼容 bistream 版本）
     适配 openai_server.py 定义的 /v1/audio/speech/stream 接口
@@ -1061,6 +1263,7 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
     - 非阻塞：异步架构，不会卡住主循环
     
     注意：audio_api_key 参数未使用（本地模式不需要 API Key），保留是为了与其他 worker 保持统一签名
+    runner 与其他异步 worker 相同：由 TTSWorkerPool 传入时，协程交给共享事件循环运行
     """
     _ = audio_api_key  # 本地模式不需要 API Key
 
@@ -1075,6 +1278,8 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
             logger.error('本地cosyvoice未配置url, 请在设置中填写正确的端口')
         response_queue.put(("__ready__", True))
         # 模仿 dummy_tts：持续清空队列但不生成音频
+        if runner is not None:
+            return runner(_discard_requests(request_queue))
         while True:
             try:
                 sid, _ = request_queue.get()
@@ -1117,6 +1322,7 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
                         audio_array = np.frombuffer(message, dtype=np.int16)
                         resampled_bytes = _resample_audio(audio_array, SRC_RATE, 48000, resampler)
                         response_queue.put(resampled_bytes)
+                        latency.first_audio(standby)
             except websockets.exceptions.ConnectionClosed:
                 logger.debug("本地 WebSocket 连接已关闭")
             except asyncio.CancelledError:
@@ -1132,8 +1338,30 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
             except Exception as e:
                 logger.error(f"发送结束信号失败: {e}")
 
+        async def connect():
+            """建立连接并发送配置，返回 (ws, None)"""
+            logger.info(f"🔄 [LocalTTS] 正在连接: {WS_URL}")
+            new_ws = await websockets.connect(WS_URL, ping_interval=None)
+            logger.info("✅ [LocalTTS] 连接成功")
+            
+            # 发送配置
+            config = {
+                "voice": voice_name,
+                "speed": speech_speed,
+            }
+            try:
+                await new_ws.send(json.dumps(config))
+            except BaseException:
+                await _close_quietly(new_ws)
+                raise
+            logger.debug(f"发送配置: {config}")
+            return new_ws, None
+
+        standby = TTSStandbyConnection(connect, "LocalCosyVoice")
+        latency = standby.metrics
+
         async def create_connection():
-            """创建新连接并发送配置"""
+            """换入新连接（优先使用后台预热好的备用连接）"""
             nonlocal ws, receive_task, resampler
             
             # 清理旧连接
@@ -1152,89 +1380,251 @@ def local_cosyvoice_worker(request_queue, response_queue, audio_api_key, voice_i
             # 重置 resampler
             resampler = soxr.ResampleStream(SRC_RATE, 48000, 1, dtype='float32')
             
-            logger.info(f"🔄 [LocalTTS] 正在连接: {WS_URL}")
-            ws = await websockets.connect(WS_URL, ping_interval=None)
-            logger.info("✅ [LocalTTS] 连接成功")
-            
-            # 发送配置
-            config = {
-                "voice": voice_name,
-                "speed": speech_speed,
-            }
-            await ws.send(json.dumps(config))
-            logger.debug(f"发送配置: {config}")
+            ws = None
+            ws, _ = await standby.acquire()
             
             # 启动接收任务
             receive_task = asyncio.create_task(receive_loop(ws))
             return ws
 
-        # 初始连接
+        # 初始连接：先把第一条备用连接准备好，首轮直接换入
         try:
-            await create_connection()
+            await standby.ready()
             response_queue.put(("__ready__", True))
         except Exception as e:
             logger.error(f"❌ [LocalTTS] 初始连接失败: {e}")
             logger.error("请确保服务器已运行且端口正确")
             response_queue.put(("__ready__", False))
+            await standby.close()
             return
 
-        # 主循环
-        loop = asyncio.get_running_loop()
-        while True:
-            try:
-                sid, tts_text = await loop.run_in_executor(None, request_queue.get)
-            except Exception as e:
-                logger.error(f'队列获取异常: {e}')
-                break
-
-            # speech_id 变化 -> 打断旧语音，建立新连接
-            if sid != current_speech_id and sid is not None:
-                # 发送结束信号（文本已在实时流中发送过了）
-                if ws:
-                    await send_end_signal(ws)
-                
-                current_speech_id = sid
+        try:
+            # 主循环
+            loop = asyncio.get_running_loop()
+            while True:
                 try:
-                    await create_connection()
+                    sid, tts_text = await _next_request(request_queue)
                 except Exception as e:
-                    logger.error(f"重连失败: {e}")
-                    ws = None
-                    continue
+                    logger.error(f'队列获取异常: {e}')
+                    break
 
-            if sid is None:
-                # 终止信号：发送结束信号
-                if ws:
-                    await send_end_signal(ws)
-                current_speech_id = None
-                continue
+                # speech_id 变化 -> 打断旧语音，建立新连接
+                if sid != current_speech_id and sid is not None:
+                    # 发送结束信号（文本已在实时流中发送过了）
+                    if ws:
+                        await send_end_signal(ws)
+                
+                    current_speech_id = sid
+                    latency.turn_started(standby)
+                    try:
+                        await create_connection()
+                    except Exception as e:
+                        logger.error(f"重连失败: {e}")
+                        latency.turn_aborted(standby)
+                        ws = None
+                        continue
 
-            if not tts_text or not tts_text.strip():
-                continue
+                if sid is None:
+                    # 终止信号：发送结束信号
+                    if ws:
+                        await send_end_signal(ws)
+                    current_speech_id = None
+                    continue
+
+                if not tts_text or not tts_text.strip():
+                    continue
             
-            # 同时发送（bistream 模式允许边发边收）
+                # 同时发送（bistream 模式允许边发边收）
+                if ws:
+                    try:
+                        await ws.send(json.dumps({"text": tts_text}))
+                        logger.debug(f"发送合成片段: {tts_text}")
+                    except Exception as e:
+                        logger.error(f"发送失败: {e}")
+                        ws = None
+        finally:
+            # 清理（被 TTSWorkerPool 取消时同样执行）
+            await standby.close()
+            if receive_task and not receive_task.done():
+                receive_task.cancel()
+                try:
+                    await receive_task
+                except asyncio.CancelledError:
+                    pass
             if ws:
                 try:
-                    await ws.send(json.dumps({"text": tts_text}))
-                    logger.debug(f"发送合成片段: {tts_text}")
-                except Exception as e:
-                    logger.error(f"发送失败: {e}")
-                    ws = None
-
-        # 清理
-        if receive_task and not receive_task.done():
-            receive_task.cancel()
-            try:
-                await receive_task
-            except asyncio.CancelledError:
-                pass
-        if ws:
-            try:
-                await ws.close()
-            except Exception:
-                pass
+                    await ws.close()
+                except Exception:
+                    pass
 
-    # 运行 Asyncio 循环
+    # 运行 Asyncio 循环（由 TTSWorkerPool 托管时交给共享事件循环）
+    if runner is not None:
+        return runner(async_worker())
     try:
         asyncio.run(async_worker())
     except Exception as e:
-        logger.error(f"Local CosyVoice Worker 崩溃: {e}")
\ No newline at end of file
+        logger.error(f"Local CosyVoice Worker 崩溃: {e}")
+
+
+# 输出 48kHz PCM、并在轮次合成完成后发送 ("__turn_done__", speech_id) 的 worker，其音频可写入 TTS 缓存
+_CACHEABLE_TTS_WORKERS = {
+    step_realtime_tts_worker,
+    qwen_realtime_tts_worker,
+    cogtts_tts_worker,
+}
+
+
+def get_tts_cache_model(worker):
+    """
+    返回 worker 在 TTS 缓存键中使用的模型名；不支持缓存的 worker 返回 None
+    （如输出 OGG 的 CosyVoice 声音克隆、不报告轮次完成的本地 CosyVoice）
+    """
+    base = getattr(worker, 'func', worker)
+    if base not in _CACHEABLE_TTS_WORKERS:
+        return None
+    name = base.__name__
+    keywords = getattr(worker, 'keywords', None)
+    if keywords:
+        name += ":" + ",".join(f"{k}={v}" for k, v in sorted(keywords.items()))
+    return name
+
+
+# 支持 runner 参数、可由共享事件循环托管的异步 worker
+_POOLABLE_TTS_WORKERS = {
+    step_realtime_tts_worker,
+    qwen_realtime_tts_worker,
+    cogtts_tts_worker,
+    local_cosyvoice_worker,
+}
+
+
+class TTSSessionHandle:
+    """
+    TTSWorkerPool 中一个会话的句柄，接口与原先的 TTS Thread 兼容（is_alive/join）
+    
+    request_queue 接收 (speech_id, text)，(None, None) 表示本轮结束；
+    response_queue 是 TTSQueueBridge，由主事件循环消费。
+    """
+
+    def __init__(self, pool, request_queue, response_queue, loop_index=None):
+        self._pool = pool
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.loop_index = loop_index
+        self._future = None  # concurrent.futures.Future（池化）
+        self._thread = None  # threading.Thread（同步 worker 回退）
+
+    def is_alive(self) -> bool:
+        if self._future is not None:
+            return not self._future.done()
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self, timeout=None):
+        if self._future is not None:
+            concurrent.futures.wait([self._future], timeout=timeout)
+        elif self._thread is not None:
+            self._thread.join(timeout)
+
+    def cancel_speech(self, speech_id):
+        """打断指定 speech_id：丢弃其尚未处理的文本，并结束当前合成"""
+        if speech_id is not None and isinstance(self.request_queue, TTSQueueBridge):
+            self.request_queue.discard(lambda req: req[0] == speech_id)
+        self.request_queue.put((None, None))
+
+    def stop(self):
+        """结束会话：池化会话直接取消协程（worker 的 finally 会关闭连接）"""
+        if self._future is not None:
+            self._future.cancel()
+        else:
+            self.request_queue.put((None, None))
+        self._pool._release(self)
+
+
+class TTSWorkerPool:
+    """
+    多会话共享的 TTS worker 池
+    
+    异步 worker 作为任务运行在至多 max_loops 个常驻事件循环线程上，
+    新会话分配给当前会话数最少的循环，会话之间在同一循环内按 await 点轮流推进。
+    不支持池化的同步 worker（dashscope SDK / dummy）仍各自使用一个守护线程。
+    """
+
+    def __init__(self, max_loops: int = TTS_POOL_MAX_LOOPS):
+        self.max_loops = max(1, max_loops)
+        self._loops = []       # [asyncio.AbstractEventLoop]
+        self._sessions = []    # 每个循环上的活跃会话数
+        self._lock = threading.Lock()
+
+    def _acquire_loop(self) -> int:
+        with self._lock:
+            if len(self._loops) < self.max_loops and (not self._sessions or min(self._sessions) > 0):
+                loop = asyncio.new_event_loop()
+                index = len(self._loops)
+                thread = threading.Thread(target=loop.run_forever, name=f"tts-pool-{index}", daemon=True)
+                thread.start()
+                self._loops.append(loop)
+                self._sessions.append(0)
+            index = min(range(len(self._loops)), key=self._sessions.__getitem__)
+            self._sessions[index] += 1
+            return index
+
+    def _release(self, handle: TTSSessionHandle):
+        with self._lock:
+            if handle.loop_index is not None and self._sessions[handle.loop_index] > 0:
+                self._sessions[handle.loop_index] -= 1
+            handle.loop_index = None
+
+    def start(self, worker, audio_api_key, voice_id) -> TTSSessionHandle:
+        """启动一个 TTS 会话，worker 为 get_tts_worker 的返回值"""
+        func = worker.func if isinstance(worker, partial) else worker
+        response_queue = TTSQueueBridge()
+
+        if func not in _POOLABLE_TTS_WORKERS:
+            request_queue = Queue()
+            handle = TTSSessionHandle(self, request_queue, response_queue)
+            handle._thread = threading.Thread(
+                target=worker,
+                args=(request_queue, response_queue, audio_api_key, voice_id),
+                daemon=True
+            )
+            handle._thread.start()
+            return handle
+
+        request_queue = TTSQueueBridge()
+        loop_index = self._acquire_loop()
+        handle = TTSSessionHandle(self, request_queue, response_queue, loop_index)
+
+        async def run_session():
+            coroutines = []
+            try:
+                # worker 的同步前置逻辑在池循环中执行，异步主循环通过 runner 取回后在此等待
+                worker(request_queue, response_queue, audio_api_key, voice_id, runner=coroutines.append)
+                if coroutines:
+                    await coroutines[0]
+            except Exception as e:
+                logger.error(f"TTS 会话异常退出: {e}")
+            finally:
+                self._release(handle)
+
+        handle._future = asyncio.run_coroutine_threadsafe(run_session(), self._loops[loop_index])
+        return handle
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"loops": len(self._loops), "sessions": list(self._sessions)}
+        stats["latency"] = get_tts_latency_stats()
+        return stats
+
+
+_tts_pool = None
+_tts_pool_lock = threading.Lock()
+
+
+def get_tts_pool() -> TTSWorkerPool:
+    """获取进程内共享的 TTSWorkerPool 单例"""
+    global _tts_pool
+    if _tts_pool is None:
+        with _tts_pool_lock:
+            if _tts_pool is None:
+                _tts_pool = TTSWorkerPool()
+    return _tts_pool
@@ -1027,8 +1027,12 @@ async def delete_catgirl(name: str):
         files_to_delete = [
             f'semantic_memory_{name}',  # 语义记忆目录
             f'time_indexed_{name}',     # 时间索引数据库文件
+            f'time_indexed_{name}-wal',  # 时间索引数据库的 WAL 日志
+            f'time_indexed_{name}-shm',
             f'settings_{name}.json',    # 设置文件
             f'recent_{name}.json',      # 最近聊天记录文件
+            f'recent_{name}.json.journal',  # 最近聊天记录的追加日志
+            f'recent_{name}.json.review',  # 记忆审阅进度
         ]
         
         for base_dir in memory_paths:
@@ -17,6 +17,8 @@ from pathlib import Path
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 
+from utils.history_journal import JOURNAL_SUFFIX, compact_history_file, read_history_file, write_history_file
+
 
 router = APIRouter(prefix="/api/memory", tags=["memory"])
 
@@ -186,8 +188,12 @@ async def get_recent_file(filename: str):
     if not resolved_path.exists():
         return JSONResponse({"success": False, "error": "文件不存在"}, status_code=404)
     
-    with open(resolved_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    if os.path.exists(str(resolved_path) + JOURNAL_SUFFIX):
+        # 还有未合并进快照的追加日志，返回合并后的完整记录
+        content = json.dumps(read_history_file(str(resolved_path)), ensure_ascii=False, indent=2)
+    else:
+        with open(resolved_path, 'r', encoding='utf-8') as f:
+            content = f.read()
     return {"content": content}
 
 
@@ -238,8 +244,8 @@ async def save_recent_file(request: Request):
             }
         })
     try:
-        with open(resolved_path, 'w', encoding='utf-8') as f:
-            json.dump(arr, f, ensure_ascii=False, indent=2)
+        # 原子写入快照，旧的追加日志随之作废
+        write_history_file(str(resolved_path), arr)
         
         # 从文件名提取猫娘名 (recent_XXX.json -> XXX)
         match = re.match(r'^recent_(.+)\.json$', filename)
@@ -316,6 +322,9 @@ async def update_catgirl_name(request: Request):
             logger.warning(f"记忆文件不存在: {old_file_path}")
             return JSONResponse({"success": False, "error": f"记忆文件不存在: {old_filename}"}, status_code=404)
         
+        # 先把追加日志合并进快照，之后按普通 JSON 文件处理
+        compact_history_file(str(old_file_path))
+
         # 如果新文件已存在，先删除
         if os.path.exists(new_file_path):
             os.remove(new_file_path)
@@ -372,8 +381,7 @@ async def update_catgirl_name(request: Request):
                         data['content'] = content
         
         # 保存更新后的内容
-        with open(new_file_path, 'w', encoding='utf-8') as f:
-            json.dump(file_content, f, ensure_ascii=False, indent=2)
+        write_history_file(str(new_file_path), file_content)
         
         logger.info(f"已更新猫娘名称从 '{old_name}' 到 '{new_name}' 的记忆文件")
         return {"success": True}
@@ -1022,6 +1022,9 @@ async def proactive_chat(request: Request):
             # 记录开始输出的时间戳，用于检测输出过程中是否有新的用户输入
             output_start_time = time.time()
             
+            # 开场白常常重复：命中 TTS 缓存时直接播放缓存语音，文本只做显示
+            spoken_from_cache = await mgr.play_cached_speech(response_text)
+            
             # 通过handle_text_data处理这段话（触发TTS和前端显示）
             # 分chunk发送以模拟流式效果
             chunks = [response_text[i:i+10] for i in range(0, len(response_text), 10)]
@@ -1037,13 +1040,16 @@ async def proactive_chat(request: Request):
                         "message": "输出过程中检测到用户活动，已停止"
                     })
                 
-                await mgr.handle_text_data(chunk, is_first_chunk=(i == 0))
+                if spoken_from_cache:
+                    await mgr.send_lanlan_response(chunk, is_first_chunk=(i == 0))
+                else:
+                    await mgr.handle_text_data(chunk, is_first_chunk=(i == 0))
                 await asyncio.sleep(0.15)  # 小延迟模拟流式
             
             # 发送TTS结束信号，触发TTS的commit（对于Qwen TTS的server_commit模式尤为重要）
-            if mgr.use_tts and mgr.tts_thread and mgr.tts_thread.is_alive():
+            if not spoken_from_cache and mgr.use_tts and mgr.tts_worker and mgr.tts_worker.is_alive():
                 try:
-                    mgr.tts_request_queue.put((None, None))
+                    mgr.queue_tts_request(None, None)
                 except Exception as e:
                     logger.warning(f"[{lanlan_name}] 发送TTS结束信号失败: {e}")
             
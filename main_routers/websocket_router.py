@@ -3,13 +3,14 @@
 WebSocket Router
 
 Handles WebSocket endpoints including:
-- Main WebSocket connection for chat
+- Main WebSocket connection for chat (JSON text frames + binary audio frames)
 - Proactive chat
 - Task notifications
 """
 
 import json
 import uuid
+import struct
 import asyncio
 import logging
 
@@ -27,6 +28,25 @@ logger = logging.getLogger("Main")
 # Lock for session management
 _lock = asyncio.Lock()
 
+# 二进制音频帧协议：8 字节头 + 小端 int16 PCM
+#   [0:4] magic b'NKA1'
+#   [4:8] uint32 LE 采样率（48000 = PC 端，交给 RNNoise；16000 = 移动端直通）
+# 头部 8 字节对齐，payload 可直接被 np.frombuffer 零拷贝读取
+AUDIO_FRAME_MAGIC = b'NKA1'
+AUDIO_FRAME_HEADER = struct.Struct('<4sI')
+AUDIO_FRAME_SAMPLE_RATES = (48000, 16000)
+
+
+def parse_audio_frame(frame: bytes):
+    """解析二进制音频帧，返回 (sample_rate, payload memoryview)；格式不合法时返回 None"""
+    if len(frame) < AUDIO_FRAME_HEADER.size:
+        return None
+    magic, sample_rate = AUDIO_FRAME_HEADER.unpack_from(frame)
+    payload = memoryview(frame)[AUDIO_FRAME_HEADER.size:]
+    if magic != AUDIO_FRAME_MAGIC or sample_rate not in AUDIO_FRAME_SAMPLE_RATES or len(payload) % 2:
+        return None
+    return sample_rate, payload
+
 
 @router.websocket("/ws/{lanlan_name}")
 async def websocket_endpoint(websocket: WebSocket, lanlan_name: str):
@@ -72,7 +92,9 @@ async def websocket_endpoint(websocket: WebSocket, lanlan_name: str):
 
     try:
         while True:
-            data = await websocket.receive_text()
+            raw = await websocket.receive()
+            if raw["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(raw.get("code", 1000), raw.get("reason"))
             # 安全检查：如果角色已被重命名或删除，lanlan_name 可能不再存在
             if lanlan_name not in session_id or lanlan_name not in session_manager:
                 logger.info(f"角色 {lanlan_name} 已被重命名或删除，关闭旧连接")
@@ -82,7 +104,22 @@ async def websocket_endpoint(websocket: WebSocket, lanlan_name: str):
                 await session_manager[lanlan_name].send_status("{lanlan_name}正在前往另一个终端...")
                 await websocket.close()
                 break
-            message = json.loads(data)
+
+            # 二进制帧：麦克风 PCM，直接交给 session manager，不经过 JSON
+            if raw.get("bytes") is not None:
+                parsed = parse_audio_frame(raw["bytes"])
+                if parsed is None:
+                    logger.warning(f"Invalid binary audio frame ({len(raw['bytes'])} bytes)")
+                    continue
+                sample_rate, payload = parsed
+                asyncio.create_task(session_manager[lanlan_name].stream_data({
+                    "input_type": "audio",
+                    "data": payload,
+                    "sample_rate": sample_rate,
+                }))
+                continue
+
+            message = json.loads(raw["text"])
             action = message.get("action")
             
             # 处理语言设置（可以在任何消息中携带）
@@ -0,0 +1,319 @@
+"""
+嵌入计算服务
+所有角色的语义记忆共用同一个后台线程：待嵌入文本先查内容哈希缓存，未命中的跨角色合并成批量请求，
+失败时指数退避重试，连续失败后暂停一段时间，避免在不支持嵌入模型的接口上反复消耗请求。
+缓存持久化在记忆目录下的 embedding_cache，问候语、系统备忘等重复文本只会计算一次。
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 单次请求的最大文本数（DashScope text-embedding-v4 的兼容接口上限为 10）
+EMBEDDING_BATCH_SIZE = 10
+# 收到第一条文本后等待多久再发请求，以便合并更多文本
+EMBEDDING_BATCH_WINDOW = 0.05
+# 重试次数与退避时间（秒）
+EMBEDDING_MAX_RETRIES = 4
+EMBEDDING_RETRY_MIN_DELAY = 1.0
+EMBEDDING_RETRY_MAX_DELAY = 30.0
+# 重试耗尽后暂停嵌入请求的时间（秒），期间新请求直接失败
+EMBEDDING_FAILURE_COOLDOWN = 300.0
+# 同步接口 embed_documents / embed_query 等待结果的上限（秒），覆盖排队与全部重试的时间
+EMBEDDING_RESULT_TIMEOUT = 120.0
+
+
+class EmbeddingCache:
+    """
+    内容哈希 -> 向量 的磁盘缓存（线程安全）
+
+    目录下 vectors.f16 按行追加 float16 向量，keys.txt 每行一个哈希，与向量行一一对应；
+    先写向量再写哈希，崩溃后以两者中较短的一方为准。
+
+    Args:
+        directory: 缓存目录（每个嵌入模型一个）
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._dim = 0
+        self._load()
+
+    def _load(self):
+        try:
+            meta = json.loads((self.directory / "meta.json").read_text(encoding="utf-8"))
+            self._dim = int(meta["dim"])
+            with open(self.directory / "keys.txt", "r", encoding="ascii") as f:
+                lines = f.readlines()
+            vectors_size = os.path.getsize(self.directory / "vectors.f16")
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ 嵌入缓存 {self.directory} 损坏，将重新建立: {e}")
+            self._dim = 0
+            return
+        # 哈希按顺序追加，只有尾部可能写了一半：取到第一行不完整的哈希为止
+        keys = []
+        for line in lines:
+            if not (line.endswith("\n") and len(line) == 65):
+                break
+            keys.append(line[:-1])
+        count = min(len(keys), vectors_size // (self._dim * 2))
+        if count < len(lines) or count * self._dim * 2 < vectors_size:
+            # 截掉崩溃时写了一半的尾部
+            with open(self.directory / "vectors.f16", "ab") as f:
+                f.truncate(count * self._dim * 2)
+            with open(self.directory / "keys.txt", "w", encoding="ascii") as f:
+                f.write("".join(key + "\n" for key in keys[:count]))
+        self._rows = {key: row for row, key in enumerate(keys[:count])}
+        logger.info(f"📚 已加载嵌入缓存 {self.directory}（{count} 条）")
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """批量读取缓存，返回命中的 {哈希: 向量}"""
+        with self._lock:
+            rows = {key: self._rows[key] for key in keys if key in self._rows}
+            if not rows:
+                return {}
+            row_bytes = self._dim * 2
+            found = {}
+            with open(self.directory / "vectors.f16", "rb") as f:
+                for key, row in sorted(rows.items(), key=lambda item: item[1]):
+                    f.seek(row * row_bytes)
+                    found[key] = np.frombuffer(f.read(row_bytes), dtype=np.float16).astype(np.float32).tolist()
+            return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """追加写入新向量；维度与已有缓存不一致时忽略"""
+        with self._lock:
+            items = {key: vector for key, vector in items.items() if key not in self._rows}
+            if not items:
+                return
+            vectors = np.asarray(list(items.values()), dtype=np.float16)
+            if self._dim == 0:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._dim = vectors.shape[1]
+                (self.directory / "meta.json").write_text(json.dumps({"dim": self._dim}), encoding="utf-8")
+            elif vectors.shape[1] != self._dim:
+                logger.warning(f"⚠️ 嵌入维度 {vectors.shape[1]} 与缓存维度 {self._dim} 不一致，跳过缓存")
+                return
+            try:
+                with open(self.directory / "vectors.f16", "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self.directory / "keys.txt", "a", encoding="ascii") as f:
+                    f.write("".join(key + "\n" for key in items))
+            except Exception as e:
+                logger.warning(f"⚠️ 写入嵌入缓存失败: {e}")
+                return
+            start = len(self._rows)
+            for offset, key in enumerate(items):
+                self._rows[key] = start + offset
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class EmbeddingService:
+    """
+    带缓存的批量嵌入服务，对外提供与 langchain Embeddings 相同的 embed_documents / embed_query，
+    可以直接作为 LocalVectorStore 的 embedding_function。
+
+    Args:
+        embeddings: 实际发请求的 langchain 嵌入对象
+        model: 嵌入模型名（参与缓存键）
+        cache_dir: 缓存目录，为 None 时只做批量合并不做持久化
+    """
+
+    def __init__(self, embeddings, model: str, cache_dir: Optional[Path] = None):
+        self._embeddings = embeddings
+        self.model = model
+        self.cache = EmbeddingCache(cache_dir) if cache_dir is not None else None
+        self._pending = OrderedDict()  # key -> (text, Future)
+        self._retries = []  # 等待重试的批次堆：(可重试时间, 序号, 第几次尝试, batch)
+        self._retry_seq = itertools.count()
+        self._inflight: Dict[str, Future] = {}  # 已取出、尚未完成的文本（含等待重试的批次）
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._cooldown_until = 0.0
+        self.requests = 0
+        self.cache_hits = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def submit(self, texts: List[str], urgent: bool = False) -> List[Future]:
+        """
+        提交文本，返回与之一一对应的 Future（结果为向量）。
+        相同文本共用一个 Future；urgent 为 True 时插到队首（用于检索查询）。
+        """
+        keys = [self._key(text) for text in texts]
+        futures: Dict[str, Future] = {}
+        cached = self.cache.get_many(list(dict.fromkeys(keys))) if self.cache is not None else {}
+        with self._cond:
+            for key, text in zip(keys, texts):
+                if key in futures:
+                    continue
+                future = Future()
+                if key in cached:
+                    self.cache_hits += 1
+                    future.set_result(cached[key])
+                elif key in self._pending:
+                    future = self._pending[key][1]
+                    if urgent:
+                        self._pending.move_to_end(key, last=False)
+                elif key in self._inflight:
+                    # 已在请求或等待重试中
+                    future = self._inflight[key]
+                elif time.monotonic() < self._cooldown_until:
+                    future.set_exception(RuntimeError("嵌入服务暂时不可用（最近的请求持续失败）"))
+                else:
+                    self._pending[key] = (text, future)
+                    if urgent:
+                        self._pending.move_to_end(key, last=False)
+                futures[key] = future
+            if self._pending:
+                self._ensure_worker()
+                self._cond.notify()
+        return [futures[key] for key in keys]
+
+    def _ensure_worker(self):
+        """启动后台线程（调用方持有 _cond）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name="embedding-service", daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    # 退避时间已到的重试批次优先；退避期间照常处理新文本（检索查询不必等别的批次重试）
+                    if self._retries and self._retries[0][0] <= now:
+                        _, _, attempt, batch = heapq.heappop(self._retries)
+                        break
+                    if self._pending:
+                        if len(self._pending) < EMBEDDING_BATCH_SIZE:
+                            self._cond.wait(EMBEDDING_BATCH_WINDOW)
+                        attempt = 1
+                        batch = []
+                        while self._pending and len(batch) < EMBEDDING_BATCH_SIZE:
+                            key, (text, future) = self._pending.popitem(last=False)
+                            self._inflight[key] = future
+                            batch.append((key, text, future))
+                        break
+                    self._cond.wait(self._retries[0][0] - now if self._retries else None)
+            try:
+                self._run_batch(batch, attempt)
+            except Exception as e:
+                # 兜底：任何意外错误都要让这一批的 Future 结束，否则等待方会一直阻塞
+                logger.error(f"❌ 处理嵌入批次时出错: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            with self._cond:
+                for key, _, future in batch:
+                    if future.done() and self._inflight.get(key) is future:
+                        del self._inflight[key]
+
+    def _run_batch(self, batch, attempt: int):
+        """发送一次批量请求；失败时按指数退避把批次放回重试队列，重试耗尽后让批次失败"""
+        texts = [text for _, text, _ in batch]
+        try:
+            self.requests += 1
+            vectors = self._embeddings.embed_documents(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"嵌入接口返回了 {len(vectors)} 个向量，预期 {len(texts)} 个")
+        except Exception as e:
+            if attempt >= EMBEDDING_MAX_RETRIES:
+                logger.error(f"❌ 嵌入请求失败，已达到最大重试次数，暂停 {EMBEDDING_FAILURE_COOLDOWN:.0f} 秒: {e}")
+                with self._cond:
+                    self._cooldown_until = time.monotonic() + EMBEDDING_FAILURE_COOLDOWN
+                    # 队列里剩余的文本也不再尝试
+                    batch.extend((key, text, future) for key, (text, future) in self._pending.items())
+                    self._pending.clear()
+                    for _, _, _, retry_batch in self._retries:
+                        batch.extend(retry_batch)
+                    self._retries.clear()
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            delay = min(EMBEDDING_RETRY_MIN_DELAY * 2 ** (attempt - 1), EMBEDDING_RETRY_MAX_DELAY)
+            logger.warning(f"⚠️ 嵌入请求失败，{delay:g} 秒后重试 (第 {attempt}/{EMBEDDING_MAX_RETRIES} 次): {e}")
+            with self._cond:
+                heapq.heappush(self._retries, (time.monotonic() + delay, next(self._retry_seq), attempt + 1, batch))
+            return
+
+        if self.cache is not None:
+            try:
+                self.cache.put_many({key: vector for (key, _, _), vector in zip(batch, vectors)})
+            except Exception as e:
+                logger.warning(f"⚠️ 写入嵌入缓存失败: {e}")
+        for (_, _, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(list(vector))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """阻塞等待嵌入结果，不要在事件循环中直接调用；超过 EMBEDDING_RESULT_TIMEOUT 抛出 TimeoutError"""
+        deadline = time.monotonic() + EMBEDDING_RESULT_TIMEOUT
+        return [future.result(timeout=max(0.0, deadline - time.monotonic())) for future in self.submit(list(texts))]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit([text], urgent=True)[0].result(timeout=EMBEDDING_RESULT_TIMEOUT)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return list(await asyncio.gather(*(asyncio.wrap_future(f) for f in self.submit(list(texts)))))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit([text], urgent=True)[0])
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "retrying": sum(len(batch) for *_, batch in self._retries),
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "cached": len(self.cache) if self.cache is not None else 0,
+            }
+
+
+_embedding_services: Dict[tuple, EmbeddingService] = {}
+_embedding_services_lock = threading.Lock()
+
+
+def get_embedding_service(base_url: str, api_key: str, model: str) -> EmbeddingService:
+    """获取按 (接口地址, API Key, 模型) 共享的嵌入服务，各角色的语义记忆共用同一个批量队列"""
+    key = (base_url, api_key, model)
+    with _embedding_services_lock:
+        service = _embedding_services.get(key)
+        if service is None:
+            from langchain_openai import OpenAIEmbeddings
+            from utils.config_manager import get_config_manager
+            embeddings = OpenAIEmbeddings(
+                base_url=base_url, model=model, api_key=api_key,
+                # 非 OpenAI 模型不能按 tiktoken 分词后发送 token id；重试由本服务负责
+                check_embedding_ctx_length=False, chunk_size=EMBEDDING_BATCH_SIZE, max_retries=0,
+            )
+            cache_dir = None
+            try:
+                cache_dir = get_config_manager().memory_dir / "embedding_cache" / re.sub(r"[^\w.-]", "_", model)
+            except Exception as e:
+                logger.warning(f"⚠️ 无法确定嵌入缓存目录，仅在内存中合并请求: {e}")
+            service = _embedding_services[key] = EmbeddingService(embeddings, model, cache_dir)
+        return service
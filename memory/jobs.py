@@ -0,0 +1,216 @@
+"""
+记忆处理任务队列
+/process、/renew 收到的对话历史先落盘再立即返回，压缩、时间索引、记忆审阅等耗时步骤由后台 worker 执行：
+- 同一角色的任务严格串行；尚未开始的任务合并成一个，连续多次提交只触发一轮 LLM 调用
+- 不同角色并行，总并发受 MEMORY_JOB_CONCURRENCY 限制
+- 任务文件在完成后才删除，进程退出后重启会自动恢复未完成的任务
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# 同时执行的记忆任务数（跨角色）
+MEMORY_JOB_CONCURRENCY = 2
+# 内存中保留的任务状态条数
+MEMORY_JOB_STATUS_LIMIT = 200
+
+
+class MemoryJobQueue:
+    """
+    持久化的按角色串行的记忆任务队列
+
+    任务是一个 dict：{"id", "lanlan_name", "history", "detailed", "created", "merged"}，
+    history 为原始消息字典列表，合并任务时按提交顺序拼接。
+
+    Args:
+        job_dir: 任务文件目录
+        handler: 执行任务的协程函数，接收任务 dict
+        concurrency: 最大并发任务数
+    """
+
+    def __init__(self, job_dir: Path, handler: Callable[[dict], Awaitable[None]],
+                 concurrency: int = MEMORY_JOB_CONCURRENCY):
+        self.job_dir = Path(job_dir)
+        self.handler = handler
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = {}  # lanlan_name -> 尚未开始的（已合并）任务
+        self._running = {}  # lanlan_name -> 正在执行的任务
+        self._workers = {}  # lanlan_name -> asyncio.Task
+        self._status = OrderedDict()  # job_id -> 状态
+        try:
+            self.job_dir.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            logger.warning(f"⚠️ 记忆任务目录不可用，任务将不会持久化: {e}")
+
+    # ---------- 持久化 ----------
+
+    def _path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.json"
+
+    def persist(self, job: dict):
+        """原子写入任务文件"""
+        path = self._path(job["id"])
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(json.dumps(job, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ 保存记忆任务 {job['id']} 失败: {e}")
+
+    def _remove(self, job_id: str):
+        try:
+            self._path(job_id).unlink(missing_ok=True)
+        except Exception as e:
+            logger.warning(f"⚠️ 删除记忆任务文件 {job_id} 失败: {e}")
+
+    def recover(self, prepare: Optional[Callable[[dict], None]] = None) -> int:
+        """
+        重新加载上次未完成的任务（需在事件循环中调用）
+
+        Args:
+            prepare: 入队前对每个任务执行的同步回调（例如补写尚未写入的近期记忆）
+        """
+        jobs = []
+        for path in self.job_dir.glob("*.json"):
+            try:
+                jobs.append(json.loads(path.read_text(encoding="utf-8")))
+            except Exception as e:
+                logger.warning(f"⚠️ 无法读取记忆任务文件 {path.name}，已丢弃: {e}")
+                path.unlink(missing_ok=True)
+        # 合并时先写入合并后的任务再删除被合并的任务文件，两步之间退出会留下已合并过的任务，跳过它们
+        merged_ids = {merged_id for job in jobs for merged_id in job.get("merged", [])}
+        for job in [job for job in jobs if job["id"] in merged_ids]:
+            self._remove(job["id"])
+        jobs = [job for job in jobs if job["id"] not in merged_ids]
+        jobs.sort(key=lambda job: job.get("created", 0))
+        for job in jobs:
+            if prepare is not None:
+                try:
+                    prepare(job)
+                except Exception as e:
+                    logger.error(f"❌ 恢复记忆任务 {job['id']} 失败: {e}")
+            self._enqueue(job)
+        if jobs:
+            logger.info(f"📋 已恢复 {len(jobs)} 个未完成的记忆任务")
+        return len(jobs)
+
+    # ---------- 提交与执行 ----------
+
+    def create(self, lanlan_name: str, history: list, detailed: bool = False) -> dict:
+        """创建并持久化任务（尚未入队）"""
+        job = {
+            "id": str(uuid4()),
+            "lanlan_name": lanlan_name,
+            "history": history,
+            "detailed": detailed,
+            "created": time.time(),
+            "merged": [],
+        }
+        self.persist(job)
+        return job
+
+    def submit(self, job: dict) -> str:
+        """任务入队并确保该角色的 worker 在运行，返回任务 ID"""
+        self._enqueue(job)
+        return job["id"]
+
+    def _set_status(self, job_id: str, **fields):
+        status = self._status.setdefault(job_id, {"id": job_id})
+        status.update(fields)
+        self._status.move_to_end(job_id)
+        while len(self._status) > MEMORY_JOB_STATUS_LIMIT:
+            self._status.popitem(last=False)
+
+    def _enqueue(self, job: dict):
+        lanlan_name = job["lanlan_name"]
+        pending = self._pending.get(lanlan_name)
+        if pending is None:
+            self._pending[lanlan_name] = job
+            self._set_status(job["id"], lanlan_name=lanlan_name, state="queued", created=job.get("created"))
+        else:
+            # 合并到尚未开始的任务：消息按提交顺序拼接，只要有一个需要详细摘要就按详细处理
+            pending["history"] = pending["history"] + job["history"]
+            pending["detailed"] = pending["detailed"] or job["detailed"]
+            pending["merged"] = pending.get("merged", []) + [job["id"]] + job.get("merged", [])
+            self.persist(pending)
+            self._remove(job["id"])
+            self._set_status(job["id"], lanlan_name=lanlan_name, state="merged",
+                             merged_into=pending["id"], created=job.get("created"))
+            logger.info(f"📋 {lanlan_name} 的记忆任务已合并到排队中的任务 {pending['id']}")
+
+        worker = self._workers.get(lanlan_name)
+        if worker is None or worker.done():
+            self._workers[lanlan_name] = asyncio.create_task(self._worker(lanlan_name))
+
+    async def _worker(self, lanlan_name: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            while lanlan_name in self._pending:
+                async with self._semaphore:
+                    job = self._pending.pop(lanlan_name, None)
+                    if job is None:
+                        break
+                    self._running[lanlan_name] = job
+                    self._set_status(job["id"], state="running", started=time.time())
+                    try:
+                        await self.handler(job)
+                        self._set_status(job["id"], state="done", finished=time.time())
+                        logger.info(f"✅ {lanlan_name} 的记忆任务 {job['id']} 处理完成")
+                    except asyncio.CancelledError:
+                        # 进程退出：保留任务文件，下次启动时恢复
+                        self._set_status(job["id"], state="cancelled")
+                        raise
+                    except Exception as e:
+                        self._set_status(job["id"], state="error", error=str(e), finished=time.time())
+                        logger.error(f"❌ {lanlan_name} 的记忆任务 {job['id']} 处理失败: {e}", exc_info=True)
+                    finally:
+                        self._running.pop(lanlan_name, None)
+                    self._remove(job["id"])
+                    for merged_id in job.get("merged", []):
+                        if merged_id in self._status:
+                            self._set_status(merged_id, state=self._status[job["id"]]["state"])
+        finally:
+            if self._workers.get(lanlan_name) is asyncio.current_task():
+                del self._workers[lanlan_name]
+
+    async def shutdown(self):
+        """取消所有 worker，未完成的任务留在磁盘上"""
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    # ---------- 状态查询 ----------
+
+    def get_status(self, job_id: str) -> Optional[dict]:
+        status = self._status.get(job_id)
+        return dict(status) if status is not None else None
+
+    def character_status(self, lanlan_name: str) -> dict:
+        pending = self._pending.get(lanlan_name)
+        running = self._running.get(lanlan_name)
+        recent = [dict(s) for s in self._status.values() if s.get("lanlan_name") == lanlan_name][-10:]
+        return {
+            "lanlan_name": lanlan_name,
+            "running": running["id"] if running else None,
+            "queued": pending["id"] if pending else None,
+            "queued_messages": len(pending["history"]) if pending else 0,
+            "recent": recent,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "running": {name: job["id"] for name, job in self._running.items()},
+            "queued": {name: job["id"] for name, job in self._pending.items()},
+            "concurrency": self.concurrency,
+        }
@@ -1,20 +1,102 @@
 from datetime import datetime
 from config import get_extra_body
 from utils.config_manager import get_config_manager
+from utils.history_journal import HistoryJournal
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, messages_to_dict, messages_from_dict, HumanMessage, AIMessage
 import json
 import os
 import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
 from openai import APIConnectionError, InternalServerError, RateLimitError
 
-from config.prompts_sys import recent_history_manager_prompt, detailed_recent_history_manager_prompt, further_summarize_prompt, history_review_prompt
+from config.prompts_sys import recent_history_manager_prompt, detailed_recent_history_manager_prompt, further_summarize_prompt, history_review_incremental_prompt
 
 # Setup logger
 from utils.logger_config import setup_logging
 logger, log_config = setup_logging(service_name="RecentMemory", log_level=logging.INFO)
 
+# 摘要缓存条数
+SUMMARY_CACHE_MAX_ENTRIES = 256
+# 已缓存的前缀至少有这么多条消息时才做增量摘要
+SUMMARY_MIN_PREFIX = 2
+# 每轮审阅最多发送的未审阅消息数
+REVIEW_CHUNK_SIZE = 20
+# 每轮审阅附带的已审阅上下文条数
+REVIEW_CONTEXT_SIZE = 4
+# 审阅进度文件中保留的消息指纹数
+REVIEW_CHECKPOINT_MAX = 512
+# 审阅进度文件后缀（与近期记忆文件放在一起）
+REVIEW_CHECKPOINT_SUFFIX = ".review"
+
+_REVIEW_ACTIONS = {'删除': 'delete', 'delete': 'delete', '修改': 'replace', 'replace': 'replace', 'edit': 'replace'}
+
+
+def _message_text(msg):
+    """提取消息中的文本内容（多模态内容中的非文本部分用 |类型| 占位）"""
+    content = getattr(msg, 'content', '')
+    if isinstance(content, str):
+        return content
+    parts = []
+    try:
+        for item in content:
+            if isinstance(item, dict):
+                parts.append(item.get('text', f"|{item.get('type', '')}|"))
+            else:
+                parts.append(str(item))
+    except Exception:
+        parts = [str(content)]
+    return "\n".join(parts)
+
+
+def _message_fingerprint(msg):
+    """消息指纹（类型 + 文本），用于记录审阅进度"""
+    return hashlib.sha1(f"{getattr(msg, 'type', '')}\x1f{_message_text(msg)}".encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """
+    摘要缓存，近期记忆压缩与时间索引共用。
+    键是 (角色, 是否详细, 消息前缀) 的滚动哈希，因此既能整段命中，也能找到已摘要过的最长前缀做增量摘要。
+    """
+
+    def __init__(self, max_entries=SUMMARY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (备忘录文本, 摘要)
+
+    @staticmethod
+    def prefix_keys(messages, lanlan_name, detailed):
+        """返回每个前缀的哈希，第 i 项对应前 i+1 条消息"""
+        digest = hashlib.sha256(f"{lanlan_name}\x1f{bool(detailed)}".encode('utf-8'))
+        keys = []
+        for msg in messages:
+            digest.update(f"\x1e{getattr(msg, 'type', '')}\x1f{_message_text(msg)}".encode('utf-8'))
+            keys.append(digest.copy().hexdigest())
+        return keys
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def longest_prefix(self, keys):
+        """在除整段以外的前缀中找最长的已缓存项，返回 (前缀长度, 缓存值)"""
+        for length in range(len(keys) - 1, SUMMARY_MIN_PREFIX - 1, -1):
+            value = self.get(keys[length - 1])
+            if value is not None:
+                return length, value
+        return 0, None
+
+
 class CompressedRecentHistoryManager:
     def __init__(self, max_history_length=10):
         self._config_manager = get_config_manager()
@@ -24,13 +106,45 @@ class CompressedRecentHistoryManager:
         self.log_file_path = recent_log
         self.name_mapping = name_mapping
         self.user_histories = {}
+        self._summary_cache = SummaryCache()
+        # 每个角色一个追加式日志存储；user_histories 是权威副本，只在磁盘被外部修改时重新读取
+        self._journals = {}
+        # 审阅修改记录时递增，压缩据此判断记录是否在调用 LLM 期间被改动
+        self._history_versions = {}
+        # 记录任何变化（追加、压缩、审阅、外部修改）都递增，供上下文缓存判断是否需要重建
+        self._revisions = {}
         for ln in self.log_file_path:
-            if os.path.exists(self.log_file_path[ln]):
-                with open(self.log_file_path[ln], encoding='utf-8') as f:
-                    self.user_histories[ln] = messages_from_dict(json.load(f))
-            else:
-                self.user_histories[ln] = []
-    
+            self.user_histories[ln] = []
+            self._sync_history(ln)
+
+    def _get_journal(self, lanlan_name):
+        """获取角色的日志存储（文件路径变化时重新创建）"""
+        path = self.log_file_path[lanlan_name]
+        journal = self._journals.get(lanlan_name)
+        if journal is None or journal.path != path:
+            journal = self._journals[lanlan_name] = HistoryJournal(path)
+        return journal
+
+    def _sync_history(self, lanlan_name):
+        """首次访问或磁盘上的记录被外部修改（记忆浏览器编辑等）时重新加载并返回 True，否则沿用内存中的副本"""
+        try:
+            file_content = self._get_journal(lanlan_name).refresh()
+            if file_content is None:
+                return False
+            self.user_histories[lanlan_name] = messages_from_dict(file_content)
+        except Exception as e:
+            logger.warning(f"读取 {lanlan_name} 的历史记录文件失败: {e}，使用空列表")
+            self.user_histories[lanlan_name] = []
+        self._touch(lanlan_name)
+        return True
+
+    def _touch(self, lanlan_name):
+        self._revisions[lanlan_name] = self._revisions.get(lanlan_name, 0) + 1
+
+    def history_revision(self, lanlan_name):
+        """内存中记录的修订号，记录有任何变化都会改变"""
+        return self._revisions.get(lanlan_name, 0)
+
     def _get_llm(self):
         """动态获取LLM实例以支持配置热重载"""
         api_config = self._config_manager.get_model_api_config('summary')
@@ -54,11 +168,20 @@ class CompressedRecentHistoryManager:
         )
 
     async def update_history(self, new_messages, lanlan_name, detailed=False):
+        """追加新消息，超过长度上限时压缩旧消息"""
+        if self.append_history(new_messages, lanlan_name):
+            await self.compress_if_needed(lanlan_name, detailed)
+
+    def append_history(self, new_messages, lanlan_name):
+        """
+        追加新消息并写入日志（不调用 LLM，可在请求路径上直接执行）
+        返回是否写入成功
+        """
         # 检查角色是否存在于配置中，如果不存在则创建默认路径
         try:
-            _, _, _, _, _, _, _, _, _, recent_log = self._config_manager.get_character_data()
-            # 更新文件路径映射
-            self.log_file_path = recent_log
+            _, _, _, _, _, _, _, _, _, recent_log = self._config_manager.get_character_snapshot().data
+            # 更新文件路径映射（快照只读，复制一份）
+            self.log_file_path = dict(recent_log)
             
             # 如果角色不在配置中，使用默认路径创建
             if lanlan_name not in recent_log:
@@ -81,87 +204,119 @@ class CompressedRecentHistoryManager:
                     logger.info(f"[RecentHistory] 使用默认路径: {default_path}")
             except Exception as e2:
                 logger.error(f"创建默认路径失败: {e2}")
-                return
+                return False
         
         # 确保角色在 user_histories 中
         if lanlan_name not in self.user_histories:
             self.user_histories[lanlan_name] = []
         
-        # 如果文件存在，加载历史记录
-        if lanlan_name in self.log_file_path and os.path.exists(self.log_file_path[lanlan_name]):
-            try:
-                with open(self.log_file_path[lanlan_name], encoding='utf-8') as f:
-                    file_content = json.load(f)
-                    if file_content:
-                        self.user_histories[lanlan_name] = messages_from_dict(file_content)
-            except (json.JSONDecodeError, Exception) as e:
-                logger.warning(f"读取 {lanlan_name} 的历史记录文件失败: {e}，使用空列表")
-                self.user_histories[lanlan_name] = []
+        # 首次访问或文件被外部修改时加载历史记录
+        self._sync_history(lanlan_name)
 
         try:
             self.user_histories[lanlan_name].extend(new_messages)
+            self._touch(lanlan_name)
             logger.info(f"[RecentHistory] {lanlan_name} 添加了 {len(new_messages)} 条新消息，当前共 {len(self.user_histories[lanlan_name])} 条")
+            # 压缩前先把新消息追加到日志，压缩期间进程退出也不会丢失
+            self._get_journal(lanlan_name).append(messages_to_dict(new_messages))
+        except Exception as e:
+            logger.error(f"[RecentHistory] 更新历史记录时出错: {e}", exc_info=True)
+            self._save_current(lanlan_name)
+            return False
+        return True
 
-            # 确保文件目录存在
-            file_path = self.log_file_path[lanlan_name]
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            with open(file_path, "w", encoding='utf-8') as f:  # Save the updated history to file before compressing
-                json.dump(messages_to_dict(self.user_histories[lanlan_name]), f, indent=2, ensure_ascii=False)
+    async def compress_if_needed(self, lanlan_name, detailed=False, session=None):
+        """
+        历史记录超过长度上限时，把较早的消息压缩成一条备忘录
 
-            if len(self.user_histories[lanlan_name]) > self.max_history_length:
-                # 压缩旧消息
-                to_compress = self.user_histories[lanlan_name][:-self.max_history_length+1]
-                compressed = [(await self.compress_history(to_compress, lanlan_name, detailed))[0]]
+        Args:
+            session: 本次会话的完整消息。待压缩部分以会话开头若干条结尾时，先单独摘要这段会话前缀并缓存，
+                再与更早的备忘录合并；随后时间索引摘要整段会话时只需在该前缀摘要上增量补充剩余消息。
+                时间索引一律使用普通模式摘要，detailed 模式下的前缀摘要无法复用，因此不做这一步
+        """
+        history = self.user_histories.get(lanlan_name, [])
+        if len(history) <= self.max_history_length or lanlan_name not in self.log_file_path:
+            return
+        version = self._history_versions.get(lanlan_name, 0)
+        try:
+            # 压缩旧消息，只保留最近的max_history_length-1条原始消息
+            to_compress = history[:-self.max_history_length+1]
+            summary_input = to_compress
+            overlap = self._session_overlap(to_compress, session) if session and not detailed else 0
+            if overlap >= SUMMARY_MIN_PREFIX:
+                session_memo, session_summary = await self.compress_history(session[:overlap], lanlan_name, detailed)
+                if session_summary:
+                    summary_input = to_compress[:-overlap] + [session_memo]
+            if len(summary_input) == 1 and summary_input[0] is not to_compress[0]:
+                # 待压缩部分全部来自本次会话，会话前缀摘要就是结果
+                compressed = summary_input
+            else:
+                compressed = [(await self.compress_history(summary_input, lanlan_name, detailed))[0]]
 
-                # 只保留最近的max_history_length条消息
-                self.user_histories[lanlan_name] = compressed + self.user_histories[lanlan_name][-self.max_history_length+1:]
+            if self._sync_history(lanlan_name) or self._history_versions.get(lanlan_name, 0) != version:
+                # 压缩期间记录被外部修改（记忆浏览器编辑、记忆审阅等），放弃本次压缩，下次更新时重新压缩
+                logger.info(f"[RecentHistory] {lanlan_name} 的历史记录在压缩期间被修改，跳过本次压缩")
+                return
+            # 压缩期间可能又追加了新消息，按压缩前的条数替换前缀
+            self.user_histories[lanlan_name] = compressed + self.user_histories[lanlan_name][len(to_compress):]
+            self._touch(lanlan_name)
+            self._get_journal(lanlan_name).replace_prefix(len(to_compress), messages_to_dict(compressed))
         except Exception as e:
-            logger.error(f"[RecentHistory] 更新历史记录时出错: {e}", exc_info=True)
-            # 即使出错，也尝试保存当前状态
-            try:
-                file_path = self.log_file_path[lanlan_name]
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                with open(file_path, "w", encoding='utf-8') as f:
-                    json.dump(messages_to_dict(self.user_histories.get(lanlan_name, [])), f, indent=2, ensure_ascii=False)
-            except Exception as save_error:
-                logger.error(f"[RecentHistory] 保存历史记录失败: {save_error}", exc_info=True)
+            logger.error(f"[RecentHistory] 压缩历史记录时出错: {e}", exc_info=True)
+            self._save_current(lanlan_name)
             return
 
-        # 最终保存
+        logger.info(f"[RecentHistory] {lanlan_name} 历史记录已保存到文件: {self.log_file_path[lanlan_name]}")
+
+    @staticmethod
+    def _session_overlap(to_compress, session):
+        """待压缩消息的末尾与会话开头重合的条数"""
+        for overlap in range(min(len(to_compress), len(session)), 0, -1):
+            if all(a.type == b.type and _message_text(a) == _message_text(b)
+                   for a, b in zip(to_compress[-overlap:], session[:overlap])):
+                return overlap
+        return 0
+
+    def _save_current(self, lanlan_name):
+        """出错时尝试把内存中的当前状态完整写入快照"""
         try:
-            file_path = self.log_file_path[lanlan_name]
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "w", encoding='utf-8') as f:
-                json.dump(messages_to_dict(self.user_histories[lanlan_name]), f, indent=2, ensure_ascii=False)
-            logger.info(f"[RecentHistory] {lanlan_name} 历史记录已保存到文件: {file_path}")
-        except Exception as e:
-            logger.error(f"[RecentHistory] 最终保存历史记录失败: {e}", exc_info=True)
+            self._get_journal(lanlan_name).rewrite(messages_to_dict(self.user_histories.get(lanlan_name, [])))
+        except Exception as save_error:
+            logger.error(f"[RecentHistory] 保存历史记录失败: {save_error}", exc_info=True)
 
 
     # detailed: 保留尽可能多的细节
     async def compress_history(self, messages, lanlan_name, detailed=False):
+        """
+        把消息压缩为备忘录，返回 (备忘录 SystemMessage, 摘要文本)。
+        结果按消息内容哈希与模式缓存；已有某个前缀的摘要时，只把该摘要和新增消息交给模型（增量摘要）。
+        """
+        keys = SummaryCache.prefix_keys(messages, lanlan_name, detailed)
+        if not keys:
+            return await self._summarize(messages, lanlan_name, detailed)
+        cached = self._summary_cache.get(keys[-1])
+        if cached is not None:
+            logger.info(f"[RecentHistory] {lanlan_name} 的摘要命中缓存（{len(messages)} 条消息）")
+            return SystemMessage(content=cached[0]), cached[1]
+
+        prefix_length, prefix = self._summary_cache.longest_prefix(keys)
+        summary_input = messages
+        if prefix is not None:
+            logger.info(f"[RecentHistory] {lanlan_name} 增量摘要：复用前 {prefix_length} 条消息的摘要，只补充 {len(messages) - prefix_length} 条")
+            summary_input = [SystemMessage(content=prefix[0])] + list(messages[prefix_length:])
+
+        memo, summary = await self._summarize(summary_input, lanlan_name, detailed)
+        if summary:
+            self._summary_cache.put(keys[-1], (memo.content, summary))
+        return memo, summary
+
+    async def _summarize(self, messages, lanlan_name, detailed=False):
         name_mapping = self.name_mapping.copy()
         name_mapping['ai'] = lanlan_name
         lines = []
         for msg in messages:
             role = name_mapping.get(getattr(msg, 'type', ''), getattr(msg, 'type', ''))
-            content = getattr(msg, 'content', '')
-            if isinstance(content, str):
-                line = f"{role} | {content}"
-            else:
-                parts = []
-                try:
-                    for item in content:
-                        if isinstance(item, dict):
-                            parts.append(item.get('text', f"|{item.get('type', '')}|"))
-                        else:
-                            parts.append(str(item))
-                except Exception:
-                    parts = [str(content)]
-                joined = "\n".join(parts)
-                line = f"{role} | {joined}"
-            lines.append(line)
+            lines.append(f"{role} | {_message_text(msg)}")
         messages_text = "\n".join(lines)
         if not detailed:
             prompt = recent_history_manager_prompt % messages_text
@@ -250,9 +405,9 @@ class CompressedRecentHistoryManager:
     def get_recent_history(self, lanlan_name):
         # 检查角色是否存在于配置中，如果不存在则创建默认路径
         try:
-            _, _, _, _, _, _, _, _, _, recent_log = self._config_manager.get_character_data()
-            # 更新文件路径映射
-            self.log_file_path = recent_log
+            _, _, _, _, _, _, _, _, _, recent_log = self._config_manager.get_character_snapshot().data
+            # 更新文件路径映射（快照只读，复制一份）
+            self.log_file_path = dict(recent_log)
             
             # 如果角色不在配置中，使用默认路径
             if lanlan_name not in recent_log:
@@ -278,24 +433,67 @@ class CompressedRecentHistoryManager:
         if lanlan_name not in self.user_histories:
             self.user_histories[lanlan_name] = []
         
-        # 如果文件存在，加载历史记录
-        if lanlan_name in self.log_file_path and os.path.exists(self.log_file_path[lanlan_name]):
-            try:
-                with open(self.log_file_path[lanlan_name], encoding='utf-8') as f:
-                    file_content = json.load(f)
-                    if file_content:
-                        self.user_histories[lanlan_name] = messages_from_dict(file_content)
-            except (json.JSONDecodeError, Exception) as e:
-                logger.warning(f"读取 {lanlan_name} 的历史记录文件失败: {e}，使用空列表")
-                self.user_histories[lanlan_name] = []
-        
+        # 首次访问或文件被外部修改时加载历史记录，否则直接使用内存中的副本
+        self._sync_history(lanlan_name)
+
         return self.user_histories.get(lanlan_name, [])
 
+    # ---------- 记忆审阅 ----------
+
+    def _review_checkpoint_path(self, lanlan_name):
+        return self.log_file_path[lanlan_name] + REVIEW_CHECKPOINT_SUFFIX
+
+    def _load_reviewed(self, lanlan_name):
+        """读取已审阅消息的指纹（按审阅先后排列）"""
+        try:
+            with open(self._review_checkpoint_path(lanlan_name), 'r', encoding='utf-8') as f:
+                return list(json.load(f).get('reviewed', []))
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.warning(f"⚠️ 读取 {lanlan_name} 的审阅进度失败，将从头审阅: {e}")
+            return []
+
+    def _save_reviewed(self, lanlan_name, reviewed):
+        """原子写入审阅进度，只保留最近的 REVIEW_CHECKPOINT_MAX 个指纹"""
+        path = self._review_checkpoint_path(lanlan_name)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'reviewed': reviewed[-REVIEW_CHECKPOINT_MAX:]}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ 保存 {lanlan_name} 的审阅进度失败: {e}")
+
+    @staticmethod
+    def _locate_window(window_fps, current_fps):
+        """
+        找到审阅时的消息窗口在当前记录中的位置，返回 (偏移量, 仍然存在的窗口起始下标)。
+        审阅期间压缩只会替换前缀、新消息只会追加到末尾，所以窗口的某个后缀仍连续存在；取重合最长（相同时最靠后）的位置。
+        """
+        n = len(window_fps)
+        best_end, best_matched = None, 0
+        for end in range(len(current_fps) - 1, -1, -1):
+            matched = 0
+            while matched < n and end - matched >= 0 and current_fps[end - matched] == window_fps[n - 1 - matched]:
+                matched += 1
+            if matched > best_matched:
+                best_end, best_matched = end, matched
+                if matched == n:
+                    break
+        if best_end is None:
+            return None, n
+        return best_end - (n - 1), n - best_matched
+
     async def review_history(self, lanlan_name, cancel_event=None):
         """
-        审阅历史记录，寻找并修正矛盾、冗余、逻辑混乱或复读的部分
+        增量审阅历史记录，寻找并修正矛盾、冗余、逻辑混乱或复读的部分。
+        只把尚未审阅的消息（附带少量已审阅的上下文）发给模型，模型返回按编号的删除/修改操作，
+        以补丁形式应用到最新的记录上；每审阅完一批就保存进度，被取消后下次从断点继续。
+
         :param lanlan_name: 角色名称
         :param cancel_event: asyncio.Event对象，用于取消操作
+        :return: 是否修改了历史记录
         """
         # 检查是否被取消
         if cancel_event and cancel_event.is_set():
@@ -304,9 +502,7 @@ class CompressedRecentHistoryManager:
             
         # 检查配置文件中是否禁用自动审阅
         try:
-            from utils.config_manager import get_config_manager
-            config_manager = get_config_manager()
-            config_path = str(config_manager.get_config_path('core_config.json'))
+            config_path = str(self._config_manager.get_config_path('core_config.json'))
             if os.path.exists(config_path):
                 with open(config_path, 'r', encoding='utf-8') as f:
                     config_data = json.load(f)
@@ -315,123 +511,154 @@ class CompressedRecentHistoryManager:
                         return False
         except Exception as e:
             print(f"⚠️ 读取配置文件失败：{e}，继续执行审阅")
-        
-        # 获取当前历史记录
-        
-        current_history = self.get_recent_history(lanlan_name)
-        
-        if not current_history:
+
+        if not self.get_recent_history(lanlan_name):
             print(f"💡 {lanlan_name} 的历史记录为空，无需审阅")
             return False
-        
-        # 检查是否被取消
-        if cancel_event and cancel_event.is_set():
-            print(f"⚠️ {lanlan_name} 的记忆整理被取消（获取历史后）")
-            return False
-        
-        # 将消息转换为可读的文本格式
+
+        reviewed = self._load_reviewed(lanlan_name)
+        modified = False
+        while True:
+            if cancel_event and cancel_event.is_set():
+                print(f"⚠️ {lanlan_name} 的记忆整理被取消")
+                return modified
+
+            self._sync_history(lanlan_name)
+            history = self.user_histories.get(lanlan_name, [])
+            reviewed_set = set(reviewed)
+            fingerprints = [_message_fingerprint(msg) for msg in history]
+            # 备忘录由摘要生成，不单独计入待审阅
+            start = next((i for i, msg in enumerate(history)
+                          if msg.type != 'system' and fingerprints[i] not in reviewed_set), None)
+            if start is None:
+                print(f"💡 {lanlan_name} 的历史记录均已审阅")
+                return modified
+
+            end = min(len(history), start + REVIEW_CHUNK_SIZE)
+            context_start = max(0, start - REVIEW_CONTEXT_SIZE)
+            window = list(range(context_start, end))
+            if history[0].type == 'system' and context_start > 0:
+                # 备忘录始终作为上下文
+                window.insert(0, 0)
+            edits = await self._review_chunk(lanlan_name, [history[i] for i in window],
+                                             sum(1 for i in window if i < start), cancel_event)
+            if edits is None:
+                return modified
+
+            self._sync_history(lanlan_name)
+            current = self.user_histories.get(lanlan_name, [])
+            window_fps = [fingerprints[i] for i in window]
+            current_fps = [_message_fingerprint(msg) for msg in current]
+            offset, first_alive = self._locate_window(window_fps, current_fps)
+            if offset is None:
+                # 记录在审阅期间被整体改写（记忆浏览器编辑等），这一批不保存进度，下次审阅时重新处理
+                logger.info(f"[RecentHistory] {lanlan_name} 的历史记录在审阅期间被修改，放弃本批审阅结果")
+                return modified
+
+            patched = list(current)
+            deleted = set()
+            replaced = 0
+            for position, action, content in edits:
+                if position < first_alive:
+                    continue  # 该消息已被压缩进备忘录
+                target = offset + position
+                if action == 'delete' and patched[target].type != 'system':
+                    deleted.add(target)
+                elif action == 'replace' and content:
+                    original = patched[target]
+                    new_content = [{"type": "text", "text": content}] if isinstance(original.content, list) else content
+                    patched[target] = original.__class__(content=new_content)
+                    replaced += 1
+                    reviewed.append(_message_fingerprint(patched[target]))
+            patched = [msg for i, msg in enumerate(patched) if i not in deleted]
+            reviewed.extend(fingerprints[i] for i in range(start, end))
+
+            if deleted or replaced:
+                self.user_histories[lanlan_name] = patched
+                self._history_versions[lanlan_name] = self._history_versions.get(lanlan_name, 0) + 1
+                self._touch(lanlan_name)
+                self._get_journal(lanlan_name).rewrite(messages_to_dict(patched))
+                modified = True
+                print(f"✅ {lanlan_name} 的记忆已修正并保存（删除 {len(deleted)} 条，修改 {replaced} 条）")
+            self._save_reviewed(lanlan_name, reviewed)
+
+    async def _review_chunk(self, lanlan_name, messages, context_count, cancel_event=None):
+        """
+        审阅一批消息，前 context_count 条是已审阅的上下文。
+        返回 [(窗口内下标, 'delete'/'replace', 新内容)]，失败或被取消时返回 None。
+        """
         name_mapping = self.name_mapping.copy()
         name_mapping['ai'] = lanlan_name
-        
-        history_text = ""
-        for msg in current_history:
-            if hasattr(msg, 'type') and msg.type in name_mapping:
-                role = name_mapping[msg.type]
-            else:
-                role = "unknown"
-            
-            if hasattr(msg, 'content'):
-                if isinstance(msg.content, str):
-                    content = msg.content
-                elif isinstance(msg.content, list):
-                    content = "\n".join([str(i) if isinstance(i, str) else i.get("text", str(i)) for i in msg.content])
-                else:
-                    content = str(msg.content)
-            else:
-                content = str(msg)
-            
-            history_text += f"{role}: {content}\n\n"
-        
-        # 检查是否被取消
-        if cancel_event and cancel_event.is_set():
-            print(f"⚠️ {lanlan_name} 的记忆整理被取消（准备调用LLM前）")
-            return False
-        
+
+        lines = []
+        for i, msg in enumerate(messages):
+            if i == context_count:
+                lines.append("【待审阅】")
+            elif i == 0:
+                lines.append("【已审阅】")
+            role = name_mapping.get(msg.type, "unknown")
+            lines.append(f"[{i}] {role}: {_message_text(msg)}\n")
+        history_text = "\n".join(lines)
+
         retries = 0
         max_retries = 3
         while retries < max_retries:
+            if cancel_event and cancel_event.is_set():
+                print(f"⚠️ {lanlan_name} 的记忆整理被取消（准备调用LLM前）")
+                return None
             try:
-                # 使用LLM审阅历史记录
-                prompt = history_review_prompt % (self.name_mapping['human'], name_mapping['ai'], history_text, self.name_mapping['human'], name_mapping['ai'])
+                prompt = history_review_incremental_prompt % (self.name_mapping['human'], name_mapping['ai'], history_text)
                 review_llm = self._get_review_llm()
                 response_content = (await review_llm.ainvoke(prompt)).content
-                
+
                 # 检查是否被取消（LLM调用后）
                 if cancel_event and cancel_event.is_set():
                     print(f"⚠️ {lanlan_name} 的记忆整理被取消（LLM调用后，保存前）")
-                    return False
-                
+                    return None
+
                 # 确保response_content是字符串
                 if isinstance(response_content, list):
                     response_content = str(response_content)
-                
+
                 # 清理响应内容
                 if response_content.startswith("```"):
                     response_content = response_content.replace('```json', '').replace('```', '')
-                
-                # 解析JSON响应
+
                 review_result = json.loads(response_content)
-                
-                if '修正说明' in review_result and '修正后的对话' in review_result:
-                    print(f"💡 记忆整理结果：{review_result['修正说明']}")
-                    
-                    # 将修正后的对话转换回消息格式
-                    corrected_messages = []
-                    for msg_data in review_result['修正后的对话']:
-                        role = msg_data.get('role', 'user')
-                        content = msg_data.get('content', '')
-                        
-                        if role in ['user', 'human', name_mapping['human']]:
-                            corrected_messages.append(HumanMessage(content=content))
-                        elif role in ['ai', 'assistant', name_mapping['ai']]:
-                            corrected_messages.append(AIMessage(content=content))
-                        elif role in ['system', 'system_message', name_mapping['system']]:
-                            corrected_messages.append(SystemMessage(content=content))
-                        else:
-                            # 默认作为用户消息处理
-                            corrected_messages.append(HumanMessage(content=content))
-                    
-                    # 更新历史记录
-                    self.user_histories[lanlan_name] = corrected_messages
-                    
-                    # 保存到文件
-                    with open(self.log_file_path[lanlan_name], "w", encoding='utf-8') as f:
-                        json.dump(messages_to_dict(corrected_messages), f, indent=2, ensure_ascii=False)
-                    
-                    print(f"✅ {lanlan_name} 的记忆已修正并保存")
-                    return True
-                else:
+                if '修改' not in review_result:
                     print(f"❌ 审阅响应格式错误：{response_content}")
-                    return False
-                    
+                    return None
+                if review_result.get('修正说明'):
+                    print(f"💡 记忆整理结果：{review_result['修正说明']}")
+
+                edits = []
+                for edit in review_result['修改'] or []:
+                    position = edit.get('编号')
+                    action = _REVIEW_ACTIONS.get(str(edit.get('操作', '')).strip().lower())
+                    # 已审阅的上下文不允许修改，备忘录不允许删除（在应用时检查）
+                    if not isinstance(position, int) or action is None:
+                        continue
+                    if position >= len(messages) or (position < context_count and messages[position].type != 'system'):
+                        continue
+                    if position < 0:
+                        continue
+                    edits.append((position, action, str(edit.get('内容', '')).strip()))
+                return edits
+
             except (APIConnectionError, InternalServerError, RateLimitError) as e:
                 logger.info(f"ℹ️ 捕获到 {type(e).__name__} 错误")
                 retries += 1
                 if retries >= max_retries:
                     print(f'❌ 记忆整理失败，已达到最大重试次数: {e}')
-                    return False
+                    return None
                 # 指数退避: 1, 2, 4 秒
                 wait_time = 2 ** (retries - 1)
                 print(f'⚠️ 遇到网络或429错误，等待 {wait_time} 秒后重试 (第 {retries}/{max_retries} 次)')
                 await asyncio.sleep(wait_time)
-                # 检查是否被取消
-                if cancel_event and cancel_event.is_set():
-                    print(f"⚠️ {lanlan_name} 的记忆整理在重试等待期间被取消")
-                    return False
             except Exception as e:
                 logger.error(f"❌ 历史记录审阅失败：{e}")
-                return False
-        
+                return None
+
         # 如果所有重试都失败
         print(f"❌ {lanlan_name} 的记忆整理失败，已达到最大重试次数")
-        return False
+        return None
@@ -0,0 +1,122 @@
+"""
+本地记忆重排
+对向量召回的候选片段做纯本地打分，不调用 LLM：
+- 各路召回结果（原始对话、压缩摘要的向量排名，以及候选集内的 BM25 关键词排名）用 RRF 融合
+- 按片段时间做指数衰减，越久远的记忆权重越低（设有下限，旧记忆不会被完全淘汰）
+- 用字符 trigram 相似度去掉内容几乎相同的片段
+"""
+import math
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+from memory.timeindex import lexical_terms
+from utils.frontend_utils import calculate_text_similarity
+
+# RRF 融合常数（越大排名靠后的结果权重衰减越慢）
+RRF_K = 60
+# 时间衰减的半衰期（天）与最低权重
+RERANK_RECENCY_HALF_LIFE_DAYS = 30.0
+RERANK_RECENCY_FLOOR = 0.5
+# trigram 相似度超过该值视为重复片段
+RERANK_DUPLICATE_THRESHOLD = 0.8
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def rrf_scores(ranked_lists: Sequence[Sequence[Hashable]], rrf_k: int = RRF_K) -> Dict[Hashable, float]:
+    """倒数排名融合：ranked_lists 中每个列表是按相关度排好序的键，返回 {键: 融合分数}"""
+    scores = {}
+    for ranked in ranked_lists:
+        for rank, key in enumerate(ranked):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return scores
+
+
+def bm25_rank(query: str, texts: Sequence[str]) -> List[int]:
+    """在候选集合内按 BM25 给 texts 排序，返回与查询有词项重合的下标（按相关度降序）"""
+    query_terms = set(lexical_terms(query))
+    if not query_terms or not texts:
+        return []
+    docs = [Counter(lexical_terms(text)) for text in texts]
+    avg_len = sum(sum(doc.values()) for doc in docs) / len(docs) or 1.0
+    df = Counter(term for doc in docs for term in query_terms if term in doc)
+    scored = []
+    for i, doc in enumerate(docs):
+        doc_len = sum(doc.values())
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_len))
+        if score > 0:
+            scored.append((score, i))
+    scored.sort(reverse=True)
+    return [i for _, i in scored]
+
+
+def recency_weight(timestamp, now: Optional[datetime] = None,
+                   half_life_days: float = RERANK_RECENCY_HALF_LIFE_DAYS,
+                   floor: float = RERANK_RECENCY_FLOOR) -> float:
+    """按时间指数衰减的权重，范围 [floor, 1]；时间缺失或无法解析时返回 1"""
+    if not timestamp:
+        return 1.0
+    try:
+        ts = timestamp if isinstance(timestamp, datetime) else datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return 1.0
+    age_days = max(0.0, ((now or datetime.now()) - ts).total_seconds() / 86400)
+    return floor + (1 - floor) * 0.5 ** (age_days / half_life_days)
+
+
+def suppress_duplicates(items: Sequence, text_of: Callable[[object], str], k: int,
+                        threshold: float = RERANK_DUPLICATE_THRESHOLD) -> list:
+    """按顺序保留前 k 个与已保留项都不相似的条目"""
+    kept, kept_texts = [], []
+    for item in items:
+        text = text_of(item)
+        if any(calculate_text_similarity(text, other) >= threshold for other in kept_texts):
+            continue
+        kept.append(item)
+        kept_texts.append(text)
+        if len(kept) >= k:
+            break
+    return kept
+
+
+def local_rerank(query: str, ranked_lists: Sequence[Sequence], k: int,
+                 text_of: Callable[[object], str], timestamp_of: Callable[[object], object],
+                 now: Optional[datetime] = None) -> list:
+    """
+    本地重排多路召回结果
+
+    Args:
+        query: 查询文本
+        ranked_lists: 各路召回结果，每路按相关度降序
+        k: 返回条数
+        text_of: 取条目文本的函数（也用作去重键）
+        timestamp_of: 取条目时间的函数
+        now: 当前时间（用于时间衰减）
+    """
+    items = {}
+    key_lists = []
+    for ranked in ranked_lists:
+        keys = []
+        for item in ranked:
+            key = text_of(item).strip()
+            items.setdefault(key, item)
+            keys.append(key)
+        key_lists.append(keys)
+    if not items:
+        return []
+    keys = list(items)
+    key_lists.append([keys[i] for i in bm25_rank(query, keys)])
+    scores = rrf_scores(key_lists)
+    now = now or datetime.now()
+    for key in scores:
+        scores[key] *= recency_weight(timestamp_of(items[key]), now)
+    ordered = [items[key] for key in sorted(scores, key=scores.get, reverse=True)]
+    return suppress_duplicates(ordered, text_of, k)
@@ -1,130 +1,209 @@
-
-
 """
-请注意，这是一个未完成的、未经测试的记忆模组的路由器。本文件的所有代码暂时都没有任何实际用途。为了减少项目依赖，暂时将langgraph组件移除。未来可能会也可能不会重新引入。
-from langgraph.graph import StateGraph, END
+记忆检索路由
+把一次回忆请求拆成“时间范围 + 检索词”：时间范围优先用规则解析（memory.timeparse），规则解析不了且查询里明显在问时间时才请 LLM 兜底；
+随后并行查询时间索引库中的关键词倒排索引（摘要与原始对话）、时间范围内的最新摘要、以及（可用时）向量库，
+再用 RRF（倒数排名融合）合并各路结果。常见查询完全不需要调用 LLM。
 """
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import List, NamedTuple, Optional
 
-from typing import TypedDict, List, Dict, Any
 from langchain_core.messages import BaseMessage
-import json
 from langchain_openai import ChatOpenAI
-from config import ROUTER_MODEL
+
+from config import ROUTER_MODEL, TIME_ORIGINAL_TABLE_NAME, TIME_COMPRESSED_TABLE_NAME
+from memory.rerank import rrf_scores, suppress_duplicates
+from memory.timeindex import lexical_terms, message_json_text
+from memory.timeparse import TIME_HINT_PATTERN, TimeRange, parse_time_range, strip_time_expression
 from utils.config_manager import get_config_manager
 
-class RouterState(TypedDict):
-    messages: List[BaseMessage]
-    query_type: str
-    results: Dict[str, Any]
+logger = logging.getLogger(__name__)
+
+# 每一路检索取回的候选数
+ROUTER_CANDIDATES = 20
+# 向量检索不支持按时间过滤，限定时间范围时多取一些再过滤
+ROUTER_VECTOR_OVERFETCH = 4
+# LLM 解析时间范围的超时（秒）
+ROUTER_LLM_TIMEOUT = 10.0
+# 查询中不参与关键词检索的常见虚词/疑问词
+ROUTER_STOP_TERMS = frozenset([
+    '我们', '你们', '他们', '什么', '怎么', '怎样', '哪些', '那些', '这些', '一下', '的是', '了什', '做了', '们做', '们聊',
+    '聊了', '说了', '们说', '还记', '记得', '得吗', '的事', '吗', '呢', '了', '的', '我', '你',
+    'the', 'a', 'an', 'we', 'you', 'i', 'what', 'did', 'do', 'about', 'of', 'and', 'to', 'was', 'is', 'remember',
+    'した', 'たこ', 'こと', 'って', '何を', 'について',
+])
+
+
+class MemoryHit(NamedTuple):
+    text: str
+    session_id: str
+    timestamp: str
+    source: str  # summary / original / vector
+    score: float
+
+
+def rrf_fuse(ranked_lists: List[List[MemoryHit]], k: int) -> List[MemoryHit]:
+    """用倒数排名融合多路结果并去除重复片段，score 替换为融合分数"""
+    hits = {}
+    for ranked in ranked_lists:
+        for hit in ranked:
+            hits.setdefault(hit.text.strip(), hit)
+    scores = rrf_scores([[hit.text.strip() for hit in ranked] for ranked in ranked_lists])
+    ordered = [hits[key]._replace(score=scores[key]) for key in sorted(scores, key=scores.get, reverse=True)]
+    return suppress_duplicates(ordered, lambda hit: hit.text, k)
+
 
 class MemoryQueryRouter:
+    """
+    混合记忆检索引擎
+
+    Args:
+        time_memory: TimeIndexedMemory
+        semantic_memory: SemanticMemory，可以为 None（不做向量检索）
+        recent_history: CompressedRecentHistoryManager
+        settings_manager: ImportantSettingsManager
+    """
+
     def __init__(self, time_memory, semantic_memory, recent_history, settings_manager):
         self.time_memory = time_memory
         self.semantic_memory = semantic_memory
         self.recent_history = recent_history
         self.settings_manager = settings_manager
         self._config_manager = get_config_manager()
-        self.graph = self._build_graph()
-    
+
     def _get_llm(self):
         """动态获取LLM实例以支持配置热重载"""
         api_config = self._config_manager.get_model_api_config('summary')
-        return ChatOpenAI(model=ROUTER_MODEL, base_url=api_config['base_url'], api_key=api_config['api_key'])
-
-    def _build_graph(self):
-        # 构建LangGraph流程图
-        workflow = StateGraph(RouterState)
-
-        # 添加节点
-        workflow.add_node("route_query", self._route_query)
-        workflow.add_node("time_query_agent", self._time_query_agent)
-        workflow.add_node("semantic_query_agent", self._semantic_query_agent)
-        workflow.add_node("semantic_query_with_time_agent", self._semantic_query_with_time_agent)
-
-        # 定义边
-        workflow.add_edge("route_query", "time_query_agent")
-        workflow.add_edge("route_query", "semantic_query_agent")
-        workflow.add_edge("route_query", "semantic_query_with_time_agent")
-
-        workflow.add_edge("time_query_agent", END)
-        workflow.add_edge("semantic_query_agent", END)
-        workflow.add_edge("semantic_query_with_time_agent", END)
+        return ChatOpenAI(model=ROUTER_MODEL, base_url=api_config['base_url'], api_key=api_config['api_key'],
+                          temperature=0, timeout=ROUTER_LLM_TIMEOUT, max_retries=1)
 
-        # 设置入口点
-        workflow.set_entry_point("route_query")
-
-        return workflow.compile()
-
-    def _route_query(self, state):
-        # 分析请求类型并路由到相应的智能体
-        query = state["messages"][-1].content
-
-        # 使用LLM确定查询类型
-        prompt = f"""
-请分析以下查询，并确定它属于哪种类型:
-1. time_query - 基于时间的查询（例如"上周我做了什么？"）
-2. semantic_query - 基于语义的查询（例如"关于Python的讨论"）
-3. semantic_query_with_time_constraint - 基于语义的查询（例如"昨天我们讨论玩什么"）
+    # ---------- 时间范围 ----------
 
+    async def _llm_time_range(self, query: str, now: datetime) -> Optional[TimeRange]:
+        """规则解析失败时让 LLM 提取时间范围，失败返回 None"""
+        prompt = f"""现在是 {now.strftime('%Y-%m-%d %H:%M')}（{'一二三四五六日'[now.weekday()]}）。
+从以下查询中提取它所指的时间范围；如果查询没有指明时间，返回 null。
 查询: {query}
 
-只返回类型名称，不要有其他文本。"""
-
-        llm = self._get_llm()
-        response = llm.invoke(prompt)
-        query_type = response.content.strip().lower()
-
-        return {"query_type": query_type}
-
-    def _time_query_agent(self, state):
-        if state["query_type"] != "time_query":
-            return state
-
-        query = state["messages"][-1].content
-
-        # 提取时间范围
-        prompt = f"""
-        从以下查询中提取时间范围:
-        {query}
-
-        以JSON格式返回，格式为:
-        {{
-            "start_time": "YYYY-MM-DD HH:MM:SS",
-            "end_time": "YYYY-MM-DD HH:MM:SS"
-        }}
-        """
-
-        llm = self._get_llm()
-        response = llm.invoke(prompt)
+只返回JSON，格式为 {{"start_time": "YYYY-MM-DD HH:MM:SS", "end_time": "YYYY-MM-DD HH:MM:SS"}} 或 null，不要有其他文本。"""
         try:
-            time_range = json.loads(response.content)
-            results = self.time_memory.retrieve_by_timeframe(
-                time_range["start_time"],
-                time_range["end_time"]
-            )
-            return {"results": {"time_query_results": results}}
-        except:
-            return {"results": {"error": "无法解析时间范围"}}
-
-    def _semantic_query_agent(self, state):
-        if state["query_type"] != "semantic_query":
-            return state
-
-        query = state["messages"][-1].content
-        results = self.semantic_memory.retrieve_by_query(query)
-
-        return {"results": {"semantic_query_results": results}}
-
-    def _semantic_query_with_time_agent(self, state):
-        pass
-
-    def process_request(self, messages, request_type=None):
-        # 处理来自聊天机器人的请求
-        initial_state = {
-            "messages": messages,
-            "query_type": request_type,
-            "results": {}
-        }
-
-        result = self.graph.invoke(initial_state)
-        return result["results"]
+            response = await self._get_llm().ainvoke(prompt)
+            content = response.content.strip()
+            if content.startswith("```"):
+                content = content.strip("`").removeprefix("json").strip()
+            data = json.loads(content)
+            if not data:
+                return None
+            start = datetime.fromisoformat(data["start_time"])
+            end = min(datetime.fromisoformat(data["end_time"]), now)
+            if end <= start:
+                return None
+            return TimeRange(start, end, "")
+        except Exception as e:
+            logger.warning(f"⚠️ LLM 解析时间范围失败: {e}")
+            return None
+
+    async def resolve_time_range(self, query: str, now: Optional[datetime] = None, use_llm: bool = True) -> Optional[TimeRange]:
+        now = now or datetime.now()
+        time_range = parse_time_range(query, now)
+        if time_range is None and use_llm and TIME_HINT_PATTERN.search(query):
+            time_range = await self._llm_time_range(query, now)
+        return time_range
+
+    # ---------- 各路检索 ----------
+
+    def _lexical(self, lanlan_name, table, terms, time_range) -> List[MemoryHit]:
+        start, end = (time_range.start, time_range.end) if time_range else (None, None)
+        if table == TIME_COMPRESSED_TABLE_NAME:
+            rows = self.time_memory.search_summary(lanlan_name, terms, start, end, ROUTER_CANDIDATES)
+            source = "summary"
+        else:
+            rows = self.time_memory.search_original(lanlan_name, terms, start, end, ROUTER_CANDIDATES)
+            source = "original"
+        hits = []
+        for _, session_id, message, timestamp, score in rows:
+            text = message_json_text(message)
+            if text.strip():
+                hits.append(MemoryHit(text, session_id, str(timestamp), source, float(score)))
+        return hits
+
+    def _latest_summaries(self, lanlan_name, time_range) -> List[MemoryHit]:
+        rows = self.time_memory.latest_summary_by_timeframe(
+            lanlan_name, time_range.start, time_range.end, ROUTER_CANDIDATES)
+        hits = []
+        for _, session_id, message, timestamp in rows:
+            text = message_json_text(message)
+            if text.strip():
+                hits.append(MemoryHit(text, session_id, str(timestamp), "summary", 0.0))
+        return hits
+
+    def _vector(self, lanlan_name, query, time_range) -> List[MemoryHit]:
+        original = getattr(self.semantic_memory, "original_memory", {}).get(lanlan_name)
+        if original is None or len(original.vectorstore) == 0:
+            return []
+        fetch = ROUTER_CANDIDATES * (ROUTER_VECTOR_OVERFETCH if time_range else 1)
+        hits = []
+        for doc, score in original.vectorstore.similarity_search_with_score(query, k=fetch):
+            timestamp = doc.metadata.get("timestamp", "")
+            if time_range:
+                try:
+                    ts = datetime.fromisoformat(timestamp)
+                except (TypeError, ValueError):
+                    continue
+                if not (time_range.start <= ts <= time_range.end):
+                    continue
+            hits.append(MemoryHit(doc.page_content, doc.metadata.get("event_id", ""), timestamp, "vector", float(score)))
+        return hits[:ROUTER_CANDIDATES]
+
+    async def retrieve(self, query: str, lanlan_name: str, k: int = 8, now: Optional[datetime] = None,
+                       use_llm: bool = True) -> List[MemoryHit]:
+        """
+        混合检索
+
+        Args:
+            query: 查询文本（可以包含“昨天”“上周”之类的时间表达式）
+            lanlan_name: 角色名
+            k: 返回结果数
+            now: 当前时间（用于解析相对时间，默认当前时刻）
+            use_llm: 规则无法解析时间时是否允许调用 LLM
+        """
+        time_range = await self.resolve_time_range(query, now, use_llm)
+        keywords = strip_time_expression(query, time_range)
+        terms = [term for term in lexical_terms(keywords) if term not in ROUTER_STOP_TERMS]
+
+        branches = []
+        if terms:
+            branches.append(asyncio.to_thread(self._lexical, lanlan_name, TIME_COMPRESSED_TABLE_NAME, terms, time_range))
+            branches.append(asyncio.to_thread(self._lexical, lanlan_name, TIME_ORIGINAL_TABLE_NAME, terms, time_range))
+            if self.semantic_memory is not None:
+                branches.append(asyncio.to_thread(self._vector, lanlan_name, keywords, time_range))
+        if time_range is not None:
+            # 限定了时间：该范围内的摘要本身就是候选（“昨天我们做了什么”这类查询几乎只靠这一路）
+            branches.append(asyncio.to_thread(self._latest_summaries, lanlan_name, time_range))
+
+        ranked_lists = []
+        for result in await asyncio.gather(*branches, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ 记忆检索的某一路失败: {result}")
+                continue
+            if result:
+                ranked_lists.append(result)
+        return rrf_fuse(ranked_lists, k)
+
+    async def query(self, query: str, lanlan_name: str, k: int = 8) -> str:
+        """检索并格式化为可直接放进提示词的文本"""
+        hits = await self.retrieve(query, lanlan_name, k)
+        results_text = "\n".join([
+            f"记忆片段{i} | {hit.timestamp[:16]}\n{hit.text}\n"
+            for i, hit in enumerate(hits)
+        ])
+        return f"""======{lanlan_name}尝试回忆=====\n{query}\n\n====={lanlan_name}的相关记忆=====\n{results_text}"""
+
+    async def process_request(self, messages: List[BaseMessage], lanlan_name: str, k: int = 8) -> List[MemoryHit]:
+        """以对话中最后一条消息作为查询"""
+        content = messages[-1].content
+        if isinstance(content, list):
+            content = "\n".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+        return await self.retrieve(content, lanlan_name, k)
@@ -1,17 +1,23 @@
 # from langchain_chroma import Chroma
-# ↑ 这个库引入了Chroma和onnx依赖，显著增大了一键包体积，暂时注释掉
+# ↑ 这个库引入了Chroma和onnx依赖，显著增大了一键包体积，已改用 memory.vectorstore 中的本地向量存储
 from typing import List
 from langchain_core.documents import Document
 from datetime import datetime
 from memory.recent import CompressedRecentHistoryManager
+from memory.vectorstore import LocalVectorStore
+from memory.embedding import get_embedding_service
+from memory.rerank import local_rerank
 from config import SEMANTIC_MODEL, RERANKER_MODEL, get_extra_body
 from utils.config_manager import get_config_manager
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
 from config.prompts_sys import semantic_manager_prompt
 import json
 import asyncio
 from openai import APIConnectionError, InternalServerError, RateLimitError
 
+# 开启 LLM 精排时，只把本地重排后的前几条交给 LLM
+SEMANTIC_LLM_RERANK_TOP_N = 3
+
 class SemanticMemory:
     def __init__(self, recent_history_manager: CompressedRecentHistoryManager, persist_directory=None):
         self._config_manager = get_config_manager()
@@ -31,19 +37,25 @@ class SemanticMemory:
         return ChatOpenAI(model=RERANKER_MODEL, base_url=api_config['base_url'], api_key=api_config['api_key'], temperature=0.1, extra_body=get_extra_body(RERANKER_MODEL) or None)
 
     async def store_conversation(self, event_id, messages, lanlan_name):
-        self.original_memory[lanlan_name].store_conversation(event_id, messages)
+        # 嵌入请求与写盘是阻塞操作，放到线程里执行
+        await asyncio.to_thread(self.original_memory[lanlan_name].store_conversation, event_id, messages)
         await self.compressed_memory[lanlan_name].store_compressed_summary(event_id, messages)
 
-    async def hybrid_search(self, query, lanlan_name, with_rerank=True, k=10):
-        # 从原始和压缩记忆中获取结果
-        original_results = self.original_memory[lanlan_name].retrieve_by_query(query, k)
-        compressed_results = self.compressed_memory[lanlan_name].retrieve_by_query(query, k)
-        combined = original_results + compressed_results
+    async def store_original(self, event_id, messages, lanlan_name):
+        """只写入原始对话（仅消耗嵌入请求，不调用 LLM 生成摘要）"""
+        await asyncio.to_thread(self.original_memory[lanlan_name].store_conversation, event_id, messages)
+
+    async def hybrid_search(self, query, lanlan_name, with_rerank=True, k=10, use_llm_rerank=False):
+        # 从原始和压缩记忆中获取结果（带相似度，按相关度降序）
+        original_results, compressed_results = await asyncio.gather(
+            asyncio.to_thread(self.original_memory[lanlan_name].retrieve_with_score, query, k),
+            asyncio.to_thread(self.compressed_memory[lanlan_name].retrieve_with_score, query, k),
+        )
 
-        if with_rerank:
-            return await self.rerank_results(query, combined)
+        if with_rerank and (original_results or compressed_results):
+            return await self.rerank_results(query, [original_results, compressed_results], use_llm=use_llm_rerank)
         else:
-            return combined
+            return [doc for doc, _ in original_results + compressed_results]
 
     async def query(self, query, lanlan_name):
         results_text = "\n".join([
@@ -52,8 +64,31 @@ class SemanticMemory:
         ])
         return f"""======{lanlan_name}尝试回忆=====\n{query}\n\n====={lanlan_name}的相关记忆=====\n{results_text}"""
 
-    async def rerank_results(self, query, results: list, k=5) -> list:
-        # 使用LLM重新排序结果
+    async def rerank_results(self, query, ranked_lists: list, k=5, use_llm=False) -> list:
+        """
+        本地重排：各路向量排名与候选集内的关键词排名做 RRF 融合，叠加时间衰减并去除重复片段。
+        use_llm 为 True 时再让 LLM 对前 SEMANTIC_LLM_RERANK_TOP_N 条精排，失败时保留本地顺序。
+
+        Args:
+            query: 查询文本
+            ranked_lists: 各路召回结果，每路为按相关度降序的 (Document, 相似度) 列表
+            k: 返回条数
+            use_llm: 是否调用 LLM 精排
+        """
+        results = await asyncio.to_thread(
+            local_rerank, query, ranked_lists, k,
+            lambda item: item[0].page_content, lambda item: item[0].metadata.get("timestamp"),
+        )
+        docs = [doc for doc, _ in results]
+        if use_llm and len(docs) > 1:
+            head = docs[:SEMANTIC_LLM_RERANK_TOP_N]
+            reranked = await self._llm_rerank(query, head, len(head))
+            if reranked:
+                docs = reranked + [doc for doc in head if doc not in reranked] + docs[len(head):]
+        return docs
+
+    async def _llm_rerank(self, query, results: list, k) -> list:
+        # 使用LLM重新排序结果，失败时返回空列表
         results_text = "\n\n".join([
             f"记忆片段 {i + 1}:\n{doc.page_content}"
             for i, doc in enumerate(results)
@@ -85,10 +120,10 @@ class SemanticMemory:
                 continue
 
             try:
-                # 解析排序后的文档编号
+                # 解析排序后的文档编号（提示词中的编号从 1 开始）
                 reranked_indices = json.loads(response.content)
                 # 按新顺序排序结果
-                reranked_results = [results[idx] for idx in reranked_indices[:k] if 0 <= idx < len(results)]
+                reranked_results = [results[idx - 1] for idx in reranked_indices[:k] if 1 <= idx <= len(results)]
                 return reranked_results
             except Exception as e:
                 retries += 1
@@ -102,13 +137,12 @@ class SemanticMemoryOriginal:
     def __init__(self, persist_directory, lanlan_name, name_mapping):
         config_manager = get_config_manager()
         api_config = config_manager.get_model_api_config('summary')
-        self.embeddings = OpenAIEmbeddings(base_url=api_config['base_url'], model=SEMANTIC_MODEL, api_key=api_config['api_key'])
-        # self.vectorstore = Chroma(
-        #     collection_name="Origin",
-        #     persist_directory=persist_directory[lanlan_name],
-        #     embedding_function=self.embeddings
-        # )
-        self.vectorstore = None
+        self.embeddings = get_embedding_service(api_config['base_url'], api_config['api_key'], SEMANTIC_MODEL)
+        self.vectorstore = LocalVectorStore(
+            collection_name="Origin",
+            persist_directory=persist_directory[lanlan_name],
+            embedding_function=self.embeddings
+        )
         self.lanlan_name = lanlan_name
         self.name_mapping = name_mapping
 
@@ -150,6 +184,9 @@ class SemanticMemoryOriginal:
         # 在原始对话上进行精确语义搜索
         return self.vectorstore.similarity_search(query, k=k)
 
+    def retrieve_with_score(self, query, k=10):
+        return self.vectorstore.similarity_search_with_score(query, k=k)
+
 
 class SemanticMemoryCompressed:
     def __init__(self, persist_directory, lanlan_name, recent_history_manager: CompressedRecentHistoryManager, name_mapping):
@@ -157,13 +194,12 @@ class SemanticMemoryCompressed:
         self.name_mapping = name_mapping
         config_manager = get_config_manager()
         api_config = config_manager.get_model_api_config('summary')
-        self.embeddings = OpenAIEmbeddings(base_url=api_config['base_url'], model=SEMANTIC_MODEL, api_key=api_config['api_key'])
-        self.vectorstore = None
-        # self.vectorstore = Chroma(
-        #     collection_name="Compressed",
-        #     persist_directory=persist_directory[lanlan_name],
-        #     embedding_function=self.embeddings
-        # )
+        self.embeddings = get_embedding_service(api_config['base_url'], api_config['api_key'], SEMANTIC_MODEL)
+        self.vectorstore = LocalVectorStore(
+            collection_name="Compressed",
+            persist_directory=persist_directory[lanlan_name],
+            embedding_function=self.embeddings
+        )
         self.recent_history_manager = recent_history_manager
 
     async def store_compressed_summary(self, event_id, messages):
@@ -171,7 +207,8 @@ class SemanticMemoryCompressed:
         _, summary = await self.recent_history_manager.compress_history(messages, self.lanlan_name)
         if not summary:
             return
-        self.vectorstore.add_texts(
+        await asyncio.to_thread(
+            self.vectorstore.add_texts,
             texts=[summary],
             metadatas=[{
                 "event_id": event_id,
@@ -188,4 +225,7 @@ class SemanticMemoryCompressed:
 
     def retrieve_by_query(self, query, k=10):
         # 在压缩摘要上进行语义搜索
-        return self.vectorstore.similarity_search(query, k=k)
\ No newline at end of file
+        return self.vectorstore.similarity_search(query, k=k)
+
+    def retrieve_with_score(self, query, k=10):
+        return self.vectorstore.similarity_search_with_score(query, k=k)
\ No newline at end of file
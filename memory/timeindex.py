@@ -1,155 +1,304 @@
-from langchain_community.chat_message_histories import SQLChatMessageHistory
-from langchain_core.messages import SystemMessage
-from sqlalchemy import create_engine, text
+from langchain_core.messages import SystemMessage, message_to_dict
 from config import TIME_ORIGINAL_TABLE_NAME, TIME_COMPRESSED_TABLE_NAME
 from utils.config_manager import get_config_manager
 from datetime import datetime
+import json
 import logging
 import os
+import re
+import sqlite3
+import threading
 
 logger = logging.getLogger(__name__)
 
+# 分页/流式查询的默认每页条数
+TIME_INDEX_PAGE_SIZE = 500
+# 数据库被其他连接锁住时的等待时间（毫秒）
+TIME_INDEX_BUSY_TIMEOUT_MS = 5000
+# 关键词检索时参与查询的最多词项数
+LEXICAL_MAX_QUERY_TERMS = 32
+
+# 中日韩文字按二元组切分，其余按字母数字连续串切分
+_CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN_PATTERN = re.compile(f'([{_CJK_CHARS}]+)|([^\\W_{_CJK_CHARS}]+)')
+
+
+def lexical_terms(text):
+    """
+    把文本切成检索词项：中日韩文字连续段切成重叠二元组（单字段保留单字），其余按字母数字串小写化。
+    写入索引与查询使用同一切分规则，不依赖分词库。
+    """
+    terms = []
+    for cjk, word in _TOKEN_PATTERN.findall(text or ""):
+        if cjk:
+            if len(cjk) == 1:
+                terms.append(cjk)
+            else:
+                terms.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            terms.append(word.lower())
+    return terms
+
+
+def message_json_text(message_json):
+    """从 message_to_dict 序列化后的 JSON 中取出文本内容"""
+    try:
+        content = json.loads(message_json)["data"]["content"]
+    except Exception:
+        return ""
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def _format_timestamp(value):
+    """与旧版（SQLAlchemy + sqlite3 默认适配器）写入的格式保持一致：YYYY-MM-DD HH:MM:SS[.ffffff]"""
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return str(value)
+
+
+class TimeIndexStore:
+    """
+    单个角色的时间索引数据库（线程安全）
+    表结构与旧版 SQLChatMessageHistory 兼容（id, session_id, message, timestamp），
+    在此基础上开启 WAL，并为 timestamp、session_id 建索引；连接在进程内复用。
+    若 SQLite 支持 FTS5，每张表另有一张无内容的倒排索引表 {table}_fts（rowid 与原表 id 对应），
+    写入消息时在同一事务中更新，用于 BM25 关键词检索。
+
+    Args:
+        db_path: SQLite 数据库文件路径
+    """
+
+    TABLES = (TIME_ORIGINAL_TABLE_NAME, TIME_COMPRESSED_TABLE_NAME)
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=TIME_INDEX_BUSY_TIMEOUT_MS / 1000)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={TIME_INDEX_BUSY_TIMEOUT_MS}")
+        self.lexical_enabled = False
+        self._ensure_schema()
+        self._ensure_lexical_index()
+
+    def _ensure_schema(self):
+        with self._lock, self._conn:
+            for table in self.TABLES:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    f"(id INTEGER PRIMARY KEY, session_id TEXT, message TEXT, timestamp DATETIME)"
+                )
+                columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+                if 'timestamp' not in columns:
+                    # 早期版本的表没有 timestamp 列
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN timestamp DATETIME")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp)")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_session_id ON {table}(session_id)")
+
+    def _ensure_lexical_index(self):
+        """创建关键词倒排索引；首次创建时为已有消息补建索引。SQLite 不支持 FTS5 时只关闭关键词检索"""
+        try:
+            with self._lock, self._conn:
+                for table in self.TABLES:
+                    exists = self._conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (f"{table}_fts",)
+                    ).fetchone()
+                    if exists:
+                        continue
+                    self._conn.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5(terms, content='')")
+                    rows = self._conn.execute(f"SELECT id, message FROM {table}").fetchall()
+                    self._conn.executemany(
+                        f"INSERT INTO {table}_fts (rowid, terms) VALUES (?, ?)",
+                        [(row_id, " ".join(lexical_terms(message_json_text(message)))) for row_id, message in rows]
+                    )
+                    if rows:
+                        logger.info(f"📚 已为 {self.db_path} 的 {table} 补建关键词索引（{len(rows)} 条）")
+            self.lexical_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ 当前 SQLite 不支持 FTS5，关键词检索不可用: {e}")
+
+    def add_messages(self, table, session_id, messages, timestamp):
+        """在一个事务里批量插入消息，时间戳随插入一并写入，关键词索引同步更新"""
+        ts = _format_timestamp(timestamp)
+        rows = [(session_id, json.dumps(message_to_dict(message)), ts) for message in messages]
+        with self._lock, self._conn:
+            if not self.lexical_enabled:
+                self._conn.executemany(
+                    f"INSERT INTO {table} (session_id, message, timestamp) VALUES (?, ?, ?)", rows
+                )
+                return
+            for row in rows:
+                row_id = self._conn.execute(
+                    f"INSERT INTO {table} (session_id, message, timestamp) VALUES (?, ?, ?)", row
+                ).lastrowid
+                self._conn.execute(
+                    f"INSERT INTO {table}_fts (rowid, terms) VALUES (?, ?)",
+                    (row_id, " ".join(lexical_terms(message_json_text(row[1]))))
+                )
+
+    def search_terms(self, table, terms, start_time=None, end_time=None, limit=20):
+        """
+        BM25 关键词检索，可限定时间范围。
+        返回按相关度排序的 (id, session_id, message, timestamp, score)，score 越大越相关。
+        """
+        if not self.lexical_enabled:
+            return []
+        terms = list(dict.fromkeys(term.replace('"', '') for term in terms if term.strip('"')))[:LEXICAL_MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        sql = (f"SELECT t.id, t.session_id, t.message, t.timestamp, -bm25({table}_fts) AS score "
+               f"FROM {table}_fts JOIN {table} AS t ON t.id = {table}_fts.rowid "
+               f"WHERE {table}_fts MATCH ?")
+        params = [" OR ".join(f'"{term}"' for term in terms)]
+        if start_time is not None:
+            sql += " AND t.timestamp >= ?"
+            params.append(_format_timestamp(start_time))
+        if end_time is not None:
+            sql += " AND t.timestamp <= ?"
+            params.append(_format_timestamp(end_time))
+        sql += " ORDER BY bm25({table}_fts) LIMIT ?".format(table=table)
+        params.append(limit)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def fetch_latest(self, table, start_time, end_time, limit=20):
+        """按时间倒序返回 [start_time, end_time] 内最新的 (id, session_id, message, timestamp)"""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT id, session_id, message, timestamp FROM {table} "
+                f"WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (_format_timestamp(start_time), _format_timestamp(end_time), limit)
+            ).fetchall()
+
+    def fetch_range(self, table, start_time, end_time, limit=None, offset=0):
+        """按时间顺序返回 [start_time, end_time] 内的 (session_id, message)，可分页"""
+        sql = (f"SELECT session_id, message FROM {table} "
+               f"WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp, id")
+        params = [_format_timestamp(start_time), _format_timestamp(end_time)]
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def iter_range(self, table, start_time, end_time, page_size=TIME_INDEX_PAGE_SIZE):
+        """
+        按时间顺序逐页读取 [start_time, end_time] 内的 (session_id, message)。
+        使用 (timestamp, id) 作为游标翻页，每页都走索引，不随已读行数变慢；页与页之间不持有锁。
+        """
+        start = _format_timestamp(start_time)
+        end = _format_timestamp(end_time)
+        cursor_ts, cursor_id = None, None
+        while True:
+            with self._lock:
+                if cursor_ts is None:
+                    rows = self._conn.execute(
+                        f"SELECT id, timestamp, session_id, message FROM {table} "
+                        f"WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp, id LIMIT ?",
+                        (start, end, page_size)
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        f"SELECT id, timestamp, session_id, message FROM {table} "
+                        f"WHERE timestamp BETWEEN ? AND ? AND (timestamp > ? OR (timestamp = ? AND id > ?)) "
+                        f"ORDER BY timestamp, id LIMIT ?",
+                        (start, end, cursor_ts, cursor_ts, cursor_id, page_size)
+                    ).fetchall()
+            for row_id, ts, session_id, message in rows:
+                yield session_id, message
+            if len(rows) < page_size:
+                return
+            cursor_id, cursor_ts = rows[-1][0], rows[-1][1]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
 class TimeIndexedMemory:
     def __init__(self, recent_history_manager):
-        self.engine = {}
+        self.stores = {}
         self.recent_history_manager = recent_history_manager
         _, _, _, _, _, _, _, time_store, _, _ = get_config_manager().get_character_data()
         for i in time_store:
-            self.engine[i] = create_engine(f"sqlite:///{time_store[i]}")
-
-            _ = SQLChatMessageHistory(
-                connection=self.engine[i],
-                session_id="",
-                table_name=TIME_ORIGINAL_TABLE_NAME,
-            )
-
-            _ = SQLChatMessageHistory(
-                connection=self.engine[i],
-                session_id="",
-                table_name=TIME_COMPRESSED_TABLE_NAME,
-            )
-            self.check_table_schema(i)
-
-    def add_timestamp_column(self, lanlan_name):
-        with self.engine[lanlan_name].connect() as conn:
-            conn.execute(text(f"ALTER TABLE {TIME_ORIGINAL_TABLE_NAME} ADD COLUMN timestamp DATETIME"))
-            conn.execute(text(f"ALTER TABLE {TIME_COMPRESSED_TABLE_NAME} ADD COLUMN timestamp DATETIME"))
-            conn.commit()
-
-    def check_table_schema(self, lanlan_name):
-        with self.engine[lanlan_name].connect() as conn:
-            result = conn.execute(text(f"PRAGMA table_info({TIME_ORIGINAL_TABLE_NAME})"))
-            columns = result.fetchall()
-            for i in columns:
-                if i[1] == 'timestamp':
-                    return
-            self.add_timestamp_column(lanlan_name)
+            try:
+                self.stores[i] = TimeIndexStore(time_store[i])
+            except Exception as e:
+                logger.error(f"[TimeIndexedMemory] 打开角色 {i} 的时间索引数据库失败: {e}")
 
-    async def store_conversation(self, event_id, messages, lanlan_name, timestamp=None):
-        # 检查角色是否存在于配置中，如果不存在则创建默认路径
+    def _get_store(self, lanlan_name):
+        """获取角色的数据库；角色不在配置中（例如新建角色）时使用默认路径创建"""
+        store = self.stores.get(lanlan_name)
+        if store is not None:
+            return store
         try:
-            _, _, _, _, _, _, _, time_store, _, _ = get_config_manager().get_character_data()
-            
-            # 如果角色不在配置中，使用默认路径创建
-            if lanlan_name not in time_store:
-                config_mgr = get_config_manager()
-                # 确保memory目录存在
-                config_mgr.ensure_memory_directory()
-                memory_base = str(config_mgr.memory_dir)
-                default_path = os.path.join(memory_base, f'time_indexed_{lanlan_name}')
-                time_store[lanlan_name] = default_path
-                logger.info(f"[TimeIndexedMemory] 角色 '{lanlan_name}' 不在配置中，使用默认路径: {default_path}")
-            
-            # 确保数据库引擎存在
-            if lanlan_name not in self.engine:
-                # 创建数据库引擎和表
-                db_path = time_store[lanlan_name]
-                self.engine[lanlan_name] = create_engine(f"sqlite:///{db_path}")
-                _ = SQLChatMessageHistory(
-                    connection=self.engine[lanlan_name],
-                    session_id="",
-                    table_name=TIME_ORIGINAL_TABLE_NAME,
-                )
-                _ = SQLChatMessageHistory(
-                    connection=self.engine[lanlan_name],
-                    session_id="",
-                    table_name=TIME_COMPRESSED_TABLE_NAME,
-                )
-                self.check_table_schema(lanlan_name)
-                logger.info(f"[TimeIndexedMemory] 为角色 {lanlan_name} 创建数据库引擎: {db_path}")
+            _, _, _, _, _, _, _, time_store, _, _ = get_config_manager().get_character_snapshot().data
+            db_path = time_store.get(lanlan_name)
         except Exception as e:
             logger.error(f"检查角色配置失败: {e}")
-            # 即使配置检查失败，也尝试使用默认路径
+            db_path = None
+        try:
+            config_mgr = get_config_manager()
+            # 确保memory目录存在
+            config_mgr.ensure_memory_directory()
+            if db_path is None:
+                db_path = os.path.join(str(config_mgr.memory_dir), f'time_indexed_{lanlan_name}')
+                logger.info(f"[TimeIndexedMemory] 角色 '{lanlan_name}' 不在配置中，使用默认路径: {db_path}")
+            store = self.stores[lanlan_name] = TimeIndexStore(db_path)
+            logger.info(f"[TimeIndexedMemory] 为角色 {lanlan_name} 创建数据库: {db_path}")
+            return store
+        except Exception as e:
+            logger.error(f"创建默认数据库失败: {e}")
+            return None
+
+    def close(self):
+        """关闭所有角色的数据库连接（重新加载记忆组件后释放旧实例）"""
+        stores, self.stores = self.stores, {}
+        for lanlan_name, store in stores.items():
             try:
-                config_mgr = get_config_manager()
-                # 确保memory目录存在
-                config_mgr.ensure_memory_directory()
-                memory_base = str(config_mgr.memory_dir)
-                default_path = os.path.join(memory_base, f'time_indexed_{lanlan_name}')
-                if lanlan_name not in self.engine:
-                    self.engine[lanlan_name] = create_engine(f"sqlite:///{default_path}")
-                    _ = SQLChatMessageHistory(
-                        connection=self.engine[lanlan_name],
-                        session_id="",
-                        table_name=TIME_ORIGINAL_TABLE_NAME,
-                    )
-                    _ = SQLChatMessageHistory(
-                        connection=self.engine[lanlan_name],
-                        session_id="",
-                        table_name=TIME_COMPRESSED_TABLE_NAME,
-                    )
-                    self.check_table_schema(lanlan_name)
-                    logger.info(f"[TimeIndexedMemory] 使用默认路径创建数据库: {default_path}")
-            except Exception as e2:
-                logger.error(f"创建默认数据库失败: {e2}")
-                return
-        
+                store.close()
+            except Exception as e:
+                logger.warning(f"[TimeIndexedMemory] 关闭角色 {lanlan_name} 的时间索引数据库失败: {e}")
+
+    async def store_conversation(self, event_id, messages, lanlan_name, timestamp=None):
+        store = self._get_store(lanlan_name)
+        if store is None:
+            logger.error(f"角色 '{lanlan_name}' 的数据库不存在")
+            return
+
         if timestamp is None:
             timestamp = datetime.now()
 
-        if lanlan_name not in self.engine:
-            logger.error(f"角色 '{lanlan_name}' 的数据库引擎不存在")
-            return
+        # 原始消息先落库，摘要需要调用 LLM，完成后再单独写入
+        store.add_messages(TIME_ORIGINAL_TABLE_NAME, event_id, messages, timestamp)
+        summary = (await self.recent_history_manager.compress_history(messages, lanlan_name))[1]
+        store.add_messages(TIME_COMPRESSED_TABLE_NAME, event_id, [SystemMessage(summary)], timestamp)
 
-        origin_history = SQLChatMessageHistory(
-            connection=self.engine[lanlan_name],
-            session_id=event_id,
-            table_name=TIME_ORIGINAL_TABLE_NAME,
-        )
-
-        compressed_history = SQLChatMessageHistory(
-            connection=self.engine[lanlan_name],
-            session_id=event_id,
-            table_name=TIME_COMPRESSED_TABLE_NAME,
-        )
-
-        origin_history.add_messages(messages)
-        compressed_history.add_message(SystemMessage((await self.recent_history_manager.compress_history(messages, lanlan_name))[1]))
-
-        with self.engine[lanlan_name].connect() as conn:
-            conn.execute(
-                text(f"UPDATE {TIME_ORIGINAL_TABLE_NAME} SET timestamp = :timestamp WHERE session_id = :session_id"),
-                {"timestamp": timestamp, "session_id": event_id}
-            )
-            conn.execute(
-                text(f"UPDATE {TIME_COMPRESSED_TABLE_NAME} SET timestamp = :timestamp WHERE session_id = :session_id"),
-                {"timestamp": timestamp, "session_id": event_id}
-            )
-            conn.commit()
-
-    def retrieve_summary_by_timeframe(self, lanlan_name, start_time, end_time):
-        with self.engine[lanlan_name].connect() as conn:
-            result = conn.execute(
-                text(f"SELECT session_id, message FROM {TIME_COMPRESSED_TABLE_NAME} WHERE timestamp BETWEEN :start_time AND :end_time"),
-                {"start_time": start_time, "end_time": end_time}
-            )
-            return result.fetchall()
-
-    def retrieve_original_by_timeframe(self, lanlan_name, start_time, end_time):
+    def retrieve_summary_by_timeframe(self, lanlan_name, start_time, end_time, limit=None, offset=0):
+        return self._get_store(lanlan_name).fetch_range(TIME_COMPRESSED_TABLE_NAME, start_time, end_time, limit, offset)
+
+    def retrieve_original_by_timeframe(self, lanlan_name, start_time, end_time, limit=None, offset=0):
         # 查询指定时间范围内的对话
-        with self.engine[lanlan_name].connect() as conn:
-            result = conn.execute(
-                text(f"SELECT session_id, message FROM {TIME_ORIGINAL_TABLE_NAME} WHERE timestamp BETWEEN :start_time AND :end_time"),
-                {"start_time": start_time, "end_time": end_time}
-            )
-            return result.fetchall()
\ No newline at end of file
+        return self._get_store(lanlan_name).fetch_range(TIME_ORIGINAL_TABLE_NAME, start_time, end_time, limit, offset)
+
+    def iter_summary_by_timeframe(self, lanlan_name, start_time, end_time, page_size=TIME_INDEX_PAGE_SIZE):
+        """流式读取时间范围内的摘要，适合跨度很大的查询"""
+        return self._get_store(lanlan_name).iter_range(TIME_COMPRESSED_TABLE_NAME, start_time, end_time, page_size)
+
+    def latest_summary_by_timeframe(self, lanlan_name, start_time, end_time, limit=20):
+        """时间范围内最新的若干条摘要（时间倒序）"""
+        return self._get_store(lanlan_name).fetch_latest(TIME_COMPRESSED_TABLE_NAME, start_time, end_time, limit)
+
+    def search_summary(self, lanlan_name, terms, start_time=None, end_time=None, limit=20):
+        """在摘要中做关键词检索"""
+        return self._get_store(lanlan_name).search_terms(TIME_COMPRESSED_TABLE_NAME, terms, start_time, end_time, limit)
+
+    def search_original(self, lanlan_name, terms, start_time=None, end_time=None, limit=20):
+        """在原始对话中做关键词检索"""
+        return self._get_store(lanlan_name).search_terms(TIME_ORIGINAL_TABLE_NAME, terms, start_time, end_time, limit)
+
+    def iter_original_by_timeframe(self, lanlan_name, start_time, end_time, page_size=TIME_INDEX_PAGE_SIZE):
+        """流式读取时间范围内的原始对话"""
+        return self._get_store(lanlan_name).iter_range(TIME_ORIGINAL_TABLE_NAME, start_time, end_time, page_size)
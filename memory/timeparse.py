@@ -0,0 +1,352 @@
+"""
+基于规则的时间表达式解析
+把查询中常见的中文 / 英文 / 日文相对与绝对时间说法（“昨天”、“上周三晚上”、“3天前”、“3 hours ago”、“last week”、
+“先月”、“2024年5月1日”等）解析成 [start, end) 时间区间，规则匹配不上时才需要让 LLM 兜底。
+"""
+import re
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+
+class TimeRange(NamedTuple):
+    start: datetime
+    end: datetime
+    matched: str  # 查询中被识别为时间表达式的原文
+
+
+_CN_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '俩': 2, '三': 3, '四': 4, '五': 5,
+              '六': 6, '七': 7, '八': 8, '九': 9, '十': 10, '几': 3, '数': 3}
+_EN_NUMBERS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+               'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'few': 3, 'several': 3, 'couple of': 2}
+_WEEKDAYS = {
+    '一': 0, '二': 1, '三': 2, '四': 3, '五': 4, '六': 5, '日': 6, '天': 6,
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    '月': 0, '火': 1, '水': 2, '木': 3, '金': 4, '土': 5,
+}
+_EN_MONTHS = {name: i + 1 for i, name in enumerate(
+    ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+     'august', 'september', 'october', 'november', 'december'])}
+_EN_MONTHS.update({name[:3]: num for name, num in list(_EN_MONTHS.items())})
+_EN_MONTHS['sept'] = 9
+
+# 一天之内的时段（起止小时，end 可以为 24 以上表示次日凌晨）
+_DAY_PARTS = {
+    '凌晨': (0, 6), '早上': (5, 12), '早晨': (5, 12), '清晨': (5, 9), '上午': (6, 12), '中午': (11, 14),
+    '下午': (12, 18), '傍晚': (17, 20), '晚上': (18, 24), '夜里': (20, 30), '半夜': (23, 29), '深夜': (22, 29),
+    'morning': (5, 12), 'afternoon': (12, 18), 'evening': (17, 24), 'night': (18, 30), 'tonight': (18, 30),
+    '昨晚': (18, 30), '今晚': (18, 30), '昨夜': (18, 30),
+    '朝': (5, 12), '午前': (0, 12), '午後': (12, 24), '昼': (11, 14), '夕方': (16, 19), '夜': (18, 30),
+}
+
+
+def _number(token: str) -> Optional[int]:
+    """解析阿拉伯数字、中文数字（一百以内）和英文数词"""
+    if not token:
+        return None
+    token = token.strip().lower()
+    if token.isdigit():
+        return int(token)
+    if token in _EN_NUMBERS:
+        return _EN_NUMBERS[token]
+    if all(ch in _CN_DIGITS for ch in token):
+        if '十' in token:
+            tens, _, ones = token.partition('十')
+            return (_CN_DIGITS[tens] if tens else 1) * 10 + (_CN_DIGITS[ones] if ones else 0)
+        value = 0
+        for ch in token:
+            value = value * 10 + _CN_DIGITS[ch]
+        return value
+    return None
+
+
+def _day(now: datetime, offset_days: int = 0) -> datetime:
+    return (now + timedelta(days=offset_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _week_start(now: datetime, offset_weeks: int = 0) -> datetime:
+    return _day(now, -now.weekday()) + timedelta(weeks=offset_weeks)
+
+
+def _month_start(year: int, month: int) -> datetime:
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return datetime(year, month, 1)
+
+
+def _month_range(now: datetime, offset_months: int = 0):
+    start = _month_start(now.year, now.month + offset_months)
+    return start, _month_start(start.year, start.month + 1)
+
+
+def _last_weekday(now: datetime, weekday: int, weeks_back: int = 0) -> datetime:
+    """weeks_back=0：本周的星期 X（若还没到则取上周）；weeks_back>=1：往前数若干周的星期 X"""
+    if weeks_back:
+        return _week_start(now, -weeks_back) + timedelta(days=weekday)
+    day = _week_start(now) + timedelta(days=weekday)
+    if day > _day(now):
+        day -= timedelta(weeks=1)
+    return day
+
+
+_NUM = r'(\d+|[零〇一二两俩三四五六七八九十几数]+)'
+_EN_NUM = r'(\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten|few|several|couple of)'
+
+# (正则, 处理函数)：处理函数接收 (match, now)，返回 (start, end) 或 None
+_RULES = []
+
+
+def _rule(pattern, flags=re.IGNORECASE):
+    def decorator(func):
+        _RULES.append((re.compile(pattern, flags), func))
+        return func
+    return decorator
+
+
+# ---------- 绝对日期 ----------
+
+@_rule(r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*[日号號]?')
+def _absolute_date(m, now):
+    start = datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    return start, start + timedelta(days=1)
+
+
+@_rule(r'(\d{4})\s*年\s*(\d{1,2})\s*月(?!\s*\d)')
+def _absolute_month(m, now):
+    start = _month_start(int(m.group(1)), int(m.group(2)))
+    return start, _month_start(start.year, start.month + 1)
+
+
+@_rule(r'(?<!\d)(\d{1,2}|[一二三四五六七八九十]{1,3})\s*月\s*(\d{1,2}|[一二三四五六七八九十]{1,3})\s*[日号號]')
+def _month_day(m, now):
+    month, day = _number(m.group(1)), _number(m.group(2))
+    start = datetime(now.year, month, day)
+    if start > now:
+        start = start.replace(year=now.year - 1)
+    return start, start + timedelta(days=1)
+
+
+@_rule(r'\b(' + '|'.join(sorted(_EN_MONTHS, key=len, reverse=True)) + r')\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s*(\d{4}))?\b')
+def _en_month_day(m, now):
+    year = int(m.group(3)) if m.group(3) else now.year
+    start = datetime(year, _EN_MONTHS[m.group(1).lower()], int(m.group(2)))
+    if not m.group(3) and start > now:
+        start = start.replace(year=year - 1)
+    return start, start + timedelta(days=1)
+
+
+@_rule(r'\bin\s+(' + '|'.join(sorted(_EN_MONTHS, key=len, reverse=True)) + r')\b(?:\s+(\d{4}))?')
+def _en_month(m, now):
+    year = int(m.group(2)) if m.group(2) else now.year
+    start = _month_start(year, _EN_MONTHS[m.group(1).lower()])
+    if not m.group(2) and start > now:
+        start = _month_start(year - 1, start.month)
+    return start, _month_start(start.year, start.month + 1)
+
+
+# ---------- N 分钟/小时/天/周/月/年 前，最近 N 天 ----------
+
+_CN_HOUR_UNITS = ('小时', '小時', '钟头', '鐘頭', '時間')
+_CN_MINUTE_UNITS = ('分钟', '分鐘', '分')
+
+
+def _hours_ago(now: datetime, hours: float):
+    """“N 小时前”：以该时刻为中心前后各留一小时（不超过当前时间）"""
+    center = now - timedelta(hours=hours)
+    return center - timedelta(hours=1), min(now, center + timedelta(hours=1))
+
+
+def _minutes_ago(now: datetime, minutes: int):
+    """“N 分钟前”：从该时刻再往前多留一倍的余量（至少 10 分钟）直到现在"""
+    return now - timedelta(minutes=minutes + max(minutes, 10)), now
+
+
+@_rule(_NUM + r'\s*(?:个|個)?\s*(小时|小時|钟头|鐘頭|時間|分钟|分鐘|分|天|日|星期|周|週間|週|礼拜|禮拜|个月|個月|ヶ月|か月|カ月|月|年)\s*(?:之|以)?(?:前|以前)')
+def _units_ago(m, now):
+    n = _number(m.group(1))
+    unit = m.group(2)
+    if n is None:
+        return None
+    if unit in _CN_HOUR_UNITS:
+        return _hours_ago(now, n)
+    if unit in _CN_MINUTE_UNITS:
+        return _minutes_ago(now, n)
+    if unit in ('天', '日'):
+        start = _day(now, -n)
+        return start, start + timedelta(days=1)
+    if unit in ('星期', '周', '週間', '週', '礼拜', '禮拜'):
+        start = _week_start(now, -n)
+        return start, start + timedelta(weeks=1)
+    if unit == '年':
+        return datetime(now.year - n, 1, 1), datetime(now.year - n + 1, 1, 1)
+    return _month_range(now, -n)
+
+
+@_rule(r'(?:最近|过去|過去|近|这|這|前|ここ)\s*' + _NUM + r'\s*(?:个|個)?\s*(小时|小時|钟头|鐘頭|時間|分钟|分鐘|天|日|星期|周|週間|週|礼拜|个月|個月|ヶ月|か月|月|年)(?:间|間|里|裏|以来|来)?')
+def _last_n_units(m, now):
+    n = _number(m.group(1))
+    if n is None:
+        return None
+    unit = m.group(2)
+    if unit in _CN_HOUR_UNITS:
+        return now - timedelta(hours=n), now
+    if unit in _CN_MINUTE_UNITS:
+        return now - timedelta(minutes=n), now
+    days = {'天': 1, '日': 1, '星期': 7, '周': 7, '週間': 7, '週': 7, '礼拜': 7, '年': 365}.get(unit, 30)
+    return _day(now, -(n * days - 1)), now
+
+
+@_rule(r'\b' + _EN_NUM + r'\s+(minute|min|hour|hr|day|week|month|year)s?\s+ago\b')
+def _en_units_ago(m, now):
+    n = _number(m.group(1))
+    unit = m.group(2).lower()
+    if unit in ('hour', 'hr'):
+        return _hours_ago(now, n)
+    if unit in ('minute', 'min'):
+        return _minutes_ago(now, n)
+    if unit == 'day':
+        start = _day(now, -n)
+        return start, start + timedelta(days=1)
+    if unit == 'week':
+        start = _week_start(now, -n)
+        return start, start + timedelta(weeks=1)
+    if unit == 'year':
+        return datetime(now.year - n, 1, 1), datetime(now.year - n + 1, 1, 1)
+    return _month_range(now, -n)
+
+
+@_rule(r'\b(?:in\s+)?(?:the\s+)?(?:past|last)\s+' + _EN_NUM + r'\s+(minute|min|hour|hr|day|week|month|year)s?\b')
+def _en_last_n_units(m, now):
+    n = _number(m.group(1))
+    unit = m.group(2).lower()
+    if unit in ('hour', 'hr'):
+        return now - timedelta(hours=n), now
+    if unit in ('minute', 'min'):
+        return now - timedelta(minutes=n), now
+    days = {'day': 1, 'week': 7, 'month': 30, 'year': 365}[unit]
+    return _day(now, -(n * days - 1)), now
+
+
+# ---------- 星期几 ----------
+
+@_rule(r'(上上|上|这|這|本)?\s*(?:个|個)?\s*(?:星期|周|礼拜|禮拜)([一二三四五六日天])')
+def _cn_weekday(m, now):
+    prefix = m.group(1) or ''
+    weekday = _WEEKDAYS[m.group(2)]
+    if prefix in ('上上',):
+        return _one_day(_last_weekday(now, weekday, 2))
+    if prefix == '上':
+        return _one_day(_last_weekday(now, weekday, 1))
+    if prefix in ('这', '這', '本'):
+        return _one_day(_week_start(now) + timedelta(days=weekday))
+    return _one_day(_last_weekday(now, weekday))
+
+
+@_rule(r'(先々週|先週|今週)?\s*の?\s*([月火水木金土日])曜日?')
+def _ja_weekday(m, now):
+    weekday = _WEEKDAYS[m.group(2)]
+    weeks_back = {'先々週': 2, '先週': 1}.get(m.group(1) or '', 0)
+    if m.group(1) == '今週':
+        return _one_day(_week_start(now) + timedelta(days=weekday))
+    return _one_day(_last_weekday(now, weekday, weeks_back))
+
+
+@_rule(r'\b(last|this|on)?\s*(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b')
+def _en_weekday(m, now):
+    weekday = _WEEKDAYS[m.group(2).lower()]
+    prefix = (m.group(1) or '').lower()
+    if prefix == 'last':
+        return _one_day(_last_weekday(now, weekday, 1))
+    if prefix == 'this':
+        return _one_day(_week_start(now) + timedelta(days=weekday))
+    return _one_day(_last_weekday(now, weekday))
+
+
+def _one_day(start: datetime):
+    return start, start + timedelta(days=1)
+
+
+# ---------- 固定说法 ----------
+
+_FIXED = [
+    # (正则, 处理函数)
+    (r'大前天', lambda now: _one_day(_day(now, -3))),
+    (r'前天|一昨日|おととい|day before yesterday', lambda now: _one_day(_day(now, -2))),
+    (r'昨天|昨日|昨晚|昨夜|きのう|yesterday|last night', lambda now: _one_day(_day(now, -1))),
+    (r'今天|今日|今晚|今朝|きょう|today|tonight|this morning|this afternoon|this evening|earlier today',
+     lambda now: _one_day(_day(now))),
+    (r'刚才|刚刚|剛才|剛剛|方才|さっき|先ほど|just now|a moment ago|a while ago',
+     lambda now: (now - timedelta(hours=2), now)),
+    (r'半(?:个|個)?(?:小时|小時|钟头|鐘頭)(?:之|以)?前|半時間前|half an hour ago',
+     lambda now: _minutes_ago(now, 30)),
+    (r'上上(?:个|個)?(?:星期|周|礼拜|禮拜)|先々週|the week before last',
+     lambda now: (_week_start(now, -2), _week_start(now, -1))),
+    (r'上(?:个|個)?(?:星期|周|礼拜|禮拜)|先週|last week', lambda now: (_week_start(now, -1), _week_start(now))),
+    (r'(?:这|這|本)(?:个|個)?(?:星期|周|礼拜|禮拜)|今週|this week', lambda now: (_week_start(now), now)),
+    (r'上上(?:个|個)月|先々月', lambda now: _month_range(now, -2)),
+    (r'上(?:个|個)?月|先月|last month', lambda now: _month_range(now, -1)),
+    (r'(?:这|這|本)(?:个|個)?月|今月|this month', lambda now: (_month_range(now)[0], now)),
+    (r'前年|一昨年|おととし|the year before last', lambda now: (datetime(now.year - 2, 1, 1), datetime(now.year - 1, 1, 1))),
+    (r'去年|昨年|last year', lambda now: (datetime(now.year - 1, 1, 1), datetime(now.year, 1, 1))),
+    (r'今年|this year', lambda now: (datetime(now.year, 1, 1), now)),
+    (r'最近|近来|近來|这几天|這幾天|这阵子|這陣子|前几天|前幾天|最近の|この前|このあいだ|recently|lately|the other day|these days',
+     lambda now: (_day(now, -6), now)),
+]
+for _pattern, _func in _FIXED:
+    _RULES.append((re.compile(_pattern, re.IGNORECASE), (lambda f: lambda m, now: f(now))(_func)))
+
+_DAY_PART_PATTERN = re.compile('|'.join(sorted((re.escape(k) for k in _DAY_PARTS), key=len, reverse=True)), re.IGNORECASE)
+# 不含具体时间、但明显在问“什么时候”的说法：规则解析失败时才值得交给 LLM
+TIME_HINT_PATTERN = re.compile(
+    r'那天|那次|那时|那時|那会|那會|时候|時候|哪天|几号|幾號|多久|什么时候|什麼時候|以前|之前|当时|當時|'
+    r'いつ|あの日|あの時|頃|ごろ|'
+    r'\bwhen\b|\bago\b|\bsince\b|\bbefore\b|\bduring\b|\bthat day\b|\bback then\b',
+    re.IGNORECASE,
+)
+
+
+def parse_time_range(query: str, now: Optional[datetime] = None) -> Optional[TimeRange]:
+    """
+    解析查询中的时间表达式，返回 TimeRange（start 含、end 不含），无法识别时返回 None。
+    同一查询匹配到多条规则时取最早出现（位置相同则取最长）的那一条；随后若紧跟“晚上”“morning”等时段则进一步收窄。
+    """
+    if not query:
+        return None
+    now = now or datetime.now()
+    best = None
+    for pattern, handler in _RULES:
+        for m in pattern.finditer(query):
+            try:
+                span = handler(m, now)
+            except (ValueError, KeyError, TypeError):
+                continue
+            if span is None:
+                continue
+            key = (m.start(), -(m.end() - m.start()))
+            if best is None or key < best[0]:
+                best = (key, m, span)
+            break
+    if best is None:
+        return None
+    _, m, (start, end) = best
+    matched_start, matched_end = m.start(), m.end()
+
+    # 时段修饰：仅当结果是单独一天时才收窄（如“昨天晚上”“上周三下午”“yesterday morning”）
+    if end - start == timedelta(days=1):
+        part = _DAY_PART_PATTERN.search(query, matched_start, matched_end + 10) or \
+               _DAY_PART_PATTERN.search(query, max(0, matched_start - 12), matched_start)
+        if part:
+            begin_hour, end_hour = _DAY_PARTS.get(part.group(0).lower(), _DAY_PARTS.get(part.group(0)))
+            start, end = start + timedelta(hours=begin_hour), start + timedelta(hours=end_hour)
+            matched_start, matched_end = min(matched_start, part.start()), max(matched_end, part.end())
+
+    if end > now:
+        # 区间不延伸到未来
+        end = max(now, start + timedelta(seconds=1))
+    return TimeRange(start, end, query[matched_start:matched_end])
+
+
+def strip_time_expression(query: str, time_range: Optional[TimeRange]) -> str:
+    """去掉查询中已识别的时间表达式，剩余部分用于关键词检索"""
+    if not time_range or not time_range.matched:
+        return query
+    return query.replace(time_range.matched, ' ', 1)
@@ -0,0 +1,408 @@
+"""
+本地向量存储
+替代 Chroma 的轻量实现：每个集合是一个磁盘上的 float16 矩阵（np.memmap）加一份 JSONL 文档表，
+接口与 langchain VectorStore 的 add_texts / similarity_search 保持一致。
+数据量小时直接暴力计算余弦相似度；超过 IVF_MIN_VECTORS 后在后台训练倒排索引（IVF），只扫描最相近的若干个簇。
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# 暴力检索时每次转成 float32 参与计算的行数（1536 维约 48MB）
+SEARCH_BLOCK_ROWS = 8192
+# 矩阵文件初始容量（行），之后按倍数扩容
+INITIAL_CAPACITY = 1024
+# 向量数达到该值后启用 IVF 索引
+IVF_MIN_VECTORS = 20000
+# 向量数增长到上次训练时的该倍数后重新训练索引
+IVF_RETRAIN_GROWTH = 2.0
+# k-means 训练轮数与每个簇的采样数
+IVF_TRAIN_ITERATIONS = 8
+IVF_SAMPLES_PER_LIST = 32
+# 检索时探测的簇数：max(IVF_MIN_PROBES, 簇数 / IVF_PROBE_DIVISOR)
+IVF_MIN_PROBES = 8
+IVF_PROBE_DIVISOR = 16
+
+_VECTORS_FILE = "vectors.f16"
+_DOCS_FILE = "docs.jsonl"
+_META_FILE = "index.json"
+_IVF_FILE = "ivf.npz"
+
+
+def _normalize(vectors) -> np.ndarray:
+    """转为 float32 并按行归一化，零向量保持为零"""
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr[None, :]
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return arr / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回分数最高的 k 个下标（按分数降序）"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+class _IVFIndex:
+    """倒排索引：簇中心 + 按簇排列的行号"""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, trained_count: int):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.trained_count = trained_count
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """返回最相近的 nprobe 个簇内的行号（升序，便于顺序读盘）"""
+        probes = _top_k(self.centroids @ query, min(nprobe, self.nlist))
+        parts = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes]
+        ids = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        ids.sort()
+        return ids
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, count: int, seed: int = 0) -> "_IVFIndex":
+        """在前 count 行上训练球面 k-means，并把所有行分配到最近的簇"""
+        nlist = int(min(4096, max(16, np.sqrt(count))))
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, nlist * IVF_SAMPLES_PER_LIST)
+        sample_ids = np.sort(rng.choice(count, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_ids], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = ~np.any(sums, axis=1)
+            # 空簇重新随机选一个样本作为中心
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=offsets[1:])
+        return cls(centroids, order, offsets, count)
+
+    def save(self, path: Path):
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp_path, centroids=self.centroids, order=self.order,
+                 offsets=self.offsets, trained_count=np.int64(self.trained_count))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["_IVFIndex"]:
+        try:
+            with np.load(path) as data:
+                return cls(data["centroids"], data["order"], data["offsets"], int(data["trained_count"]))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ 读取向量索引失败，将重新训练: {e}")
+            return None
+
+
+class LocalVectorStore:
+    """
+    嵌入式本地向量存储（线程安全）
+
+    磁盘布局（persist_directory/collection_name/ 下）：
+        vectors.f16  行归一化后的 float16 向量矩阵，容量按倍数扩容
+        docs.jsonl   每行一条 {"text", "metadata"}，与矩阵行一一对应
+        index.json   维度、已提交条数与文档文件长度；写完向量和文档后最后更新，作为提交点
+        ivf.npz      可选的倒排索引
+
+    Args:
+        collection_name: 集合名（子目录名）
+        persist_directory: 角色的语义记忆目录
+        embedding_function: 提供 embed_documents / embed_query 的嵌入对象
+    """
+
+    def __init__(self, collection_name: str, persist_directory: str, embedding_function):
+        self.collection_name = collection_name
+        self.directory = Path(persist_directory) / collection_name
+        self.embedding_function = embedding_function
+        self._lock = threading.RLock()
+        self._matrix = None  # np.memmap，尚未写入任何数据时为 None
+        self._dim = 0
+        self._count = 0
+        self._capacity = 0
+        self._docs_bytes = 0
+        self._doc_offsets: List[int] = []
+        self._ivf: Optional[_IVFIndex] = None
+        self._training = False
+        self._load()
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        meta_path = self.directory / _META_FILE
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"❌ 读取向量存储 {self.directory} 失败: {e}")
+            return
+        self._dim = int(meta.get("dim", 0))
+        self._count = int(meta.get("count", 0))
+        self._docs_bytes = int(meta.get("docs_bytes", 0))
+        if not self._dim or not self._count:
+            self._count = 0
+            return
+
+        try:
+            self._load_data()
+        except Exception as e:
+            # 文档或向量文件缺失/损坏：与无法读取 index.json 一样按空存储启动，不影响记忆服务启动
+            logger.error(f"❌ 加载向量存储 {self.directory} 的数据文件失败，按空存储启动: {e}")
+            self._matrix = None
+            self._dim = 0
+            self._count = 0
+            self._capacity = 0
+            self._docs_bytes = 0
+            self._doc_offsets = []
+            return
+
+        ivf = _IVFIndex.load(self.directory / _IVF_FILE)
+        if ivf is not None and ivf.trained_count <= self._count and ivf.centroids.shape[1] == self._dim:
+            self._ivf = ivf
+        logger.info(f"📚 已加载向量存储 {self.directory}（{self._count} 条）")
+
+    def _load_data(self):
+        """按提交点读取文档偏移并映射向量矩阵（文件缺失时抛出异常）"""
+        # 只认提交点之前的文档，崩溃时写了一半的尾部会在下次写入时截掉
+        offsets = []
+        position = 0
+        with open(self.directory / _DOCS_FILE, "rb") as f:
+            for line in f:
+                if position >= self._docs_bytes:
+                    break
+                offsets.append(position)
+                position += len(line)
+        if len(offsets) < self._count:
+            logger.warning(f"⚠️ 向量存储 {self.directory} 文档数少于向量数，按文档数截断")
+            self._count = len(offsets)
+            self._docs_bytes = position
+
+        vectors_path = self.directory / _VECTORS_FILE
+        capacity = os.path.getsize(vectors_path) // (self._dim * 2)
+        if capacity < self._count:
+            logger.warning(f"⚠️ 向量存储 {self.directory} 向量文件不完整，按已有向量数截断")
+            self._count = capacity
+            self._docs_bytes = offsets[capacity] if capacity < len(offsets) else position
+        self._doc_offsets = offsets[:self._count]
+        if capacity:
+            self._capacity = capacity
+            self._matrix = np.memmap(vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self._dim))
+
+    def _ensure_capacity(self, rows: int):
+        """保证矩阵文件至少容纳 rows 行（调用方持有锁）"""
+        if rows <= self._capacity:
+            return
+        capacity = max(INITIAL_CAPACITY, self._capacity)
+        while capacity < rows:
+            capacity *= 2
+        vectors_path = self.directory / _VECTORS_FILE
+        if self._matrix is not None:
+            self._matrix.flush()
+            # 先释放映射再扩展文件（Windows 下不能改变已映射文件的大小）
+            self._matrix = None
+        with open(vectors_path, "ab") as f:
+            f.truncate(capacity * self._dim * 2)
+        self._capacity = capacity
+        self._matrix = np.memmap(vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self._dim))
+
+    def _write_meta(self):
+        meta_path = self.directory / _META_FILE
+        tmp_path = meta_path.with_name(meta_path.name + ".tmp")
+        tmp_path.write_text(json.dumps({
+            "dim": self._dim,
+            "count": self._count,
+            "docs_bytes": self._docs_bytes,
+        }), encoding="utf-8")
+        os.replace(tmp_path, meta_path)
+
+    # ---------- 写入 ----------
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs) -> List[str]:
+        """嵌入并追加文本，返回新条目的行号（字符串形式，与 langchain 接口一致）"""
+        texts = list(texts)
+        if not texts:
+            return []
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+        embeddings = self.embedding_function.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas)
+
+    def add_embeddings(self, texts: List[str], embeddings, metadatas: Optional[List[dict]] = None) -> List[str]:
+        """追加已经算好的向量（供批量嵌入服务使用）"""
+        if not texts:
+            return []
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+        vectors = _normalize(embeddings)
+        if len(vectors) != len(texts) or len(metadatas) != len(texts):
+            raise ValueError("texts、embeddings 与 metadatas 的数量不一致")
+
+        with self._lock:
+            if self._dim == 0:
+                self._dim = vectors.shape[1]
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(
+                    f"嵌入维度 {vectors.shape[1]} 与向量存储 {self.directory} 的维度 {self._dim} 不一致，"
+                    f"更换嵌入模型后请删除该目录重建"
+                )
+            self.directory.mkdir(parents=True, exist_ok=True)
+            start = self._count
+            end = start + len(texts)
+            self._ensure_capacity(end)
+            self._matrix[start:end] = vectors.astype(np.float16)
+            self._matrix.flush()
+
+            lines = [
+                (json.dumps({"text": text, "metadata": metadata or {}}, ensure_ascii=False) + "\n").encode("utf-8")
+                for text, metadata in zip(texts, metadatas)
+            ]
+            with open(self.directory / _DOCS_FILE, "ab") as f:
+                # 截掉上次崩溃时未提交的尾部
+                f.truncate(self._docs_bytes)
+                offsets = []
+                position = self._docs_bytes
+                for line in lines:
+                    offsets.append(position)
+                    position += len(line)
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._doc_offsets.extend(offsets)
+            self._docs_bytes = position
+            self._count = end
+            self._write_meta()
+            self._maybe_train_index()
+        return [str(i) for i in range(start, end)]
+
+    # ---------- 索引 ----------
+
+    def _maybe_train_index(self):
+        """向量数足够多且索引过旧时，在后台线程训练 IVF（调用方持有锁）"""
+        if self._training or self._count < IVF_MIN_VECTORS:
+            return
+        if self._ivf is not None and self._count < self._ivf.trained_count * IVF_RETRAIN_GROWTH:
+            return
+        self._training = True
+        # 训练线程持有独立映射期间不能扩容文件（Windows 限制），先预留到下次重训前够用的容量
+        self._ensure_capacity(int(self._count * IVF_RETRAIN_GROWTH) + 1)
+        threading.Thread(target=self._train_index, name=f"ivf-{self.collection_name}", daemon=True).start()
+
+    def _train_index(self):
+        try:
+            with self._lock:
+                count = self._count
+                vectors_path = self.directory / _VECTORS_FILE
+                dim = self._dim
+            # 训练使用独立的只读映射，不阻塞写入和检索
+            matrix = np.memmap(vectors_path, dtype=np.float16, mode="r", shape=(count, dim))
+            try:
+                ivf = _IVFIndex.train(matrix, count)
+            finally:
+                del matrix
+            ivf.save(self.directory / _IVF_FILE)
+            with self._lock:
+                self._ivf = ivf
+            logger.info(f"📚 向量存储 {self.directory} 索引训练完成（{count} 条，{ivf.nlist} 个簇）")
+        except Exception as e:
+            logger.error(f"❌ 向量存储 {self.directory} 索引训练失败: {e}")
+        finally:
+            with self._lock:
+                self._training = False
+
+    # ---------- 检索 ----------
+
+    def _read_docs(self, ids) -> List[Document]:
+        docs = []
+        with open(self.directory / _DOCS_FILE, "rb") as f:
+            for i in ids:
+                f.seek(self._doc_offsets[i])
+                record = json.loads(f.readline())
+                docs.append(Document(page_content=record["text"], metadata=record.get("metadata") or {}))
+        return docs
+
+    def _scan(self, query: np.ndarray, count: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """分块暴力检索前 count 行"""
+        best_ids = []
+        best_scores = []
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = np.asarray(self._matrix[start:min(start + SEARCH_BLOCK_ROWS, count)], dtype=np.float32)
+            scores = block @ query
+            idx = _top_k(scores, k)
+            best_ids.append(idx + start)
+            best_scores.append(scores[idx])
+        ids = np.concatenate(best_ids)
+        scores = np.concatenate(best_scores)
+        order = _top_k(scores, k)
+        return ids[order], scores[order]
+
+    def _search_ivf(self, query: np.ndarray, count: int, k: int, ivf: _IVFIndex) -> Tuple[np.ndarray, np.ndarray]:
+        """只扫描最近的若干个簇，以及索引训练之后新增的行"""
+        nprobe = max(IVF_MIN_PROBES, ivf.nlist // IVF_PROBE_DIVISOR)
+        ids = ivf.candidates(query, nprobe)
+        if count > ivf.trained_count:
+            ids = np.concatenate([ids, np.arange(ivf.trained_count, count, dtype=np.int64)])
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        scores = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), SEARCH_BLOCK_ROWS):
+            chunk = ids[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(chunk)] = np.asarray(self._matrix[chunk], dtype=np.float32) @ query
+        order = _top_k(scores, k)
+        return ids[order], scores[order]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """返回 (文档, 余弦相似度) 列表，按相似度降序"""
+        if self._count == 0 or k <= 0:
+            return []
+        query_vector = _normalize(self.embedding_function.embed_query(query))[0]
+        return self.similarity_search_by_vector_with_score(query_vector, k)
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4) -> List[Tuple[Document, float]]:
+        query_vector = _normalize(embedding)[0]
+        with self._lock:
+            count = self._count
+            if count == 0 or k <= 0:
+                return []
+            if query_vector.shape[0] != self._dim:
+                logger.warning(f"⚠️ 查询向量维度 {query_vector.shape[0]} 与向量存储维度 {self._dim} 不一致")
+                return []
+            if self._ivf is not None:
+                ids, scores = self._search_ivf(query_vector, count, k, self._ivf)
+            else:
+                ids, scores = self._scan(query_vector, count, k)
+            docs = self._read_docs(ids)
+        return list(zip(docs, scores.tolist()))
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def __len__(self) -> int:
+        return self._count
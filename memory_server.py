@@ -2,18 +2,20 @@
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from memory import CompressedRecentHistoryManager, SemanticMemory, ImportantSettingsManager, TimeIndexedMemory
-from fastapi import FastAPI
-from fastapi.responses import PlainTextResponse
+from memory import CompressedRecentHistoryManager, SemanticMemory, ImportantSettingsManager, TimeIndexedMemory, MemoryQueryRouter
+from memory.jobs import MemoryJobQueue
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response
 import json
 import uvicorn
 from langchain_core.messages import convert_to_messages
-from uuid import uuid4
-from config import MEMORY_SERVER_PORT
+from config import MEMORY_SERVER_PORT, SEMANTIC_MEMORY_STORE_ENABLED
 from utils.config_manager import get_config_manager
 from pydantic import BaseModel
 import re
 import asyncio
+import hashlib
+from urllib.parse import quote
 import logging
 import argparse
 from utils.frontend_utils import get_timestamp
@@ -33,6 +35,7 @@ recent_history_manager = CompressedRecentHistoryManager()
 semantic_manager = SemanticMemory(recent_history_manager)
 settings_manager = ImportantSettingsManager()
 time_manager = TimeIndexedMemory(recent_history_manager)
+memory_router = MemoryQueryRouter(time_manager, semantic_manager, recent_history_manager, settings_manager)
 
 # 用于保护重新加载操作的锁
 _reload_lock = asyncio.Lock()
@@ -43,7 +46,7 @@ async def reload_memory_components():
     使用锁保护重新加载操作，确保原子性交换，避免竞态条件。
     先创建所有新实例，然后原子性地交换引用。
     """
-    global recent_history_manager, semantic_manager, settings_manager, time_manager
+    global recent_history_manager, semantic_manager, settings_manager, time_manager, memory_router
     async with _reload_lock:
         logger.info("[MemoryServer] 开始重新加载记忆组件配置...")
         try:
@@ -52,12 +55,18 @@ async def reload_memory_components():
             new_semantic = SemanticMemory(new_recent)
             new_settings = ImportantSettingsManager()
             new_time = TimeIndexedMemory(new_recent)
+            new_router = MemoryQueryRouter(new_time, new_semantic, new_recent, new_settings)
             
             # 然后原子性地交换引用
+            old_time = time_manager
             recent_history_manager = new_recent
             semantic_manager = new_semantic
             settings_manager = new_settings
             time_manager = new_time
+            memory_router = new_router
+            
+            # 旧实例为每个角色各持有一个 WAL 连接，交换后关闭（正在执行的语句会先持锁完成）
+            await asyncio.to_thread(old_time.close)
             
             logger.info("[MemoryServer] ✅ 记忆组件配置重新加载完成")
             return True
@@ -72,6 +81,12 @@ enable_shutdown = False
 # 全局变量用于管理correction任务
 correction_tasks = {}  # {lanlan_name: asyncio.Task}
 correction_cancel_flags = {}  # {lanlan_name: asyncio.Event}
+# 审阅进行中又有新消息的角色：当前审阅结束后再跑一轮（审阅是增量的，不需要中断重来）
+correction_rerun_requested = set()
+# new_dialog 上下文缓存：{lanlan_name: (签名, 设定部分, 近期记录部分, ETag)}
+dialog_context_cache = {}
+# 后台语义记忆写入任务（保持引用，避免被垃圾回收）
+semantic_store_tasks = set()
 
 @app.post("/shutdown")
 async def shutdown_memory_server():
@@ -93,7 +108,8 @@ async def shutdown_memory_server():
 async def shutdown_event_handler():
     """应用关闭时执行清理工作"""
     logger.info("Memory server正在关闭...")
-    # 这里可以添加任何需要的清理工作
+    # 未完成的记忆任务保留在磁盘上，下次启动时恢复
+    await memory_jobs.shutdown()
     logger.info("Memory server已关闭")
 
 
@@ -108,8 +124,12 @@ async def _run_review_in_background(lanlan_name: str):
         correction_cancel_flags[lanlan_name] = cancel_event
     
     try:
-        # 直接异步调用review_history方法
-        await recent_history_manager.review_history(lanlan_name, cancel_event)
+        # 直接异步调用review_history方法；审阅期间有新消息时接着审阅新增部分
+        while True:
+            correction_rerun_requested.discard(lanlan_name)
+            await recent_history_manager.review_history(lanlan_name, cancel_event)
+            if lanlan_name not in correction_rerun_requested or cancel_event.is_set():
+                break
         logger.info(f"✅ {lanlan_name} 的记忆整理任务完成")
     except asyncio.CancelledError:
         logger.info(f"⚠️ {lanlan_name} 的记忆整理任务被取消")
@@ -117,92 +137,142 @@ async def _run_review_in_background(lanlan_name: str):
         logger.error(f"❌ {lanlan_name} 的记忆整理任务出错: {e}")
     finally:
         # 清理任务记录
+        correction_rerun_requested.discard(lanlan_name)
         if lanlan_name in correction_tasks:
             del correction_tasks[lanlan_name]
         # 重置取消标志
         if lanlan_name in correction_cancel_flags:
             correction_cancel_flags[lanlan_name].clear()
 
+def _store_semantic_in_background(uid: str, input_history, lanlan_name: str):
+    """在后台把原始对话写入语义记忆，嵌入请求由共享的批量服务合并、缓存并重试，不阻塞请求返回"""
+    manager = semantic_manager
+
+    async def _run():
+        try:
+            await manager.store_original(uid, input_history, lanlan_name)
+        except KeyError:
+            logger.debug(f"语义记忆中没有角色 {lanlan_name}，跳过写入")
+        except Exception as e:
+            logger.warning(f"⚠️ {lanlan_name} 的语义记忆写入失败: {e}")
+
+    task = asyncio.create_task(_run())
+    semantic_store_tasks.add(task)
+    task.add_done_callback(semantic_store_tasks.discard)
+
+def _check_character(lanlan_name: str, label: str = ""):
+    """检查角色是否存在于配置中，如果不存在则记录信息但继续处理（允许新角色）"""
+    try:
+        character_data = _config_manager.load_characters()
+        catgirl_names = list(character_data.get('猫娘', {}).keys())
+        if lanlan_name not in catgirl_names:
+            logger.info(f"[MemoryServer] {label}角色 '{lanlan_name}' 不在配置中，但继续处理（可能是新创建的角色）")
+    except Exception as e:
+        logger.warning(f"检查角色配置失败: {e}，继续处理")
+
+
+async def _restart_review(lanlan_name: str):
+    """
+    在后台审阅新增的记录。审阅按批保存进度，已有任务在运行时不再中断重来，
+    而是让它在当前批次结束后继续审阅新增的消息
+    """
+    if lanlan_name in correction_tasks and not correction_tasks[lanlan_name].done():
+        correction_rerun_requested.add(lanlan_name)
+        return
+
+    # 启动新的review任务
+    task = asyncio.create_task(_run_review_in_background(lanlan_name))
+    correction_tasks[lanlan_name] = task
+
+
+def _append_job_history(job: dict):
+    """把任务中的对话立即写入近期记忆（只写日志，不调用 LLM），之后 /new_dialog 就能读到"""
+    if job.get("appended"):
+        return
+    input_history = convert_to_messages(job["history"])
+    if not recent_history_manager.append_history(input_history, job["lanlan_name"]):
+        raise RuntimeError(f"写入 {job['lanlan_name']} 的近期记忆失败")
+    job["appended"] = True
+    memory_jobs.persist(job)
+
+
+async def _run_memory_job(job: dict):
+    """后台执行记忆任务：压缩近期记忆、写入时间索引与语义记忆，然后启动记忆审阅"""
+    lanlan_name = job["lanlan_name"]
+    uid = job["id"]
+    input_history = convert_to_messages(job["history"])
+    _append_job_history(job)
+    # 把本次会话传入，压缩时缓存会话前缀的摘要，时间索引随后只需增量补充（仅普通模式，与时间索引的摘要模式一致）
+    await recent_history_manager.compress_if_needed(lanlan_name, detailed=job.get("detailed", False), session=input_history)
+    """
+    下面屏蔽了设置提取模块，因为它需要消耗token，但当前版本实用性近乎于0。尤其是，Qwen与GPT等旗舰模型相比性能差距过大。
+    语义记忆同样需要消耗token（每条消息都要调用嵌入接口），默认关闭，由 SEMANTIC_MEMORY_STORE_ENABLED 开启。
+    """
+    # await settings_manager.extract_and_update_settings(input_history, lanlan_name)
+    if SEMANTIC_MEMORY_STORE_ENABLED:
+        # 开启后原始对话经批量嵌入服务在后台写入，不阻塞记忆任务
+        _store_semantic_in_background(uid, input_history, lanlan_name)
+    await time_manager.store_conversation(uid, input_history, lanlan_name)
+
+    # 在后台启动review_history任务
+    await _restart_review(lanlan_name)
+
+
+# 记忆处理任务队列：请求只负责落盘和写入近期记忆，LLM 相关步骤在后台按角色串行执行
+memory_jobs = MemoryJobQueue(_config_manager.memory_dir / "pending_jobs", _run_memory_job)
+
+
+@app.on_event("startup")
+async def recover_memory_jobs():
+    """恢复上次退出时尚未完成的记忆任务"""
+    memory_jobs.recover(prepare=_append_job_history)
+
+
+def _accept_history(request: HistoryRequest, lanlan_name: str, detailed: bool, label: str = ""):
+    """落盘任务并立即写入近期记忆，然后交给后台队列"""
+    _check_character(lanlan_name, label)
+    history = json.loads(request.input_history)
+    job = memory_jobs.create(lanlan_name, history, detailed=detailed)
+    logger.info(f"[MemoryServer] {label}收到 {lanlan_name} 的对话历史处理请求，消息数: {len(history)}，任务: {job['id']}")
+    _append_job_history(job)
+    return memory_jobs.submit(job)
+
+
 @app.post("/process/{lanlan_name}")
 async def process_conversation(request: HistoryRequest, lanlan_name: str):
-    global correction_tasks
     try:
-        # 检查角色是否存在于配置中，如果不存在则记录信息但继续处理（允许新角色）
-        try:
-            character_data = _config_manager.load_characters()
-            catgirl_names = list(character_data.get('猫娘', {}).keys())
-            if lanlan_name not in catgirl_names:
-                logger.info(f"[MemoryServer] 角色 '{lanlan_name}' 不在配置中，但继续处理（可能是新创建的角色）")
-        except Exception as e:
-            logger.warning(f"检查角色配置失败: {e}，继续处理")
-        
-        uid = str(uuid4())
-        input_history = convert_to_messages(json.loads(request.input_history))
-        logger.info(f"[MemoryServer] 收到 {lanlan_name} 的对话历史处理请求，消息数: {len(input_history)}")
-        await recent_history_manager.update_history(input_history, lanlan_name)
-        """
-        下面屏蔽了两个模块，因为这两个模块需要消耗token，但当前版本实用性近乎于0。尤其是，Qwen与GPT等旗舰模型相比性能差距过大。
-        """
-        # await settings_manager.extract_and_update_settings(input_history, lanlan_name)
-        # await semantic_manager.store_conversation(uid, input_history, lanlan_name)
-        await time_manager.store_conversation(uid, input_history, lanlan_name)
-        
-        # 在后台启动review_history任务
-        if lanlan_name in correction_tasks and not correction_tasks[lanlan_name].done():
-            # 如果已有任务在运行，取消它
-            correction_tasks[lanlan_name].cancel()
-            try:
-                await correction_tasks[lanlan_name]
-            except asyncio.CancelledError:
-                pass
-        
-        # 启动新的review任务
-        task = asyncio.create_task(_run_review_in_background(lanlan_name))
-        correction_tasks[lanlan_name] = task
-        
-        return {"status": "processed"}
+        job_id = _accept_history(request, lanlan_name, detailed=False)
+        return {"status": "queued", "job_id": job_id}
     except Exception as e:
         logger.error(f"处理对话历史失败: {e}")
         return {"status": "error", "message": str(e)}
 
 @app.post("/renew/{lanlan_name}")
 async def process_conversation_for_renew(request: HistoryRequest, lanlan_name: str):
-    global correction_tasks
     try:
-        # 检查角色是否存在于配置中，如果不存在则记录信息但继续处理（允许新角色）
-        try:
-            character_data = _config_manager.load_characters()
-            catgirl_names = list(character_data.get('猫娘', {}).keys())
-            if lanlan_name not in catgirl_names:
-                logger.info(f"[MemoryServer] renew: 角色 '{lanlan_name}' 不在配置中，但继续处理（可能是新创建的角色）")
-        except Exception as e:
-            logger.warning(f"检查角色配置失败: {e}，继续处理")
-        
-        uid = str(uuid4())
-        input_history = convert_to_messages(json.loads(request.input_history))
-        logger.info(f"[MemoryServer] renew: 收到 {lanlan_name} 的对话历史处理请求，消息数: {len(input_history)}")
-        await recent_history_manager.update_history(input_history, lanlan_name, detailed=True)
-        # await settings_manager.extract_and_update_settings(input_history, lanlan_name)
-        # await semantic_manager.store_conversation(uid, input_history, lanlan_name)
-        await time_manager.store_conversation(uid, input_history, lanlan_name)
-        
-        # 在后台启动review_history任务
-        if lanlan_name in correction_tasks and not correction_tasks[lanlan_name].done():
-            # 如果已有任务在运行，取消它
-            correction_tasks[lanlan_name].cancel()
-            try:
-                await correction_tasks[lanlan_name]
-            except asyncio.CancelledError:
-                pass
-        
-        # 启动新的review任务
-        task = asyncio.create_task(_run_review_in_background(lanlan_name))
-        correction_tasks[lanlan_name] = task
-        
-        return {"status": "processed"}
+        job_id = _accept_history(request, lanlan_name, detailed=True, label="renew: ")
+        return {"status": "queued", "job_id": job_id}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/jobs")
+async def get_memory_jobs():
+    """查看记忆任务队列的整体状态"""
+    return memory_jobs.stats()
+
+@app.get("/jobs/{lanlan_name}")
+async def get_character_memory_jobs(lanlan_name: str):
+    """查看指定角色正在执行、排队中以及最近完成的记忆任务"""
+    return memory_jobs.character_status(lanlan_name)
+
+@app.get("/job/{job_id}")
+async def get_memory_job(job_id: str):
+    status = memory_jobs.get_status(job_id)
+    if status is None:
+        return {"status": "unknown", "id": job_id}
+    return status
+
+
 @app.get("/get_recent_history/{lanlan_name}")
 def get_recent_history(lanlan_name: str):
     # 检查角色是否存在于配置中
@@ -217,8 +287,8 @@ def get_recent_history(lanlan_name: str):
         return "开始聊天前，没有历史记录。\n"
     
     history = recent_history_manager.get_recent_history(lanlan_name)
-    _, _, _, _, name_mapping, _, _, _, _, _ = _config_manager.get_character_data()
-    name_mapping['ai'] = lanlan_name
+    _, _, _, _, name_mapping, _, _, _, _, _ = _config_manager.get_character_snapshot().data
+    name_mapping = {**name_mapping, 'ai': lanlan_name}
     result = f"开始聊天前，{lanlan_name}又在脑海内整理了近期发生的事情。\n"
     for i in history:
         if i.type == 'system':
@@ -233,6 +303,11 @@ def get_recent_history(lanlan_name: str):
 async def get_memory(query: str, lanlan_name:str):
     return await semantic_manager.query(query, lanlan_name)
 
+@app.get("/recall/{lanlan_name}/{query}")
+async def recall_memory(query: str, lanlan_name: str, k: int = 8):
+    """混合检索（时间范围 + 关键词 + 向量），常见的时间说法由规则解析，不需要调用 LLM"""
+    return await memory_router.query(query, lanlan_name, k)
+
 @app.get("/get_settings/{lanlan_name}")
 def get_settings(lanlan_name: str):
     # 检查角色是否存在于配置中
@@ -286,14 +361,13 @@ async def cancel_correction(lanlan_name: str):
     return {"status": "no_task"}
 
 @app.get("/new_dialog/{lanlan_name}")
-async def new_dialog(lanlan_name: str):
+async def new_dialog(lanlan_name: str, request: Request):
     global correction_tasks, correction_cancel_flags
     
     # 检查角色是否存在于配置中
     try:
-        character_data = _config_manager.load_characters()
-        catgirl_names = list(character_data.get('猫娘', {}).keys())
-        if lanlan_name not in catgirl_names:
+        lanlan_basic_config = _config_manager.get_character_snapshot().data[3]
+        if lanlan_name not in lanlan_basic_config:
             logger.warning(f"角色 '{lanlan_name}' 不在配置中，返回空上下文")
             return PlainTextResponse("")
     except Exception as e:
@@ -317,20 +391,50 @@ async def new_dialog(lanlan_name: str):
         except Exception as e:
             logger.warning(f"⚠️ 中断 {lanlan_name} 的correction任务时出现异常: {e}")
     
-    # 正则表达式：删除所有类型括号及其内容（包括[]、()、{}、<>、【】、（）等）
-    brackets_pattern = re.compile(r'(\[.*?\]|\(.*?\)|（.*?）|【.*?】|\{.*?\}|<.*?>)')
-    master_name, _, _, _, name_mapping, _, _, _, _, _ = _config_manager.get_character_data()
-    name_mapping['ai'] = lanlan_name
-    result = f"\n========以下是{lanlan_name}的内心活动========\n{lanlan_name}的脑海里经常想着自己和{master_name}的事情，她记得{json.dumps(settings_manager.get_settings(lanlan_name), ensure_ascii=False)}\n\n"
-    result += f"现在时间是{get_timestamp()}。开始聊天前，{lanlan_name}又在脑海内整理了近期发生的事情。\n"
-    for i in recent_history_manager.get_recent_history(lanlan_name):
+    settings_block, history_block, etag = _get_dialog_context(lanlan_name)
+    timestamp = get_timestamp()
+    # 当前时间只在返回时拼入，ETag 只反映设定与近期记录；客户端收到 304 后用新时间替换缓存文本中的旧时间
+    headers = {"ETag": etag, "X-Context-Timestamp": quote(timestamp)}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    result = settings_block + f"现在时间是{timestamp}。开始聊天前，{lanlan_name}又在脑海内整理了近期发生的事情。\n" + history_block
+    return PlainTextResponse(result, headers=headers)
+
+# 正则表达式：删除所有类型括号及其内容（包括[]、()、{}、<>、【】、（）等）
+_BRACKETS_PATTERN = re.compile(r'(\[.*?\]|\(.*?\)|（.*?）|【.*?】|\{.*?\}|<.*?>)')
+
+def _get_dialog_context(lanlan_name: str):
+    """
+    返回 new_dialog 上下文的 (设定部分, 近期记录部分, ETag)。
+    角色配置、设定文件、近期记录都未变化时直接使用缓存，不读盘也不重新拼接
+    """
+    snapshot = _config_manager.get_character_snapshot()
+    master_name, _, _, _, name_mapping, _, _, _, setting_store, _ = snapshot.data
+    history = recent_history_manager.get_recent_history(lanlan_name)
+    try:
+        setting_stat = os.stat(setting_store[lanlan_name])
+        setting_signature = (setting_stat.st_mtime_ns, setting_stat.st_size)
+    except (KeyError, OSError):
+        setting_signature = None
+    signature = (id(recent_history_manager), id(settings_manager), snapshot.version,
+                 recent_history_manager.history_revision(lanlan_name), setting_signature)
+    cached = dialog_context_cache.get(lanlan_name)
+    if cached is not None and cached[0] == signature:
+        return cached[1:]
+
+    name_mapping = {**name_mapping, 'ai': lanlan_name}
+    settings_block = f"\n========以下是{lanlan_name}的内心活动========\n{lanlan_name}的脑海里经常想着自己和{master_name}的事情，她记得{json.dumps(settings_manager.get_settings(lanlan_name), ensure_ascii=False)}\n\n"
+    history_block = ""
+    for i in history:
         if type(i.content) == str:
-            cleaned_content = brackets_pattern.sub('', i.content).strip()
-            result += f"{name_mapping[i.type]} | {cleaned_content}\n"
+            cleaned_content = _BRACKETS_PATTERN.sub('', i.content).strip()
+            history_block += f"{name_mapping[i.type]} | {cleaned_content}\n"
         else:
-            texts = [brackets_pattern.sub('', j['text']).strip() for j in i.content if j['type'] == 'text']
-            result += f"{name_mapping[i.type]} | " + "\n".join(texts) + "\n"
-    return PlainTextResponse(result)
+            texts = [_BRACKETS_PATTERN.sub('', j['text']).strip() for j in i.content if j['type'] == 'text']
+            history_block += f"{name_mapping[i.type]} | " + "\n".join(texts) + "\n"
+    etag = '"' + hashlib.sha1((settings_block + "\x1e" + history_block).encode('utf-8')).hexdigest()[:20] + '"'
+    dialog_context_cache[lanlan_name] = (signature, settings_block, history_block, etag)
+    return settings_block, history_block, etag
 
 if __name__ == "__main__":
     import threading
@@ -7,6 +7,7 @@ import asyncio
 import json
 import os
 import logging
+from collections import deque
 from config import MONITOR_SERVER_PORT
 from utils.config_manager import get_config_manager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
@@ -170,9 +171,102 @@ async def get_index(request: Request, lanlan_name: str):
     })
 
 
-# 存储所有连接的客户端
-connected_clients = set()
-subtitle_clients = set()
+# 每个客户端发送队列的上限：音频积压超过约 2 秒（48kHz int16）时丢弃最旧的音频，其余消息超过条数上限时丢弃最旧的
+MONITOR_AUDIO_BACKLOG_BYTES = 48000 * 2 * 2
+MONITOR_MAX_PENDING_MESSAGES = 256
+
+
+def dump_message(message) -> str:
+    """预先序列化 JSON（与 WebSocket.send_json 的格式一致），广播时所有客户端复用同一份文本"""
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+class ClientWriter:
+    """
+    单个客户端的发送任务：广播只把消息放进该客户端的有界队列，由独立任务顺序发送，
+    一个卡顿的客户端不会拖慢其他客户端。
+
+    - coalesce_key 相同的待发消息只保留最新内容（字幕）
+    - 音频积压超过 MONITOR_AUDIO_BACKLOG_BYTES 时丢弃最旧的音频
+    - 发送失败后自动从所属的客户端表中移除
+    """
+
+    def __init__(self, websocket: WebSocket, registry: dict):
+        self.websocket = websocket
+        self.registry = registry
+        self.dropped = 0
+        self._pending = deque()  # [kind, payload, coalesce_key]
+        self._audio_bytes = 0
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        registry[websocket] = self
+
+    def send_text(self, text: str, coalesce_key: str = None):
+        if coalesce_key is not None:
+            for item in self._pending:
+                if item[2] == coalesce_key:
+                    # 原位替换：保持在队列中的位置，只发送最新内容
+                    item[1] = text
+                    return
+        self._append(['text', text, coalesce_key])
+
+    def send_bytes(self, data: bytes):
+        self._audio_bytes += len(data)
+        self._append(['bytes', data, None])
+        while self._audio_bytes > MONITOR_AUDIO_BACKLOG_BYTES and self._drop_oldest('bytes'):
+            pass
+
+    def discard(self, coalesce_key: str):
+        """丢弃尚未发送的指定类型消息（例如清空字幕时丢弃待发字幕）"""
+        for item in [i for i in self._pending if i[2] == coalesce_key]:
+            self._pending.remove(item)
+
+    def _append(self, item):
+        self._pending.append(item)
+        if len(self._pending) > MONITOR_MAX_PENDING_MESSAGES:
+            self._drop_oldest()
+        self._wakeup.set()
+
+    def _drop_oldest(self, kind: str = None) -> bool:
+        for item in self._pending:
+            if kind is None or item[0] == kind:
+                self._pending.remove(item)
+                if item[0] == 'bytes':
+                    self._audio_bytes -= len(item[1])
+                self.dropped += 1
+                return True
+        return False
+
+    async def _run(self):
+        try:
+            while True:
+                if not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                kind, payload, _ = self._pending.popleft()
+                if kind == 'bytes':
+                    self._audio_bytes -= len(payload)
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"客户端发送失败，移除: {self.websocket.client}: {e}")
+        finally:
+            if self.registry.get(self.websocket) is self:
+                del self.registry[self.websocket]
+            if self.dropped:
+                logger.info(f"客户端 {self.websocket.client} 因积压丢弃了 {self.dropped} 条消息")
+
+    def close(self):
+        self._task.cancel()
+
+
+# 存储所有连接的客户端（WebSocket -> ClientWriter）
+connected_clients = {}
+subtitle_clients = {}
 current_subtitle = ""
 should_clear_next = False
 
@@ -194,15 +288,15 @@ async def subtitle_websocket_endpoint(websocket: WebSocket):
     print(f"字幕客户端已连接: {websocket.client}")
 
     # 添加到字幕客户端集合
-    subtitle_clients.add(websocket)
+    writer = ClientWriter(websocket, subtitle_clients)
 
     try:
         # 发送当前字幕（如果有）
         if current_subtitle:
-            await websocket.send_json({
+            writer.send_text(dump_message({
                 "type": "subtitle",
                 "text": current_subtitle
-            })
+            }), coalesce_key="subtitle")
 
         # 保持连接
         while True:
@@ -210,7 +304,8 @@ async def subtitle_websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         print(f"字幕客户端已断开: {websocket.client}")
     finally:
-        subtitle_clients.discard(websocket)
+        writer.close()
+        subtitle_clients.pop(websocket, None)
 
 
 # 广播字幕到所有字幕客户端
@@ -222,16 +317,13 @@ async def broadcast_subtitle():
         # 给一个短暂的延迟让清空动画完成
         await asyncio.sleep(0.3)
 
-    clients = subtitle_clients.copy()
-    for client in clients:
-        try:
-            await client.send_json({
-                "type": "subtitle",
-                "text": current_subtitle
-            })
-        except Exception as e:
-            print(f"字幕广播错误: {e}")
-            subtitle_clients.discard(client)
+    # 字幕每次都是完整文本：客户端来不及发送时只保留最新一条
+    text = dump_message({
+        "type": "subtitle",
+        "text": current_subtitle
+    })
+    for writer in list(subtitle_clients.values()):
+        writer.send_text(text, coalesce_key="subtitle")
 
 
 # 清空字幕
@@ -239,15 +331,10 @@ async def clear_subtitle():
     global current_subtitle
     current_subtitle = ""
 
-    clients = subtitle_clients.copy()
-    for client in clients:
-        try:
-            await client.send_json({
-                "type": "clear"
-            })
-        except Exception as e:
-            print(f"清空字幕错误: {e}")
-            subtitle_clients.discard(client)
+    text = dump_message({"type": "clear"})
+    for writer in list(subtitle_clients.values()):
+        writer.discard("subtitle")
+        writer.send_text(text)
 
 # 主服务器连接端点
 @app.websocket("/sync/{lanlan_name}")
@@ -280,16 +367,12 @@ async def sync_endpoint(websocket: WebSocket, lanlan_name:str):
                         if is_japanese(current_subtitle):
                             translated_text = await translate_japanese_to_chinese(current_subtitle)
                             current_subtitle = translated_text
-                            clients = subtitle_clients.copy()
-                            for client in clients:
-                                try:
-                                    await client.send_json({
-                                        "type": "subtitle",
-                                        "text": translated_text
-                                    })
-                                except Exception as e:
-                                    print(f"翻译字幕广播错误: {e}")
-                                    subtitle_clients.discard(client)
+                            text = dump_message({
+                                "type": "subtitle",
+                                "text": translated_text
+                            })
+                            for writer in list(subtitle_clients.values()):
+                                writer.send_text(text, coalesce_key="subtitle")
 
                     # 清空字幕区域，准备下一条
                     global should_clear_next
@@ -331,80 +414,38 @@ async def websocket_endpoint(websocket: WebSocket, lanlan_name:str):
     await websocket.accept()
     print(f"✅ [CLIENT] 查看客户端已连接: {websocket.client}, 当前总数: {len(connected_clients) + 1}")
 
-    # 添加到连接集合
-    connected_clients.add(websocket)
+    # 添加到连接集合（每个客户端一个发送任务）
+    writer = ClientWriter(websocket, connected_clients)
 
     try:
         # 保持连接直到客户端断开
         while True:
             # 接收任何类型的消息（文本或二进制），主要用于保持连接
-            try:
-                await websocket.receive_text()
-            except:
-                # 如果收到的是二进制数据，receive_text() 会失败，尝试 receive_bytes()
-                try:
-                    await websocket.receive_bytes()
-                except:
-                    # 如果两者都失败，等待一下再继续
-                    await asyncio.sleep(0.1)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
     except WebSocketDisconnect:
         print(f"❌ [CLIENT] 查看客户端已断开: {websocket.client}")
     except Exception as e:
         print(f"❌ [CLIENT] 客户端连接异常: {e}")
     finally:
         # 安全地移除客户端（即使已经被移除也不会报错）
-        connected_clients.discard(websocket)
+        writer.close()
+        connected_clients.pop(websocket, None)
         print(f"🗑️ [CLIENT] 已移除客户端，当前剩余: {len(connected_clients)}")
 
 
-# 广播消息到所有客户端
+# 广播消息到所有客户端：只序列化一次，放入各客户端的发送队列后立即返回
 async def broadcast_message(message):
-    clients = connected_clients.copy()
-    success_count = 0
-    fail_count = 0
-    disconnected_clients = []
-    
-    for client in clients:
-        try:
-            await client.send_json(message)
-            success_count += 1
-        except Exception as e:
-            print(f"❌ [BROADCAST] 广播错误到 {client.client}: {e}")
-            fail_count += 1
-            disconnected_clients.append(client)
-    
-    # 移除所有断开的客户端
-    for client in disconnected_clients:
-        connected_clients.discard(client)
-        print(f"🗑️ [BROADCAST] 移除断开的客户端: {client.client}")
-    
-    if success_count > 0:
-        print(f"✅ [BROADCAST] 成功广播到 {success_count} 个客户端" + (f", 失败并移除 {fail_count} 个" if fail_count > 0 else ""))
+    text = dump_message(message)
+    for writer in list(connected_clients.values()):
+        writer.send_text(text)
 
 
 # 广播二进制数据到所有客户端
 async def broadcast_binary(data):
-    clients = connected_clients.copy()
-    success_count = 0
-    fail_count = 0
-    disconnected_clients = []
-    
-    for client in clients:
-        try:
-            await client.send_bytes(data)
-            success_count += 1
-        except Exception as e:
-            print(f"❌ [BINARY BROADCAST] 二进制广播错误到 {client.client}: {e}")
-            fail_count += 1
-            disconnected_clients.append(client)
-    
-    # 移除所有断开的客户端
-    for client in disconnected_clients:
-        connected_clients.discard(client)
-        print(f"🗑️ [BINARY BROADCAST] 移除断开的客户端: {client.client}")
-    
-    if success_count > 0:
-        print(f"✅ [BINARY BROADCAST] 成功广播音频到 {success_count} 个客户端" + (f", 失败并移除 {fail_count} 个" if fail_count > 0 else ""))
+    for writer in list(connected_clients.values()):
+        writer.send_bytes(data)
 
 
 # 定期清理断开的连接
@@ -416,13 +457,10 @@ async def startup_event():
 async def cleanup_disconnected_clients():
     while True:
         try:
-            # 检查并移除已断开的客户端
-            for client in list(connected_clients):
-                try:
-                    await client.send_json({"type": "heartbeat"})
-                except Exception as e:
-                    print("广播错误:", e)
-                    connected_clients.remove(client)
+            # 检查并移除已断开的客户端（发送失败的客户端由其发送任务自行移除）
+            heartbeat = dump_message({"type": "heartbeat"})
+            for writer in list(connected_clients.values()):
+                writer.send_text(heartbeat)
             await asyncio.sleep(60)  # 每分钟检查一次
         except Exception as e:
             print(f"清理客户端错误: {e}")
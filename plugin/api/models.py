@@ -51,7 +51,7 @@ class HealthCheckResponse(BaseModel):
     alive: bool
     exitcode: Optional[int] = None
     pid: Optional[int] = None
-    status: Literal["running", "stopped", "crashed"]
+    status: Literal["running", "stopped", "crashed", "not_started"]
     communication: Dict[str, Any]
 
 
@@ -82,6 +82,7 @@ class PluginPushMessage(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
     timestamp: str = Field(..., description="消息推送时间（ISO格式）")
     message_id: str = Field(..., description="消息唯一ID")
+    seq: int = Field(0, description="消息序号（单调递增，可作为 since 游标）")
     
     @field_serializer('binary_data')
     def serialize_binary_data(self, value: Optional[bytes]) -> Optional[str]:
@@ -0,0 +1,182 @@
+"""
+插件消息存储模块
+
+有界的插件推送消息存储，替代 asyncio.Queue 的"全部取出再放回"式过滤：
+- 每条消息分配单调递增的序号 seq，客户端可用它作为游标只取"seq 之后的消息"
+- 按插件 ID、优先级建立索引，过滤时只遍历相关消息
+- 超出容量时淘汰最旧的消息
+- 新消息到达时唤醒长轮询的等待者
+
+只在事件循环线程中访问（插件报文回调与 HTTP 路由都运行在同一个事件循环中）。
+"""
+import asyncio
+import heapq
+import logging
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("plugin.message_store")
+
+# 索引中已移除的序号超过存活序号（再加上这个余量）时整体压缩该索引
+_INDEX_COMPACT_SLACK = 32
+
+
+class PluginMessageStore:
+    """插件消息存储"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # seq -> 消息；dict 保持插入顺序，即按 seq 升序
+        self._messages: Dict[int, Dict[str, Any]] = {}
+        # 索引中只存 seq；被取走的消息在索引里延迟清理（头部随时清理，积累过多时压缩）
+        self._by_plugin: Dict[str, Deque[int]] = {}
+        self._by_priority: Dict[int, Deque[int]] = {}
+        # 各索引键下仍存在的消息数
+        self._plugin_live: Dict[str, int] = {}
+        self._priority_live: Dict[int, int] = {}
+        self._last_seq = 0
+        self._changed: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def last_seq(self) -> int:
+        """最近一条消息的序号（没有消息时为 0）"""
+        return self._last_seq
+
+    def put_nowait(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        存入一条消息（与 asyncio.Queue 接口兼容；满时淘汰最旧的消息，不会抛出 QueueFull）
+
+        Returns:
+            存入的消息（附带 seq 和 message_id）
+        """
+        self._last_seq += 1
+        seq = self._last_seq
+        record = dict(msg)
+        record["seq"] = seq
+        record.setdefault("message_id", str(uuid.uuid4()))
+        plugin_id = record.get("plugin_id", "")
+        priority = record.get("priority", 0)
+
+        self._messages[seq] = record
+        self._by_plugin.setdefault(plugin_id, deque()).append(seq)
+        self._by_priority.setdefault(priority, deque()).append(seq)
+        self._plugin_live[plugin_id] = self._plugin_live.get(plugin_id, 0) + 1
+        self._priority_live[priority] = self._priority_live.get(priority, 0) + 1
+
+        while len(self._messages) > self.maxsize:
+            oldest_seq = next(iter(self._messages))
+            self._remove(oldest_seq)
+            logger.debug("Message store full, dropped oldest message %s", oldest_seq)
+
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+        return record
+
+    def _remove(self, seq: int) -> None:
+        """移除一条消息并同步清理两个索引"""
+        record = self._messages.pop(seq)
+        self._discard(self._by_plugin, self._plugin_live, record.get("plugin_id", ""))
+        self._discard(self._by_priority, self._priority_live, record.get("priority", 0))
+
+    def _discard(self, index: Dict[Any, Deque[int]], live: Dict[Any, int], key: Any) -> None:
+        """索引键下有一条消息被移除：清理索引头部已不存在的序号，已移除的序号过多时压缩整个索引"""
+        remaining = live[key] - 1
+        if remaining == 0:
+            del live[key]
+            del index[key]
+            return
+        live[key] = remaining
+        seqs = index[key]
+        while seqs[0] not in self._messages:
+            seqs.popleft()
+        if len(seqs) > 2 * remaining + _INDEX_COMPACT_SLACK:
+            index[key] = deque(seq for seq in seqs if seq in self._messages)
+
+    def _candidates(self, plugin_id: Optional[str], priority_min: Optional[int]) -> Optional[List[Deque[int]]]:
+        """选出需要遍历的索引（None 表示遍历全部消息）"""
+        if plugin_id is not None:
+            return [self._by_plugin.get(plugin_id, deque())]
+        if priority_min is not None:
+            return [seqs for priority, seqs in self._by_priority.items() if priority >= priority_min]
+        return None
+
+    def _iter_seqs(self, plugin_id: Optional[str], priority_min: Optional[int],
+                   since: Optional[int]) -> Iterable[int]:
+        """按 seq 升序产出候选序号"""
+        indexes = self._candidates(plugin_id, priority_min)
+        if since is None:
+            # 遍历结束前不会修改消息和索引，可以直接迭代
+            if indexes is None:
+                return iter(self._messages)
+            return heapq.merge(*indexes)
+        # 游标模式：通常只有少量新消息，从尾部向前找到游标位置即可
+        tails = []
+        for seqs in ([self._messages] if indexes is None else indexes):
+            tail = []
+            for seq in reversed(seqs):
+                if seq <= since:
+                    break
+                tail.append(seq)
+            tail.reverse()
+            tails.append(tail)
+        return heapq.merge(*tails)
+
+    def query(
+        self,
+        plugin_id: Optional[str] = None,
+        priority_min: Optional[int] = None,
+        max_count: int = 100,
+        since: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        按条件获取消息（按 seq 升序）
+
+        Args:
+            plugin_id: 过滤特定插件（可选）
+            priority_min: 最低优先级（可选）
+            max_count: 最大数量
+            since: 游标；给出时只读取 seq 大于它的消息且不移除，否则取走命中的消息
+        """
+        result: List[Dict[str, Any]] = []
+        for seq in self._iter_seqs(plugin_id, priority_min, since):
+            record = self._messages.get(seq)
+            if record is None:
+                continue
+            if priority_min is not None and record.get("priority", 0) < priority_min:
+                continue
+            result.append(record)
+            if len(result) >= max_count:
+                break
+
+        if since is None:
+            for record in result:
+                self._remove(record["seq"])
+        return result
+
+    async def wait_query(
+        self,
+        timeout: float,
+        plugin_id: Optional[str] = None,
+        priority_min: Optional[int] = None,
+        max_count: int = 100,
+        since: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """长轮询：没有命中的消息时最多等待 timeout 秒，直到有新消息命中"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            result = self.query(plugin_id, priority_min, max_count, since)
+            remaining = deadline - loop.time()
+            if result or remaining <= 0:
+                return result
+            if self._changed is None:
+                self._changed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return []
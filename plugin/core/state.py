@@ -8,6 +8,7 @@ import logging
 import threading
 from typing import Any, Dict, Optional
 
+from plugin.core.message_store import PluginMessageStore
 from plugin.sdk.events import EventHandler
 from plugin.settings import EVENT_QUEUE_MAX, MESSAGE_QUEUE_MAX
 
@@ -21,12 +22,14 @@ class PluginRuntimeState:
         self.event_handlers: Dict[str, EventHandler] = {}
         self.plugin_status: Dict[str, Dict[str, Any]] = {}
         self.plugin_hosts: Dict[str, Any] = {}
+        self.plugin_load_stats: Dict[str, Dict[str, Any]] = {}  # 每个插件的加载耗时等信息
+        self.plugin_catalog_version = 0  # 插件/入口注册表每次变化时递增，用于插件列表缓存失效
         self.plugin_status_lock = threading.Lock()
         self.plugins_lock = threading.Lock()  # 保护 plugins 字典的线程安全
         self.event_handlers_lock = threading.Lock()  # 保护 event_handlers 字典的线程安全
         self.plugin_hosts_lock = threading.Lock()  # 保护 plugin_hosts 字典的线程安全
         self._event_queue: Optional[asyncio.Queue] = None
-        self._message_queue: Optional[asyncio.Queue] = None
+        self._message_store: Optional[PluginMessageStore] = None
 
     @property
     def event_queue(self) -> asyncio.Queue:
@@ -35,10 +38,10 @@ class PluginRuntimeState:
         return self._event_queue
 
     @property
-    def message_queue(self) -> asyncio.Queue:
-        if self._message_queue is None:
-            self._message_queue = asyncio.Queue(maxsize=MESSAGE_QUEUE_MAX)
-        return self._message_queue
+    def message_store(self) -> PluginMessageStore:
+        if self._message_store is None:
+            self._message_store = PluginMessageStore(maxsize=MESSAGE_QUEUE_MAX)
+        return self._message_store
 
 
 # 全局状态实例
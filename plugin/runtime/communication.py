@@ -1,136 +1,80 @@
 """
 插件进程间通信资源管理器
 
-负责管理插件进程间的通信资源，包括队列、Future、后台任务等。
+负责管理插件进程间的通信资源，包括双工通道、Future、报文分发等。
 """
 from __future__ import annotations
 
 import asyncio
 import logging
 import uuid
-from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from queue import Empty
-from typing import Any, Dict, Optional
-
-from multiprocessing import Queue
+from typing import Any, Callable, Dict, Optional
 
 from plugin.settings import (
-    COMMUNICATION_THREAD_POOL_MAX_WORKERS,
     PLUGIN_TRIGGER_TIMEOUT,
     PLUGIN_SHUTDOWN_TIMEOUT,
-    QUEUE_GET_TIMEOUT,
-    MESSAGE_CONSUMER_SLEEP_INTERVAL,
-    RESULT_CONSUMER_SLEEP_INTERVAL,
 )
 from plugin.api.exceptions import PluginExecutionError
+from plugin.runtime.transport import PluginChannel
 
 
 @dataclass
 class PluginCommunicationResourceManager:
     """
     插件进程间通信资源管理器
-    
+
     负责管理：
-    - 命令队列、结果队列、状态队列、消息队列
+    - 与子进程之间的双工通道（命令、结果、状态、消息共用一条）
     - 待处理请求的 Future 管理
-    - 结果消费后台任务
-    - 消息消费后台任务
+    - 收到报文后按类型分发（结果 -> Future，状态 -> 状态回调，消息 -> 主进程消息队列）
     - 通信超时和清理
     """
     plugin_id: str
-    cmd_queue: Queue
-    res_queue: Queue
-    status_queue: Queue
-    message_queue: Queue
+    channel: PluginChannel
     logger: logging.Logger = field(default_factory=lambda: logging.getLogger("plugin.communication"))
-    
+
     # 异步相关资源
     _pending_futures: Dict[str, asyncio.Future] = field(default_factory=dict)
-    _result_consumer_task: Optional[asyncio.Task] = None
-    _message_consumer_task: Optional[asyncio.Task] = None
-    _shutdown_event: Optional[asyncio.Event] = None
-    _executor: Optional[ThreadPoolExecutor] = None
-    _message_target_queue: Optional[asyncio.Queue] = None  # 主进程的消息队列
-    
-    def __post_init__(self):
-        """初始化异步资源"""
-        # 延迟到实际使用时再创建，避免在错误的事件循环中创建
-        # 为每个插件创建独立的线程池，避免阻塞
-        self._executor = ThreadPoolExecutor(
-            max_workers=COMMUNICATION_THREAD_POOL_MAX_WORKERS,
-            thread_name_prefix=f"plugin-comm-{self.plugin_id}"
-        )
-    
-    def _ensure_shutdown_event(self) -> None:
-        """确保 shutdown_event 已创建（延迟初始化）"""
-        if self._shutdown_event is None:
-            self._shutdown_event = asyncio.Event()
-    
-    async def start(self, message_target_queue: Optional[asyncio.Queue] = None) -> None:
+    _message_target_queue: Optional[Any] = None  # 主进程的消息存储（提供 put_nowait）
+    _status_handler: Optional[Callable[[str, Dict[str, Any], str], None]] = None
+
+    async def start(
+        self,
+        message_target_queue: Optional[Any] = None,
+        status_handler: Optional[Callable[[str, Dict[str, Any], str], None]] = None,
+    ) -> None:
         """
-        启动结果消费和消息消费后台任务
-        
+        开始在当前事件循环中接收子进程报文
+
         Args:
-            message_target_queue: 主进程的消息队列，用于接收插件推送的消息
+            message_target_queue: 主进程的消息存储，用于接收插件推送的消息
+            status_handler: 状态回调 (plugin_id, status, source)，收到状态更新时直接调用
         """
         self._message_target_queue = message_target_queue
-        if self._result_consumer_task is None or self._result_consumer_task.done():
-            self._result_consumer_task = asyncio.create_task(self._consume_results())
-            self.logger.debug(f"Started result consumer for plugin {self.plugin_id}")
-        if self._message_consumer_task is None or self._message_consumer_task.done():
-            self._message_consumer_task = asyncio.create_task(self._consume_messages())
-            self.logger.debug(f"Started message consumer for plugin {self.plugin_id}")
-    
+        self._status_handler = status_handler
+        if self._message_target_queue is None:
+            self.logger.warning(f"Message target queue not set for plugin {self.plugin_id}, pushed messages will be dropped")
+        self.channel.start_reading(asyncio.get_running_loop(), self._dispatch, self._on_channel_closed)
+        self.logger.debug(f"Started channel reader for plugin {self.plugin_id}")
+
+    @property
+    def is_reading(self) -> bool:
+        return self.channel.is_reading
+
     async def shutdown(self, timeout: float = PLUGIN_SHUTDOWN_TIMEOUT) -> None:
         """
         关闭通信资源
-        
+
         Args:
-            timeout: 等待后台任务退出的超时时间
+            timeout: 保留参数，与其他关闭接口保持一致（读取是事件驱动的，无需等待后台任务）
         """
         self.logger.debug(f"Shutting down communication resources for plugin {self.plugin_id}")
-        
-        # 停止结果消费和消息消费任务
-        self._ensure_shutdown_event()
-        self._shutdown_event.set()
-        
-        if self._result_consumer_task and not self._result_consumer_task.done():
-            try:
-                await asyncio.wait_for(self._result_consumer_task, timeout=timeout)
-            except asyncio.TimeoutError:
-                self.logger.warning(
-                    f"Result consumer for plugin {self.plugin_id} didn't stop in time, cancelling"
-                )
-                self._result_consumer_task.cancel()
-                try:
-                    await self._result_consumer_task
-                except asyncio.CancelledError:
-                    pass
-        
-        if self._message_consumer_task and not self._message_consumer_task.done():
-            try:
-                await asyncio.wait_for(self._message_consumer_task, timeout=timeout)
-            except asyncio.TimeoutError:
-                self.logger.warning(
-                    f"Message consumer for plugin {self.plugin_id} didn't stop in time, cancelling"
-                )
-                self._message_consumer_task.cancel()
-                try:
-                    await self._message_consumer_task
-                except asyncio.CancelledError:
-                    pass
-        
+        self.channel.close()
         # 清理所有待处理的 Future
         self._cleanup_pending_futures()
-        
-        # 关闭线程池
-        if self._executor:
-            self._executor.shutdown(wait=True)
-            self._executor = None
-        
         self.logger.debug(f"Communication resources for plugin {self.plugin_id} shutdown complete")
-    
+
     def _cleanup_pending_futures(self) -> None:
         """清理所有待处理的 Future"""
         count = len(self._pending_futures)
@@ -140,36 +84,38 @@ class PluginCommunicationResourceManager:
         self._pending_futures.clear()
         if count > 0:
             self.logger.debug(f"Cleaned up {count} pending futures for plugin {self.plugin_id}")
-    
+
     async def trigger(self, entry_id: str, args: dict, timeout: float = PLUGIN_TRIGGER_TIMEOUT) -> Any:
         """
         发送触发命令并等待结果
-        
+
         Args:
             entry_id: 入口 ID
             args: 参数
             timeout: 超时时间（秒）
-        
+
         Returns:
             插件返回的结果
-        
+
         Raises:
             TimeoutError: 如果超时
             Exception: 如果插件执行出错
         """
         req_id = str(uuid.uuid4())
-        future = asyncio.Future()
+        future = asyncio.get_running_loop().create_future()
         self._pending_futures[req_id] = future
-        
+
         try:
             # 发送命令
-            self.cmd_queue.put({
+            self.channel.send({
                 "type": "TRIGGER",
                 "req_id": req_id,
                 "entry_id": entry_id,
-                "args": args
+                "args": args,
+                # 子进程按同样的期限取消执行，避免超时的调用继续占用插件
+                "timeout": timeout,
             })
-            
+
             # 等待结果（带超时）
             try:
                 result = await asyncio.wait_for(future, timeout=timeout)
@@ -185,139 +131,79 @@ class PluginCommunicationResourceManager:
         finally:
             # 清理 Future（无论成功还是失败）
             self._pending_futures.pop(req_id, None)
-    
+
     async def send_stop_command(self) -> None:
         """发送停止命令到插件进程"""
+        self.send_stop_command_sync()
+
+    def send_stop_command_sync(self) -> None:
+        """同步发送停止命令（用于非异步上下文）"""
         try:
-            self.cmd_queue.put({"type": "STOP"}, timeout=QUEUE_GET_TIMEOUT)
+            self.channel.send({"type": "STOP"})
             self.logger.debug(f"Sent STOP command to plugin {self.plugin_id}")
         except Exception as e:
             self.logger.warning(f"Failed to send STOP command to plugin {self.plugin_id}: {e}")
-    
-    async def _consume_results(self) -> None:
-        """
-        后台任务：持续消费结果队列
-        
-        这个任务会一直运行直到收到关闭信号
-        """
-        self._ensure_shutdown_event()
-        loop = asyncio.get_running_loop()
-        
-        while not self._shutdown_event.is_set():
-            try:
-                # 使用 executor 在后台线程中阻塞读取队列
-                res = await loop.run_in_executor(
-                    self._executor,
-                    lambda: self.res_queue.get(timeout=QUEUE_GET_TIMEOUT)
-                )
-                
-                req_id = res.get("req_id")
-                if not req_id:
-                    self.logger.warning(f"Received result without req_id from plugin {self.plugin_id}")
-                    continue
-                
-                future = self._pending_futures.pop(req_id, None)
-                if future:
-                    if not future.done():
-                        if res.get("success"):
-                            future.set_result(res)
-                        else:
-                            future.set_exception(Exception(res.get("error", "Unknown error")))
+
+    def _dispatch(self, msg: Dict[str, Any]) -> None:
+        """按报文类型分发（在事件循环线程中调用）"""
+        msg_type = msg.get("type")
+        if msg_type == "RESULT":
+            self._handle_result(msg)
+        elif msg_type == "STATUS_UPDATE":
+            self._handle_status(msg)
+        elif msg_type == "MESSAGE_PUSH":
+            self._forward_message(msg)
+        else:
+            self.logger.warning(f"Received unknown message type {msg_type!r} from plugin {self.plugin_id}")
+
+    def _handle_result(self, res: Dict[str, Any]) -> None:
+        req_id = res.get("req_id")
+        if not req_id:
+            self.logger.warning(f"Received result without req_id from plugin {self.plugin_id}")
+            return
+
+        future = self._pending_futures.pop(req_id, None)
+        if future:
+            if not future.done():
+                if res.get("success"):
+                    future.set_result(res)
                 else:
-                    self.logger.warning(
-                        f"Received result for unknown req_id {req_id} from plugin {self.plugin_id}"
-                    )
-                    
-            except Empty:
-                # 队列为空，继续等待
-                continue
-            except (OSError, RuntimeError) as e:
-                # 系统级错误，记录并继续
-                if not self._shutdown_event.is_set():
-                    self.logger.error(f"System error consuming results for plugin {self.plugin_id}: {e}")
-                await asyncio.sleep(RESULT_CONSUMER_SLEEP_INTERVAL)
-            except Exception as e:
-                # 其他未知异常，记录详细信息
-                if not self._shutdown_event.is_set():
-                    self.logger.exception(f"Unexpected error consuming results for plugin {self.plugin_id}: {e}")
-                # 短暂休眠避免 CPU 占用过高
-                await asyncio.sleep(RESULT_CONSUMER_SLEEP_INTERVAL)
-    
-    def get_status_messages(self, max_count: int | None = None) -> list[Dict[str, Any]]:
-        """
-        从状态队列中获取消息（非阻塞）
-        
-        Args:
-            max_count: 最多获取的消息数量（None 时使用默认值）
-        
-        Returns:
-            状态消息列表
-        """
-        from plugin.settings import STATUS_MESSAGE_DEFAULT_MAX_COUNT
-        if max_count is None:
-            max_count = STATUS_MESSAGE_DEFAULT_MAX_COUNT
-        messages = []
-        count = 0
-        while count < max_count:
-            try:
-                msg = self.status_queue.get_nowait()
-                messages.append(msg)
-                count += 1
-            except Empty:
-                break
-        return messages
-    
-    async def _consume_messages(self) -> None:
-        """
-        后台任务：持续消费消息队列
-        
-        将插件推送的消息转发到主进程的消息队列
-        """
+                    future.set_exception(Exception(res.get("error", "Unknown error")))
+        else:
+            self.logger.warning(
+                f"Received result for unknown req_id {req_id} from plugin {self.plugin_id}"
+            )
+
+    def _handle_status(self, msg: Dict[str, Any]) -> None:
+        if self._status_handler is None:
+            return
+        self._status_handler(msg.get("plugin_id") or self.plugin_id, msg.get("data", {}), "child_process")
+
+    def _forward_message(self, msg: Dict[str, Any]) -> None:
+        """转发消息到主进程的消息队列"""
         if self._message_target_queue is None:
-            self.logger.warning(f"Message target queue not set for plugin {self.plugin_id}, message consumer will not work")
             return
-        
-        self._ensure_shutdown_event()
-        loop = asyncio.get_running_loop()
-        
-        while not self._shutdown_event.is_set():
-            try:
-                # 使用 executor 在后台线程中阻塞读取队列
-                msg = await loop.run_in_executor(
-                    self._executor,
-                    lambda: self.message_queue.get(timeout=QUEUE_GET_TIMEOUT)
-                )
-                
-                # 转发消息到主进程的消息队列
-                try:
-                    if self._message_target_queue:
-                        await self._message_target_queue.put(msg)
-                        self.logger.info(
-                            f"[MESSAGE FORWARD] Plugin: {self.plugin_id} | "
-                            f"Source: {msg.get('source', 'unknown')} | "
-                            f"Priority: {msg.get('priority', 0)} | "
-                            f"Description: {msg.get('description', '')} | "
-                            f"Content: {str(msg.get('content', ''))[:100]}"
-                        )
-                except asyncio.QueueFull:
-                    self.logger.warning(f"Main message queue is full, dropping message from plugin {self.plugin_id}")
-                except (AttributeError, RuntimeError) as e:
-                    self.logger.error(f"Queue error forwarding message from plugin {self.plugin_id}: {e}")
-                except Exception as e:
-                    self.logger.exception(f"Unexpected error forwarding message from plugin {self.plugin_id}: {e}")
-                    
-            except Empty:
-                # 队列为空，继续等待
-                continue
-            except (OSError, RuntimeError) as e:
-                # 系统级错误
-                if not self._shutdown_event.is_set():
-                    self.logger.error(f"System error consuming messages for plugin {self.plugin_id}: {e}")
-                await asyncio.sleep(MESSAGE_CONSUMER_SLEEP_INTERVAL)
-            except Exception as e:
-                # 其他未知异常
-                if not self._shutdown_event.is_set():
-                    self.logger.exception(f"Unexpected error consuming messages for plugin {self.plugin_id}: {e}")
-                # 短暂休眠避免 CPU 占用过高
-                await asyncio.sleep(MESSAGE_CONSUMER_SLEEP_INTERVAL)
+        try:
+            self._message_target_queue.put_nowait(msg)
+            self.logger.info(
+                f"[MESSAGE FORWARD] Plugin: {self.plugin_id} | "
+                f"Source: {msg.get('source', 'unknown')} | "
+                f"Priority: {msg.get('priority', 0)} | "
+                f"Description: {msg.get('description', '')} | "
+                f"Content: {str(msg.get('content', ''))[:100]}"
+            )
+        except asyncio.QueueFull:
+            self.logger.warning(f"Main message queue is full, dropping message from plugin {self.plugin_id}")
+        except (AttributeError, RuntimeError) as e:
+            self.logger.error(f"Queue error forwarding message from plugin {self.plugin_id}: {e}")
 
+    def _on_channel_closed(self) -> None:
+        """子进程退出（通道对端关闭）：立即让所有等待中的请求失败，而不是等到超时"""
+        if self._pending_futures:
+            self.logger.warning(
+                f"Channel to plugin {self.plugin_id} closed with {len(self._pending_futures)} pending requests"
+            )
+        for future in self._pending_futures.values():
+            if not future.done():
+                future.set_exception(Exception("Plugin process exited"))
+        self._pending_futures.clear()
@@ -1,19 +1,22 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
+import functools
 import importlib
 import inspect
 import logging
 import multiprocessing
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict
-from multiprocessing import Queue
-from queue import Empty
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict
 
 from plugin.sdk.events import EVENT_META_ATTR
 from plugin.core.context import PluginContext
 from plugin.runtime.communication import PluginCommunicationResourceManager
+from plugin.runtime.transport import PluginChannel
 from plugin.api.models import HealthCheckResponse
 from plugin.api.exceptions import (
     PluginLifecycleError,
@@ -25,26 +28,154 @@ from plugin.api.exceptions import (
 from plugin.settings import (
     PLUGIN_TRIGGER_TIMEOUT,
     PLUGIN_SHUTDOWN_TIMEOUT,
-    QUEUE_GET_TIMEOUT,
     PROCESS_SHUTDOWN_TIMEOUT,
     PROCESS_TERMINATE_TIMEOUT,
+    PLUGIN_SYNC_ENTRY_WORKERS,
+    PLUGIN_ENTRY_DEFAULT_CONCURRENCY,
 )
 
 
+def _call_sync_entry(method, args: dict) -> Any:
+    """调用同步入口；兼容只接收一个 dict 参数的旧式接口"""
+    try:
+        return method(**args)
+    except TypeError as err:
+        # 检查是否可能是旧式接口（只接收一个 dict 参数）
+        sig = inspect.signature(method)
+        params = list(sig.parameters.keys())
+        if len(params) == 1 and params[0] not in args:
+            # 旧式只接收一个 dict 的接口，尝试向后兼容
+            return method(args)
+        # 不是旧式接口，重新抛出原始 TypeError
+        raise err
+
+
+class _PluginEntryExecutor:
+    """
+    插件子进程内的执行器
+    
+    - 一个常驻事件循环（后台线程）执行所有异步入口、定时任务和生命周期函数，不再每次调用都新建事件循环
+    - 同步入口放到有界线程池中执行
+    - 每个入口用信号量限制并发（默认 PLUGIN_ENTRY_DEFAULT_CONCURRENCY，可由入口的 max_concurrency 覆盖）
+    - 超时后取消异步入口；同步线程无法中断，结果被丢弃，并发名额在线程结束后归还
+    """
+
+    def __init__(self, plugin_id: str, logger: logging.Logger, max_workers: int = PLUGIN_SYNC_ENTRY_WORKERS):
+        self.plugin_id = plugin_id
+        self.logger = logger
+        self.loop = asyncio.new_event_loop()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"plugin-entry-{plugin_id}")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._thread = threading.Thread(target=self._run_loop, name=f"plugin-loop-{plugin_id}", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _semaphore_for(self, entry_id: str, method) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(entry_id)
+        if semaphore is None:
+            meta = getattr(method, EVENT_META_ATTR, None)
+            limit = (getattr(meta, "extra", None) or {}).get("max_concurrency") or PLUGIN_ENTRY_DEFAULT_CONCURRENCY
+            semaphore = self._semaphores[entry_id] = asyncio.Semaphore(max(1, int(limit)))
+        return semaphore
+
+    async def invoke(self, fn, args: Dict[str, Any] | None = None) -> Any:
+        """在事件循环中执行函数：协程函数直接 await，同步函数放到线程池"""
+        args = args or {}
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(**args)
+        return await self.loop.run_in_executor(self._pool, functools.partial(_call_sync_entry, fn, args))
+
+    async def _run_entry(self, entry_id: str, method, args: dict) -> Any:
+        semaphore = self._semaphore_for(entry_id, method)
+        await semaphore.acquire()
+        if asyncio.iscoroutinefunction(method):
+            try:
+                return await method(**args)
+            finally:
+                semaphore.release()
+        future = self._pool.submit(_call_sync_entry, method, args)
+        # 线程无法被强制中断：超时后不再等待结果，但并发名额要等线程真正结束才归还
+        future.add_done_callback(lambda _f: self.loop.call_soon_threadsafe(semaphore.release))
+        return await asyncio.wrap_future(future)
+
+    async def execute(self, entry_id: str, method, args: dict, timeout: float | None) -> Any:
+        """执行入口（排队等待并发名额的时间也计入超时）"""
+        if timeout and timeout > 0:
+            return await asyncio.wait_for(self._run_entry(entry_id, method, args), timeout=timeout)
+        return await self._run_entry(entry_id, method, args)
+
+    def submit(self, coro) -> "concurrent.futures.Future":
+        """线程安全：把协程调度到常驻事件循环"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, fn, args: Dict[str, Any] | None = None) -> Any:
+        """阻塞执行（用于生命周期函数）"""
+        return self.submit(self.invoke(fn, args)).result()
+
+    async def run_timer(self, fn, interval_seconds: int, fn_name: str) -> None:
+        """定时任务：在常驻事件循环中按固定间隔执行"""
+        while True:
+            try:
+                await self.invoke(fn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.exception("Timer '%s' failed: %s", fn_name, e)
+                # 定时任务失败不应中断循环，继续执行
+            await asyncio.sleep(interval_seconds)
+
+    async def _cancel_all(self) -> None:
+        tasks = [t for t in asyncio.all_tasks(self.loop) if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self, timeout: float = PLUGIN_SHUTDOWN_TIMEOUT) -> None:
+        """取消所有执行中的任务并停止事件循环"""
+        try:
+            self.submit(self._cancel_all()).result(timeout=timeout)
+        except Exception as e:
+            self.logger.warning("Failed to cancel running tasks: %s", e)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
 def _plugin_process_runner(
     plugin_id: str,
     entry_point: str,
     config_path: Path,
-    cmd_queue: Queue,
-    res_queue: Queue,
-    status_queue: Queue,
-    message_queue: Queue,
+    conn: Connection,
 ) -> None:
     """
     独立进程中的运行函数，负责加载插件、映射入口、处理命令并返回结果。
+    命令循环只负责接收命令，入口在 _PluginEntryExecutor 中并发执行，结果完成后各自写回通道。
+    状态更新和消息推送也经由同一条通道发往主进程。
     """
     logging.basicConfig(level=logging.INFO, format=f"[Proc-{plugin_id}] %(message)s")
     logger = logging.getLogger(f"plugin.{plugin_id}")
+    executor: _PluginEntryExecutor | None = None
+    channel = PluginChannel(conn, plugin_id)
+
+    def _send_result(payload: Dict[str, Any]) -> None:
+        try:
+            channel.send({"type": "RESULT", **payload})
+        except (EOFError, OSError):
+            # 主进程已关闭通道，结果无处可送
+            pass
+        except Exception as e:
+            # 返回值无法序列化
+            logger.error("Failed to send result for %s: %s", payload.get("req_id"), e)
+            channel.send({
+                "type": "RESULT",
+                "req_id": payload.get("req_id"),
+                "success": False,
+                "data": None,
+                "error": f"Unserializable result: {str(e)}",
+            })
 
     try:
         module_path, class_name = entry_point.split(":", 1)
@@ -55,10 +186,11 @@ def _plugin_process_runner(
             plugin_id=plugin_id,
             logger=logger,
             config_path=config_path,
-            status_queue=status_queue,
-            message_queue=message_queue,
+            status_queue=channel,
+            message_queue=channel,
         )
         instance = cls(ctx)
+        executor = _PluginEntryExecutor(plugin_id, logger)
 
         entry_map: Dict[str, Any] = {}
         events_by_type: Dict[str, Dict[str, Any]] = {}
@@ -87,10 +219,7 @@ def _plugin_process_runner(
         startup_fn = lifecycle_events.get("startup")
         if startup_fn:
             try:
-                if asyncio.iscoroutinefunction(startup_fn):
-                    asyncio.run(startup_fn())
-                else:
-                    startup_fn()
+                executor.run(startup_fn)
             except (KeyboardInterrupt, SystemExit):
                 # 系统级中断，直接抛出
                 raise
@@ -101,22 +230,6 @@ def _plugin_process_runner(
                 # 如果启动失败是致命的，可以在这里 raise PluginLifecycleError
 
         # 定时任务：timer auto_start interval
-        def _run_timer_interval(fn, interval_seconds: int, fn_name: str, stop_event: threading.Event):
-            while not stop_event.is_set():
-                try:
-                    if asyncio.iscoroutinefunction(fn):
-                        asyncio.run(fn())
-                    else:
-                        fn()
-                except (KeyboardInterrupt, SystemExit):
-                    # 系统级中断，停止定时任务
-                    logger.info("Timer '%s' interrupted, stopping", fn_name)
-                    break
-                except Exception as e:
-                    logger.exception("Timer '%s' failed: %s", fn_name, e)
-                    # 定时任务失败不应中断循环，继续执行
-                stop_event.wait(interval_seconds)
-
         timer_events = events_by_type.get("timer", {})
         for eid, fn in timer_events.items():
             meta = getattr(fn, EVENT_META_ATTR, None)
@@ -126,79 +239,64 @@ def _plugin_process_runner(
             if mode == "interval":
                 seconds = getattr(meta, "extra", {}).get("seconds", 0)
                 if seconds > 0:
-                    stop_event = threading.Event()
-                    t = threading.Thread(
-                        target=_run_timer_interval,
-                        args=(fn, seconds, eid, stop_event),
-                        daemon=True,
-                    )
-                    t.start()
+                    executor.submit(executor.run_timer(fn, seconds, eid))
                     logger.info("Started timer '%s' every %ss", eid, seconds)
 
-        # 命令循环
+        async def _handle_trigger(msg: Dict[str, Any]) -> None:
+            entry_id = msg["entry_id"]
+            args = msg["args"]
+            req_id = msg["req_id"]
+            method = entry_map.get(entry_id) or getattr(instance, entry_id, None) or getattr(
+                instance, f"entry_{entry_id}", None
+            )
+
+            ret_payload = {"req_id": req_id, "success": False, "data": None, "error": None}
+
+            try:
+                if not method:
+                    raise PluginEntryNotFoundError(plugin_id, entry_id)
+                
+                logger.info("Executing entry '%s' using method '%s'", entry_id, getattr(method, "__name__", entry_id))
+                
+                ret_payload["data"] = await executor.execute(entry_id, method, args, msg.get("timeout"))
+                ret_payload["success"] = True
+                
+            except PluginError as e:
+                # 插件系统已知异常，直接使用
+                logger.warning("Plugin error executing %s: %s", entry_id, e)
+                ret_payload["error"] = str(e)
+            except asyncio.TimeoutError:
+                logger.warning("Entry %s timed out after %ss, cancelled", entry_id, msg.get("timeout"))
+                ret_payload["error"] = f"Execution timed out after {msg.get('timeout')}s"
+            except asyncio.CancelledError:
+                # 进程退出时取消
+                ret_payload["error"] = "Execution cancelled"
+                _send_result(ret_payload)
+                raise
+            except (TypeError, ValueError, AttributeError) as e:
+                # 参数或方法调用错误
+                logger.error("Invalid call to entry %s: %s", entry_id, e)
+                ret_payload["error"] = f"Invalid call: {str(e)}"
+            except Exception as e:
+                # 其他未知异常
+                logger.exception("Unexpected error executing %s", entry_id)
+                ret_payload["error"] = f"Unexpected error: {str(e)}"
+
+            _send_result(ret_payload)
+
+        # 命令循环：阻塞读取通道，主进程关闭通道时退出
         while True:
             try:
-                msg = cmd_queue.get(timeout=QUEUE_GET_TIMEOUT)
-            except Empty:
-                continue
+                msg = channel.recv()
+            except (EOFError, OSError):
+                logger.info("Channel to host closed, exiting")
+                break
 
             if msg["type"] == "STOP":
                 break
 
             if msg["type"] == "TRIGGER":
-                entry_id = msg["entry_id"]
-                args = msg["args"]
-                req_id = msg["req_id"]
-                method = entry_map.get(entry_id) or getattr(instance, entry_id, None) or getattr(
-                    instance, f"entry_{entry_id}", None
-                )
-
-                ret_payload = {"req_id": req_id, "success": False, "data": None, "error": None}
-
-                try:
-                    if not method:
-                        raise PluginEntryNotFoundError(plugin_id, entry_id)
-                    
-                    logger.info("Executing entry '%s' using method '%s'", entry_id, getattr(method, "__name__", entry_id))
-                    
-                    if asyncio.iscoroutinefunction(method):
-                        res = asyncio.run(method(**args))
-                    else:
-                        try:
-                            res = method(**args)
-                        except TypeError as err:
-                            # 检查是否可能是旧式接口（只接收一个 dict 参数）
-                            sig = inspect.signature(method)
-                            params = list(sig.parameters.keys())
-                            if len(params) == 1 and params[0] not in args:
-                                # 旧式只接收一个 dict 的接口，尝试向后兼容
-                                res = method(args)
-                            else:
-                                # 不是旧式接口，重新抛出原始 TypeError
-                                raise err
-                    
-                    ret_payload["success"] = True
-                    ret_payload["data"] = res
-                    
-                except PluginError as e:
-                    # 插件系统已知异常，直接使用
-                    logger.warning("Plugin error executing %s: %s", entry_id, e)
-                    ret_payload["error"] = str(e)
-                except (TypeError, ValueError, AttributeError) as e:
-                    # 参数或方法调用错误
-                    logger.error("Invalid call to entry %s: %s", entry_id, e)
-                    ret_payload["error"] = f"Invalid call: {str(e)}"
-                except (KeyboardInterrupt, SystemExit):
-                    # 系统级中断，需要特殊处理
-                    logger.warning("Entry %s interrupted", entry_id)
-                    ret_payload["error"] = "Execution interrupted"
-                    raise  # 重新抛出系统级异常
-                except Exception as e:
-                    # 其他未知异常
-                    logger.exception("Unexpected error executing %s", entry_id)
-                    ret_payload["error"] = f"Unexpected error: {str(e)}"
-
-                res_queue.put(ret_payload)
+                executor.submit(_handle_trigger(msg))
 
     except (KeyboardInterrupt, SystemExit):
         # 系统级中断，正常退出
@@ -207,17 +305,22 @@ def _plugin_process_runner(
     except Exception as e:
         # 进程崩溃，记录详细信息
         logger.exception("Plugin process %s crashed: %s", plugin_id, e)
-        # 尝试发送错误信息到结果队列（如果可能）
+        # 尝试发送错误信息到主进程（如果可能）
         try:
-            res_queue.put({
+            channel.send({
+                "type": "RESULT",
                 "req_id": "CRASH",
                 "success": False,
                 "data": None,
                 "error": f"Process crashed: {str(e)}"
             })
         except Exception:
-            pass  # 如果队列也坏了，只能放弃
+            pass  # 如果通道也坏了，只能放弃
         raise  # 重新抛出，让进程退出
+    finally:
+        if executor is not None:
+            executor.close()
+        channel.close()
 
 
 class PluginProcessHost:
@@ -233,47 +336,42 @@ class PluginProcessHost:
         self.plugin_id = plugin_id
         self.logger = logging.getLogger(f"plugin.host.{plugin_id}")
         
-        # 创建队列（由通信资源管理器管理）
-        cmd_queue: Queue = multiprocessing.Queue()
-        res_queue: Queue = multiprocessing.Queue()
-        status_queue: Queue = multiprocessing.Queue()
-        message_queue: Queue = multiprocessing.Queue()
+        # 创建双工通道（命令、结果、状态、消息共用，由通信资源管理器管理）
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=True)
         
         # 创建并启动进程
         self.process = multiprocessing.Process(
             target=_plugin_process_runner,
-            args=(plugin_id, entry_point, config_path, cmd_queue, res_queue, status_queue, message_queue),
+            args=(plugin_id, entry_point, config_path, child_conn),
             daemon=False,
         )
         self.process.start()
+        # 子进程持有自己的一端；主进程关闭副本，子进程退出时才能读到 EOF
+        child_conn.close()
         
         # 验证进程状态
         if not self.process.is_alive():
             self.logger.warning(f"Plugin {plugin_id} process is not alive after initialization")
         
         # 创建通信资源管理器
+        self.channel = PluginChannel(parent_conn, plugin_id)
         self.comm_manager = PluginCommunicationResourceManager(
             plugin_id=plugin_id,
-            cmd_queue=cmd_queue,
-            res_queue=res_queue,
-            status_queue=status_queue,
-            message_queue=message_queue,
+            channel=self.channel,
         )
-        
-        # 为了向后兼容，保留这些属性
-        self.cmd_queue = cmd_queue
-        self.res_queue = res_queue
-        self.status_queue = status_queue
-        self.message_queue = message_queue
     
-    async def start(self, message_target_queue=None) -> None:
+    async def start(self, message_target_queue=None, status_handler=None) -> None:
         """
-        启动后台任务（需要在异步上下文中调用）
+        开始接收子进程报文（需要在异步上下文中调用）
         
         Args:
             message_target_queue: 主进程的消息队列，用于接收插件推送的消息
+            status_handler: 状态回调 (plugin_id, status, source)
         """
-        await self.comm_manager.start(message_target_queue=message_target_queue)
+        await self.comm_manager.start(
+            message_target_queue=message_target_queue,
+            status_handler=status_handler,
+        )
     
     async def shutdown(self, timeout: float = PLUGIN_SHUTDOWN_TIMEOUT) -> None:
         """
@@ -289,7 +387,7 @@ class PluginProcessHost:
         # 1. 发送停止命令
         await self.comm_manager.send_stop_command()
         
-        # 2. 关闭通信资源（包括后台任务）
+        # 2. 关闭通信资源（停止读取通道）
         await self.comm_manager.shutdown(timeout=timeout)
         
         # 3. 关闭进程
@@ -307,23 +405,17 @@ class PluginProcessHost:
         注意：这个方法不会等待异步任务完成，建议使用 shutdown()
         """
         # 发送停止命令（同步）
-        try:
-            self.cmd_queue.put({"type": "STOP"}, timeout=QUEUE_GET_TIMEOUT)
-        except Exception as e:
-            self.logger.warning(f"Failed to send STOP command: {e}")
-        
-        # 尽量通知通信管理器停止（即使不等待）
-        if getattr(self, "comm_manager", None) is not None:
-            try:
-                # 标记 shutdown event，后台协程会自行退出
-                if getattr(self.comm_manager, "_shutdown_event", None) is not None:
-                    self.comm_manager._shutdown_event.set()
-            except Exception:
-                # 保持同步关闭的"尽力而为"语义，不要让这里抛异常
-                pass
+        self.comm_manager.send_stop_command_sync()
         
         # 关闭进程
         self._shutdown_process(timeout=timeout)
+        
+        # 尽量关闭通道（即使不等待）
+        try:
+            self.channel.close()
+        except Exception:
+            # 保持同步关闭的"尽力而为"语义，不要让这里抛异常
+            pass
     
     async def trigger(self, entry_id: str, args: dict, timeout: float = PLUGIN_TRIGGER_TIMEOUT) -> Any:
         """
@@ -357,10 +449,7 @@ class PluginProcessHost:
             status=status,
             communication={
                 "pending_requests": len(self.comm_manager._pending_futures),
-                "consumer_running": (
-                    self.comm_manager._result_consumer_task is not None
-                    and not self.comm_manager._result_consumer_task.done()
-                ),
+                "consumer_running": self.comm_manager.is_reading,
             },
         )
     
@@ -379,7 +468,7 @@ class PluginProcessHost:
             return True
         
         try:
-            # 先尝试优雅关闭（进程会从队列读取 STOP 命令后退出）
+            # 先尝试优雅关闭（进程会从通道读取 STOP 命令后退出）
             self.process.join(timeout=timeout)
             
             if self.process.is_alive():
@@ -401,3 +490,81 @@ class PluginProcessHost:
         except Exception as e:
             self.logger.exception(f"Error shutting down plugin {self.plugin_id}: {e}")
             return False
+
+
+class LazyPluginProcessHost:
+    """
+    延迟启动的插件进程宿主
+    
+    与 PluginProcessHost 接口一致，但直到第一次 trigger 才真正创建子进程，
+    避免服务器启动时为每个已安装插件都拉起进程并导入插件代码。
+    """
+
+    def __init__(self, plugin_id: str, host_factory: Callable[[], PluginProcessHost]):
+        self.plugin_id = plugin_id
+        self.logger = logging.getLogger(f"plugin.host.{plugin_id}")
+        self._host_factory = host_factory
+        self._host: PluginProcessHost | None = None
+        self._start_kwargs: Dict[str, Any] | None = None
+        self._start_lock: asyncio.Lock | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._host is not None
+
+    @property
+    def process(self):
+        return self._host.process if self._host is not None else None
+
+    @property
+    def comm_manager(self):
+        return self._host.comm_manager if self._host is not None else None
+
+    async def start(self, message_target_queue=None, status_handler=None) -> None:
+        """记录通信参数，真正的进程在第一次 trigger 时创建"""
+        self._start_kwargs = {
+            "message_target_queue": message_target_queue,
+            "status_handler": status_handler,
+        }
+        if self._host is not None:
+            await self._host.start(**self._start_kwargs)
+
+    async def ensure_started(self) -> PluginProcessHost:
+        """确保子进程已创建并开始通信"""
+        if self._host is not None:
+            return self._host
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._host is None:
+                self.logger.info(f"Starting plugin {self.plugin_id} process on first use")
+                # 创建进程是阻塞操作（spawn 模式下尤其慢），放到线程中执行
+                host = await asyncio.to_thread(self._host_factory)
+                if self._start_kwargs is not None:
+                    await host.start(**self._start_kwargs)
+                self._host = host
+        return self._host
+
+    async def trigger(self, entry_id: str, args: dict, timeout: float = PLUGIN_TRIGGER_TIMEOUT) -> Any:
+        host = await self.ensure_started()
+        return await host.trigger(entry_id, args, timeout)
+
+    async def shutdown(self, timeout: float = PLUGIN_SHUTDOWN_TIMEOUT) -> None:
+        if self._host is not None:
+            await self._host.shutdown(timeout=timeout)
+
+    def shutdown_sync(self, timeout: float = PLUGIN_SHUTDOWN_TIMEOUT) -> None:
+        if self._host is not None:
+            self._host.shutdown_sync(timeout=timeout)
+
+    def is_alive(self) -> bool:
+        return self._host is not None and self._host.is_alive()
+
+    def health_check(self) -> HealthCheckResponse:
+        if self._host is not None:
+            return self._host.health_check()
+        return HealthCheckResponse(
+            alive=False,
+            status="not_started",
+            communication={"pending_requests": 0, "consumer_running": False},
+        )
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+import dataclasses
+import functools
 import importlib
 import inspect
+import json
 import logging
+import os
+import time
 from pathlib import Path
 from typing import Any, Dict, List, Callable, Type, Optional
 
@@ -12,7 +17,7 @@ try:
 except ImportError:  # pragma: no cover
     import tomli as tomllib  # type: ignore[no-redef]
 
-from plugin.sdk.events import EventHandler, EVENT_META_ATTR
+from plugin.sdk.events import EventHandler, EventMeta, EVENT_META_ATTR
 from plugin.sdk.version import SDK_VERSION
 from plugin.core.state import state
 from plugin.api.models import PluginMeta
@@ -21,6 +26,12 @@ from plugin.api.exceptions import (
     PluginLoadError,
     PluginMetadataError,
 )
+from plugin.runtime.host import LazyPluginProcessHost
+from plugin.settings import (
+    PLUGIN_METADATA_CACHE_FILE,
+    PLUGIN_LAZY_START,
+    PLUGIN_PREWARM,
+)
 try:
     from packaging.version import Version, InvalidVersion
     from packaging.specifiers import SpecifierSet, InvalidSpecifier
@@ -77,36 +88,53 @@ def register_plugin(plugin: PluginMeta) -> None:
     """Insert plugin into registry (not exposed as HTTP)."""
     with state.plugins_lock:
         state.plugins[plugin.id] = plugin.model_dump()
+        state.plugin_catalog_version += 1
+
+
+# 需要插件进程常驻运行的事件类型（不能延迟启动）
+_BACKGROUND_EVENT_TYPES = {"lifecycle", "timer", "message"}
+
+
+def _meta_to_dict(meta: Any) -> Dict[str, Any]:
+    if dataclasses.is_dataclass(meta):
+        return dataclasses.asdict(meta)
+    return dict(vars(meta))
 
 
-def scan_static_metadata(pid: str, cls: type, conf: dict, pdata: dict) -> None:
+def collect_static_metadata(pid: str, cls: type, conf: dict, pdata: dict) -> Dict[str, Any]:
     """
-    在不实例化的情况下扫描类属性，提取 @EventHandler 元数据并填充全局表。
+    在不实例化的情况下扫描类属性，提取入口元数据（可 JSON 序列化，用于缓存）。
+
+    Returns:
+        {"records": [...], "event_types": [...], "input_schema": {...}}
     """
     logger = logging.getLogger(__name__)
+    records: List[Dict[str, Any]] = []
+    event_types = set()
     for name, member in inspect.getmembers(cls):
         event_meta = getattr(member, EVENT_META_ATTR, None)
         if event_meta is None and hasattr(member, "__wrapped__"):
             event_meta = getattr(member.__wrapped__, EVENT_META_ATTR, None)
-
-        if event_meta and getattr(event_meta, "event_type", None) == "plugin_entry":
-            eid = getattr(event_meta, "id", name)
-            handler_obj = EventHandler(meta=event_meta, handler=member)
-            with state.event_handlers_lock:
-                state.event_handlers[f"{pid}.{eid}"] = handler_obj
-                state.event_handlers[f"{pid}:plugin_entry:{eid}"] = handler_obj
-            plugin_entry_method_map[(pid, str(eid))] = name
+        if event_meta is None:
+            continue
+
+        event_type = getattr(event_meta, "event_type", None)
+        event_types.add(event_type)
+        if event_type == "plugin_entry":
+            records.append({
+                "kind": "event",
+                "id": str(getattr(event_meta, "id", name)),
+                "method": name,
+                "meta": _meta_to_dict(event_meta),
+            })
 
     entries = conf.get("entries") or pdata.get("entries") or []
     for ent in entries:
-        logger = logging.getLogger(__name__)
         try:
             eid = ent.get("id") if isinstance(ent, dict) else str(ent)
             if not eid:
                 continue
-            try:
-                handler_fn = getattr(cls, eid)
-            except AttributeError:
+            if not hasattr(cls, eid):
                 logger.warning(
                     "Entry id %s for plugin %s has no handler on class %s, skipping",
                     eid,
@@ -120,14 +148,86 @@ def scan_static_metadata(pid: str, cls: type, conf: dict, pdata: dict) -> None:
                 description=ent.get("description", "") if isinstance(ent, dict) else "",
                 input_schema=ent.get("input_schema", {}) if isinstance(ent, dict) else {},
             )
-            eh = EventHandler(meta=entry_meta, handler=handler_fn)
-            with state.event_handlers_lock:
-                state.event_handlers[f"{pid}.{eid}"] = eh
-                state.event_handlers[f"{pid}:plugin_entry:{eid}"] = eh
+            records.append({"kind": "simple", "id": eid, "method": eid, "meta": _meta_to_dict(entry_meta)})
         except (AttributeError, KeyError, TypeError) as e:
             logger.warning("Error parsing entry %s for plugin %s: %s", ent, pid, e, exc_info=True)
             # 继续处理其他条目，不中断整个插件加载
 
+    return {
+        "records": records,
+        "event_types": sorted(t for t in event_types if t),
+        "input_schema": getattr(cls, "input_schema", {}) or {"type": "object", "properties": {}},
+    }
+
+
+def register_static_metadata(pid: str, metadata: Dict[str, Any], cls: Optional[type] = None) -> None:
+    """
+    把 collect_static_metadata 的结果填充到全局表。
+    来自缓存时没有插件类（cls 为 None），handler 为 None——主进程只用元数据，入口在子进程中执行。
+    """
+    for rec in metadata.get("records", []):
+        eid = rec["id"]
+        if rec["kind"] == "event":
+            meta = EventMeta(**rec["meta"])
+            plugin_entry_method_map[(pid, eid)] = rec["method"]
+        else:
+            meta = SimpleEntryMeta(**rec["meta"])
+        handler = getattr(cls, rec["method"], None) if cls is not None else None
+        handler_obj = EventHandler(meta=meta, handler=handler)
+        with state.event_handlers_lock:
+            state.event_handlers[f"{pid}.{eid}"] = handler_obj
+            state.event_handlers[f"{pid}:plugin_entry:{eid}"] = handler_obj
+            state.plugin_catalog_version += 1
+
+
+def scan_static_metadata(pid: str, cls: type, conf: dict, pdata: dict) -> Dict[str, Any]:
+    """
+    在不实例化的情况下扫描类属性，提取 @EventHandler 元数据并填充全局表。
+    """
+    metadata = collect_static_metadata(pid, cls, conf, pdata)
+    register_static_metadata(pid, metadata, cls)
+    return metadata
+
+
+def _source_fingerprint(toml_path: Path) -> List[List[Any]]:
+    """plugin.toml 与插件目录下所有 Python 源文件的 (相对路径, mtime_ns, size)"""
+    plugin_dir = toml_path.parent
+    files = [toml_path] + sorted(
+        p for p in plugin_dir.rglob("*.py") if "__pycache__" not in p.parts
+    )
+    fingerprint = []
+    for path in files:
+        st = path.stat()
+        fingerprint.append([path.relative_to(plugin_dir).as_posix(), st.st_mtime_ns, st.st_size])
+    return fingerprint
+
+
+def _load_metadata_cache(cache_path: Path, logger: logging.Logger) -> Dict[str, Any]:
+    try:
+        with cache_path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("sdk_version") == SDK_VERSION:
+            return data.get("plugins") or {}
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable plugin metadata cache %s: %s", cache_path, e)
+    return {}
+
+
+def _save_metadata_cache(cache_path: Path, plugins: Dict[str, Any], logger: logging.Logger) -> None:
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump({"sdk_version": SDK_VERSION, "plugins": plugins}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning("Failed to write plugin metadata cache %s: %s", cache_path, e)
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
 
 def load_plugins_from_toml(
     plugin_config_root: Path,
@@ -137,14 +237,24 @@ def load_plugins_from_toml(
     """
     扫描插件配置，启动子进程，并静态扫描元数据用于注册列表。
     process_host_factory 接收 (plugin_id, entry_point, config_path) 并返回宿主对象。
+
+    - 插件元数据按 plugin.toml 与插件源码的修改时间缓存，未变化的插件不在主进程中导入
+    - PLUGIN_LAZY_START 时插件进程在第一次 trigger 时才创建（PLUGIN_PREWARM 中的插件，
+      以及带 lifecycle / timer / message 事件、需要后台运行的插件除外）
+    - 每个插件的加载耗时记录在 state.plugin_load_stats
     """
     if not plugin_config_root.exists():
         logger.info("No plugin config directory %s, skipping", plugin_config_root)
         return
 
     logger.info("Loading plugins from %s", plugin_config_root)
+    load_started = time.perf_counter()
+    cache_path = plugin_config_root / PLUGIN_METADATA_CACHE_FILE
+    metadata_cache = _load_metadata_cache(cache_path, logger)
+    new_cache: Dict[str, Any] = {}
     for toml_path in plugin_config_root.glob("*/plugin.toml"):
         try:
+            plugin_started = time.perf_counter()
             with toml_path.open("rb") as f:
                 conf = tomllib.load(f)
             pdata = conf.get("plugin") or {}
@@ -244,22 +354,59 @@ def load_plugins_from_toml(
                     )
                     continue
 
-            module_path, class_name = entry.split(":", 1)
             try:
-                mod = importlib.import_module(module_path)
-                cls: Type[Any] = getattr(mod, class_name)
-            except (ImportError, ModuleNotFoundError) as e:
-                logger.error("Failed to import module '%s' for plugin %s: %s", module_path, pid, e)
-                continue
-            except AttributeError as e:
-                logger.error("Class '%s' not found in module '%s' for plugin %s: %s", class_name, module_path, pid, e)
-                continue
-            except Exception as e:
-                logger.exception("Unexpected error importing plugin class %s", entry)
-                continue
+                fingerprint = _source_fingerprint(toml_path)
+            except OSError as e:
+                logger.warning("Failed to stat sources of plugin %s, metadata cache disabled: %s", pid, e)
+                fingerprint = None
+
+            cls: Optional[Type[Any]] = None
+            metadata: Optional[Dict[str, Any]] = None
+            cached = metadata_cache.get(pid)
+            if (
+                fingerprint is not None
+                and isinstance(cached, dict)
+                and cached.get("entry") == entry
+                and cached.get("fingerprint") == fingerprint
+            ):
+                metadata = cached.get("metadata")
+
+            metadata_cached = metadata is not None
+            if metadata is None:
+                module_path, class_name = entry.split(":", 1)
+                try:
+                    mod = importlib.import_module(module_path)
+                    cls = getattr(mod, class_name)
+                except (ImportError, ModuleNotFoundError) as e:
+                    logger.error("Failed to import module '%s' for plugin %s: %s", module_path, pid, e)
+                    continue
+                except AttributeError as e:
+                    logger.error("Class '%s' not found in module '%s' for plugin %s: %s", class_name, module_path, pid, e)
+                    continue
+                except Exception as e:
+                    logger.exception("Unexpected error importing plugin class %s", entry)
+                    continue
+                metadata = collect_static_metadata(pid, cls, conf, pdata)
 
+            if fingerprint is not None:
+                try:
+                    json.dumps(metadata)
+                    new_cache[pid] = {"entry": entry, "fingerprint": fingerprint, "metadata": metadata}
+                except (TypeError, ValueError):
+                    logger.debug("Metadata of plugin %s is not JSON serializable, not caching", pid)
+
+            lazy = (
+                PLUGIN_LAZY_START
+                and pid not in PLUGIN_PREWARM
+                and not _BACKGROUND_EVENT_TYPES.intersection(metadata.get("event_types", []))
+            )
             try:
-                host = process_host_factory(pid, entry, toml_path)
+                if lazy:
+                    host = LazyPluginProcessHost(
+                        pid, functools.partial(process_host_factory, pid, entry, toml_path)
+                    )
+                else:
+                    host = process_host_factory(pid, entry, toml_path)
                 state.plugin_hosts[pid] = host
             except (OSError, RuntimeError) as e:
                 logger.error("Failed to start process for plugin %s: %s", pid, e)
@@ -268,7 +415,7 @@ def load_plugins_from_toml(
                 logger.exception("Unexpected error starting process for plugin %s", pid)
                 continue
 
-            scan_static_metadata(pid, cls, conf, pdata)
+            register_static_metadata(pid, metadata, cls)
 
             plugin_meta = PluginMeta(
                 id=pid,
@@ -280,14 +427,34 @@ def load_plugins_from_toml(
                 sdk_supported=sdk_supported_str,
                 sdk_untested=sdk_untested_str,
                 sdk_conflicts=sdk_conflicts_list,
-                input_schema=getattr(cls, "input_schema", {}) or {"type": "object", "properties": {}},
+                input_schema=metadata["input_schema"],
             )
             register_plugin(plugin_meta)
 
-            logger.info("Loaded plugin %s (Process: %s)", pid, getattr(host, "process", None))
+            load_time_ms = (time.perf_counter() - plugin_started) * 1000
+            state.plugin_load_stats[pid] = {
+                "load_time_ms": round(load_time_ms, 1),
+                "metadata_cached": metadata_cached,
+                "lazy": lazy,
+            }
+            logger.info(
+                "Loaded plugin %s in %.1f ms (metadata %s, Process: %s)",
+                pid,
+                load_time_ms,
+                "cached" if metadata_cached else "scanned",
+                "deferred until first trigger" if lazy else getattr(host, "process", None),
+            )
         except (KeyError, ValueError, TypeError) as e:
             # TOML 解析或配置错误
             logger.error("Invalid plugin configuration in %s: %s", toml_path, e)
         except Exception as e:
             # 其他未知错误
             logger.exception("Unexpected error loading plugin from %s", toml_path)
+
+    if new_cache != metadata_cache:
+        _save_metadata_cache(cache_path, new_cache, logger)
+    logger.info(
+        "Loaded %d plugins in %.1f ms",
+        len(state.plugin_load_stats),
+        (time.perf_counter() - load_started) * 1000,
+    )
@@ -0,0 +1,150 @@
+"""
+插件进程间双工通道
+
+每个插件只用一条双工 Pipe（multiprocessing.connection）承载所有报文，按 type 字段区分：
+- 主进程 -> 子进程：TRIGGER / STOP
+- 子进程 -> 主进程：RESULT / STATUS_UPDATE / MESSAGE_PUSH
+
+主进程侧通过 loop.add_reader 挂到事件循环上，有数据时才读取，不再需要轮询线程；
+事件循环不支持 add_reader 时（如 Windows 的 Proactor）退回到一个阻塞读取的线程。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Optional
+
+
+class PluginChannel:
+    """
+    双工通道的一端
+
+    子进程侧直接把它当作队列交给 PluginContext（提供 put / put_nowait），
+    主进程侧调用 start_reading 注册报文回调。发送是线程安全的。
+    """
+
+    def __init__(self, conn: Connection, name: str = "plugin"):
+        self.name = name
+        self._conn = conn
+        self._send_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._on_message: Optional[Callable[[Dict[str, Any]], None]] = None
+        self._on_close: Optional[Callable[[], None]] = None
+        self._reader_fd: Optional[int] = None
+        self._reader_thread: Optional[threading.Thread] = None
+        self._reading = False
+        self.logger = logging.getLogger(f"plugin.transport.{name}")
+
+    # ---- 发送 ----
+
+    def send(self, msg: Dict[str, Any]) -> None:
+        """发送一条报文（连接已关闭时抛出 OSError / EOFError）"""
+        with self._send_lock:
+            self._conn.send(msg)
+
+    def put(self, msg: Dict[str, Any], block: bool = True, timeout: Optional[float] = None) -> None:
+        """兼容 Queue.put 的接口"""
+        self.send(msg)
+
+    def put_nowait(self, msg: Dict[str, Any]) -> None:
+        """兼容 Queue.put_nowait 的接口"""
+        self.send(msg)
+
+    # ---- 接收 ----
+
+    def recv(self) -> Dict[str, Any]:
+        """阻塞接收一条报文（子进程命令循环使用）"""
+        return self._conn.recv()
+
+    @property
+    def is_reading(self) -> bool:
+        return self._reading
+
+    def start_reading(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        on_message: Callable[[Dict[str, Any]], None],
+        on_close: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        在事件循环中接收报文，回调总在事件循环线程中执行
+
+        Args:
+            loop: 主进程事件循环
+            on_message: 收到报文时的回调
+            on_close: 对端关闭（子进程退出）时的回调
+        """
+        if self._reading:
+            return
+        self._loop = loop
+        self._on_message = on_message
+        self._on_close = on_close
+        self._reading = True
+        try:
+            fd = self._conn.fileno()
+            loop.add_reader(fd, self._on_readable)
+            self._reader_fd = fd
+        except (NotImplementedError, AttributeError, ValueError, OSError):
+            self._reader_thread = threading.Thread(
+                target=self._read_blocking, name=f"plugin-reader-{self.name}", daemon=True
+            )
+            self._reader_thread.start()
+
+    def stop_reading(self) -> None:
+        """停止接收（不关闭连接）"""
+        self._reading = False
+        if self._reader_fd is not None and self._loop is not None:
+            try:
+                self._loop.remove_reader(self._reader_fd)
+            except (ValueError, OSError, RuntimeError):
+                pass
+            self._reader_fd = None
+
+    def close(self) -> None:
+        """停止接收并关闭连接"""
+        self.stop_reading()
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+
+    def _on_readable(self) -> None:
+        try:
+            # 一次把已到达的报文读完
+            while self._reading and self._conn.poll():
+                self._dispatch(self._conn.recv())
+        except (EOFError, OSError):
+            self._handle_closed()
+
+    def _read_blocking(self) -> None:
+        loop = self._loop
+        while self._reading:
+            try:
+                msg = self._conn.recv()
+            except (EOFError, OSError):
+                if loop is not None and not loop.is_closed():
+                    loop.call_soon_threadsafe(self._handle_closed)
+                return
+            if loop is None or loop.is_closed():
+                return
+            loop.call_soon_threadsafe(self._dispatch, msg)
+
+    def _dispatch(self, msg: Dict[str, Any]) -> None:
+        if not self._reading or self._on_message is None:
+            return
+        try:
+            self._on_message(msg)
+        except Exception as e:
+            self.logger.exception(f"Error handling message from plugin {self.name}: {e}")
+
+    def _handle_closed(self) -> None:
+        if not self._reading:
+            return
+        self.stop_reading()
+        if self._on_close is not None:
+            try:
+                self._on_close()
+            except Exception as e:
+                self.logger.exception(f"Error in close callback for plugin {self.name}: {e}")
@@ -59,11 +59,15 @@ def plugin_entry(
     kind: str = "action",
     auto_start: bool = False,
     extra: dict | None = None,
+    max_concurrency: int | None = None,
 ) -> Callable:
     """
     语法糖：专门用来声明"对外可调用入口"的装饰器。
     本质上是 on_event(event_type="plugin_entry").
+    - max_concurrency: 该入口允许同时执行的调用数（默认 PLUGIN_ENTRY_DEFAULT_CONCURRENCY）
     """
+    if max_concurrency is not None:
+        extra = {**(extra or {}), "max_concurrency": max_concurrency}
     return on_event(
         event_type="plugin_entry",
         id=id,
@@ -29,8 +29,7 @@ async def startup() -> None:
     服务器启动时的初始化
     
     1. 从 TOML 配置加载插件
-    2. 启动插件的通信资源
-    3. 启动状态消费任务
+    2. 启动插件的通信资源（状态更新直接推送到状态管理器）
     """
     # 加载插件
     load_plugins_from_toml(PLUGIN_CONFIG_ROOT, logger, _factory)
@@ -44,33 +43,23 @@ async def startup() -> None:
     # 启动所有插件的通信资源管理器
     for plugin_id, host in state.plugin_hosts.items():
         try:
-            await host.start(message_target_queue=state.message_queue)
+            await host.start(
+                message_target_queue=state.message_store,
+                status_handler=status_manager.apply_status_update,
+            )
             logger.debug(f"Started communication resources for plugin {plugin_id}")
         except Exception as e:
             logger.exception(f"Failed to start communication resources for plugin {plugin_id}: {e}")
-    
-    # 启动状态消费任务
-    await status_manager.start_status_consumer(
-        plugin_hosts_getter=lambda: state.plugin_hosts
-    )
-    logger.info("Status consumer started")
 
 
 async def shutdown() -> None:
     """
     服务器关闭时的清理
     
-    1. 关闭状态消费任务
-    2. 关闭所有插件的资源
+    关闭所有插件的资源
     """
     logger.info("Shutting down all plugins...")
     
-    # 关闭状态消费任务
-    try:
-        await status_manager.shutdown_status_consumer(timeout=PLUGIN_SHUTDOWN_TIMEOUT)
-    except Exception:
-        logger.exception("Error shutting down status consumer")
-    
     # 关闭所有插件的资源
     shutdown_tasks = []
     for plugin_id, host in state.plugin_hosts.items():
@@ -4,9 +4,10 @@
 提供插件相关的业务逻辑处理。
 """
 import asyncio
+import hashlib
+import json
 import logging
-import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
 
@@ -28,6 +29,9 @@ from plugin.settings import (
 
 logger = logging.getLogger("user_plugin_server")
 
+# 按 state.plugin_catalog_version 缓存的插件列表及其 ETag
+_plugin_catalog_cache: Dict[str, Any] = {"version": None, "plugins": [], "etag": ""}
+
 
 def build_plugin_list() -> List[Dict[str, Any]]:
     """
@@ -96,6 +100,22 @@ def build_plugin_list() -> List[Dict[str, Any]]:
     return result
 
 
+def get_plugin_catalog() -> Tuple[List[Dict[str, Any]], str]:
+    """
+    获取插件列表及其 ETag（注册表未变化时直接返回缓存）
+    
+    ETag 取插件列表内容的哈希，插件服务器重启后内容不变时 ETag 也不变。
+    """
+    version = state.plugin_catalog_version
+    if _plugin_catalog_cache["version"] != version:
+        plugins = build_plugin_list()
+        digest = hashlib.sha1(
+            json.dumps(plugins, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()[:16]
+        _plugin_catalog_cache.update(version=version, plugins=plugins, etag=f'"{digest}"')
+    return _plugin_catalog_cache["plugins"], _plugin_catalog_cache["etag"]
+
+
 async def trigger_plugin(
     plugin_id: str,
     entry_id: str,
@@ -144,10 +164,10 @@ async def trigger_plugin(
             detail=f"Plugin '{plugin_id}' is not running/loaded"
         )
     
-    # 检查进程健康状态
+    # 检查进程健康状态（延迟启动的插件尚未创建进程，交给 host.trigger 按需启动）
     try:
         health = host.health_check()
-        if not health.alive:
+        if not health.alive and health.status != "not_started":
             raise HTTPException(
                 status_code=503,
                 detail=f"Plugin '{plugin_id}' process is not alive (status: {health.status})"
@@ -189,95 +209,86 @@ async def trigger_plugin(
     )
 
 
+def _build_push_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """把存储中的消息构建为 PluginPushMessage 字典，并输出服务器终端日志"""
+    plugin_message = PluginPushMessage(
+        plugin_id=msg.get("plugin_id", ""),
+        source=msg.get("source", ""),
+        description=msg.get("description", ""),
+        priority=msg.get("priority", 0),
+        message_type=msg.get("message_type", "text"),
+        content=msg.get("content"),
+        binary_data=msg.get("binary_data"),
+        binary_url=msg.get("binary_url"),
+        metadata=msg.get("metadata", {}),
+        timestamp=msg.get("time", now_iso()),
+        message_id=msg.get("message_id", ""),
+        seq=msg.get("seq", 0),
+    )
+    
+    # 服务器终端日志输出
+    content_str = msg.get("content") or ""
+    logger.info(
+        f"[MESSAGE] Plugin: {msg.get('plugin_id', 'unknown')} | "
+        f"Source: {msg.get('source', 'unknown')} | "
+        f"Priority: {msg.get('priority', 0)} | "
+        f"Description: {msg.get('description', '')} | "
+        f"Content: {content_str[:100]}"
+    )
+    return plugin_message.model_dump()
+
+
 def get_messages_from_queue(
     plugin_id: Optional[str] = None,
     max_count: int | None = None,
     priority_min: Optional[int] = None,
+    since: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
-    从消息队列中获取消息
+    从消息存储中获取消息
     
     Args:
         plugin_id: 过滤特定插件（可选）
         max_count: 最大数量（None 时使用默认值）
         priority_min: 最低优先级（可选）
+        since: 游标（可选）；给出时只返回序号大于它的消息且不移除，否则取走返回的消息
     
     Returns:
-        消息列表
+        消息列表（按序号升序）
     """
     if max_count is None:
         max_count = MESSAGE_QUEUE_DEFAULT_MAX_COUNT
     
-    # 先把当前队列内容全部取出
-    remaining: List[Dict[str, Any]] = []
-    while True:
-        try:
-            msg = state.message_queue.get_nowait()
-            remaining.append(msg)
-        except asyncio.QueueEmpty:
-            break
-    
-    # 在内存里按顺序过滤 + 构造返回
-    messages: List[Dict[str, Any]] = []
-    kept: List[Dict[str, Any]] = []
-    count = 0
-    
-    for msg in remaining:
-        if count < max_count:
-            # 过滤插件ID
-            if plugin_id and msg.get("plugin_id") != plugin_id:
-                kept.append(msg)
-                continue
-            
-            # 过滤优先级
-            if priority_min is not None:
-                msg_priority = msg.get("priority", 0)
-                if msg_priority < priority_min:
-                    kept.append(msg)
-                    continue
-            
-            # 命中的消息构建 PluginPushMessage
-            message_id = str(uuid.uuid4())
-            plugin_message = PluginPushMessage(
-                plugin_id=msg.get("plugin_id", ""),
-                source=msg.get("source", ""),
-                description=msg.get("description", ""),
-                priority=msg.get("priority", 0),
-                message_type=msg.get("message_type", "text"),
-                content=msg.get("content"),
-                binary_data=msg.get("binary_data"),
-                binary_url=msg.get("binary_url"),
-                metadata=msg.get("metadata", {}),
-                timestamp=msg.get("time", now_iso()),
-                message_id=message_id,
-            )
-            message_dict = plugin_message.model_dump()
-            messages.append(message_dict)
-            
-            # 服务器终端日志输出
-            content_str = msg.get("content") or ""
-            logger.info(
-                f"[MESSAGE] Plugin: {msg.get('plugin_id', 'unknown')} | "
-                f"Source: {msg.get('source', 'unknown')} | "
-                f"Priority: {msg.get('priority', 0)} | "
-                f"Description: {msg.get('description', '')} | "
-                f"Content: {content_str[:100]}"
-            )
-            
-            count += 1
-        else:
-            # 已达到最大数量，剩余消息保留
-            kept.append(msg)
-    
-    # 未消费的消息按原顺序放回队列
-    for msg in kept:
-        try:
-            state.message_queue.put_nowait(msg)
-        except asyncio.QueueFull:
-            logger.warning("Message queue is full when re-queueing filtered messages, dropping")
-            break
+    records = state.message_store.query(
+        plugin_id=plugin_id,
+        priority_min=priority_min,
+        max_count=max_count,
+        since=since,
+    )
+    return [_build_push_message(msg) for msg in records]
+
+
+async def wait_messages_from_queue(
+    wait: float,
+    plugin_id: Optional[str] = None,
+    max_count: int | None = None,
+    priority_min: Optional[int] = None,
+    since: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    长轮询版本的 get_messages_from_queue：没有命中的消息时最多等待 wait 秒
+    """
+    if max_count is None:
+        max_count = MESSAGE_QUEUE_DEFAULT_MAX_COUNT
     
-    return messages
+    records = await state.message_store.wait_query(
+        wait,
+        plugin_id=plugin_id,
+        priority_min=priority_min,
+        max_count=max_count,
+        since=since,
+    )
+    return [_build_push_message(msg) for msg in records]
 
 
 def push_message_to_queue(
@@ -292,12 +303,11 @@ def push_message_to_queue(
     metadata: Optional[Dict[str, Any]] = None,
 ) -> str:
     """
-    将消息推送到队列
+    将消息推送到消息存储（存储满时淘汰最旧的消息）
     
     Returns:
         message_id
     """
-    message_id = str(uuid.uuid4())
     message = {
         "type": "MESSAGE_PUSH",
         "plugin_id": plugin_id,
@@ -313,7 +323,7 @@ def push_message_to_queue(
     }
     
     try:
-        state.message_queue.put_nowait(message)
+        record = state.message_store.put_nowait(message)
         logger.info(
             f"[MESSAGE PUSH] Plugin: {plugin_id} | "
             f"Source: {source} | "
@@ -322,26 +332,14 @@ def push_message_to_queue(
             f"Description: {description} | "
             f"Content: {(content or '')[:100]}"
         )
-    except asyncio.QueueFull:
-        # 队列满时，尝试移除最旧的消息
-        try:
-            state.message_queue.get_nowait()
-            state.message_queue.put_nowait(message)
-            logger.warning("Message queue full, dropped oldest message")
-        except (asyncio.QueueEmpty, AttributeError, RuntimeError) as e:
-            logger.error(f"Failed to enqueue message, queue full and cleanup failed: {e}")
-            raise HTTPException(
-                status_code=503,
-                detail="Message queue is full, please try again later"
-            ) from e
     except (AttributeError, RuntimeError) as e:
-        logger.error(f"Message queue error: {e}")
+        logger.error(f"Message store error: {e}")
         raise HTTPException(
             status_code=503,
             detail="Message queue is not available"
         ) from e
     
-    return message_id
+    return record["message_id"]
 
 
 def _enqueue_event(event: Dict[str, Any]) -> None:
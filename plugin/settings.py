@@ -33,6 +33,21 @@ def get_plugin_config_root() -> Path:
 
 PLUGIN_CONFIG_ROOT = get_plugin_config_root()
 
+# 插件静态元数据缓存文件名（位于插件配置根目录下，按 plugin.toml 与插件源码的修改时间失效）
+PLUGIN_METADATA_CACHE_FILE = ".metadata_cache.json"
+
+
+# ========== 启动配置 ==========
+
+# 是否延迟启动插件进程（第一次 trigger 时才创建子进程）
+# 带 lifecycle / timer / message 事件的插件需要后台运行，总是立即启动
+PLUGIN_LAZY_START = os.getenv("PLUGIN_LAZY_START", "1").strip().lower() not in ("0", "false", "no")
+
+# 启动时预热（立即创建进程）的插件 ID 列表，可通过环境变量 PLUGIN_PREWARM 以逗号分隔指定
+PLUGIN_PREWARM = frozenset(
+    pid.strip() for pid in os.getenv("PLUGIN_PREWARM", "").split(",") if pid.strip()
+)
+
 
 # ========== 队列配置 ==========
 
@@ -54,12 +69,6 @@ PLUGIN_TRIGGER_TIMEOUT = 10.0
 # 插件关闭超时（shutdown）
 PLUGIN_SHUTDOWN_TIMEOUT = 5.0
 
-# 队列操作超时（queue.get）
-QUEUE_GET_TIMEOUT = 1.0
-
-# 状态消费关闭超时
-STATUS_CONSUMER_SHUTDOWN_TIMEOUT = 5.0
-
 # 进程关闭超时
 PROCESS_SHUTDOWN_TIMEOUT = 5.0
 
@@ -69,10 +78,12 @@ PROCESS_TERMINATE_TIMEOUT = 1.0
 
 # ========== 线程池配置 ==========
 
-# 通信资源管理器的线程池最大工作线程数
-# 根据CPU核心数动态设置，适合I/O密集型操作
-# 公式：min(4, CPU核心数 + 2)，确保至少有足够的并发能力
-COMMUNICATION_THREAD_POOL_MAX_WORKERS = min(4, (os.cpu_count() or 1) + 2)
+# 插件子进程中执行同步入口、同步定时任务的线程数
+PLUGIN_SYNC_ENTRY_WORKERS = 8
+
+# 单个入口默认允许同时执行的调用数（可在 @plugin_entry(max_concurrency=...) 中覆盖）
+# 不同入口之间互不阻塞；默认同一入口串行，避免未做线程安全处理的插件出错
+PLUGIN_ENTRY_DEFAULT_CONCURRENCY = 1
 
 
 # ========== 消息队列配置 ==========
@@ -80,8 +91,8 @@ COMMUNICATION_THREAD_POOL_MAX_WORKERS = min(4, (os.cpu_count() or 1) + 2)
 # 获取消息时的默认最大数量
 MESSAGE_QUEUE_DEFAULT_MAX_COUNT = 100
 
-# 状态消息获取时的默认最大数量
-STATUS_MESSAGE_DEFAULT_MAX_COUNT = 100
+# 长轮询获取消息时允许的最长等待时间（秒）
+MESSAGE_LONG_POLL_MAX_WAIT = 60.0
 
 
 # ========== SDK 元数据属性 ==========
@@ -96,18 +107,6 @@ NEKO_PLUGIN_TAG = "__neko_plugin__"
 EVENT_META_ATTR = "__neko_event_meta__"
 
 
-# ========== 其他配置 ==========
-
-# 状态消费任务的休眠间隔（秒）
-STATUS_CONSUMER_SLEEP_INTERVAL = 0.1
-
-# 消息消费任务的休眠间隔（秒）
-MESSAGE_CONSUMER_SLEEP_INTERVAL = 0.1
-
-# 结果消费任务的休眠间隔（秒）
-RESULT_CONSUMER_SLEEP_INTERVAL = 0.1
-
-
 # ========== 插件Logger配置 ==========
 
 # 插件文件日志默认配置
@@ -163,20 +162,18 @@ def validate_config() -> None:
     if PLUGIN_SHUTDOWN_TIMEOUT > 300:
         raise ValueError("PLUGIN_SHUTDOWN_TIMEOUT is unreasonably large (max: 300s)")
     
-    if COMMUNICATION_THREAD_POOL_MAX_WORKERS <= 0:
-        raise ValueError("COMMUNICATION_THREAD_POOL_MAX_WORKERS must be positive")
-    if COMMUNICATION_THREAD_POOL_MAX_WORKERS > 100:
-        raise ValueError("COMMUNICATION_THREAD_POOL_MAX_WORKERS is unreasonably large (max: 100)")
-    
+    if PLUGIN_SYNC_ENTRY_WORKERS <= 0:
+        raise ValueError("PLUGIN_SYNC_ENTRY_WORKERS must be positive")
+    if PLUGIN_ENTRY_DEFAULT_CONCURRENCY <= 0:
+        raise ValueError("PLUGIN_ENTRY_DEFAULT_CONCURRENCY must be positive")
+
     if MESSAGE_QUEUE_DEFAULT_MAX_COUNT <= 0:
         raise ValueError("MESSAGE_QUEUE_DEFAULT_MAX_COUNT must be positive")
     if MESSAGE_QUEUE_DEFAULT_MAX_COUNT > 10000:
         raise ValueError("MESSAGE_QUEUE_DEFAULT_MAX_COUNT is unreasonably large (max: 10000)")
     
-    if STATUS_MESSAGE_DEFAULT_MAX_COUNT <= 0:
-        raise ValueError("STATUS_MESSAGE_DEFAULT_MAX_COUNT must be positive")
-    if STATUS_MESSAGE_DEFAULT_MAX_COUNT > 10000:
-        raise ValueError("STATUS_MESSAGE_DEFAULT_MAX_COUNT is unreasonably large (max: 10000)")
+    if MESSAGE_LONG_POLL_MAX_WAIT <= 0:
+        raise ValueError("MESSAGE_LONG_POLL_MAX_WAIT must be positive")
 
 
 # 在模块加载时验证配置
@@ -189,6 +186,11 @@ __all__ = [
     # 路径配置
     "PLUGIN_CONFIG_ROOT",
     "get_plugin_config_root",
+    "PLUGIN_METADATA_CACHE_FILE",
+    
+    # 启动配置
+    "PLUGIN_LAZY_START",
+    "PLUGIN_PREWARM",
     
     # 队列配置
     "EVENT_QUEUE_MAX",
@@ -198,28 +200,22 @@ __all__ = [
     "PLUGIN_EXECUTION_TIMEOUT",
     "PLUGIN_TRIGGER_TIMEOUT",
     "PLUGIN_SHUTDOWN_TIMEOUT",
-    "QUEUE_GET_TIMEOUT",
-    "STATUS_CONSUMER_SHUTDOWN_TIMEOUT",
     "PROCESS_SHUTDOWN_TIMEOUT",
     "PROCESS_TERMINATE_TIMEOUT",
     
     # 线程池配置
-    "COMMUNICATION_THREAD_POOL_MAX_WORKERS",
+    "PLUGIN_SYNC_ENTRY_WORKERS",
+    "PLUGIN_ENTRY_DEFAULT_CONCURRENCY",
     
     # 消息队列配置
     "MESSAGE_QUEUE_DEFAULT_MAX_COUNT",
-    "STATUS_MESSAGE_DEFAULT_MAX_COUNT",
+    "MESSAGE_LONG_POLL_MAX_WAIT",
     
     # SDK 元数据属性
     "NEKO_PLUGIN_META_ATTR",
     "NEKO_PLUGIN_TAG",
     "EVENT_META_ATTR",
     
-    # 其他配置
-    "STATUS_CONSUMER_SLEEP_INTERVAL",
-    "MESSAGE_CONSUMER_SLEEP_INTERVAL",
-    "RESULT_CONSUMER_SLEEP_INTERVAL",
-    
     # 插件Logger配置
     "PLUGIN_LOG_LEVEL",
     "PLUGIN_LOG_MAX_BYTES",
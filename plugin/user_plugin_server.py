@@ -9,7 +9,7 @@ import logging
 from contextlib import asynccontextmanager
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from config import USER_PLUGIN_SERVER_PORT
 
 from plugin.core.state import state
@@ -23,14 +23,15 @@ from plugin.runtime.registry import get_plugins as registry_get_plugins
 from plugin.runtime.status import status_manager
 from plugin.server.exceptions import register_exception_handlers
 from plugin.server.services import (
-    build_plugin_list,
+    get_plugin_catalog,
     trigger_plugin,
     get_messages_from_queue,
+    wait_messages_from_queue,
     push_message_to_queue,
 )
 from plugin.server.lifecycle import startup, shutdown
 from plugin.server.utils import now_iso
-from plugin.settings import MESSAGE_QUEUE_DEFAULT_MAX_COUNT
+from plugin.settings import MESSAGE_QUEUE_DEFAULT_MAX_COUNT, MESSAGE_LONG_POLL_MAX_WAIT
 
 
 @asynccontextmanager
@@ -65,6 +66,7 @@ async def available():
         "status": "ok",
         "available": True,
         "plugins_count": plugins_count,
+        "load_stats": dict(state.plugin_load_stats),
         "time": now_iso()
     }
 
@@ -96,7 +98,7 @@ async def plugin_status(plugin_id: Optional[str] = Query(default=None)):
 # ========== 插件管理路由 ==========
 
 @app.get("/plugins")
-async def list_plugins():
+async def list_plugins(request: Request, response: Response):
     """
     返回已知插件列表
     
@@ -105,9 +107,14 @@ async def list_plugins():
         "plugins": [ ... ],
         "message": "..."
     }
+    
+    响应带 ETag；请求头 If-None-Match 与之相同时返回 304，客户端继续使用缓存的列表。
     """
     try:
-        plugins = build_plugin_list()
+        plugins, etag = get_plugin_catalog()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         
         if plugins:
             return {"plugins": plugins, "message": ""}
@@ -151,25 +158,46 @@ async def get_plugin_messages(
     plugin_id: Optional[str] = Query(default=None),
     max_count: int = Query(default=MESSAGE_QUEUE_DEFAULT_MAX_COUNT, ge=1, le=1000),
     priority_min: Optional[int] = Query(default=None, description="最低优先级（包含）"),
+    since: Optional[int] = Query(default=None, ge=0, description="游标：只返回序号大于它的消息（不移除）"),
+    wait: float = Query(default=0, ge=0, le=MESSAGE_LONG_POLL_MAX_WAIT, description="长轮询等待秒数"),
 ):
     """
-    获取插件推送的消息队列
+    获取插件推送的消息
     
-    - GET /plugin/messages                    -> 获取所有插件的消息
+    - GET /plugin/messages                    -> 获取（并取走）所有插件的消息
     - GET /plugin/messages?plugin_id=xxx       -> 获取指定插件的消息
     - GET /plugin/messages?max_count=50        -> 限制返回数量
     - GET /plugin/messages?priority_min=5      -> 只返回优先级>=5的消息
+    - GET /plugin/messages?since=123           -> 只读取序号 123 之后的消息，不移除（下次用返回的 next_cursor）
+    - GET /plugin/messages?since=123&wait=25   -> 长轮询：暂无新消息时最多等待 25 秒
     """
     try:
-        messages = get_messages_from_queue(
-            plugin_id=plugin_id,
-            max_count=max_count,
-            priority_min=priority_min,
-        )
+        if wait > 0:
+            messages = await wait_messages_from_queue(
+                wait,
+                plugin_id=plugin_id,
+                max_count=max_count,
+                priority_min=priority_min,
+                since=since,
+            )
+        else:
+            messages = get_messages_from_queue(
+                plugin_id=plugin_id,
+                max_count=max_count,
+                priority_min=priority_min,
+                since=since,
+            )
+        
+        if messages:
+            next_cursor = messages[-1]["seq"]
+        else:
+            # 没有命中：游标推进到当前最新序号，避免下次重复扫描不相关的消息
+            next_cursor = max(since or 0, state.message_store.last_seq)
         
         return {
             "messages": messages,
             "count": len(messages),
+            "next_cursor": next_cursor,
             "time": now_iso(),
         }
     except Exception as e:
@@ -2822,11 +2822,16 @@ function init_app() {
                 }
 
                 if (isRecording && socket.readyState === WebSocket.OPEN) {
-                    socket.send(JSON.stringify({
-                        action: 'stream_data',
-                        data: Array.from(audioData),
-                        input_type: 'audio'
-                    }));
+                    // 二进制音频帧：8字节头（magic 'NKA1' + uint32 LE 采样率）+ int16 PCM
+                    const frame = new ArrayBuffer(8 + audioData.byteLength);
+                    const header = new DataView(frame);
+                    header.setUint8(0, 0x4E); // 'N'
+                    header.setUint8(1, 0x4B); // 'K'
+                    header.setUint8(2, 0x41); // 'A'
+                    header.setUint8(3, 0x31); // '1'
+                    header.setUint32(4, targetSampleRate, true);
+                    new Int16Array(frame, 8).set(audioData);
+                    socket.send(frame);
                 }
             };
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试嵌入计算服务（批量合并、缓存去重、失败传递、重试期间的检索查询）
+"""
+import sys
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory import embedding
+from memory.embedding import EmbeddingCache, EmbeddingService
+
+# 缩短批量窗口与退避时间，测试不必真的等待
+embedding.EMBEDDING_BATCH_WINDOW = 0.01
+embedding.EMBEDDING_RETRY_MIN_DELAY = 0.3
+embedding.EMBEDDING_MAX_RETRIES = 2
+
+
+class FakeEmbeddings:
+    """按文本长度生成向量；fail 中的文本所在批次请求失败"""
+
+    def __init__(self, fail=(), drop_last=False):
+        self.fail = set(fail)
+        self.drop_last = drop_last
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        if self.fail & set(texts):
+            raise ConnectionError("provider down")
+        vectors = [[float(len(text)), 1.0, 0.5] for text in texts]
+        return vectors[:-1] if self.drop_last else vectors
+
+
+def test_batching_and_cache_dedupe():
+    """相同文本只请求一次；同一目录的新服务直接命中磁盘缓存"""
+    print("\n=== 批量合并与缓存 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        fake = FakeEmbeddings()
+        service = EmbeddingService(fake, "m", Path(tmp))
+        vectors = service.embed_documents(["你好", "早上好", "你好"])
+        print(f"calls={fake.calls}")
+        assert vectors[0] == vectors[2] == [2.0, 1.0, 0.5]
+        assert vectors[1] == [3.0, 1.0, 0.5]
+        assert fake.calls == [["你好", "早上好"]]
+
+        fake2 = FakeEmbeddings()
+        reopened = EmbeddingService(fake2, "m", Path(tmp))
+        assert reopened.embed_query("早上好") == [3.0, 1.0, 0.5]
+        assert fake2.calls == []
+        assert reopened.stats()["cache_hits"] == 1
+
+
+def test_failure_propagates_to_futures():
+    """重试耗尽后所有等待方都收到异常，之后进入冷却期直接失败"""
+    print("\n=== 失败传递 ===")
+    fake = FakeEmbeddings(fail={"坏"})
+    service = EmbeddingService(fake, "m")
+    futures = service.submit(["坏", "好"])
+    for future in futures:
+        try:
+            future.result(timeout=5)
+        except ConnectionError as e:
+            print(f"future failed: {e}")
+        else:
+            raise AssertionError("应当失败")
+    assert len(fake.calls) == embedding.EMBEDDING_MAX_RETRIES
+    try:
+        service.embed_query("冷却期")
+    except RuntimeError as e:
+        print(f"cooldown: {e}")
+    else:
+        raise AssertionError("冷却期内应当直接失败")
+    assert len(fake.calls) == embedding.EMBEDDING_MAX_RETRIES
+
+
+def test_unexpected_errors_resolve_futures():
+    """返回的向量数量不对、写缓存出错时 Future 也会结束，后台线程继续工作"""
+    print("\n=== 意外错误 ===")
+    fake = FakeEmbeddings(drop_last=True)
+    service = EmbeddingService(fake, "m")
+    future = service.submit(["一", "二"])[1]
+    try:
+        future.result(timeout=5)
+    except ValueError as e:
+        print(f"count mismatch: {e}")
+    else:
+        raise AssertionError("向量数量不一致时应当失败")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = EmbeddingService(FakeEmbeddings(), "m", Path(tmp))
+
+        def broken_put_many(items):
+            raise OSError("disk full")
+
+        service.cache.put_many = broken_put_many
+        assert service.embed_query("三") == [1.0, 1.0, 0.5]
+        # 同一个后台线程还能继续处理后续请求
+        thread = service._thread
+        assert service.embed_query("四四") == [2.0, 1.0, 0.5]
+        assert service._thread is thread and thread.is_alive()
+
+
+def test_query_not_blocked_by_retry():
+    """某个批次退避重试期间，检索查询照常处理"""
+    print("\n=== 重试期间的查询 ===")
+    fake = FakeEmbeddings(fail={"坏"})
+    service = EmbeddingService(fake, "m")
+    failing = service.submit(["坏"])[0]
+    while not fake.calls:
+        time.sleep(0.01)
+    started = time.monotonic()
+    assert service.embed_query("查询") == [2.0, 1.0, 0.5]
+    elapsed = time.monotonic() - started
+    print(f"query answered after {elapsed * 1000:.0f} ms")
+    assert elapsed < embedding.EMBEDDING_RETRY_MIN_DELAY
+    assert not failing.done()
+    # 重试中的文本再次提交时共用同一个 Future，不会重复请求
+    assert service.submit(["坏"])[0] is failing
+    try:
+        failing.result(timeout=5)
+    except ConnectionError:
+        pass
+    assert [call for call in fake.calls if call == ["坏"]] == [["坏"]] * embedding.EMBEDDING_MAX_RETRIES
+
+
+def test_cache_recovers_torn_tail():
+    """缓存文件尾部写了一半（崩溃）时，以向量与哈希中较短的一方为准"""
+    print("\n=== 缓存尾部恢复 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(Path(tmp))
+        cache.put_many({"a" * 64: [1.0, 2.0], "b" * 64: [3.0, 4.0]})
+        with open(Path(tmp) / "vectors.f16", "ab") as f:
+            f.write(b"\x00\x3c")  # 半行向量
+        with open(Path(tmp) / "keys.txt", "a", encoding="ascii") as f:
+            f.write("c" * 10)  # 半行哈希
+
+        reopened = EmbeddingCache(Path(tmp))
+        assert len(reopened) == 2
+        assert reopened.get_many(["b" * 64]) == {"b" * 64: [3.0, 4.0]}
+        assert os.path.getsize(Path(tmp) / "vectors.f16") == 2 * 2 * 2
+        reopened.put_many({"c" * 64: [5.0, 6.0]})
+        assert EmbeddingCache(Path(tmp)).get_many(["c" * 64]) == {"c" * 64: [5.0, 6.0]}
+
+
+if __name__ == "__main__":
+    test_batching_and_cache_dedupe()
+    test_failure_propagates_to_futures()
+    test_unexpected_errors_resolve_futures()
+    test_query_not_blocked_by_retry()
+    test_cache_recovers_torn_tail()
+    print("\n嵌入服务测试全部通过！")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试近期记忆的追加式日志（重放、写了一半的尾行、外部改写、合并、只读读取）
+"""
+import sys
+import os
+import json
+import tempfile
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import history_journal
+from utils.history_journal import HistoryJournal, read_history_file, write_history_file
+
+
+def _msg(text):
+    return {"type": "human", "data": {"content": text}}
+
+
+def _texts(history):
+    return [m["data"]["content"] for m in history]
+
+
+def test_replay():
+    """追加与前缀替换只写日志，新实例重放后得到相同的记录"""
+    print("\n=== 日志重放 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recent_test.json")
+        journal = HistoryJournal(path)
+        journal.append([_msg("a"), _msg("b")])
+        journal.append([_msg("c")])
+        journal.replace_prefix(2, [_msg("summary")])
+        assert not os.path.exists(path)  # 还没有合并进快照
+        assert os.path.exists(journal.journal_path)
+
+        replayed = HistoryJournal(path).load()
+        print(f"replayed -> {_texts(replayed)}")
+        assert _texts(replayed) == ["summary", "c"]
+        assert _texts(read_history_file(path)) == ["summary", "c"]
+
+
+def test_torn_final_line():
+    """最后一行只写了一半：重放时忽略，拥有日志的实例截掉尾部后继续追加"""
+    print("\n=== 写了一半的尾行 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recent_test.json")
+        HistoryJournal(path).append([_msg("a")])
+        with open(path + ".journal", "ab") as f:
+            f.write(b'{"op": "append", "messages": [{"type": "hu')
+
+        journal = HistoryJournal(path)
+        assert _texts(journal.load()) == ["a"]
+        journal.append([_msg("b")])
+        assert _texts(HistoryJournal(path).load()) == ["a", "b"]
+        with open(journal.journal_path, "rb") as f:
+            lines = f.readlines()
+        assert len(lines) == 3 and all(line.endswith(b"\n") for line in lines)
+
+
+def test_read_history_file_is_read_only():
+    """外部读取不会截断或删除日志（另一个进程可能正在写入）"""
+    print("\n=== 只读读取 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recent_test.json")
+        HistoryJournal(path).append([_msg("a")])
+        journal_path = path + ".journal"
+        partial = b'{"op": "append", "messages": [{"type": "human", "data": {"content": "b"}}]}'
+        with open(journal_path, "ab") as f:
+            f.write(partial)
+        with open(journal_path, "rb") as f:
+            before = f.read()
+
+        assert _texts(read_history_file(path)) == ["a"]
+        with open(journal_path, "rb") as f:
+            assert f.read() == before
+
+        # 写入方补完这一行后，读取方能看到完整的记录
+        with open(journal_path, "ab") as f:
+            f.write(b"\n")
+        assert _texts(read_history_file(path)) == ["a", "b"]
+
+        # 快照被外部改写后日志作废：只读读取忽略它但不删除
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([_msg("edited")], f)
+        assert _texts(read_history_file(path)) == ["edited"]
+        assert os.path.exists(journal_path)
+
+
+def test_stale_journal_after_external_edit():
+    """记忆浏览器改写快照后，旧日志不会再被应用，并由拥有日志的实例删除"""
+    print("\n=== 外部改写 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recent_test.json")
+        journal = HistoryJournal(path)
+        journal.append([_msg("a")])
+        write_history_file(path, [_msg("edited")])
+        assert not os.path.exists(path + ".journal")
+
+        with open(path + ".journal", "wb") as f:
+            f.write(b'{"base": "0000"}\n{"op": "append", "messages": []}\n')
+        assert _texts(journal.load()) == ["edited"]
+        assert not os.path.exists(path + ".journal")
+        journal.append([_msg("b")])
+        assert _texts(HistoryJournal(path).load()) == ["edited", "b"]
+
+
+def test_compaction():
+    """操作条数达到上限后合并进快照并删除日志"""
+    print("\n=== 合并 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recent_test.json")
+        journal = HistoryJournal(path)
+        for i in range(history_journal.RECENT_JOURNAL_MAX_OPS):
+            journal.append([_msg(str(i))])
+        assert not os.path.exists(journal.journal_path)
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        assert len(snapshot) == history_journal.RECENT_JOURNAL_MAX_OPS
+        journal.append([_msg("after")])
+        assert _texts(HistoryJournal(path).load())[-2:] == [str(history_journal.RECENT_JOURNAL_MAX_OPS - 1), "after"]
+
+
+if __name__ == "__main__":
+    test_replay()
+    test_torn_final_line()
+    test_read_history_file_is_read_only()
+    test_stale_journal_after_external_edit()
+    test_compaction()
+    print("\n历史记录日志测试全部通过！")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试记忆任务队列（按角色串行、排队任务合并、出错处理、退出后恢复）
+"""
+import sys
+import os
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory.jobs import MemoryJobQueue
+
+
+def _job_files(job_dir):
+    return sorted(path.name for path in Path(job_dir).glob("*.json"))
+
+
+def test_merge_pending_jobs():
+    """执行中的任务之后提交的任务合并成一个，只再执行一次"""
+    print("\n=== 排队任务合并 ===")
+
+    async def run(job_dir):
+        handled = []
+        release = asyncio.Event()
+
+        async def handler(job):
+            handled.append((job["id"], list(job["history"]), job["detailed"]))
+            if len(handled) == 1:
+                await release.wait()
+
+        queue = MemoryJobQueue(job_dir, handler)
+        first = queue.create("lan", [1])
+        queue.submit(first)
+        await asyncio.sleep(0)
+        assert queue.character_status("lan")["running"] == first["id"]
+
+        second = queue.create("lan", [2])
+        third = queue.create("lan", [3], detailed=True)
+        fourth = queue.create("lan", [4])
+        for job in (second, third, fourth):
+            queue.submit(job)
+        status = queue.character_status("lan")
+        print(f"status -> {status}")
+        assert status["queued"] == second["id"]
+        assert status["queued_messages"] == 3
+        # 被合并的任务文件已删除，合并结果写回排队中的任务
+        assert _job_files(job_dir) == sorted([f"{first['id']}.json", f"{second['id']}.json"])
+        with open(Path(job_dir) / f"{second['id']}.json", encoding="utf-8") as f:
+            assert json.load(f)["merged"] == [third["id"], fourth["id"]]
+
+        release.set()
+        while queue.stats()["running"] or queue.stats()["queued"]:
+            await asyncio.sleep(0.01)
+        print(f"handled -> {handled}")
+        assert handled == [(first["id"], [1], False), (second["id"], [2, 3, 4], True)]
+        assert _job_files(job_dir) == []
+        assert queue.get_status(fourth["id"])["state"] == "done"
+        assert queue.get_status(third["id"])["merged_into"] == second["id"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+
+def test_failed_job_is_removed():
+    """处理出错的任务记录错误状态并删除，同一角色的后续任务照常执行"""
+    print("\n=== 任务出错 ===")
+
+    async def run(job_dir):
+        async def handler(job):
+            if job["history"] == ["bad"]:
+                raise RuntimeError("boom")
+
+        queue = MemoryJobQueue(job_dir, handler)
+        bad = queue.create("lan", ["bad"])
+        queue.submit(bad)
+        await asyncio.sleep(0.05)
+        good = queue.create("lan", ["good"])
+        queue.submit(good)
+        await asyncio.sleep(0.05)
+        assert queue.get_status(bad["id"])["state"] == "error"
+        assert queue.get_status(bad["id"])["error"] == "boom"
+        assert queue.get_status(good["id"])["state"] == "done"
+        assert _job_files(job_dir) == []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+
+def test_recover_pending_jobs():
+    """退出时未完成的任务留在 pending_jobs，重启后按提交顺序恢复执行"""
+    print("\n=== 退出后恢复 ===")
+
+    async def interrupted(job_dir):
+        async def handler(job):
+            await asyncio.sleep(3600)
+
+        queue = MemoryJobQueue(job_dir, handler)
+        running = queue.create("lan", ["running"])
+        queue.submit(running)
+        await asyncio.sleep(0)
+        queue.submit(queue.create("lan", ["queued"]))
+        queue.create("other", ["never submitted"])
+        await queue.shutdown()
+        assert queue.get_status(running["id"])["state"] == "cancelled"
+
+    async def restarted(job_dir):
+        handled = []
+        prepared = []
+
+        async def handler(job):
+            handled.append((job["lanlan_name"], job["history"]))
+
+        queue = MemoryJobQueue(job_dir, handler)
+        assert queue.recover(prepare=lambda job: prepared.append(job["history"])) == 3
+        await asyncio.sleep(0.05)
+        print(f"handled -> {handled}")
+        assert prepared == [["running"], ["queued"], ["never submitted"]]
+        # 同一角色的两个任务在恢复时合并为一个
+        assert sorted(handled) == [("lan", ["running", "queued"]), ("other", ["never submitted"])]
+        assert _job_files(job_dir) == []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(interrupted(tmp))
+        assert len(_job_files(tmp)) == 3
+        asyncio.run(restarted(tmp))
+
+
+def test_recover_after_interrupted_merge():
+    """合并后的任务已写入、被合并的任务文件还没删除就退出：恢复时不重复处理被合并的消息"""
+    print("\n=== 合并中途退出 ===")
+
+    async def run(job_dir):
+        handled = []
+
+        async def handler(job):
+            handled.append(job["history"])
+
+        queue = MemoryJobQueue(job_dir, handler)
+        target = queue.create("lan", ["a"])
+        leftover = queue.create("lan", ["b"])
+        target["history"] = ["a", "b"]
+        target["merged"] = [leftover["id"]]
+        queue.persist(target)
+
+        assert queue.recover() == 1
+        await asyncio.sleep(0.05)
+        print(f"handled -> {handled}")
+        assert handled == [["a", "b"]]
+        assert _job_files(job_dir) == []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+
+if __name__ == "__main__":
+    test_merge_pending_jobs()
+    test_failed_job_is_removed()
+    test_recover_pending_jobs()
+    test_recover_after_interrupted_merge()
+    print("\n记忆任务队列测试全部通过！")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试延迟启动的插件：第一次通过 /plugin/trigger 调用时才创建进程
+"""
+import sys
+import os
+import asyncio
+import functools
+from pathlib import Path
+
+# 添加项目路径；插件入口（plugins.xxx）相对 plugin 目录导入，与单独运行 user_plugin_server 时一致
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugin"))
+
+import httpx
+
+from plugin.core.state import state
+from plugin.runtime.host import LazyPluginProcessHost, PluginProcessHost
+from plugin.user_plugin_server import app
+
+PLUGIN_ID = "testPlugin"
+PLUGIN_DIR = Path(__file__).parent / "plugin" / "plugins" / PLUGIN_ID
+
+
+def test_lazy_plugin_trigger_via_http():
+    """未启动的延迟插件可以被 HTTP 触发，触发后进程被创建并正常返回结果"""
+    print("\n=== 延迟启动插件的 HTTP 触发 ===")
+
+    async def run():
+        host = LazyPluginProcessHost(
+            PLUGIN_ID,
+            functools.partial(PluginProcessHost, PLUGIN_ID, "plugins.testPlugin:HelloPlugin", PLUGIN_DIR / "plugin.toml"),
+        )
+        await host.start()
+        health = host.health_check()
+        print(f"before trigger: alive={health.alive} status={health.status}")
+        assert not host.started
+        assert health.status == "not_started"
+
+        previous = state.plugin_hosts.get(PLUGIN_ID)
+        state.plugin_hosts[PLUGIN_ID] = host
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+                resp = await client.post("/plugin/trigger", json={
+                    "plugin_id": PLUGIN_ID,
+                    "entry_id": "run",
+                    "args": {"message": "lazy"},
+                })
+            print(f"trigger response: {resp.status_code} {resp.json()}")
+            assert resp.status_code == 200, resp.text
+            body = resp.json()
+            assert body["success"], body
+            assert body["plugin_response"]["hello"] == "lazy"
+            assert host.started
+            assert host.health_check().alive
+        finally:
+            if previous is None:
+                state.plugin_hosts.pop(PLUGIN_ID, None)
+            else:
+                state.plugin_hosts[PLUGIN_ID] = previous
+            await host.shutdown(timeout=5)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_lazy_plugin_trigger_via_http()
+    print("\n延迟启动插件测试通过！")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试插件消息存储（游标读取、容量淘汰、索引清理、长轮询唤醒）
+"""
+import sys
+import os
+import asyncio
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from plugin.core.message_store import PluginMessageStore
+
+
+def _msg(plugin_id, priority=0, content=""):
+    return {"plugin_id": plugin_id, "priority": priority, "content": content}
+
+
+def test_seq_and_cursor_reads():
+    """每条消息分配递增 seq；带游标读取只返回 seq 之后的消息且不移除"""
+    print("\n=== 游标读取 ===")
+    store = PluginMessageStore(maxsize=100)
+    records = [store.put_nowait(_msg("a", content=str(i))) for i in range(5)]
+    assert [r["seq"] for r in records] == [1, 2, 3, 4, 5]
+    assert all(r["message_id"] for r in records)
+    assert store.last_seq == 5
+
+    after = store.query(since=2)
+    print(f"since=2 -> {[r['seq'] for r in after]}")
+    assert [r["seq"] for r in after] == [3, 4, 5]
+    # 游标读取不移除消息
+    assert len(store) == 5
+    assert store.query(since=5) == []
+    assert [r["seq"] for r in store.query(since=0, max_count=2)] == [1, 2]
+
+
+def test_filtered_reads():
+    """按插件、最低优先级过滤，结果按 seq 升序"""
+    print("\n=== 过滤读取 ===")
+    store = PluginMessageStore(maxsize=100)
+    store.put_nowait(_msg("a", priority=1))   # 1
+    store.put_nowait(_msg("b", priority=5))   # 2
+    store.put_nowait(_msg("a", priority=7))   # 3
+    store.put_nowait(_msg("b", priority=2))   # 4
+    store.put_nowait(_msg("a", priority=5))   # 5
+
+    assert [r["seq"] for r in store.query(plugin_id="a", since=0)] == [1, 3, 5]
+    assert [r["seq"] for r in store.query(priority_min=5, since=0)] == [2, 3, 5]
+    assert [r["seq"] for r in store.query(plugin_id="a", priority_min=5, since=0)] == [3, 5]
+    assert [r["seq"] for r in store.query(plugin_id="b", since=2)] == [4]
+    assert store.query(plugin_id="missing", since=0) == []
+
+
+def test_destructive_query():
+    """不带游标时取走命中的消息，其余消息保留"""
+    print("\n=== 取走消息 ===")
+    store = PluginMessageStore(maxsize=100)
+    for i in range(4):
+        store.put_nowait(_msg("a" if i % 2 == 0 else "b", content=str(i)))
+
+    taken = store.query(plugin_id="a")
+    print(f"taken -> {[r['seq'] for r in taken]}")
+    assert [r["seq"] for r in taken] == [1, 3]
+    assert len(store) == 2
+    assert store.query(plugin_id="a") == []
+    assert [r["seq"] for r in store.query(since=0)] == [2, 4]
+    # 插件 a 的索引已被清空
+    assert "a" not in store._by_plugin
+
+
+def test_eviction_and_index_trimming():
+    """超出容量时淘汰最旧的消息，索引中同步清掉被淘汰的 seq"""
+    print("\n=== 容量淘汰 ===")
+    store = PluginMessageStore(maxsize=3)
+    store.put_nowait(_msg("old", priority=9))  # 1，会被淘汰
+    store.put_nowait(_msg("a", priority=1))    # 2
+    store.put_nowait(_msg("a", priority=1))    # 3
+    store.put_nowait(_msg("b", priority=2))    # 4 -> 淘汰 1
+
+    assert len(store) == 3
+    assert [r["seq"] for r in store.query(since=0)] == [2, 3, 4]
+    assert "old" not in store._by_plugin
+    assert 9 not in store._by_priority
+
+    store.put_nowait(_msg("b", priority=2))    # 5 -> 淘汰 2
+    assert list(store._by_plugin["a"]) == [3]
+    assert [r["seq"] for r in store.query(plugin_id="a", since=0)] == [3]
+    # 游标落在已淘汰的位置时，返回仍存在的后续消息
+    assert [r["seq"] for r in store.query(since=1)] == [3, 4, 5]
+    print(f"indexes -> plugin={dict(store._by_plugin)} priority={dict(store._by_priority)}")
+
+
+def test_filtered_take_cleans_other_index():
+    """按插件取走的消息也会从优先级索引中清掉，索引不会随取走的消息无限增长"""
+    print("\n=== 取走后的索引清理 ===")
+    store = PluginMessageStore(maxsize=20000)
+    store.put_nowait(_msg("a"))
+    for i in range(10000):
+        store.put_nowait(_msg("b"))
+        if i % 7 == 0:
+            store.query(plugin_id="b")
+    while store.query(plugin_id="b"):
+        pass
+
+    print(f"messages={len(store)} priority index={len(store._by_priority[0])}")
+    assert len(store) == 1
+    assert "b" not in store._by_plugin
+    assert len(store._by_priority[0]) <= 64
+    assert [r["seq"] for r in store.query(priority_min=0, since=0)] == [1]
+
+    # 压缩后索引仍然正确：新消息按顺序出现，取走后索引被删除
+    store.put_nowait(_msg("b", priority=0))
+    assert [r["plugin_id"] for r in store.query(priority_min=0)] == ["a", "b"]
+    assert store._by_priority == {} and store._by_plugin == {}
+
+
+def test_long_poll_wakeup():
+    """长轮询在新消息到达时立即返回，超时时返回空列表"""
+    print("\n=== 长轮询 ===")
+
+    async def run():
+        store = PluginMessageStore(maxsize=10)
+        loop = asyncio.get_running_loop()
+
+        # 超时：没有消息
+        started = loop.time()
+        assert await store.wait_query(0.05, since=0) == []
+        assert loop.time() - started >= 0.04
+
+        # 不相关的消息不会让等待者提前返回
+        loop.call_later(0.02, store.put_nowait, _msg("other"))
+        loop.call_later(0.05, store.put_nowait, _msg("target", content="hello"))
+        started = loop.time()
+        result = await store.wait_query(2.0, plugin_id="target", since=store.last_seq)
+        elapsed = loop.time() - started
+        print(f"woke after {elapsed * 1000:.0f} ms -> {result}")
+        assert [r["content"] for r in result] == ["hello"]
+        assert elapsed < 1.0
+
+        # 已有命中的消息时立即返回
+        assert len(await store.wait_query(2.0, plugin_id="target", since=0)) == 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_seq_and_cursor_reads()
+    test_filtered_reads()
+    test_destructive_query()
+    test_eviction_and_index_trimming()
+    test_filtered_take_cleans_other_index()
+    test_long_poll_wakeup()
+    print("\n插件消息存储测试全部通过！")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试记忆检索的时间表达式解析（中文 / 英文 / 日文）
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory.timeparse import parse_time_range, strip_time_expression
+
+# 固定“现在”：2026-10-18 周日 15:30
+NOW = datetime(2026, 10, 18, 15, 30)
+
+
+def _check(query, start, end, matched=None):
+    result = parse_time_range(query, NOW)
+    print(f"{query!r:40} -> {result}")
+    assert result is not None, f"无法解析: {query}"
+    assert result.start == start, f"{query}: start {result.start} != {start}"
+    assert result.end == end, f"{query}: end {result.end} != {end}"
+    if matched is not None:
+        assert result.matched == matched, f"{query}: matched {result.matched!r} != {matched!r}"
+    return result
+
+
+def test_relative_days():
+    """N 天前 / 昨天 / 前天"""
+    print("\n=== 相对日期 ===")
+    yesterday = datetime(2026, 10, 17)
+    _check("昨天我们聊了什么", yesterday, yesterday + timedelta(days=1), "昨天")
+    _check("what did we talk about yesterday", yesterday, yesterday + timedelta(days=1), "yesterday")
+    _check("昨日の話", yesterday, yesterday + timedelta(days=1), "昨日")
+    three_days_ago = datetime(2026, 10, 15)
+    _check("3天前", three_days_ago, three_days_ago + timedelta(days=1))
+    _check("三天前说的那部电影", three_days_ago, three_days_ago + timedelta(days=1))
+    _check("3 days ago", three_days_ago, three_days_ago + timedelta(days=1))
+    _check("3日前に", three_days_ago, three_days_ago + timedelta(days=1))
+    _check("前天", datetime(2026, 10, 16), datetime(2026, 10, 17))
+
+
+def test_relative_hours_and_minutes():
+    """N 小时前 / N 分钟前 / 最近 N 小时"""
+    print("\n=== 小时与分钟 ===")
+    around_three_hours_ago = (NOW - timedelta(hours=4), NOW - timedelta(hours=2))
+    _check("3 hours ago", *around_three_hours_ago, "3 hours ago")
+    _check("三个小时前我们聊了什么", *around_three_hours_ago, "三个小时前")
+    _check("3小时前", *around_three_hours_ago)
+    _check("3時間前に話したこと", *around_three_hours_ago, "3時間前")
+    _check("an hour ago", NOW - timedelta(hours=2), NOW)
+    _check("5 minutes ago", NOW - timedelta(minutes=15), NOW)
+    _check("10分钟前", NOW - timedelta(minutes=20), NOW)
+    _check("5分前", NOW - timedelta(minutes=15), NOW)
+    _check("半小时前", NOW - timedelta(minutes=60), NOW)
+    _check("in the past 2 hours", NOW - timedelta(hours=2), NOW)
+    _check("最近3小时", NOW - timedelta(hours=3), NOW)
+    _check("ここ3時間", NOW - timedelta(hours=3), NOW)
+
+
+def test_relative_ranges():
+    """最近 N 天 / 上周 / 上个月 / 去年"""
+    print("\n=== 相对区间 ===")
+    _check("最近三天", datetime(2026, 10, 16), NOW)
+    _check("in the last 3 days", datetime(2026, 10, 16), NOW)
+    last_week = (datetime(2026, 10, 5), datetime(2026, 10, 12))
+    _check("上周", *last_week)
+    _check("last week", *last_week)
+    _check("先週", *last_week)
+    last_month = (datetime(2026, 9, 1), datetime(2026, 10, 1))
+    _check("上个月", *last_month)
+    _check("last month", *last_month)
+    _check("先月", *last_month)
+    _check("去年", datetime(2025, 1, 1), datetime(2026, 1, 1))
+
+
+def test_weekday_and_day_part():
+    """星期几与时段修饰"""
+    print("\n=== 星期与时段 ===")
+    _check("上周三晚上", datetime(2026, 10, 7, 18), datetime(2026, 10, 8))
+    _check("yesterday morning", datetime(2026, 10, 17, 5), datetime(2026, 10, 17, 12))
+    _check("先週の金曜日", datetime(2026, 10, 9), datetime(2026, 10, 10))
+
+
+def test_absolute_dates():
+    """绝对日期"""
+    print("\n=== 绝对日期 ===")
+    _check("2024年5月1日", datetime(2024, 5, 1), datetime(2024, 5, 2))
+    _check("2024-05-01", datetime(2024, 5, 1), datetime(2024, 5, 2))
+    _check("on May 1st", datetime(2026, 5, 1), datetime(2026, 5, 2))
+
+
+def test_no_time_expression():
+    """没有时间表达式时返回 None，区间不会延伸到未来"""
+    print("\n=== 无时间表达式 ===")
+    for query in ["你喜欢什么颜色", "三分之一", "what is your favorite food"]:
+        result = parse_time_range(query, NOW)
+        print(f"{query!r:40} -> {result}")
+        assert result is None, f"{query} 不应被解析: {result}"
+    today = parse_time_range("今天", NOW)
+    assert today.end == NOW
+
+
+def test_strip_time_expression():
+    """去掉已识别的时间表达式"""
+    query = "三个小时前我们聊了什么"
+    stripped = strip_time_expression(query, parse_time_range(query, NOW))
+    print(f"{query!r} -> {stripped!r}")
+    assert stripped.strip() == "我们聊了什么"
+
+
+if __name__ == "__main__":
+    test_relative_days()
+    test_relative_hours_and_minutes()
+    test_relative_ranges()
+    test_weekday_and_day_part()
+    test_absolute_dates()
+    test_no_time_expression()
+    test_strip_time_expression()
+    print("\n时间表达式解析测试全部通过！")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 TTS 语音缓存（内存 LRU、磁盘索引与淘汰、轮次录制、轮次开头的逐句切分）
+"""
+import sys
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from main_logic.tts_cache import TTSPhraseCache, TTSTurnRecorder, TTSLeadingSegments, TTS_CACHE_MAX_SEGMENT_CHARS
+
+
+def _key(cache, text):
+    return cache.make_key("voice", "model", text)
+
+
+def _wait_for_index(cache, entries):
+    deadline = time.monotonic() + 5
+    while cache.stats()["disk_entries"] < entries and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.stats()["disk_entries"] == entries, cache.stats()
+
+
+def test_memory_lru():
+    """内存超过上限时淘汰最久未用的条目"""
+    print("\n=== 内存 LRU ===")
+    cache = TTSPhraseCache(None, memory_bytes=300)
+    a, b, c = (_key(cache, t) for t in "abc")
+    cache.put(a, b"a" * 100)
+    cache.put(b, b"b" * 100)
+    assert cache.peek(a) == b"a" * 100  # a 变为最近使用
+    cache.put(c, b"c" * 150)
+    print(f"stats -> {cache.stats()}")
+    assert cache.peek(b) is None
+    assert cache.peek(a) is not None and cache.peek(c) is not None
+    assert cache.get(b) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_index_and_promotion():
+    """重新打开时在后台建立磁盘索引；只在磁盘上的条目 get 后提升到内存"""
+    print("\n=== 磁盘索引 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TTSPhraseCache(Path(tmp))
+        for text in ("你好", "早上好", "晚安"):
+            cache.put(_key(cache, text), text.encode("utf-8") * 10)
+        assert cache.stats()["disk_entries"] == 3
+
+        # 预热预算为 0：条目只在磁盘上
+        reopened = TTSPhraseCache(Path(tmp), memory_bytes=0)
+        _wait_for_index(reopened, 3)
+        key = _key(reopened, "早上好")
+        assert reopened.on_disk(key)
+        assert reopened.peek(key) is None
+        assert reopened.get(key) == "早上好".encode("utf-8") * 10
+        assert reopened.stats()["disk_bytes"] == sum(len(t.encode("utf-8")) * 10 for t in ("你好", "早上好", "晚安"))
+
+        # 正常预算下启动时预热到内存
+        warmed = TTSPhraseCache(Path(tmp))
+        _wait_for_index(warmed, 3)
+        deadline = time.monotonic() + 5
+        while warmed.stats()["entries"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert warmed.peek(_key(warmed, "晚安")) == "晚安".encode("utf-8") * 10
+
+        # 文件被外部删除：get 返回 None 并从索引中移除
+        os.remove(warmed._path(_key(warmed, "你好")))
+        cold = TTSPhraseCache(Path(tmp), memory_bytes=0)
+        _wait_for_index(cold, 2)
+        os.remove(cold._path(_key(cold, "晚安")))
+        assert cold.get(_key(cold, "晚安")) is None
+        assert not cold.on_disk(_key(cold, "晚安"))
+        assert cold.stats()["disk_entries"] == 1
+
+
+def test_disk_pruning():
+    """磁盘超过上限时按最近访问顺序淘汰，降到上限的 90%"""
+    print("\n=== 磁盘淘汰 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TTSPhraseCache(Path(tmp), disk_bytes=1000)
+        keys = [_key(cache, str(i)) for i in range(5)]
+        for key in keys[:4]:
+            cache.put(key, b"x" * 200)
+        cache.get(keys[0])  # 0 变为最近访问
+        cache.put(keys[4], b"x" * 400)  # 1200 字节，超出上限
+        stats = cache.stats()
+        print(f"stats -> {stats}")
+        assert stats["disk_bytes"] == 800
+        assert not cache.on_disk(keys[1]) and not cache.on_disk(keys[2])
+        assert cache.on_disk(keys[0]) and cache.on_disk(keys[4])
+        assert not cache._path(keys[1]).exists()
+        assert sorted(p.stem for p in Path(tmp).glob("*/*.pcm")) == sorted([keys[0], keys[3], keys[4]])
+
+        # 重新打开后索引与磁盘一致
+        reopened = TTSPhraseCache(Path(tmp), disk_bytes=1000)
+        _wait_for_index(reopened, 3)
+        assert reopened.stats()["disk_bytes"] == 800
+
+
+def test_turn_recorder():
+    """轮次完成后返回完整文本与音频；打断后残余音频所属的轮次不写缓存"""
+    print("\n=== 轮次录制 ===")
+    recorder = TTSTurnRecorder()
+    recorder.add_text("s1", "你好")
+    recorder.add_text("s1", "呀！")
+    recorder.close_text()
+    recorder.add_audio(b"\x01\x02")
+    recorder.add_audio(b"\x03\x04")
+    assert recorder.finish("s1") == ("你好呀！", b"\x01\x02\x03\x04")
+
+    # 打断：旧轮次的残余音频还在路上，新轮次在 worker 报告完成前不写缓存
+    recorder.add_text("s2", "很长的回复")
+    recorder.add_audio(b"\x05")
+    recorder.interrupt()
+    recorder.add_text("s3", "新的")
+    recorder.close_text()
+    recorder.add_audio(b"\x06")
+    assert recorder.finish("s3") is None
+
+    recorder.add_text("s4", "下一句")
+    recorder.close_text()
+    recorder.add_audio(b"\x07")
+    assert recorder.finish("s4") == ("下一句", b"\x07")
+
+    # 文本还没结束时收到完成信号：不完整，不写缓存
+    recorder.add_text("s5", "半句")
+    recorder.add_audio(b"\x08")
+    assert recorder.finish("s5") is None
+
+
+def test_leading_segments():
+    """轮次开头按句切出完整短句；长句或迟迟没有句末符号时结束开头阶段"""
+    print("\n=== 逐句切分 ===")
+    segments = TTSLeadingSegments()
+    assert segments.feed("s1", "你好") is None
+    assert segments.next_segment() is None and segments.leading
+    assert segments.feed("s1", "！今天天气") is None
+    assert segments.next_segment() == "你好！"
+    assert segments.next_segment() is None
+    assert segments.release() == "今天天气"
+    assert not segments.leading
+    assert segments.feed("s1", "不错。") == "不错。"
+
+    # 新的 speech_id 重新开始开头阶段
+    assert segments.feed("s2", "嗯") is None
+    assert segments.finish() == "嗯"
+    assert segments.speech_id is None
+
+    # 超长且没有句末符号：开头阶段结束，缓冲交给调用方
+    segments.feed("s3", "啊" * (TTS_CACHE_MAX_SEGMENT_CHARS + 1))
+    assert segments.next_segment() is None
+    assert not segments.leading
+    assert segments.release() == "啊" * (TTS_CACHE_MAX_SEGMENT_CHARS + 1)
+
+
+if __name__ == "__main__":
+    test_memory_lru()
+    test_disk_index_and_promotion()
+    test_disk_pruning()
+    test_turn_recorder()
+    test_leading_segments()
+    print("\nTTS 缓存测试全部通过！")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地向量存储（持久化与扩容、崩溃后的尾部、文件截断后的恢复、IVF 索引）
+"""
+import sys
+import os
+import json
+import tempfile
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from memory import vectorstore
+from memory.vectorstore import LocalVectorStore
+
+# 缩小初始容量，少量数据即可覆盖扩容
+vectorstore.INITIAL_CAPACITY = 4
+
+DIM = 8
+
+
+class FakeEmbeddings:
+    """文本 "t<i>" 映射到固定的随机向量"""
+
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.vectors = {}
+
+    def _vector(self, text):
+        if text not in self.vectors:
+            self.vectors[text] = self.rng.normal(size=DIM).tolist()
+        return self.vectors[text]
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def _open(tmp, embeddings):
+    return LocalVectorStore("test", tmp, embeddings)
+
+
+def _top_text(store, query):
+    return store.similarity_search(query, k=1)[0].page_content
+
+
+def test_persistence_and_growth():
+    """追加超过初始容量后矩阵按倍数扩容，重新打开后数据与检索结果不变"""
+    print("\n=== 持久化与扩容 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings = FakeEmbeddings()
+        store = _open(tmp, embeddings)
+        texts = [f"t{i}" for i in range(10)]
+        assert store.add_texts(texts[:3], [{"i": i} for i in range(3)]) == ["0", "1", "2"]
+        store.add_texts(texts[3:])
+        print(f"count={len(store)} capacity={store._capacity}")
+        assert len(store) == 10
+        assert store._capacity == 16
+
+        reopened = _open(tmp, embeddings)
+        assert len(reopened) == 10
+        doc, score = reopened.similarity_search_with_score("t1", k=1)[0]
+        assert doc.page_content == "t1" and doc.metadata == {"i": 1}
+        assert score > 0.99
+        assert [_top_text(reopened, t) for t in texts] == texts
+
+
+def test_uncommitted_tail_is_ignored():
+    """文档写完但 index.json 未更新（崩溃）时，尾部不计入，下次写入时截掉"""
+    print("\n=== 未提交的尾部 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings = FakeEmbeddings()
+        store = _open(tmp, embeddings)
+        store.add_texts(["t0", "t1"])
+        docs_path = os.path.join(tmp, "test", "docs.jsonl")
+        with open(docs_path, "ab") as f:
+            f.write(b'{"text": "half-written"')
+
+        reopened = _open(tmp, embeddings)
+        assert len(reopened) == 2
+        reopened.add_texts(["t2"])
+        with open(docs_path, "rb") as f:
+            texts = [json.loads(line)["text"] for line in f]
+        assert texts == ["t0", "t1", "t2"]
+        assert _top_text(_open(tmp, embeddings), "t2") == "t2"
+
+
+def test_reopen_after_truncation():
+    """向量或文档文件被截断时，保留完整的部分；文件缺失时按空存储启动"""
+    print("\n=== 截断后重新打开 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings = FakeEmbeddings()
+        _open(tmp, embeddings).add_texts([f"t{i}" for i in range(6)])
+        vectors_path = os.path.join(tmp, "test", "vectors.f16")
+        with open(vectors_path, "r+b") as f:
+            f.truncate(3 * DIM * 2 + 5)  # 3 行完整向量加半行
+
+        store = _open(tmp, embeddings)
+        print(f"after vectors truncation: count={len(store)}")
+        assert len(store) == 3
+        assert _top_text(store, "t2") == "t2"
+        store.add_texts(["t6"])
+        reopened = _open(tmp, embeddings)
+        assert len(reopened) == 4
+        assert _top_text(reopened, "t6") == "t6"
+
+        docs_path = os.path.join(tmp, "test", "docs.jsonl")
+        with open(docs_path, "rb") as f:
+            first_two = b"".join(f.readlines()[:2])
+        with open(docs_path, "wb") as f:
+            f.write(first_two)
+        store = _open(tmp, embeddings)
+        print(f"after docs truncation: count={len(store)}")
+        assert len(store) == 2
+        assert _top_text(store, "t1") == "t1"
+
+        os.remove(docs_path)
+        store = _open(tmp, embeddings)
+        assert len(store) == 0
+        assert store.similarity_search("t0") == []
+        store.add_texts(["fresh"])
+        assert _top_text(_open(tmp, embeddings), "fresh") == "fresh"
+
+
+def test_ivf_index():
+    """向量数达到阈值后在后台训练 IVF 索引，检索结果与暴力检索一致，重新打开时加载索引"""
+    print("\n=== IVF 索引 ===")
+    previous = vectorstore.IVF_MIN_VECTORS
+    vectorstore.IVF_MIN_VECTORS = 500
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            embeddings = FakeEmbeddings()
+            store = _open(tmp, embeddings)
+            texts = [f"t{i}" for i in range(600)]
+            store.add_texts(texts)
+            deadline = time.monotonic() + 30
+            while store._ivf is None and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert store._ivf is not None, "索引训练超时"
+            print(f"ivf: {store._ivf.nlist} lists, trained on {store._ivf.trained_count}")
+            assert store._ivf.trained_count == 600
+
+            # 训练之后新增的行不在索引里，也能被检索到
+            store.add_texts(["late"])
+            assert _top_text(store, "late") == "late"
+            assert all(_top_text(store, t) == t for t in texts[::50])
+
+            reopened = _open(tmp, embeddings)
+            assert reopened._ivf is not None and reopened._ivf.trained_count == 600
+            assert _top_text(reopened, "t123") == "t123"
+    finally:
+        vectorstore.IVF_MIN_VECTORS = previous
+
+
+if __name__ == "__main__":
+    test_persistence_and_growth()
+    test_uncommitted_tail_is_ignored()
+    test_reopen_after_truncation()
+    test_ivf_index()
+    print("\n向量存储测试全部通过！")
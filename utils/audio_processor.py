@@ -17,6 +17,7 @@ Limiter：限幅器，防止音频削波
 
 import numpy as np
 import logging
+import math
 from typing import Optional
 import soxr
 import time
@@ -64,15 +65,27 @@ class AudioProcessor:
     Processing chain: RNNoise -> AGC -> Limiter -> Resample
     
     RNNoise requires 48kHz audio with 480-sample frames (10ms).
-    After processing, audio is downsampled to 16kHz for API compatibility.
+    After processing, audio is downsampled to 16kHz for API compatibility
+    with a persistent soxr.ResampleStream, so filter state carries across
+    chunks. The stream emits output in blocks of roughly 30ms, so some
+    calls return b'' while it buffers; reset()/request_reset() clear it
+    and flush() drains its tail. The 'HQ' setting is kept on purpose: it
+    adds 20-30ms of latency, but the lower-latency 'QQ' setting (the only
+    one that emits every 10ms chunk) aliases into the speech band, and
+    'LQ'/'MQ' still buffer in 20-30ms blocks.
+    
+    Incoming samples are staged in a fixed-capacity int16 ring buffer and all
+    complete frames are denoised in a single RNNoise call. AGC and Limiter
+    work in place on preallocated float32 scratch arrays, so the steady-state
+    path does not allocate intermediate numpy arrays.
     
     IMPORTANT: Call reset() after each speech turn to clear RNNoise's
     internal GRU state and prevent state drift during silence/background.
     
     Thread Safety:
         This class is NOT safe for concurrent use. The following mutable
-        state is unprotected: _frame_buffer, _last_speech_prob,
-        _last_speech_time, _needs_reset, _denoiser.
+        state is unprotected: the ring buffer and scratch arrays,
+        _last_speech_prob, _last_speech_time, _needs_reset, _denoiser.
         
         Callers must NOT invoke process_chunk() or reset() from multiple
         threads or coroutines simultaneously. If concurrent access is
@@ -82,6 +95,7 @@ class AudioProcessor:
     
     RNNOISE_SAMPLE_RATE = 48000  # RNNoise requires 48kHz
     RNNOISE_FRAME_SIZE = 480     # 10ms at 48kHz
+    RING_CAPACITY = 48000        # Ring buffer holds at most 1 second of input
     API_SAMPLE_RATE = 16000      # API expects 16kHz
     
     # Reset denoiser if no speech detected for this many seconds
@@ -120,8 +134,18 @@ class AudioProcessor:
         self._denoiser = None
         self._init_denoiser()
         
-        # Buffer for incomplete frames (int16 for pyrnnoise)
-        self._frame_buffer = np.array([], dtype=np.int16)
+        # Streaming resampler (48kHz -> 16kHz) - keeps filter state across chunks
+        self._resampler = self._create_resampler()
+        
+        # Ring buffer for incomplete frames (int16 for pyrnnoise)
+        self._ring = np.zeros(self.RING_CAPACITY, dtype=np.int16)
+        self._ring_head = 0
+        self._ring_size = 0
+        # Preallocated work arrays, grown only if a chunk exceeds their capacity
+        self._frames_scratch = np.zeros(self.RING_CAPACITY, dtype=np.int16)   # contiguous copy when frames wrap
+        self._denoised_scratch = np.zeros(self.RING_CAPACITY, dtype=np.int16)  # RNNoise output
+        self._float_scratch = np.zeros(self.RING_CAPACITY, dtype=np.float32)   # AGC / Limiter
+        self._int16_scratch = np.zeros(self.RING_CAPACITY, dtype=np.int16)     # final output
         
         # Track voice activity for auto-reset
         self._last_speech_prob = 0.0
@@ -166,12 +190,25 @@ class AudioProcessor:
                 logger.exception("❌ Failed to initialize RNNoise")
                 self._denoiser = None
     
+    def _create_resampler(self) -> Optional[soxr.ResampleStream]:
+        """Create the streaming resampler, or None if no resampling is needed."""
+        if self.input_sample_rate == self.output_sample_rate:
+            return None
+        return soxr.ResampleStream(
+            self.input_sample_rate,
+            self.output_sample_rate,
+            1,
+            dtype='float32',
+            quality='HQ'
+        )
+    
     def process_chunk(self, audio_bytes: bytes) -> bytes:
         """
         Process a chunk of PCM16 audio data.
         
         Args:
-            audio_bytes: Raw PCM16 audio bytes at input_sample_rate (48kHz)
+            audio_bytes: Raw PCM16 audio at input_sample_rate (48kHz); any
+                bytes-like object (bytes, memoryview) is read without copying
             
         Returns:
             Processed audio as PCM16 bytes at output_sample_rate (16kHz)
@@ -193,6 +230,9 @@ class AudioProcessor:
                         self.on_silence_reset()
                     except Exception as e:
                         logger.error(f"❌ on_silence_reset callback error: {e}")
+            elif self._needs_reset:
+                # No RNNoise: still drop resampler/AGC state on explicit request
+                self._reset_internal_state()
             self._needs_reset = False
         
         # Apply RNNoise if available (processes int16, returns int16)
@@ -211,78 +251,162 @@ class AudioProcessor:
             
             audio_int16 = processed
         
+        needs_resample = self._resampler is not None
+        if len(audio_int16) == 0 or not (self.agc_enabled or self.limiter_enabled or needs_resample):
+            return audio_int16.tobytes()
+        
+        # AGC / Limiter / 降采样都在 float32 域进行，只转换一次
+        audio_float = self._to_float(audio_int16)
+        
         # Apply AGC (Automatic Gain Control) after RNNoise
-        if self.agc_enabled and len(audio_int16) > 0:
-            audio_int16 = self._apply_agc(audio_int16)
+        if self.agc_enabled:
+            self._apply_agc(audio_float)
         
         # Apply Limiter to prevent clipping
-        if self.limiter_enabled and len(audio_int16) > 0:
-            audio_int16 = self._apply_limiter(audio_int16)
-        
-        # Downsample from 48kHz to 16kHz using high-quality soxr
-        if self.input_sample_rate != self.output_sample_rate and len(audio_int16) > 0:
-            # Convert to float for soxr, resample, then back to int16
-            audio_float = audio_int16.astype(np.float32) / 32768.0
-            audio_float = soxr.resample(
-                audio_float, 
-                self.input_sample_rate, 
-                self.output_sample_rate, 
-                quality='HQ'
-            )
-            audio_int16 = (audio_float * 32768.0).clip(-32768, 32767).astype(np.int16)
-        return audio_int16.tobytes()
+        if self.limiter_enabled:
+            self._apply_limiter(audio_float)
+        
+        # Downsample from 48kHz to 16kHz using the streaming soxr resampler
+        if needs_resample:
+            audio_float = self._resampler.resample_chunk(audio_float)
+            if len(audio_float) == 0:
+                return b''  # Resampler buffering
+        return self._to_int16(audio_float).tobytes()
+    
+    def flush(self) -> bytes:
+        """
+        Drain the samples still held by the streaming resampler (end of input)
+        and reset it for the next stream.
+        
+        Returns:
+            Remaining PCM16 audio at output_sample_rate (may be empty)
+        """
+        if self._resampler is None:
+            return b''
+        tail = self._resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        self._resampler.clear()
+        if len(tail) == 0:
+            return b''
+        return self._to_int16(tail).tobytes()
+    
+    @staticmethod
+    def _grow(buffer: np.ndarray, size: int) -> np.ndarray:
+        """Return buffer if it can hold size samples, otherwise a larger replacement."""
+        if len(buffer) >= size:
+            return buffer
+        return np.zeros(max(size, 2 * len(buffer)), dtype=buffer.dtype)
+    
+    def _to_float(self, audio: np.ndarray) -> np.ndarray:
+        """Convert int16 samples to float32 (-1.0~1.0) in the float scratch array."""
+        self._float_scratch = self._grow(self._float_scratch, len(audio))
+        out = self._float_scratch[:len(audio)]
+        np.multiply(audio, 1.0 / 32768.0, out=out, casting='unsafe')
+        return out
+    
+    def _to_int16(self, audio_float: np.ndarray) -> np.ndarray:
+        """Convert float32 samples to int16 in the output scratch array (modifies audio_float)."""
+        np.multiply(audio_float, 32768.0, out=audio_float)
+        np.clip(audio_float, -32768, 32767, out=audio_float)
+        self._int16_scratch = self._grow(self._int16_scratch, len(audio_float))
+        out = self._int16_scratch[:len(audio_float)]
+        np.copyto(out, audio_float, casting='unsafe')
+        return out
+    
+    def _ring_write(self, audio: np.ndarray) -> None:
+        """Append samples to the ring buffer, dropping the oldest beyond 1 second."""
+        capacity = len(self._ring)
+        n = len(audio)
+        overflow = self._ring_size + n - capacity
+        if overflow > 0:
+            if overflow >= self._ring_size:
+                audio = audio[overflow - self._ring_size:]
+                n = len(audio)
+                self._ring_head = 0
+                self._ring_size = 0
+            else:
+                self._ring_head = (self._ring_head + overflow) % capacity
+                self._ring_size -= overflow
+        
+        tail = (self._ring_head + self._ring_size) % capacity
+        first = min(n, capacity - tail)
+        self._ring[tail:tail + first] = audio[:first]
+        if first < n:
+            self._ring[:n - first] = audio[first:]
+        self._ring_size += n
+    
+    def _ring_peek(self, count: int) -> np.ndarray:
+        """Return the oldest count samples as a contiguous array (a view when they don't wrap)."""
+        capacity = len(self._ring)
+        head = self._ring_head
+        if head + count <= capacity:
+            return self._ring[head:head + count]
+        first = capacity - head
+        out = self._frames_scratch[:count]
+        out[:first] = self._ring[head:]
+        out[first:] = self._ring[:count - first]
+        return out
+    
+    def _ring_consume(self, count: int) -> None:
+        self._ring_head = (self._ring_head + count) % len(self._ring)
+        self._ring_size -= count
     
     def _process_with_rnnoise(self, audio: np.ndarray) -> np.ndarray:
-        """Process audio through RNNoise frame by frame.
+        """Process audio through RNNoise, all complete frames in one call.
         
         Args:
             audio: int16 numpy array
             
         Returns:
-            Denoised int16 numpy array
+            Denoised int16 numpy array (a view into a scratch array, valid
+            until the next call)
         """
-        # Add to frame buffer (int16)
-        self._frame_buffer = np.concatenate([self._frame_buffer, audio])
-        
-        # Limit buffer size to prevent memory issues (max 1 seconds of audio)
-        max_buffer_samples = 1 * self.RNNOISE_SAMPLE_RATE
-        if len(self._frame_buffer) > max_buffer_samples:
-            self._frame_buffer = self._frame_buffer[-max_buffer_samples:]
-        
-        # Process complete frames
-        output_frames = []
-        while len(self._frame_buffer) >= self.RNNOISE_FRAME_SIZE:
-            frame = self._frame_buffer[:self.RNNOISE_FRAME_SIZE]
-            self._frame_buffer = self._frame_buffer[self.RNNOISE_FRAME_SIZE:]
-            
-            # RNNoise expects [channels, samples] format with int16
-            frame_2d = frame.reshape(1, -1)
-            
-            try:
-                # Process frame - pyrnnoise takes int16 and returns int16
-                for speech_prob, denoised_frame in self._denoiser.denoise_chunk(frame_2d):
-                    prob = float(speech_prob[0])
-                    self._last_speech_prob = prob
-                    
-                    # Track last time speech was detected
-                    if prob > 0.2:
-                        self._last_speech_time = time.time()
-                    
-                    output_frames.append(denoised_frame.flatten())
-            except Exception as e:
-                logger.error(f"❌ RNNoise processing error: {e}")
-                output_frames.append(frame)
-        
-        if output_frames:
-            return np.concatenate(output_frames)
-        return np.array([], dtype=np.int16)
+        # Add to ring buffer (int16), keeping at most 1 second of audio
+        self._ring_write(audio)
+        
+        num_samples = (self._ring_size // self.RNNOISE_FRAME_SIZE) * self.RNNOISE_FRAME_SIZE
+        if num_samples == 0:
+            return self._denoised_scratch[:0]
+        
+        # RNNoise expects [channels, samples] format with int16
+        frames = self._ring_peek(num_samples)
+        self._denoised_scratch = self._grow(self._denoised_scratch, num_samples)
+        output = self._denoised_scratch
+        written = 0
+        try:
+            # pyrnnoise splits the chunk into 480-sample frames and yields one result per frame
+            for speech_prob, denoised_frame in self._denoiser.denoise_chunk(frames.reshape(1, -1)):
+                prob = float(speech_prob[0])
+                self._last_speech_prob = prob
+                
+                # Track last time speech was detected
+                if prob > 0.2:
+                    self._last_speech_time = time.time()
+                
+                frame_len = denoised_frame.shape[-1]
+                if written + frame_len > len(output):
+                    output = self._denoised_scratch = self._grow(output, written + frame_len)
+                output[written:written + frame_len] = denoised_frame.reshape(-1)
+                written += frame_len
+        except Exception as e:
+            logger.error(f"❌ RNNoise processing error: {e}")
+            # Pass the frames that were not denoised through unchanged
+            if written < num_samples:
+                output[written:num_samples] = frames[written:]
+                written = num_samples
+        
+        self._ring_consume(num_samples)
+        return output[:written]
     
     def _reset_internal_state(self) -> None:
         """Reset RNNoise internal state without full reinitialization."""
-        self._frame_buffer = np.array([], dtype=np.int16)
+        self._ring_head = 0
+        self._ring_size = 0
         self._last_speech_prob = 0.0
         # Reset AGC gain state
         self._agc_gain = 1.0
+        # Drop buffered resampler input so the next turn starts clean
+        if self._resampler is not None:
+            self._resampler.clear()
         # Reset denoiser GRU hidden states (do not reinitialize)
         if self._denoiser is not None:
             try:
@@ -300,7 +424,7 @@ class AudioProcessor:
         logger.info("🔄 AudioProcessor state reset (external call)")
     
     def request_reset(self) -> None:
-        """Request a reset on the next process_chunk call."""
+        """Request a reset (RNNoise, AGC and resampler state) on the next process_chunk call."""
         self._needs_reset = True
     
     def save_debug_audio(self) -> None:
@@ -369,23 +493,17 @@ class AudioProcessor:
         self.limiter_enabled = enabled
         logger.info(f"🎤 Limiter {'enabled' if enabled else 'disabled'}")
     
-    def _apply_agc(self, audio: np.ndarray) -> np.ndarray:
+    def _apply_agc(self, audio_float: np.ndarray) -> None:
         """
-        Apply Automatic Gain Control to normalize audio levels.
+        Apply Automatic Gain Control to normalize audio levels, in place.
         
         Uses a simple peak-following AGC with attack/release dynamics.
         
         Args:
-            audio: int16 numpy array
-            
-        Returns:
-            Gain-adjusted int16 numpy array
+            audio_float: float32 numpy array (-1.0~1.0), modified in place
         """
-        # Convert to float for processing
-        audio_float = audio.astype(np.float32) / 32768.0
-        
-        # Calculate RMS of the current chunk
-        rms = np.sqrt(np.mean(audio_float ** 2) + 1e-10)
+        # Calculate RMS of the current chunk (dot product avoids a squared temporary)
+        rms = math.sqrt(float(np.dot(audio_float, audio_float)) / len(audio_float) + 1e-10)
         
         # Calculate desired gain with noise floor protection
         if rms > self.AGC_NOISE_FLOOR:
@@ -407,27 +525,18 @@ class AudioProcessor:
             self._agc_gain = (self._agc_release_coeff * self._agc_gain + 
                              (1 - self._agc_release_coeff) * desired_gain)
         
-        # Apply gain
-        audio_float = audio_float * self._agc_gain
-        
-        # Convert back to int16 (clipping will be handled by limiter)
-        return (audio_float * 32768.0).clip(-32768, 32767).astype(np.int16)
+        # Apply gain (clipping will be handled by limiter / int16 conversion)
+        audio_float *= self._agc_gain
     
-    def _apply_limiter(self, audio: np.ndarray) -> np.ndarray:
+    def _apply_limiter(self, audio_float: np.ndarray) -> None:
         """
-        Apply a soft limiter to prevent clipping.
+        Apply a soft limiter to prevent clipping, in place.
         
         Uses a soft-knee limiter to gently compress peaks above threshold.
         
         Args:
-            audio: int16 numpy array
-            
-        Returns:
-            Limited int16 numpy array
+            audio_float: float32 numpy array (-1.0~1.0), modified in place
         """
-        # Convert to float (-1.0 to 1.0 range)
-        audio_float = audio.astype(np.float32) / 32768.0
-        
         # Apply soft-knee limiting
         threshold = self.LIMITER_THRESHOLD
         knee = self.LIMITER_KNEE
@@ -436,23 +545,27 @@ class AudioProcessor:
         knee_start = threshold - knee / 2
         knee_end = threshold + knee / 2
         
+        # Fast path: nothing reaches the knee, the limiter is a no-op
+        peak = max(float(audio_float.max()), -float(audio_float.min()))
+        if peak <= knee_start:
+            return
+        
         # Get absolute values for comparison
         abs_audio = np.abs(audio_float)
+        sign = np.sign(audio_float)
         
         # Apply soft knee compression
         # Below knee_start: pass through
         # In knee region: gentle compression
         # Above knee_end: hard limiting
         
-        output = np.copy(audio_float)
-        
         # Knee region (soft transition)
         in_knee = (abs_audio > knee_start) & (abs_audio <= knee_end)
         if np.any(in_knee):
             # Quadratic compression in knee region
             knee_ratio = (abs_audio[in_knee] - knee_start) / knee
             compression = 1 - 0.5 * knee_ratio ** 2
-            output[in_knee] = np.sign(audio_float[in_knee]) * (
+            audio_float[in_knee] = sign[in_knee] * (
                 knee_start + (abs_audio[in_knee] - knee_start) * compression
             )
         
@@ -462,10 +575,42 @@ class AudioProcessor:
             # Soft saturation using tanh
             excess = abs_audio[above_knee] - threshold
             limited = threshold + 0.5 * np.tanh(excess * 2) * (1 - threshold)
-            output[above_knee] = np.sign(audio_float[above_knee]) * limited
+            audio_float[above_knee] = sign[above_knee] * limited
         
         # Final clip to ensure no samples exceed 1.0
-        output = np.clip(output, -1.0, 1.0)
-        
-        # Convert back to int16
-        return (output * 32768.0).clip(-32768, 32767).astype(np.int16)
+        np.clip(audio_float, -1.0, 1.0, out=audio_float)
+
+
+def benchmark_resampling(num_chunks: int = 2000, chunk_samples: int = 480,
+                         input_rate: int = 48000, output_rate: int = 16000) -> dict:
+    """
+    Compare per-chunk CPU time of one-shot soxr.resample against a persistent
+    soxr.ResampleStream for the microphone path (10ms chunks by default).
+    
+    Returns:
+        {"oneshot_us": float, "stream_us": float} - average CPU microseconds per chunk
+    """
+    rng = np.random.default_rng(0)
+    chunk = (rng.standard_normal(chunk_samples) * 0.1).astype(np.float32)
+    
+    start = time.process_time()
+    for _ in range(num_chunks):
+        soxr.resample(chunk, input_rate, output_rate, quality='HQ')
+    oneshot = time.process_time() - start
+    
+    stream = soxr.ResampleStream(input_rate, output_rate, 1, dtype='float32', quality='HQ')
+    start = time.process_time()
+    for _ in range(num_chunks):
+        stream.resample_chunk(chunk)
+    streaming = time.process_time() - start
+    
+    return {
+        "oneshot_us": oneshot / num_chunks * 1e6,
+        "stream_us": streaming / num_chunks * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    result = benchmark_resampling()
+    print(f"soxr.resample (one-shot): {result['oneshot_us']:.1f} us/chunk")
+    print(f"soxr.ResampleStream:      {result['stream_us']:.1f} us/chunk")
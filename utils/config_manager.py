@@ -8,8 +8,11 @@ import os
 import json
 import shutil
 import logging
+import threading
 from copy import deepcopy
 from pathlib import Path
+from types import MappingProxyType
+from typing import Any, NamedTuple
 
 from config import (
     APP_NAME,
@@ -30,6 +33,15 @@ from utils.api_config_loader import (
 logger = logging.getLogger(__name__)
 
 
+class ConfigSnapshot(NamedTuple):
+    """
+    只读配置快照。version 在每次重建快照时递增（进程内全局单调），
+    调用方保存 version 即可廉价判断配置是否变化。
+    """
+    version: int
+    data: Any
+
+
 class ConfigManager:
     """配置文件管理器"""
     
@@ -56,6 +68,12 @@ class ConfigManager:
 
         self.project_config_dir = self._get_project_config_directory()
         self.project_memory_dir = self._get_project_memory_directory()
+
+        # 配置快照缓存：按配置文件 (路径, mtime, 大小) 校验，文件变化或显式 reload() 时重建
+        self._snapshot_lock = threading.RLock()
+        self._snapshots = {}  # 快照名 -> (文件签名, ConfigSnapshot)
+        self._snapshot_version = 0
+        self._model_api_cache = {}  # model_type -> (core_config 快照版本, 配置)
     
     def _log(self, msg):
         """仅在主进程中打印调试信息"""
@@ -447,6 +465,44 @@ class ConfigManager:
         except Exception as e:
             print(f"Warning: Failed to migrate memory files: {e}", file=sys.stderr)
     
+    # --- Snapshot cache helpers ---
+
+    @staticmethod
+    def _file_signature(path):
+        try:
+            st = os.stat(path)
+            return (str(path), st.st_mtime_ns, st.st_size)
+        except OSError:
+            return (str(path), None, None)
+
+    def _get_snapshot(self, name, filename, build):
+        """
+        获取名为 name 的配置快照：filename 的文件签名未变化时直接复用，否则调用 build() 重建
+        
+        Args:
+            name: 快照名
+            filename: 快照依赖的配置文件名
+            build: 无参函数，返回快照数据
+        """
+        signature = self._file_signature(self.get_config_path(filename))
+        with self._snapshot_lock:
+            cached = self._snapshots.get(name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            data = build()
+            # build 过程中可能回写了配置文件（如修正当前猫娘），以回写后的签名为准
+            signature = self._file_signature(self.get_config_path(filename))
+            self._snapshot_version += 1
+            snapshot = ConfigSnapshot(self._snapshot_version, data)
+            self._snapshots[name] = (signature, snapshot)
+            return snapshot
+
+    def reload(self):
+        """丢弃所有配置快照，下次读取时重新从磁盘加载"""
+        with self._snapshot_lock:
+            self._snapshots.clear()
+            self._model_api_cache.clear()
+
     # --- Character configuration helpers ---
 
     def get_default_characters(self):
@@ -479,6 +535,7 @@ class ConfigManager:
 
         with open(character_json_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        self.reload()
 
     # --- Voice storage helpers ---
 
@@ -566,7 +623,17 @@ class ConfigManager:
     # --- Character metadata helpers ---
 
     def get_character_data(self):
-        """获取角色基础数据及相关路径"""
+        """获取角色基础数据及相关路径（返回调用方可自由修改的副本）"""
+        return deepcopy(self.get_character_snapshot().data)
+
+    def get_character_snapshot(self) -> ConfigSnapshot:
+        """
+        获取角色数据的只读快照，data 与 get_character_data() 的返回值结构相同。
+        characters.json 未变化时不读盘也不复制；调用方不得修改其中的对象。
+        """
+        return self._get_snapshot('characters', 'characters.json', self._build_character_data)
+
+    def _build_character_data(self):
         character_data = self.load_characters()
         defaults = self.get_default_characters()
 
@@ -621,7 +688,14 @@ class ConfigManager:
     # --- Core config helpers ---
 
     def get_core_config(self):
-        """动态读取核心配置"""
+        """动态读取核心配置（返回调用方可自由修改的副本）"""
+        return dict(self.get_core_config_snapshot().data)
+
+    def get_core_config_snapshot(self) -> ConfigSnapshot:
+        """获取核心配置的只读快照（data 为只读映射），core_config.json 未变化时直接复用"""
+        return self._get_snapshot('core_config', 'core_config.json', self._build_core_config)
+
+    def _build_core_config(self):
         # 从 config 模块导入所有默认配置值
         from config import (
             DEFAULT_CORE_API_KEY,
@@ -863,7 +937,7 @@ class ConfigManager:
             if core_cfg.get('ttsVoiceId') is not None:
                 config['TTS_VOICE_ID'] = core_cfg.get('ttsVoiceId', '')
 
-        return config
+        return MappingProxyType(config)
 
     def get_model_api_config(self, model_type: str) -> dict:
         """
@@ -886,7 +960,15 @@ class ConfigManager:
                 - 'base_url': API端点URL
                 - 'is_custom': 是否使用自定义API配置
         """
-        core_config = self.get_core_config()
+        snapshot = self.get_core_config_snapshot()
+        cached = self._model_api_cache.get(model_type)
+        if cached is not None and cached[0] == snapshot.version:
+            return dict(cached[1])
+        result = self._build_model_api_config(model_type, snapshot.data)
+        self._model_api_cache[model_type] = (snapshot.version, result)
+        return dict(result)
+
+    def _build_model_api_config(self, model_type: str, core_config) -> dict:
         enable_custom_api = core_config.get('ENABLE_CUSTOM_API', False)
         
         # 模型类型到配置字段的映射
@@ -1045,6 +1127,8 @@ class ConfigManager:
         except Exception as e:
             print(f"Error saving {filename}: {e}", file=sys.stderr)
             raise
+        finally:
+            self.reload()
     
     def get_memory_path(self, filename):
         """
@@ -0,0 +1,245 @@
+"""
+近期记忆的追加式日志存储
+recent_{name}.json 仍是完整快照（格式不变，记忆浏览器可以直接查看、编辑），
+每次更新只向旁边的 recent_{name}.json.journal 追加一行操作记录，日志积累到一定量后再合并进快照。
+快照一律通过临时文件 + os.replace 原子替换，进程中途退出不会留下写了一半的文件。
+
+日志第一行记录其所基于的快照内容哈希；快照被外部改写（记忆浏览器保存、重命名）后哈希对不上，旧日志自动作废。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 日志操作条数超过该值后合并进快照
+RECENT_JOURNAL_MAX_OPS = 32
+# 日志文件超过该大小（字节）后合并进快照
+RECENT_JOURNAL_MAX_BYTES = 1024 * 1024
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+def _atomic_write_json(path: str, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _apply(history: list, op: dict) -> list:
+    kind = op.get("op")
+    if kind == "append":
+        return history + op["messages"]
+    if kind == "replace_prefix":
+        return op["messages"] + history[op["count"]:]
+    raise ValueError(f"未知的日志操作: {kind}")
+
+
+def _read_history(path: str, journal_path: str):
+    """
+    只读地读取快照并应用日志，不修改任何文件
+
+    Returns:
+        (消息列表, 有效操作条数, 需要的修复)：修复为 None（无需修复）、"stale"（日志基于旧快照，应删除）
+        或日志的有效字节数（尾部有写了一半或无法解析的内容，应截断到该长度）
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        raw = b""
+    base = hashlib.sha1(raw).hexdigest()
+    try:
+        history = json.loads(raw) if raw.strip() else []
+        if not isinstance(history, list):
+            raise ValueError("快照内容不是列表")
+    except Exception as e:
+        logger.warning(f"读取历史记录文件 {path} 失败: {e}，使用空列表")
+        history = []
+
+    try:
+        with open(journal_path, "rb") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        lines = []
+    if not lines:
+        return history, 0, None
+    try:
+        header = json.loads(lines[0])
+    except Exception:
+        header = {}
+    if header.get("base") != base:
+        return history, 0, "stale"
+
+    ops = 0
+    valid_bytes = len(lines[0])
+    for line in lines[1:]:
+        if not line.endswith(b"\n"):
+            break  # 写了一半的最后一行（进程退出，或另一个进程正在写入）
+        try:
+            history = _apply(history, json.loads(line))
+        except Exception as e:
+            logger.warning(f"历史记录日志 {journal_path} 中有无法解析的操作，已忽略后续内容: {e}")
+            break
+        ops += 1
+        valid_bytes += len(line)
+    return history, ops, (valid_bytes if ops < len(lines) - 1 else None)
+
+
+class HistoryJournal:
+    """
+    单个角色的近期记忆存储（线程安全），内存中的列表为权威副本
+
+    Args:
+        path: 快照文件路径（recent_{name}.json）
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self._lock = threading.RLock()
+        self._history: list = []
+        self._ops = 0
+        self._synced = None  # 最近一次读写后的 (快照签名, 日志签名)
+
+    def _current_signature(self):
+        return _signature(self.path), _signature(self.journal_path)
+
+    def refresh(self) -> Optional[List[dict]]:
+        """磁盘上的数据被外部改动过（或首次加载）时重新读取并返回消息字典列表，否则返回 None"""
+        with self._lock:
+            signature = self._current_signature()
+            if signature == self._synced:
+                return None
+            self._load()
+            return list(self._history)
+
+    def load(self) -> List[dict]:
+        """返回当前的消息字典列表（必要时先从磁盘重新读取）"""
+        with self._lock:
+            self.refresh()
+            return list(self._history)
+
+    def _load(self):
+        history, ops, repair = _read_history(self.path, self.journal_path)
+        if repair == "stale":
+            # 快照已被外部改写或已合并，旧日志作废
+            self._remove_journal()
+        elif repair is not None:
+            # 截掉无效的尾部，后续追加才不会接在半行后面
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(repair)
+        self._history = history
+        self._ops = ops
+        self._synced = self._current_signature()
+
+    def _remove_journal(self):
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除历史记录日志 {self.journal_path} 失败: {e}")
+
+    def _write_op(self, op: dict):
+        """追加一条操作记录；日志不存在时先写入基于当前快照的头部"""
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 二进制模式写入，避免 Windows 换行转换影响按字节截断
+        line = (json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.journal_path, "ab") as f:
+            if f.tell() == 0:
+                try:
+                    with open(self.path, "rb") as snapshot:
+                        raw = snapshot.read()
+                except FileNotFoundError:
+                    raw = b""
+                f.write((json.dumps({"base": hashlib.sha1(raw).hexdigest()}) + "\n").encode("utf-8"))
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._ops += 1
+        if self._ops >= RECENT_JOURNAL_MAX_OPS or os.path.getsize(self.journal_path) >= RECENT_JOURNAL_MAX_BYTES:
+            self.compact()
+        else:
+            self._synced = self._current_signature()
+
+    def append(self, messages: List[dict]):
+        """在末尾追加消息"""
+        if not messages:
+            return
+        with self._lock:
+            self.refresh()
+            op = {"op": "append", "messages": messages}
+            self._history = _apply(self._history, op)
+            self._write_op(op)
+
+    def replace_prefix(self, count: int, messages: List[dict]):
+        """把最早的 count 条消息替换为 messages（压缩摘要）"""
+        with self._lock:
+            self.refresh()
+            op = {"op": "replace_prefix", "count": count, "messages": messages}
+            self._history = _apply(self._history, op)
+            self._write_op(op)
+
+    def rewrite(self, messages: List[dict]):
+        """整体替换（记忆审阅结果等），直接写快照并清空日志"""
+        with self._lock:
+            self._history = list(messages)
+            self.compact()
+
+    def compact(self):
+        """把内存中的完整记录原子写入快照，然后删除日志"""
+        with self._lock:
+            _atomic_write_json(self.path, self._history)
+            # 快照替换后旧日志的 base 已对不上，即使删除失败也不会被重复应用
+            self._remove_journal()
+            self._ops = 0
+            self._synced = self._current_signature()
+
+
+def read_history_file(path: str) -> List[dict]:
+    """
+    读取快照并应用尚未合并的日志（供记忆浏览器等外部读取使用）。
+    严格只读：日志由 memory_server 中的 HistoryJournal 负责写入和修复，这里可能正读到它写了一半的行，只能忽略。
+    """
+    history, _, _ = _read_history(path, path + JOURNAL_SUFFIX)
+    return history
+
+
+def compact_history_file(path: str):
+    """把日志合并进快照，之后可以像普通 JSON 文件一样直接处理快照"""
+    journal = HistoryJournal(path)
+    journal.load()
+    if os.path.exists(journal.journal_path):
+        journal.compact()
+
+
+def write_history_file(path: str, messages: List[dict]):
+    """原子写入完整快照并作废旧日志"""
+    HistoryJournal(path).rewrite(messages)